@@ -0,0 +1,75 @@
+"""add_analysis_runs
+
+Ledger of gap analysis runs and their per-control results.
+
+Revision ID: add_analysis_runs_001
+Revises: add_gap_upsert_001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_analysis_runs_001'
+down_revision = 'add_gap_upsert_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('analysis_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('framework_id', sa.Integer(), nullable=True),
+        sa.Column('triggered_by_id', sa.Integer(), nullable=True),
+        sa.Column('source', sa.String(length=30), nullable=False),
+        sa.Column('force', sa.Boolean(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('total_controls', sa.Integer(), nullable=False),
+        sa.Column('gaps_identified', sa.Integer(), nullable=False),
+        sa.Column('compliant_controls', sa.Integer(), nullable=False),
+        sa.Column('error_controls', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('duration_ms', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['framework_id'], ['frameworks.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['triggered_by_id'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_analysis_runs_id'), 'analysis_runs', ['id'], unique=False)
+    op.create_index('ix_analysis_runs_company_started', 'analysis_runs', ['company_id', 'started_at'], unique=False)
+
+    op.create_table('control_results',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('run_id', sa.Integer(), nullable=False),
+        sa.Column('control_id', sa.Integer(), nullable=False),
+        sa.Column('framework_id', sa.Integer(), nullable=True),
+        sa.Column('gap_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('severity', sa.String(length=20), nullable=True),
+        sa.Column('risk_score', sa.SmallInteger(), nullable=True),
+        sa.Column('gap_created', sa.Boolean(), nullable=False),
+        sa.Column('max_similarity', sa.Float(), nullable=True),
+        sa.Column('similarity_scores', postgresql.ARRAY(sa.Float()), nullable=True),
+        sa.Column('matched_policy_titles', postgresql.ARRAY(sa.Text()), nullable=True),
+        sa.Column('missing_requirements', postgresql.ARRAY(sa.Text()), nullable=True),
+        sa.Column('reason', sa.Text(), nullable=True),
+        sa.Column('decision_reason', sa.Text(), nullable=True),
+        sa.Column('details', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.ForeignKeyConstraint(['run_id'], ['analysis_runs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_control_results_run_id_id', 'control_results', ['run_id', 'id'], unique=False)
+    op.create_index('ix_control_results_control_run', 'control_results', ['control_id', 'run_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_control_results_control_run', table_name='control_results')
+    op.drop_index('ix_control_results_run_id_id', table_name='control_results')
+    op.drop_table('control_results')
+    op.drop_index('ix_analysis_runs_company_started', table_name='analysis_runs')
+    op.drop_index(op.f('ix_analysis_runs_id'), table_name='analysis_runs')
+    op.drop_table('analysis_runs')
@@ -0,0 +1,56 @@
+"""add_artifact_blobs
+
+Revision ID: add_artifact_blobs_001
+Revises: add_ui_enum_001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_artifact_blobs_001'
+down_revision = 'add_ui_enum_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Content-addressed blob store: one row per unique artifact file
+    op.create_table('artifact_blobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('mime_type', sa.String(length=100), nullable=True),
+        sa.Column('storage_path', sa.String(length=500), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_artifact_blobs_id'), 'artifact_blobs', ['id'], unique=False)
+    op.create_index(op.f('ix_artifact_blobs_sha256'), 'artifact_blobs', ['sha256'], unique=True)
+
+    # Artifacts reference blobs (nullable: rows uploaded before the blob store keep their own file_path)
+    op.add_column('artifacts',
+        sa.Column('blob_id', sa.Integer(), nullable=True)
+    )
+    op.create_foreign_key(
+        'fk_artifacts_blob_id',
+        'artifacts',
+        'artifact_blobs',
+        ['blob_id'],
+        ['id'],
+        ondelete='SET NULL'
+    )
+    op.create_index(op.f('ix_artifacts_blob_id'), 'artifacts', ['blob_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_artifacts_blob_id'), table_name='artifacts')
+    op.drop_constraint('fk_artifacts_blob_id', 'artifacts', type_='foreignkey')
+    op.drop_column('artifacts', 'blob_id')
+
+    op.drop_index(op.f('ix_artifact_blobs_sha256'), table_name='artifact_blobs')
+    op.drop_index(op.f('ix_artifact_blobs_id'), table_name='artifact_blobs')
+    op.drop_table('artifact_blobs')
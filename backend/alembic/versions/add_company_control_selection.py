@@ -0,0 +1,72 @@
+"""add_company_control_selection
+
+Normalized control selections: one company_control_selection row per selected
+control, backfilled from the control_selections.selected_control_ids JSON arrays,
+which are then dropped.
+
+Revision ID: add_company_control_selection_001
+Revises: add_catalog_version_001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_company_control_selection_001'
+down_revision = 'add_catalog_version_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('company_control_selection',
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('framework_id', sa.Integer(), nullable=False),
+        sa.Column('control_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['framework_id'], ['frameworks.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['control_id'], ['controls.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('company_id', 'framework_id', 'control_id')
+    )
+    op.create_index('ix_company_control_selection_control_id', 'company_control_selection', ['control_id'], unique=False)
+
+    # Backfill: expand each JSON array (also double-encoded ones, stored as a JSON
+    # string) into rows, de-duplicated, keeping only controls that still exist
+    op.execute("""
+        INSERT INTO company_control_selection (company_id, framework_id, control_id)
+        SELECT DISTINCT s.company_id, s.framework_id, c.id
+        FROM (
+            SELECT company_id, framework_id,
+                   CASE WHEN json_typeof(selected_control_ids::json) = 'string'
+                        THEN (selected_control_ids::json #>> '{}')::json
+                        ELSE selected_control_ids::json
+                   END AS ids
+            FROM control_selections
+            WHERE company_id IS NOT NULL AND framework_id IS NOT NULL
+        ) AS s
+        CROSS JOIN LATERAL json_array_elements_text(
+            CASE WHEN json_typeof(s.ids) = 'array' THEN s.ids ELSE '[]'::json END
+        ) AS e(value)
+        JOIN controls AS c ON c.id::text = trim(e.value)
+        ON CONFLICT DO NOTHING
+    """)
+
+    op.execute("DROP INDEX IF EXISTS ix_control_selections_control_ids")
+    op.drop_column('control_selections', 'selected_control_ids')
+
+
+def downgrade() -> None:
+    op.add_column('control_selections', sa.Column('selected_control_ids', sa.JSON(), nullable=True))
+    op.execute("""
+        UPDATE control_selections AS s
+        SET selected_control_ids = COALESCE((
+            SELECT json_agg(ccs.control_id ORDER BY ccs.control_id)
+            FROM company_control_selection AS ccs
+            WHERE ccs.company_id = s.company_id AND ccs.framework_id = s.framework_id
+        ), '[]'::json)
+    """)
+    op.alter_column('control_selections', 'selected_control_ids', nullable=False)
+    op.drop_index('ix_company_control_selection_control_id', table_name='company_control_selection')
+    op.drop_table('company_control_selection')
@@ -0,0 +1,48 @@
+"""add_control_analysis_cache
+
+Revision ID: add_analysis_cache_001
+Revises: add_artifact_blobs_001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_analysis_cache_001'
+down_revision = 'add_artifact_blobs_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('control_analysis_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('control_id', sa.Integer(), nullable=False),
+        sa.Column('framework_id', sa.Integer(), nullable=True),
+        sa.Column('input_fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('control_requirements', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('evaluation', postgresql.JSON(astext_type=sa.Text()), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['control_id'], ['controls.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['framework_id'], ['frameworks.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('company_id', 'control_id', name='uq_control_analysis_cache_company_control')
+    )
+    op.create_index(op.f('ix_control_analysis_cache_id'), 'control_analysis_cache', ['id'], unique=False)
+    op.create_index(op.f('ix_control_analysis_cache_company_id'), 'control_analysis_cache', ['company_id'], unique=False)
+    op.create_index(op.f('ix_control_analysis_cache_control_id'), 'control_analysis_cache', ['control_id'], unique=False)
+    op.create_index(op.f('ix_control_analysis_cache_framework_id'), 'control_analysis_cache', ['framework_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_control_analysis_cache_framework_id'), table_name='control_analysis_cache')
+    op.drop_index(op.f('ix_control_analysis_cache_control_id'), table_name='control_analysis_cache')
+    op.drop_index(op.f('ix_control_analysis_cache_company_id'), table_name='control_analysis_cache')
+    op.drop_index(op.f('ix_control_analysis_cache_id'), table_name='control_analysis_cache')
+    op.drop_table('control_analysis_cache')
@@ -0,0 +1,48 @@
+"""add_control_equivalences
+
+Cross-framework control equivalence pairs (curated mappings and embedding
+similarity candidates).
+
+Revision ID: add_control_equivalences_001
+Revises: add_oscal_source_ids_001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_control_equivalences_001'
+down_revision = 'add_oscal_source_ids_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('control_equivalences',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('control_id', sa.Integer(), nullable=False),
+        sa.Column('equivalent_control_id', sa.Integer(), nullable=False),
+        sa.Column('source', sa.String(length=20), nullable=False),
+        sa.Column('similarity', sa.Float(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('reviewed_by_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['control_id'], ['controls.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['equivalent_control_id'], ['controls.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['reviewed_by_id'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('control_id', 'equivalent_control_id', name='uq_control_equivalences_pair'),
+        sa.CheckConstraint('control_id < equivalent_control_id', name='ck_control_equivalences_ordered')
+    )
+    op.create_index(op.f('ix_control_equivalences_id'), 'control_equivalences', ['id'], unique=False)
+    op.create_index('ix_control_equivalences_equivalent_control_id', 'control_equivalences', ['equivalent_control_id'], unique=False)
+    op.create_index('ix_control_equivalences_status', 'control_equivalences', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_control_equivalences_status', table_name='control_equivalences')
+    op.drop_index('ix_control_equivalences_equivalent_control_id', table_name='control_equivalences')
+    op.drop_index(op.f('ix_control_equivalences_id'), table_name='control_equivalences')
+    op.drop_table('control_equivalences')
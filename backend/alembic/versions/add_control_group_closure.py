@@ -0,0 +1,52 @@
+"""add_control_group_closure
+
+Closure table of the control group hierarchy (one row per ancestor/descendant
+pair, depth 0 for the group itself), backfilled from parent_group_id.
+
+Revision ID: add_control_group_closure_001
+Revises: add_company_control_selection_001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_control_group_closure_001'
+down_revision = 'add_company_control_selection_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('control_group_closure',
+        sa.Column('ancestor_id', sa.Integer(), nullable=False),
+        sa.Column('descendant_id', sa.Integer(), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['control_groups.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['descendant_id'], ['control_groups.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_control_group_closure_descendant_depth', 'control_group_closure', ['descendant_id', 'depth'], unique=False)
+
+    # Backfill: every group with itself, then down parent_group_id (depth-capped
+    # in case existing data has a cycle)
+    op.execute("""
+        INSERT INTO control_group_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE paths (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM control_groups
+            UNION ALL
+            SELECT p.ancestor_id, g.id, p.depth + 1
+            FROM paths AS p
+            JOIN control_groups AS g ON g.parent_group_id = p.descendant_id
+            WHERE p.depth < 32
+        )
+        SELECT ancestor_id, descendant_id, MIN(depth)
+        FROM paths
+        GROUP BY ancestor_id, descendant_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_control_group_closure_descendant_depth', table_name='control_group_closure')
+    op.drop_table('control_group_closure')
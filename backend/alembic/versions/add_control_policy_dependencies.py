@@ -0,0 +1,41 @@
+"""add_control_policy_dependencies
+
+Revision ID: add_policy_deps_001
+Revises: add_analysis_cache_001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_policy_deps_001'
+down_revision = 'add_analysis_cache_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('control_policy_dependencies',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('control_id', sa.Integer(), nullable=False),
+        sa.Column('policy_id', sa.Integer(), nullable=False),
+        sa.Column('chunk_id', sa.String(length=255), nullable=True),
+        sa.Column('score', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['control_id'], ['controls.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['policy_id'], ['policies.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_control_policy_dependencies_id'), 'control_policy_dependencies', ['id'], unique=False)
+    op.create_index('ix_control_policy_dependencies_company_policy', 'control_policy_dependencies', ['company_id', 'policy_id'], unique=False)
+    op.create_index('ix_control_policy_dependencies_company_control', 'control_policy_dependencies', ['company_id', 'control_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_control_policy_dependencies_company_control', table_name='control_policy_dependencies')
+    op.drop_index('ix_control_policy_dependencies_company_policy', table_name='control_policy_dependencies')
+    op.drop_index(op.f('ix_control_policy_dependencies_id'), table_name='control_policy_dependencies')
+    op.drop_table('control_policy_dependencies')
@@ -0,0 +1,42 @@
+"""add_decision_thresholds
+
+Per-framework decision thresholds (similarity floors, risk score bands).
+
+Revision ID: add_decision_thresholds_001
+Revises: add_analysis_runs_001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_decision_thresholds_001'
+down_revision = 'add_analysis_runs_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('decision_thresholds',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('framework_id', sa.Integer(), nullable=False),
+        sa.Column('similarity_min', sa.Float(), nullable=False),
+        sa.Column('auto_compliant', sa.Float(), nullable=False),
+        sa.Column('default_risk_score', sa.Integer(), nullable=False),
+        sa.Column('high_risk_score', sa.Integer(), nullable=False),
+        sa.Column('medium_risk_score', sa.Integer(), nullable=False),
+        sa.Column('updated_by_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['framework_id'], ['frameworks.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['updated_by_id'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('framework_id')
+    )
+    op.create_index(op.f('ix_decision_thresholds_id'), 'decision_thresholds', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_decision_thresholds_id'), table_name='decision_thresholds')
+    op.drop_table('decision_thresholds')
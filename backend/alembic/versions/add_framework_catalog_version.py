@@ -0,0 +1,26 @@
+"""add_framework_catalog_version
+
+Version stamp of a framework's control tree, bumped whenever it changes so
+cached copies of the framework catalog can detect staleness.
+
+Revision ID: add_catalog_version_001
+Revises: add_decision_thresholds_001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_catalog_version_001'
+down_revision = 'add_decision_thresholds_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('frameworks', sa.Column('catalog_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('frameworks', 'catalog_version')
@@ -0,0 +1,92 @@
+"""add_gap_upsert
+
+Gaps become one row per (company, open control): gap analysis runs update the
+open gap in place and count the runs instead of inserting a new gap each time.
+
+- gaps.company_id (backfilled from the identifying user), run_count,
+  last_analyzed_at, evidence
+- existing duplicate open gaps are collapsed into the newest one: its run_count
+  becomes the number of duplicates, artifacts and worked-on remediations of the
+  older duplicates move to it, it keeps the first identified date, and the older
+  duplicates are deleted (with their untouched generated remediations)
+- partial unique index on (company_id, control_id) for open gaps
+
+Revision ID: add_gap_upsert_001
+Revises: add_policy_deps_001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_gap_upsert_001'
+down_revision = 'add_policy_deps_001'
+branch_labels = None
+depends_on = None
+
+OPEN_GAP_CONDITION = "is_active AND status IN ('IDENTIFIED', 'IN_REMEDIATION')"
+
+
+def upgrade() -> None:
+    op.add_column('gaps', sa.Column('company_id', sa.Integer(), nullable=True))
+    op.add_column('gaps', sa.Column('evidence', sa.JSON(), nullable=True))
+    op.add_column('gaps', sa.Column('run_count', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('gaps', sa.Column('last_analyzed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+    op.create_foreign_key('fk_gaps_company_id', 'gaps', 'companies', ['company_id'], ['id'], ondelete='CASCADE')
+    op.create_index(op.f('ix_gaps_company_id'), 'gaps', ['company_id'], unique=False)
+
+    op.execute("""
+        UPDATE gaps SET company_id = users.company_id, last_analyzed_at = gaps.updated_at
+        FROM users WHERE users.id = gaps.identified_by_id
+    """)
+
+    # Open duplicates per (company, control); the newest gap is kept
+    op.execute(f"""
+        CREATE TEMPORARY TABLE gap_duplicates AS
+        SELECT id,
+               FIRST_VALUE(id) OVER (PARTITION BY company_id, control_id ORDER BY id DESC) AS keep_id,
+               COUNT(*) OVER (PARTITION BY company_id, control_id) AS duplicates,
+               MIN(identified_date) OVER (PARTITION BY company_id, control_id) AS first_identified,
+               status
+        FROM gaps
+        WHERE {OPEN_GAP_CONDITION} AND company_id IS NOT NULL AND control_id IS NOT NULL
+    """)
+    op.execute("DELETE FROM gap_duplicates WHERE duplicates = 1")
+
+    op.execute("""
+        UPDATE gaps SET run_count = d.duplicates, identified_date = d.first_identified
+        FROM gap_duplicates d WHERE d.id = d.keep_id AND gaps.id = d.keep_id
+    """)
+    # Remediation already started on an older duplicate carries over
+    op.execute("""
+        UPDATE gaps SET status = 'IN_REMEDIATION'
+        WHERE id IN (SELECT keep_id FROM gap_duplicates WHERE status = 'IN_REMEDIATION')
+    """)
+    op.execute("""
+        UPDATE artifacts SET gap_id = d.keep_id
+        FROM gap_duplicates d WHERE artifacts.gap_id = d.id AND d.id <> d.keep_id
+    """)
+    op.execute("""
+        UPDATE remediations SET gap_id = d.keep_id
+        FROM gap_duplicates d
+        WHERE remediations.gap_id = d.id AND d.id <> d.keep_id AND remediations.status <> 'PLANNED'
+    """)
+    op.execute("DELETE FROM gaps WHERE id IN (SELECT id FROM gap_duplicates WHERE id <> keep_id)")
+    op.execute("DROP TABLE gap_duplicates")
+
+    op.create_index(
+        'uq_gaps_open_company_control', 'gaps', ['company_id', 'control_id'],
+        unique=True, postgresql_where=sa.text(OPEN_GAP_CONDITION)
+    )
+
+
+def downgrade() -> None:
+    # Collapsed duplicates are not restored
+    op.drop_index('uq_gaps_open_company_control', table_name='gaps')
+    op.drop_index(op.f('ix_gaps_company_id'), table_name='gaps')
+    op.drop_constraint('fk_gaps_company_id', 'gaps', type_='foreignkey')
+    op.drop_column('gaps', 'last_analyzed_at')
+    op.drop_column('gaps', 'run_count')
+    op.drop_column('gaps', 'evidence')
+    op.drop_column('gaps', 'company_id')
@@ -0,0 +1,31 @@
+"""add_oscal_source_ids
+
+Catalog IDs of imported control groups and controls (OSCAL importer upsert keys).
+
+Revision ID: add_oscal_source_ids_001
+Revises: add_control_group_closure_001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_oscal_source_ids_001'
+down_revision = 'add_control_group_closure_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('control_groups', sa.Column('source_id', sa.String(length=100), nullable=True))
+    op.add_column('controls', sa.Column('source_id', sa.String(length=100), nullable=True))
+    op.create_unique_constraint('uq_control_groups_framework_source', 'control_groups', ['framework_id', 'source_id'])
+    op.create_unique_constraint('uq_controls_group_source', 'controls', ['control_group_id', 'source_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_controls_group_source', 'controls', type_='unique')
+    op.drop_constraint('uq_control_groups_framework_source', 'control_groups', type_='unique')
+    op.drop_column('controls', 'source_id')
+    op.drop_column('control_groups', 'source_id')
@@ -2,24 +2,30 @@
 Artifacts API endpoints.
 Handles uploading and fetching artifacts linked to gaps, policies, and controls.
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request
+from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
-import os
-import shutil
 from pathlib import Path
 from app.db import get_db
 from app.models import Artifact, ArtifactType, Gap, User
 from app.api.v1.auth import get_current_user
+from app.utils.upload_pipeline import stream_upload_to_disk, max_upload_bytes
+from app.utils.file_responses import file_download_response
+from app.services.artifact_blob_service import (
+    STORAGE_DIR,
+    find_blob,
+    register_blob,
+    acquire_blob,
+    release_blob
+)
+from app.core.config import settings
 from pydantic import BaseModel
 from datetime import datetime
 
 router = APIRouter()
 
-# Storage directory for artifacts
+# Storage directory for artifacts (content-addressed blobs, see artifact_blob_service)
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
-STORAGE_DIR = BASE_DIR / "uploads" / "artifacts"
 STORAGE_DIR.mkdir(parents=True, exist_ok=True)
 
 # Ensure uploads directory exists
@@ -40,6 +46,7 @@ class ArtifactResponse(BaseModel):
     gap_id: Optional[int] = None
     policy_id: Optional[int] = None
     control_id: Optional[int] = None
+    content_hash: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
@@ -49,7 +56,8 @@ class ArtifactResponse(BaseModel):
 
 @router.post("/upload", response_model=ArtifactResponse, status_code=status.HTTP_201_CREATED)
 async def upload_artifact(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    content_hash: Optional[str] = Form(None),
     name: str = Form(...),
     description: Optional[str] = Form(None),
     artifact_type: str = Form("document"),
@@ -62,8 +70,15 @@ async def upload_artifact(
     """
     Upload an artifact (document, evidence, etc.).
     
+    Files are stored once per unique content. If the client already knows the
+    SHA-256 of the file and passes it as content_hash, the file body can be
+    omitted: when the company has already uploaded that content the artifact is
+    created as a metadata-only insert. Otherwise 404 is returned and the file
+    must be sent (content stored for other companies is never reused by hash).
+    
     Args:
-        file: The file to upload
+        file: The file to upload (optional when content_hash matches a file of the company)
+        content_hash: Optional SHA-256 hex digest of the file content
         name: Artifact name
         description: Optional description
         artifact_type: Type of artifact (document, evidence, report, etc.)
@@ -95,28 +110,46 @@ async def upload_artifact(
                     detail=f"Gap {gap_id} not found"
                 )
         
-        # Save file
-        # Sanitize filename to avoid path issues
-        safe_filename = file.filename.replace(" ", "_").replace("/", "_").replace("\\", "_")
-        file_path = STORAGE_DIR / f"{current_user.id}_{safe_filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Known content: reference the existing blob without touching the file body
+        # (only blobs the user's company already references; the same 404 whether the
+        # content is unknown or belongs to another company)
+        blob = None
+        if content_hash:
+            if current_user.company_id:
+                blob = find_blob(db, content_hash.strip(), current_user.company_id, lock=True)
+            if not blob and not (file and file.filename):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="No stored file matches content_hash; upload the file instead"
+                )
         
-        # Get file size
-        file_size = file_path.stat().st_size
+        if not blob:
+            # Save file in a single streaming pass (size limit, SHA-256, MIME sniffing)
+            # Stored under a content-addressed name so uploads can never collide
+            stored = await stream_upload_to_disk(
+                file,
+                dest_dir=STORAGE_DIR,
+                max_bytes=max_upload_bytes(settings.MAX_ARTIFACT_UPLOAD_MB)
+            )
+            if content_hash and content_hash.strip().lower() != stored.sha256:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="content_hash does not match the uploaded file"
+                )
+            blob = register_blob(db, stored)
         
-        # Store relative path from uploads directory for serving
-        # Path format: uploads/artifacts/{user_id}_{filename}
-        relative_path = f"uploads/artifacts/{current_user.id}_{safe_filename}"
+        acquire_blob(db, blob)
         
         # Create artifact record
+        # file_path keeps the blob's relative path (uploads/artifacts/{sha256}{ext}) for serving
         artifact = Artifact(
             name=name,
             description=description,
             artifact_type=artifact_type_enum,
-            file_path=relative_path,  # Store path relative to project root for static serving
-            file_size=file_size,
-            mime_type=file.content_type,
+            file_path=blob.storage_path,
+            file_size=blob.size,
+            mime_type=blob.mime_type,
+            blob_id=blob.id,
             policy_id=policy_id,
             gap_id=gap_id,
             control_id=control_id,
@@ -130,12 +163,11 @@ async def upload_artifact(
         return artifact
         
     except HTTPException:
+        db.rollback()
         raise
     except Exception as e:
         db.rollback()
-        # Clean up file on error
-        if file_path.exists():
-            file_path.unlink()
+        # Files left without a blob row are removed by collect_orphan_blobs()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error uploading artifact: {str(e)}"
@@ -164,7 +196,7 @@ async def get_artifacts(
     Returns:
         List of artifacts
     """
-    query = db.query(Artifact).filter(Artifact.is_active == True)
+    query = db.query(Artifact).options(joinedload(Artifact.blob)).filter(Artifact.is_active == True)
     
     # Filter by linked entity if provided
     if gap_id:
@@ -213,7 +245,7 @@ async def get_artifacts_by_gap(
         )
     
     # Fetch artifacts for this gap
-    artifacts = db.query(Artifact).filter(
+    artifacts = db.query(Artifact).options(joinedload(Artifact.blob)).filter(
         Artifact.gap_id == gap_id,
         Artifact.is_active == True
     ).order_by(Artifact.created_at.desc()).all()
@@ -221,17 +253,23 @@ async def get_artifacts_by_gap(
     return artifacts
 
 
-@router.get("/{artifact_id}/download")
+@router.api_route("/{artifact_id}/download", methods=["GET", "HEAD"])
 async def download_artifact(
     artifact_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Download an artifact file.
     
+    Supports conditional and resumable downloads: the ETag is the content
+    SHA-256 (If-None-Match returns 304), and Range/If-Range requests return
+    206 partial content so interrupted downloads can resume.
+    
     Args:
         artifact_id: ID of the artifact
+        request: Incoming request (conditional and Range headers)
         current_user: Current authenticated user
         db: Database session
     
@@ -275,10 +313,58 @@ async def download_artifact(
             detail="File does not exist on server"
         )
     
-    # Return file with proper headers
-    return FileResponse(
-        path=str(file_path),
+    # Return file with conditional/Range handling (permission checks are done above)
+    return file_download_response(
+        request,
+        file_path=file_path,
+        relative_path=artifact.file_path,
         filename=artifact.name or file_path.name,
-        media_type=artifact.mime_type or "application/octet-stream"
+        media_type=artifact.mime_type,
+        content_hash=artifact.content_hash
     )
 
+
+@router.delete("/{artifact_id}")
+async def delete_artifact(
+    artifact_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete an artifact.
+    
+    The artifact is deactivated and its blob reference released. The stored
+    file is shared with other artifacts of the same content, so it is only
+    removed by the blob garbage collector once nothing references it.
+    
+    Args:
+        artifact_id: ID of the artifact
+        current_user: Current authenticated user
+        db: Database session
+    
+    Returns:
+        Success message
+    """
+    artifact = db.query(Artifact).filter(
+        Artifact.id == artifact_id,
+        Artifact.is_active == True
+    ).first()
+    
+    if not artifact:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Artifact not found"
+        )
+    
+    # Verify user has access (same company)
+    if artifact.uploaded_by and artifact.uploaded_by.company_id != current_user.company_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to delete this artifact"
+        )
+    
+    artifact.is_active = False
+    release_blob(db, artifact.blob_id)
+    db.commit()
+    
+    return {"message": "Artifact deleted successfully", "id": artifact_id}
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from openai import OpenAI
+from starlette.concurrency import run_in_threadpool
 from typing import Literal
 import re
 from app.db import get_db
@@ -9,16 +9,25 @@ from app.api.v1.auth import get_current_user
 from app.schemas.chat import ChatQuery, ChatResponse
 from app.services.pinecone_service import query_similar_policies
 from app.services.ai_service import get_embedding
-from app.core.config import settings
+from app.services.context_packer import count_tokens, get_context_budget, pack_context
+from app.services.llm_gateway import chat_completion
 
 router = APIRouter()
 
-# Initialize OpenAI client for chat
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
 # Chat-specific similarity threshold (lower than gap analysis for more lenient matching)
 CHAT_SIMILARITY_THRESHOLD = 0.60
 
+CHAT_MODEL = "gpt-4o-mini"
+CHAT_MAX_ANSWER_TOKENS = 1000
+# Tokens for the RAG prompt's fixed wording around the context and question
+CHAT_PROMPT_FRAME_TOKENS = 80
+
+CHAT_SYSTEM_PROMPT = """You are an AI assistant for a Governance, Risk, and Compliance (GRC) platform.
+Your role is to help users understand policies, controls, frameworks, and compliance requirements.
+Use the provided context from the knowledge base to answer questions accurately.
+Always cite sources when referencing specific policies.
+If the context doesn't fully answer the question, acknowledge what you can answer and what might need clarification."""
+
 
 def detect_intent(query: str) -> Literal["greeting", "small_talk", "general_knowledge", "knowledge_question"]:
     """
@@ -111,7 +120,8 @@ async def chat_query(
         if intent == "small_talk":
             # Generate conversational response for small talk
             try:
-                response = client.chat.completions.create(
+                response = await run_in_threadpool(
+                    chat_completion,
                     model="gpt-4o-mini",
                     messages=[
                         {
@@ -155,7 +165,9 @@ async def chat_query(
             
             print(f"[Chat] Querying KB with filters: company_id={current_user.company_id}, status=approved")
             
-            similar_policies = query_similar_policies(
+            # Run in the threadpool: the embedding call may wait for rate-limit quota
+            similar_policies = await run_in_threadpool(
+                query_similar_policies,
                 query_text=user_query,
                 top_k=5,
                 filter_metadata=filter_metadata,
@@ -171,14 +183,22 @@ async def chat_query(
             similar_policies = []
         
         # Step 2: Build context from retrieved policies
+        # Chunks are packed by score into the model's prompt budget (overlaps removed)
         context = ""
         sources = []
         
         if similar_policies and len(similar_policies) > 0:
+            # The budget is for the prompt (as for gap evaluation); the answer is not deducted
+            context_budget = get_context_budget(CHAT_MODEL) - count_tokens(
+                CHAT_SYSTEM_PROMPT + user_query, CHAT_MODEL
+            ) - CHAT_PROMPT_FRAME_TOKENS
+            packed = pack_context(similar_policies, context_budget, text_key="content", model=CHAT_MODEL)
+            print(f"[Chat] Packed {len(packed['chunks'])}/{len(similar_policies)} chunks into {packed['tokens']} tokens (budget: {context_budget})")
+            
             context = "Relevant Policies and Information:\n\n"
-            for idx, policy in enumerate(similar_policies, 1):
+            for idx, policy in enumerate(packed["chunks"], 1):
                 policy_title = policy.get('title', 'Unknown')
-                policy_content = policy.get('content', '')[:800] if policy.get('content') else ''
+                policy_content = policy.get('content', '')
                 policy_score = policy.get('score', 0)
                 
                 context += f"{idx}. {policy_title}\n"
@@ -200,7 +220,8 @@ async def chat_query(
                 # For general knowledge questions (what is X, explain X), provide general answer
                 # even without specific policies in KB
                 try:
-                    response = client.chat.completions.create(
+                    response = await run_in_threadpool(
+                        chat_completion,
                         model="gpt-4o-mini",
                         messages=[
                             {
@@ -227,7 +248,8 @@ async def chat_query(
             else:
                 # For specific knowledge questions without KB results, ask clarifying question
                 try:
-                    response = client.chat.completions.create(
+                    response = await run_in_threadpool(
+                        chat_completion,
                         model="gpt-4o-mini",
                         messages=[
                             {
@@ -253,11 +275,7 @@ async def chat_query(
                 )
         
         # Step 3: Generate response using OpenAI with RAG context (only if KB results found)
-        system_prompt = """You are an AI assistant for a Governance, Risk, and Compliance (GRC) platform.
-Your role is to help users understand policies, controls, frameworks, and compliance requirements.
-Use the provided context from the knowledge base to answer questions accurately.
-Always cite sources when referencing specific policies.
-If the context doesn't fully answer the question, acknowledge what you can answer and what might need clarification."""
+        system_prompt = CHAT_SYSTEM_PROMPT
         
         user_prompt = f"""Context from Knowledge Base:
 {context}
@@ -268,8 +286,9 @@ Please provide a helpful and accurate answer based on the context above. If you
         
         # Generate response using OpenAI
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
+            response = await run_in_threadpool(
+                chat_completion,
+                model=CHAT_MODEL,
                 messages=[
                     {
                         "role": "system",
@@ -281,7 +300,8 @@ Please provide a helpful and accurate answer based on the context above. If you
                     }
                 ],
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=CHAT_MAX_ANSWER_TOKENS,
+                operation="chat"
             )
             
             answer = response.choices[0].message.content.strip()
@@ -1,19 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from typing import List, Optional
 from app.db import get_db
-from app.models import Framework, ControlGroup, Control
 from app.api.v1.auth import get_current_user
-from app.models import User
+from app.api.v1.knowledge_base import require_admin_or_compliance_admin
+from app.models import User, ControlGroup
 from app.schemas.framework import (
     FrameworkResponse,
     ControlGroupResponse,
     ControlResponse,
     ControlTreeNode,
-    ControlTreeResponse
+    ControlTreeResponse,
+    ControlGroupRollup,
+    ControlGroupMove,
+    ControlEquivalenceResponse,
+    ControlEquivalenceCreate,
+    ControlEquivalenceReview
 )
 from app.utils.seed_iso27001 import seed_iso27001
+from app.services import framework_catalog, control_hierarchy, control_equivalence
+from app.utils.file_responses import CACHE_CONTROL, etag_matches
 
 router = APIRouter()
 
@@ -26,8 +33,68 @@ async def get_frameworks(
     """
     Get all active frameworks.
     """
-    frameworks = db.query(Framework).filter(Framework.is_active == True).order_by(Framework.name).all()
-    return frameworks
+    return framework_catalog.list_frameworks(db)
+
+
+@router.get("/control-equivalences", response_model=List[ControlEquivalenceResponse])
+async def get_control_equivalences(
+    framework_id: Optional[int] = None,
+    status_filter: Optional[str] = Query(None, alias="status", description="APPROVED / CANDIDATE / REJECTED"),
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    List cross-framework control equivalences (curated and embedding candidates),
+    best similarity first. Candidates are reviewed with PUT /control-equivalences/{id}.
+    """
+    return control_equivalence.list_equivalences(
+        db, framework_id=framework_id, status=status_filter.upper() if status_filter else None,
+        limit=limit, offset=offset
+    )
+
+
+@router.post("/control-equivalences", response_model=ControlEquivalenceResponse, status_code=status.HTTP_201_CREATED)
+async def create_control_equivalence(
+    equivalence: ControlEquivalenceCreate,
+    current_user: User = Depends(require_admin_or_compliance_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Add a curated (approved) equivalence between two controls.
+    """
+    try:
+        equivalence_id = control_equivalence.add_curated_pair(
+            db, equivalence.control_id, equivalence.equivalent_control_id, current_user.id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    db.commit()
+    return control_equivalence.get_equivalence(db, equivalence_id)
+
+
+@router.put("/control-equivalences/{equivalence_id}", response_model=ControlEquivalenceResponse)
+async def review_control_equivalence(
+    equivalence_id: int,
+    review: ControlEquivalenceReview,
+    current_user: User = Depends(require_admin_or_compliance_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Approve or reject an equivalence. Only APPROVED pairs share evaluations in gap analysis.
+    """
+    try:
+        row = control_equivalence.review_equivalence(db, equivalence_id, review.status, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Control equivalence not found"
+        )
+    db.commit()
+    return control_equivalence.get_equivalence(db, equivalence_id)
 
 
 @router.get("/{framework_id}/control-groups", response_model=List[ControlGroupResponse])
@@ -39,41 +106,16 @@ async def get_control_groups(
     """
     Get all control groups for a specific framework.
     """
-    # Verify framework exists
-    framework = db.query(Framework).filter(Framework.id == framework_id).first()
-    if not framework:
+    # Verify framework exists (served from the framework catalog cache)
+    tree = framework_catalog.get_framework_tree(db, framework_id)
+    if not tree:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Framework not found"
         )
     
-    # Get control groups with control counts
-    control_groups = db.query(
-        ControlGroup,
-        func.count(Control.id).label('controls_count')
-    ).outerjoin(
-        Control, ControlGroup.id == Control.control_group_id
-    ).filter(
-        ControlGroup.framework_id == framework_id,
-        ControlGroup.is_active == True
-    ).group_by(ControlGroup.id).order_by(ControlGroup.order_index, ControlGroup.code).all()
-    
-    result = []
-    for group, count in control_groups:
-        group_dict = {
-            "id": group.id,
-            "name": group.name,
-            "description": group.description,
-            "code": group.code,
-            "framework_id": group.framework_id,
-            "parent_group_id": group.parent_group_id,
-            "order_index": group.order_index,
-            "is_active": group.is_active,
-            "controls_count": count or 0
-        }
-        result.append(ControlGroupResponse(**group_dict))
-    
-    return result
+    # Control groups with their control counts, ordered by order_index, code
+    return tree.active_groups()
 
 
 @router.get("/{framework_id}/controls", response_model=List[ControlResponse])
@@ -87,43 +129,143 @@ async def get_controls(
     Get all controls for a specific framework.
     Optionally filter by control_group_id.
     """
-    # Verify framework exists
-    framework = db.query(Framework).filter(Framework.id == framework_id).first()
-    if not framework:
+    # Verify framework exists (served from the framework catalog cache)
+    tree = framework_catalog.get_framework_tree(db, framework_id)
+    if not tree:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Framework not found"
         )
     
-    # Build query
-    query = db.query(Control).join(
-        ControlGroup, Control.control_group_id == ControlGroup.id
-    ).filter(
-        ControlGroup.framework_id == framework_id,
-        Control.is_active == True
-    )
-    
-    if control_group_id:
-        query = query.filter(Control.control_group_id == control_group_id)
+    # Ordered by group order_index, control order_index, code
+    return tree.active_controls(control_group_id or None)
+
+
+def _get_catalog_group(db: Session, framework_id: int, group_id: int):
+    """A control group of a framework from the catalog cache (404 if either is missing)."""
+    tree = framework_catalog.get_framework_tree(db, framework_id)
+    group = tree.groups_by_id.get(group_id) if tree else None
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Control group not found"
+        )
+    return group
+
+
+@router.get("/{framework_id}/control-groups/{group_id}/controls", response_model=List[ControlResponse])
+async def get_subtree_controls(
+    framework_id: int,
+    group_id: int,
+    include_inactive: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get all controls under a control group, at any nesting depth (one indexed lookup
+    on the control group closure table).
+    """
+    _get_catalog_group(db, framework_id, group_id)
+    return control_hierarchy.get_subtree_controls(db, group_id, include_inactive=include_inactive)
+
+
+@router.get("/{framework_id}/control-groups/{group_id}/tree", response_model=ControlTreeNode)
+async def get_control_group_tree(
+    framework_id: int,
+    group_id: int,
+    max_depth: Optional[int] = Query(None, ge=0, description="Levels of subgroups to include (default: all)"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get a control group's subtree (subgroups down to max_depth levels, with their controls).
+    """
+    _get_catalog_group(db, framework_id, group_id)
+    node = control_hierarchy.get_subtree(db, group_id, max_depth=max_depth)
+    if not node:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Control group not found"
+        )
+    return node
+
+
+@router.get("/{framework_id}/control-groups/{group_id}/rollup", response_model=List[ControlGroupRollup])
+async def get_control_group_rollup(
+    framework_id: int,
+    group_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get control, selection and open-gap counts over the whole subtree of a control
+    group and of each of its direct children (for the user's company).
+    """
+    if not current_user.company_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User must be associated with a company"
+        )
+    _get_catalog_group(db, framework_id, group_id)
+    return control_hierarchy.get_rollup(db, group_id, current_user.company_id)
+
+
+@router.put("/{framework_id}/control-groups/{group_id}/parent", response_model=ControlGroupResponse)
+async def move_control_group(
+    framework_id: int,
+    group_id: int,
+    move: ControlGroupMove,
+    current_user: User = Depends(require_admin_or_compliance_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Move a control group (with its subgroups and controls) under another group of
+    the same framework, or to the top level (parent_group_id null).
+    """
+    group = db.query(ControlGroup).filter(
+        ControlGroup.id == group_id,
+        ControlGroup.framework_id == framework_id
+    ).first()
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Control group not found"
+        )
     
-    controls = query.order_by(ControlGroup.order_index, Control.order_index, Control.code).all()
+    try:
+        control_hierarchy.move_control_group(db, group, move.parent_group_id)
+        db.commit()
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    return controls
+    return _get_catalog_group(db, framework_id, group_id)
+
+
+def _control_tree_response(request: Request, tree: framework_catalog.FrameworkTree) -> Response:
+    """Cached control tree JSON, or 304 when the client's If-None-Match still matches."""
+    body, etag = tree.control_tree_document()
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get("/iso27001/control-tree", response_model=ControlTreeResponse)
 async def get_iso27001_control_tree(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get the complete control tree for ISO 27001 framework.
-    Returns hierarchical structure of control groups and controls.
+    Same as GET /{framework_id}/control-tree for the ISO 27001 framework.
     """
     # Find ISO 27001 framework
-    framework = db.query(Framework).filter(
-        Framework.name.ilike("%ISO 27001%")
-    ).first()
+    framework = next(
+        (fw for fw in framework_catalog.list_frameworks(db, active_only=False) if "iso 27001" in fw.name.lower()),
+        None
+    )
     
     if not framework:
         raise HTTPException(
@@ -131,61 +273,42 @@ async def get_iso27001_control_tree(
             detail="ISO 27001 framework not found"
         )
     
-    # Get all control groups for this framework
-    control_groups = db.query(ControlGroup).filter(
-        ControlGroup.framework_id == framework.id,
-        ControlGroup.is_active == True
-    ).order_by(ControlGroup.order_index, ControlGroup.code).all()
+    return _control_tree_response(request, framework_catalog.get_framework_tree(db, framework.id))
+
+
+@router.get("/{framework_id}/control-tree", response_model=ControlTreeResponse)
+async def get_control_tree(
+    framework_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the complete control tree for a framework.
+    Returns hierarchical structure of control groups (nested by parent_group_id)
+    and their controls.
     
-    # Get all controls for this framework
-    controls = db.query(Control).join(
-        ControlGroup, Control.control_group_id == ControlGroup.id
-    ).filter(
-        ControlGroup.framework_id == framework.id,
-        Control.is_active == True
-    ).order_by(Control.order_index, Control.code).all()
+    The serialized tree is cached with the framework catalog and carries a strong
+    ETag: a request with a matching If-None-Match gets 304 Not Modified without
+    any catalog query.
     
-    # Build tree structure
-    # Group controls by control_group_id
-    controls_by_group = {}
-    for control in controls:
-        if control.control_group_id not in controls_by_group:
-            controls_by_group[control.control_group_id] = []
-        controls_by_group[control.control_group_id].append(control)
+    Args:
+        framework_id: ID of the framework
+        request: Incoming request (If-None-Match header)
+        current_user: Current authenticated user
+        db: Database session
     
-    # Build tree nodes
-    tree = []
-    for group in control_groups:
-        # Create control group node
-        group_node = ControlTreeNode(
-            id=group.id,
-            name=group.name,
-            code=group.code,
-            description=group.description,
-            type="group",
-            children=[]
+    Returns:
+        ControlTreeResponse JSON, or 304 Not Modified
+    """
+    tree = framework_catalog.get_framework_tree(db, framework_id)
+    if not tree:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Framework not found"
         )
-        
-        # Add controls as children
-        if group.id in controls_by_group:
-            for control in controls_by_group[group.id]:
-                control_node = ControlTreeNode(
-                    id=control.id,
-                    name=control.name,
-                    code=control.code,
-                    description=control.description,
-                    type="control",
-                    children=[]
-                )
-                group_node.children.append(control_node)
-        
-        tree.append(group_node)
     
-    return ControlTreeResponse(
-        framework_id=framework.id,
-        framework_name=framework.name,
-        tree=tree
-    )
+    return _control_tree_response(request, tree)
 
 
 @router.post("/seed/iso27001", response_model=FrameworkResponse, status_code=status.HTTP_201_CREATED)
@@ -198,5 +321,8 @@ async def seed_iso27001_data(
     This endpoint creates the framework and all controls if they don't exist.
     """
     framework = seed_iso27001(db)
+    # Cached trees of the framework (this and other workers) are reloaded
+    framework_catalog.invalidate_framework(db, framework.id)
+    db.commit()
     db.refresh(framework)
     return framework
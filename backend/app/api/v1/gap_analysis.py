@@ -2,15 +2,23 @@
 Gap Analysis API endpoints.
 Separate from onboarding - can be called anytime after onboarding.
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from app.db import get_db
 from app.api.v1.auth import get_current_user
-from app.models import User, ControlSelection, Framework, Control, Policy
-from app.services.gap_analysis_service import run_gap_analysis_for_control, get_selected_controls
+from app.api.v1.knowledge_base import require_admin_or_compliance_admin
+from app.models import User, Control, Policy
+from app.services.gap_analysis_service import run_gap_analysis_for_controls, get_selected_controls, get_control_evidence
 from app.services.pinecone_service import query_similar_policies
 from app.services.ai_service import generate_gap_analysis
+from app.services.evaluation_cascade import get_cascade_stats, reset_cascade_stats
+from app.services.analysis_ledger import start_analysis_run, finish_analysis_run, list_analysis_runs, get_analysis_run_results
+from app.services.decision_thresholds import get_thresholds
+from app.services.threshold_replay import preview_thresholds, apply_thresholds
+from app.services import framework_catalog
+from app.services.control_selection_service import get_selected_framework_ids
+from app.schemas.gap import DecisionThresholdsUpdate
 from datetime import datetime
 
 router = APIRouter()
@@ -19,6 +27,8 @@ router = APIRouter()
 @router.post("/run")
 async def run_gap_analysis(
     framework_id: Optional[int] = None,
+    force: bool = False,
+    detail: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -28,9 +38,13 @@ async def run_gap_analysis(
     
     Args:
         framework_id: Optional framework ID to filter analysis. If not provided, analyzes all selected frameworks.
+        force: Re-run the AI evaluation for every control, ignoring stored results for unchanged inputs.
+        detail: Include the retrieved evidence per control (fetched even for short-circuited controls).
+            Prefer GET /controls/{control_id}/detail to load it lazily for a single control.
     
     Returns:
-        Dictionary with analysis results organized by framework.
+        Dictionary with analysis results organized by framework. "analysis_id" identifies
+        the recorded run; GET /runs/{analysis_id}/results redisplays it without re-running.
     """
     company = current_user.company
     
@@ -46,11 +60,8 @@ async def run_gap_analysis(
         # Single framework
         frameworks_to_analyze = [framework_id]
     else:
-        # All frameworks with control selections
-        control_selections = db.query(ControlSelection).filter(
-            ControlSelection.company_id == company.id
-        ).all()
-        frameworks_to_analyze = list(set([cs.framework_id for cs in control_selections]))
+        # All frameworks with selected controls
+        frameworks_to_analyze = get_selected_framework_ids(db, company.id)
     
     if not frameworks_to_analyze:
         print(f"[Gap Analysis API] No control selections found for company {company.id}")
@@ -63,141 +74,169 @@ async def run_gap_analysis(
             "gaps_identified": 0
         }
     
-    # PART 6: TABULAR GAP RESPONSE (UI READY)
-    # Organize by framework with tabular format
-    framework_results_map = {}
-    total_controls = 0
-    total_gaps = 0
-    
-    for fw_id in frameworks_to_analyze:
-        framework = db.query(Framework).filter(Framework.id == fw_id).first()
-        if not framework:
-            print(f"[Gap Analysis API] Framework {fw_id} not found, skipping")
-            continue
-        
-        framework_name = framework.name
-        framework_id = framework.id
-        
-        # PART 2: Use get_selected_controls helper function
-        controls = get_selected_controls(db, company.id, framework_id)
+    # Every control result of this request is recorded under one run
+    run_id = start_analysis_run(
+        db, company.id, current_user.id,
+        framework_id=framework_id, source="api", force=force
+    )
+    
+    try:
+        # PART 6: TABULAR GAP RESPONSE (UI READY)
+        # Organize by framework with tabular format
+        framework_results_map = {}
+        total_controls = 0
+        total_gaps = 0
+        selected = []  # (framework_id, selected controls)
         
-        if not controls:
-            print(f"[Gap Analysis API] No selected controls for framework {framework_id} (company {company.id})")
-            # Add warning but continue to other frameworks
+        for fw_id in frameworks_to_analyze:
+            framework = framework_catalog.get_framework(db, fw_id)
+            if not framework:
+                print(f"[Gap Analysis API] Framework {fw_id} not found, skipping")
+                continue
+            
+            framework_name = framework.name
+            framework_id = framework.id
+            
+            # PART 2: Use get_selected_controls helper function
+            controls = get_selected_controls(db, company.id, framework_id)
+            
+            if not controls:
+                print(f"[Gap Analysis API] No selected controls for framework {framework_id} (company {company.id})")
+                # Add warning but continue to other frameworks
+                if framework_id not in framework_results_map:
+                    framework_results_map[framework_id] = {
+                        "framework": framework_name,
+                        "results": []
+                    }
+                continue
+            
             if framework_id not in framework_results_map:
                 framework_results_map[framework_id] = {
                     "framework": framework_name,
                     "results": []
                 }
-            continue
-        
-        if framework_id not in framework_results_map:
-            framework_results_map[framework_id] = {
-                "framework": framework_name,
-                "results": []
-            }
+            
+            print(f"[Gap Analysis API] Analyzing {len(controls)} selected controls for framework {framework_name} (ID: {framework_id})")
+            selected.append((framework_id, controls))
         
-        print(f"[Gap Analysis API] Analyzing {len(controls)} selected controls for framework {framework_name} (ID: {framework_id})")
+        # Run analysis for the selected controls of every framework at once, so equivalent
+        # controls of different frameworks are evaluated once (see control_equivalence);
+        # evaluations that need the LLM are packed several controls per request (GAP_EVAL_BATCH_*)
+        all_results = run_gap_analysis_for_controls(
+            control_ids=[control.id for _, controls in selected for control in controls],
+            company_id=company.id,
+            user_id=current_user.id,
+            db=db,
+            force=force,
+            detail=detail,
+            run_id=run_id
+        ) if selected else []
         
-        # Run analysis for each selected control
-        for control in controls:
-            control_id = control.id
-            total_controls += 1
-            print(f"[Gap Analysis API] Analyzing control: {control.code or control.name} (ID: {control_id})")
+        offset = 0
+        for framework_id, controls in selected:
+            control_results = all_results[offset:offset + len(controls)]
+            offset += len(controls)
             
-            try:
-                # PART 1: Run gap analysis for this control (now returns error status instead of raising)
-                result = run_gap_analysis_for_control(
-                    control_id=control_id,
-                    company_id=company.id,
-                    user_id=current_user.id,
-                    db=db
-                )
+            for control, result in zip(controls, control_results):
+                control_id = control.id
+                total_controls += 1
+                print(f"[Gap Analysis API] Analyzed control: {control.code or control.name} (ID: {control_id})")
                 
-                # PART 5: Handle ERROR status from gap analysis service
-                if result.get("status") == "ERROR":
-                    print(f"[Gap Analysis API] Control {control_id} returned ERROR status: {result.get('reason')}")
+                try:
+                    # PART 5: Handle ERROR status from gap analysis service
+                    if result.get("status") == "ERROR":
+                        print(f"[Gap Analysis API] Control {control_id} returned ERROR status: {result.get('reason')}")
+                        framework_results_map[framework_id]["results"].append({
+                            "control_id": control_id,
+                            "control_code": result.get("control_code") or f"Control ID {control_id}",
+                            "status": "ERROR",
+                            "severity": None,
+                            "risk_score": 0,
+                            "reason": result.get("reason", "Control not found in database")
+                        })
+                        continue
+                    
+                    # Format result in tabular format
+                    gap_identified = result.get("gap_identified", False)
+                    if gap_identified:
+                        total_gaps += 1
+                    
+                    # PART 7: RETURN RESULTS TO UI (NO AUTO REDIRECT)
+                    # Format response to match exact specification
+                    control_code = result.get("control_code") or control.code or ""
+                    
+                    # Get reason - prefer missing requirements if available
+                    reason = result.get("reason", "")
+                    if not reason:
+                        missing_reqs = result.get("missing_requirements", [])
+                        if missing_reqs:
+                            reason = ", ".join(missing_reqs[:2])  # Limit to 2 requirements for brevity
+                        else:
+                            reason = "Control requirement not fully covered" if gap_identified else "Control requirements fully covered"
+                    
+                    # Format severity to uppercase
+                    severity = result.get("severity", "medium")
+                    if severity:
+                        severity = severity.upper()
+                    
+                    # Get risk score
+                    risk_score = result.get("risk_score", 0)
+                    if not gap_identified:
+                        risk_score = 100  # Compliant = 100% (no risk)
+                    
+                    # Create tabular result entry matching exact specification
+                    control_result = {
+                        "control_code": control_code,  # PART 7: Use control_code (not combined control)
+                        "status": result.get("status", "GAP" if gap_identified else "COMPLIANT"),
+                        "severity": severity if gap_identified else None,
+                        "risk_score": int(risk_score),  # PART 7: Use risk_score (not risk)
+                        "reason": reason
+                    }
+                    if detail and "evidence" in result:
+                        control_result["evidence"] = result["evidence"]
+                    if result.get("equivalence"):
+                        # Evaluation reused from an equivalent control (provenance)
+                        control_result["equivalence"] = result["equivalence"]
+                    
+                    framework_results_map[framework_id]["results"].append(control_result)
+                    
+                except Exception as e:
+                    import traceback
+                    print(f"[Gap Analysis API] Error analyzing control {control_id}: {str(e)}")
+                    print(f"[Gap Analysis API] Traceback:\n{traceback.format_exc()}")
+                    
+                    # PART 5: SAFE GAP ANALYSIS RESPONSE - Never crash, return ERROR status
+                    control_code = control.code if control else f"Control ID {control_id}"
+                    
                     framework_results_map[framework_id]["results"].append({
                         "control_id": control_id,
-                        "control_code": result.get("control_code") or f"Control ID {control_id}",
+                        "control_code": control_code,
                         "status": "ERROR",
                         "severity": None,
                         "risk_score": 0,
-                        "reason": result.get("reason", "Control not found in database")
+                        "reason": f"Error analyzing control: {str(e)}"
                     })
                     continue
-                
-                # Format result in tabular format
-                gap_identified = result.get("gap_identified", False)
-                if gap_identified:
-                    total_gaps += 1
-                
-                # PART 7: RETURN RESULTS TO UI (NO AUTO REDIRECT)
-                # Format response to match exact specification
-                control_code = result.get("control_code") or control.code or ""
-                
-                # Get reason - prefer missing requirements if available
-                reason = result.get("reason", "")
-                if not reason:
-                    missing_reqs = result.get("missing_requirements", [])
-                    if missing_reqs:
-                        reason = ", ".join(missing_reqs[:2])  # Limit to 2 requirements for brevity
-                    else:
-                        reason = "Control requirement not fully covered" if gap_identified else "Control requirements fully covered"
-                
-                # Format severity to uppercase
-                severity = result.get("severity", "medium")
-                if severity:
-                    severity = severity.upper()
-                
-                # Get risk score
-                risk_score = result.get("risk_score", 0)
-                if not gap_identified:
-                    risk_score = 100  # Compliant = 100% (no risk)
-                
-                # Create tabular result entry matching exact specification
-                control_result = {
-                    "control_code": control_code,  # PART 7: Use control_code (not combined control)
-                    "status": result.get("status", "GAP" if gap_identified else "COMPLIANT"),
-                    "severity": severity if gap_identified else None,
-                    "risk_score": int(risk_score),  # PART 7: Use risk_score (not risk)
-                    "reason": reason
-                }
-                
-                framework_results_map[framework_id]["results"].append(control_result)
-                
-            except Exception as e:
-                import traceback
-                print(f"[Gap Analysis API] Error analyzing control {control_id}: {str(e)}")
-                print(f"[Gap Analysis API] Traceback:\n{traceback.format_exc()}")
-                
-                # PART 5: SAFE GAP ANALYSIS RESPONSE - Never crash, return ERROR status
-                control_code = control.code if control else f"Control ID {control_id}"
-                
-                framework_results_map[framework_id]["results"].append({
-                    "control_id": control_id,
-                    "control_code": control_code,
-                    "status": "ERROR",
-                    "severity": None,
-                    "risk_score": 0,
-                    "reason": f"Error analyzing control: {str(e)}"
-                })
-                continue
-    
-    # Convert to list format (one entry per framework)
-    frameworks_list = list(framework_results_map.values())
-    
-    # Calculate gaps from results
-    calculated_gaps = 0
-    for fw in frameworks_list:
-        for result in fw.get("results", []):
-            if result.get("status") == "GAP":
-                calculated_gaps += 1
-    
-    print(f"[Gap Analysis API] Summary: {total_controls} controls analyzed, {calculated_gaps} gaps identified")
+        
+        # Convert to list format (one entry per framework)
+        frameworks_list = list(framework_results_map.values())
+        
+        # Calculate gaps from results
+        calculated_gaps = 0
+        for fw in frameworks_list:
+            for result in fw.get("results", []):
+                if result.get("status") == "GAP":
+                    calculated_gaps += 1
+        
+        print(f"[Gap Analysis API] Summary: {total_controls} controls analyzed, {calculated_gaps} gaps identified")
+    except Exception:
+        finish_analysis_run(db, run_id, status="FAILED")
+        raise
+    finish_analysis_run(db, run_id)
     
     # Always include summary totals
     response_data = {
+        "analysis_id": run_id,
         "total_controls": total_controls,
         "gaps_identified": calculated_gaps or total_gaps,
         "total_gaps": calculated_gaps or total_gaps
@@ -209,8 +248,9 @@ async def run_gap_analysis(
         # Return warning for each framework that had no controls
         for fw_id, fw_data in framework_results_map.items():
             if len(fw_data.get("results", [])) == 0:
-                framework = db.query(Framework).filter(Framework.id == fw_id).first()
+                framework = framework_catalog.get_framework(db, fw_id)
                 return {
+                    "analysis_id": run_id,
                     "framework_id": fw_id,
                     "framework_name": framework.name if framework else "Unknown",
                     "results": [],
@@ -220,6 +260,7 @@ async def run_gap_analysis(
                 }
         # Fallback if no frameworks in map
         return {
+            "analysis_id": run_id,
             "framework_id": None,
             "framework_name": None,
             "results": [],
@@ -237,3 +278,187 @@ async def run_gap_analysis(
     response_data["frameworks"] = frameworks_list
     return response_data
 
+
+@router.get("/controls/{control_id}/detail")
+async def get_control_detail(
+    control_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Evidence behind a control's verdict (approved policies, matched policy chunks,
+    Knowledge Base reference), fetched on demand. Gap analysis skips retrieval for
+    controls it can settle early, so the UI loads this only when a row is expanded.
+    """
+    company = current_user.company
+    
+    if not company:
+        raise HTTPException(
+            status_code=400,
+            detail="User must be associated with a company"
+        )
+    
+    try:
+        result = get_control_evidence(control_id, company.id, db)
+    except Exception as e:
+        print(f"[Gap Analysis API] Error loading detail for control {control_id}: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error loading control evidence: {str(e)}"
+        )
+    
+    if result.get("status") == "ERROR":
+        raise HTTPException(status_code=404, detail=result.get("reason", "Control not found"))
+    return result
+
+
+@router.get("/runs")
+async def list_runs(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    The company's most recent gap analysis runs with their totals, newest first.
+    """
+    company = current_user.company
+    
+    if not company:
+        raise HTTPException(
+            status_code=400,
+            detail="User must be associated with a company"
+        )
+    
+    return {"runs": list_analysis_runs(db, company.id, limit=limit)}
+
+
+@router.get("/runs/{run_id}/results")
+async def get_run_results(
+    run_id: int,
+    after: Optional[int] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=500),
+    status: Optional[str] = Query(None, description="GAP, COMPLIANT or ERROR"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Stored per-control results of a past run, one page at a time, so the UI can
+    redisplay an analysis without running it again.
+    
+    Args:
+        run_id: analysis_id returned by POST /run
+        after: Cursor from the previous page's next_cursor (omit for the first page)
+        limit: Page size
+        status: Only return results with this status
+    
+    Returns:
+        Run summary, one page of results and next_cursor (null on the last page)
+    """
+    company = current_user.company
+    
+    if not company:
+        raise HTTPException(
+            status_code=400,
+            detail="User must be associated with a company"
+        )
+    
+    page = get_analysis_run_results(db, company.id, run_id, after=after, limit=limit, status=status)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Analysis run not found")
+    return page
+
+
+@router.get("/thresholds/{framework_id}")
+async def get_framework_thresholds(
+    framework_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Decision thresholds in effect for a framework (similarity floors, risk score bands).
+    """
+    if not framework_catalog.get_framework(db, framework_id):
+        raise HTTPException(status_code=404, detail="Framework not found")
+    return {"framework_id": framework_id, "thresholds": get_thresholds(db, framework_id)}
+
+
+@router.post("/thresholds/{framework_id}/preview")
+async def preview_framework_thresholds(
+    framework_id: int,
+    thresholds: DecisionThresholdsUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    What-if: replay the company's latest stored results for a framework under other
+    thresholds (no LLM calls, nothing written).
+    
+    Returns:
+        Verdict and severity transitions, controls needing re-analysis and a sample
+        of the changed controls
+    """
+    company = current_user.company
+    
+    if not company:
+        raise HTTPException(
+            status_code=400,
+            detail="User must be associated with a company"
+        )
+    
+    if not framework_catalog.get_framework(db, framework_id):
+        raise HTTPException(status_code=404, detail="Framework not found")
+    
+    try:
+        return preview_thresholds(db, company.id, framework_id, thresholds.model_dump(exclude_none=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.put("/thresholds/{framework_id}")
+async def update_framework_thresholds(
+    framework_id: int,
+    thresholds: DecisionThresholdsUpdate,
+    current_user: User = Depends(require_admin_or_compliance_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Store a framework's decision thresholds and re-score the risk and severity of its
+    open gaps in bulk. Verdict changes are applied by the next analysis run, which
+    reuses the stored LLM evaluations.
+    """
+    if not framework_catalog.get_framework(db, framework_id):
+        raise HTTPException(status_code=404, detail="Framework not found")
+    
+    try:
+        return apply_thresholds(db, framework_id, thresholds.model_dump(exclude_none=True), current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/cascade-stats")
+async def cascade_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Per-tier accounting of the gap evaluation cascade (rules, classify, full, and
+    equivalence for evaluations projected from an equivalent control):
+    evaluations settled, LLM calls, prompt/completion tokens and latency since
+    server start (or the last reset).
+    """
+    return get_cascade_stats()
+
+
+@router.post("/cascade-stats/reset")
+async def reset_cascade_stats_endpoint(
+    current_user: User = Depends(require_admin_or_compliance_admin)
+):
+    """
+    Reset the process-wide cascade counters (admin / compliance admin only).
+    
+    Returns:
+        The counters as they were before the reset
+    """
+    stats = get_cascade_stats()
+    reset_cascade_stats()
+    print(f"[Gap Analysis API] Cascade stats reset by user {current_user.id}")
+    return stats
@@ -5,17 +5,18 @@ Handles uploading and managing knowledge base documents (ISO 27001, NIST, etc.)
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from typing import Optional
-import os
-import shutil
 from pathlib import Path
 from app.db import get_db
 from app.models import (
     KnowledgeBaseDocument, KnowledgeSourceType, Framework, User, Role
 )
 from app.api.v1.auth import get_current_user
-from app.utils.text_extraction import extract_text_from_file
+from app.utils.text_extraction import extract_text_cached
 from app.services.pinecone_service import get_index, chunk_text
 from app.services.ai_service import get_embedding
+from app.utils.upload_pipeline import stream_upload_to_disk, max_upload_bytes
+from app.core.config import settings
+from app.core.metrics import time_stage
 
 router = APIRouter()
 
@@ -108,40 +109,27 @@ async def upload_knowledge_base_document(
                 detail=f"Framework {framework_id} not found"
             )
         
-        # Validate file type
-        if not file.filename:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No file provided"
-            )
-        
-        file_ext = Path(file.filename).suffix.lower()
-        allowed_extensions = ['.pdf', '.docx']
-        if file_ext not in allowed_extensions:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Unsupported file type: {file_ext}. Allowed: {', '.join(allowed_extensions)}"
-            )
-        
-        # Save file to storage
-        file_path = STORAGE_DIR / f"kb_{framework_id}_{file.filename}"
-        try:
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            print(f"[Knowledge Base] ✓ File saved: {file_path}")
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error saving file: {str(e)}"
-            )
+        # Validate file type, then save in a single streaming pass
+        # (size limit, SHA-256, MIME sniffing, atomic content-addressed write)
+        stored = await stream_upload_to_disk(
+            file,
+            dest_dir=STORAGE_DIR,
+            max_bytes=max_upload_bytes(settings.MAX_UPLOAD_MB),
+            name_prefix=f"kb_{framework_id}_",
+            allowed_extensions=['.pdf', '.docx']
+        )
+        print(f"[Knowledge Base] ✓ File saved: {stored.path} ({stored.size} bytes, {stored.mime_type})")
+        # Only remove the file on failure if this request created it -
+        # identical content may already back another document
+        file_path = stored.path if stored.created else None
         
         # Extract text
         try:
-            raw_text = extract_text_from_file(str(file_path))
+            raw_text = extract_text_cached(str(stored.path), file_hash=stored.sha256)
             print(f"[Knowledge Base] ✓ Text extracted: {len(raw_text)} characters")
         except Exception as e:
             # Clean up file on error
-            if file_path.exists():
+            if file_path and file_path.exists():
                 file_path.unlink()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -150,7 +138,7 @@ async def upload_knowledge_base_document(
         
         if not raw_text or not raw_text.strip():
             # Clean up file
-            if file_path.exists():
+            if file_path and file_path.exists():
                 file_path.unlink()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -171,7 +159,7 @@ async def upload_knowledge_base_document(
                     version=version if version else None,
                     source_type=source_type,
                     raw_text=raw_text,
-                    file_path=str(file_path),
+                    file_path=str(stored.path),
                     is_active=True,
                     uploaded_by=current_user.id
                 )
@@ -213,7 +201,7 @@ async def upload_knowledge_base_document(
                         "title": title,
                         "source_type": source_type_value,
                         "raw_text": raw_text,
-                        "file_path": str(file_path),
+                        "file_path": str(stored.path),
                         "is_active": True
                     })
                     kb_doc_id = result.scalar()
@@ -231,7 +219,7 @@ async def upload_knowledge_base_document(
                     raise
         except Exception as e:
             # Clean up file on error
-            if file_path.exists():
+            if file_path and file_path.exists():
                 file_path.unlink()
             print(f"[Knowledge Base] ✗✗✗ Database error: {str(e)}")
             print(f"[Knowledge Base] Traceback:\n{traceback.format_exc()}")
@@ -318,7 +306,8 @@ async def upload_knowledge_base_document(
                     batch_size = 100
                     for i in range(0, len(vectors_to_upsert), batch_size):
                         batch = vectors_to_upsert[i:i + batch_size]
-                        index.upsert(vectors=batch, namespace=namespace)
+                        with time_stage("vector_upsert", "kb"):
+                            index.upsert(vectors=batch, namespace=namespace)
                         chunks_indexed += len(batch)
                         print(f"[Knowledge Base] ✓ Upserted batch {i//batch_size + 1} ({len(batch)} vectors) to namespace '{namespace}'")
                     
@@ -2,11 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List
-from datetime import datetime
 from app.db import get_db
 from app.models import (
     User, Company, Department, Role, Framework,
-    ControlGroup, Control, Policy, PolicyStatus, ControlSelection, Gap
+    ControlGroup, Control, Policy, PolicyStatus, Gap
 )
 from app.api.v1.auth import get_current_user
 from app.schemas.onboarding import (
@@ -20,8 +19,11 @@ from app.schemas.onboarding import (
     ControlSelectionRequest, ControlSelectionResponse,
     OnboardingStatus
 )
-from app.services.gap_analysis_service import run_gap_analysis_for_control
+from app.services.gap_analysis_service import run_gap_analysis_for_controls
+from app.services.analysis_ledger import start_analysis_run, finish_analysis_run
 from app.services.pinecone_service import index_policy_embedding
+from app.services import framework_catalog
+from app.services.control_selection_service import replace_control_selection, get_selected_control_ids
 
 router = APIRouter()
 
@@ -183,6 +185,9 @@ async def create_frameworks(
             is_active=True
         )
         db.add(framework)
+        db.flush()
+        # Framework lists cached by this and other workers are reloaded
+        framework_catalog.invalidate_framework(db, framework.id)
         created_frameworks.append(framework)
     
     db.commit()
@@ -250,6 +255,8 @@ async def configure_iso27001_controls(
                 db.add(control)
                 created_controls.append(control)
     
+    # Cached trees of the framework (this and other workers) are reloaded
+    framework_catalog.invalidate_framework(db, iso27001_framework.id)
     db.commit()
     
     return {
@@ -355,11 +362,8 @@ async def save_control_selection(
     
     # Get framework - prefer framework_id if provided, otherwise search by name
     if selection.framework_id:
-        framework = db.query(Framework).filter(
-            Framework.id == selection.framework_id,
-            Framework.is_active == True
-        ).first()
-        if not framework:
+        framework = framework_catalog.get_framework(db, selection.framework_id)
+        if not framework or not framework.is_active:
             print(f"[Onboarding] ❌ Framework with ID {selection.framework_id} not found")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -370,14 +374,16 @@ async def save_control_selection(
         # Verify framework exists - handle variations like "ISO27001", "ISO 27001", "ISO 27001:2022"
         framework_name = selection.framework.upper().replace(" ", "").replace(":", "").replace("-", "")
         
-        # Try exact match first
-        framework = db.query(Framework).filter(
-            Framework.name.ilike(f"%{selection.framework}%")
-        ).first()
+        # Try exact match first (case-insensitive substring, over the cached framework list)
+        framework = next(
+            (fw for fw in framework_catalog.list_frameworks(db, active_only=False)
+             if selection.framework.lower() in fw.name.lower()),
+            None
+        )
         
         # If not found, try matching without spaces/special chars
         if not framework:
-            all_frameworks = db.query(Framework).filter(Framework.is_active == True).all()
+            all_frameworks = framework_catalog.list_frameworks(db)
             for fw in all_frameworks:
                 fw_name_normalized = fw.name.upper().replace(" ", "").replace(":", "").replace("-", "")
                 if framework_name in fw_name_normalized or fw_name_normalized in framework_name:
@@ -416,9 +422,8 @@ async def save_control_selection(
     print(f"[Onboarding] Validating {len(control_ids)} control IDs: {control_ids[:20]}...")
     
     # 1️⃣ First, check if controls exist (without is_active filter to see what's happening)
-    all_controls = db.query(Control).filter(
-        Control.id.in_(control_ids)
-    ).all()
+    # Served from the framework catalog cache
+    all_controls = list(framework_catalog.get_controls(db, control_ids).values())
     
     print(f"[Onboarding] Found {len(all_controls)} controls in database (without is_active filter)")
     
@@ -493,27 +498,10 @@ async def save_control_selection(
     company = current_user.company
     company_id = company.id
     
-    # Check if selection already exists for this company and framework
-    existing_selection = db.query(ControlSelection).filter(
-        ControlSelection.company_id == company_id,
-        ControlSelection.framework_id == framework.id
-    ).first()
-    
-    if existing_selection:
-        # Update existing selection - ALWAYS use validated_control_ids
-        print(f"[Onboarding] Updating existing control selection (ID: {existing_selection.id})")
-        existing_selection.selected_control_ids = validated_control_ids
-    else:
-        # Create new selection - ALWAYS use validated_control_ids
-        print(f"[Onboarding] Creating new control selection for company {company_id}, framework {framework.id}")
-        new_selection = ControlSelection(
-            company_id=company_id,
-            framework_id=framework.id,
-            selected_control_ids=validated_control_ids
-        )
-        db.add(new_selection)
-    
     try:
+        # Apply the difference to the stored selection (set operations in SQL) -
+        # ALWAYS use validated_control_ids
+        replace_control_selection(db, company_id, framework.id, validated_control_ids)
         db.commit()
         print(f"[Onboarding] ✅ Successfully saved {len(validated_control_ids)} validated controls to database")
     except Exception as e:
@@ -556,33 +544,15 @@ async def run_gap_analysis(
     company = current_user.company
     
     # Fetch selected controls for the company
-    selected_control_ids = []
-    if request.framework_id:
-        # Get selection for specific framework
-        selection = db.query(ControlSelection).filter(
-            ControlSelection.company_id == company.id,
-            ControlSelection.framework_id == request.framework_id
-        ).first()
-        if selection:
-            selected_control_ids = selection.selected_control_ids
-    else:
-        # Get all selections for the company
-        selections = db.query(ControlSelection).filter(
-            ControlSelection.company_id == company.id
-        ).all()
-        for selection in selections:
-            selected_control_ids.extend(selection.selected_control_ids)
+    # (for the requested framework, or across all the company's frameworks)
+    selected_control_ids = get_selected_control_ids(db, company.id, request.framework_id)
     
     # If no controls selected, use all controls (backward compatibility)
     if not selected_control_ids:
         # Fallback: use all controls for the framework if no selection exists
         if request.framework_id:
-            controls = db.query(Control).join(
-                ControlGroup, Control.control_group_id == ControlGroup.id
-            ).filter(
-                ControlGroup.framework_id == request.framework_id,
-                Control.is_active == True
-            ).all()
+            tree = framework_catalog.get_framework_tree(db, request.framework_id)
+            controls = tree.active_controls() if tree else []
             selected_control_ids = [c.id for c in controls]
     
     # Run AI-powered gap analysis for selected controls
@@ -600,16 +570,29 @@ async def run_gap_analysis(
         gaps_created = []
         gaps_identified_count = 0
         
-        for control_id in selected_control_ids:
+        run_id = start_analysis_run(
+            db, company.id, current_user.id,
+            framework_id=request.framework_id, source="onboarding", force=request.force
+        )
+        
+        # Evaluations of controls that need the LLM are packed into batched requests
+        try:
+            results = run_gap_analysis_for_controls(
+                control_ids=selected_control_ids,
+                company_id=company.id,
+                user_id=current_user.id,
+                db=db,
+                force=request.force,
+                run_id=run_id
+            )
+        except Exception:
+            finish_analysis_run(db, run_id, status="FAILED")
+            raise
+        finish_analysis_run(db, run_id)
+        
+        for control_id, result in zip(selected_control_ids, results):
             try:
-                result = run_gap_analysis_for_control(
-                    control_id=control_id,
-                    company_id=company.id,
-                    user_id=current_user.id,
-                    db=db
-                )
-                
-                if result.get("gap_created", False):
+                if result.get("gap_identified", False) and result.get("gap_id"):
                     gaps_identified_count += 1
                     # Fetch the created gap to include in response
                     gap = db.query(Gap).filter(Gap.id == result.get("gap_id")).first()
@@ -635,13 +618,11 @@ async def run_gap_analysis(
                 identified_date=gap.identified_date
             ))
         
-        analysis_id = f"analysis_{company.id}_{current_user.id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
-        
         return GapAnalysisResponse(
             status="completed",
             message=f"Gap analysis completed. Identified {gaps_identified_count} gap(s) across {len(selected_control_ids)} control(s).",
             gaps_identified=gaps_identified_count,
-            analysis_id=analysis_id,
+            analysis_id=run_id,
             gaps=gaps_info
         )
     else:
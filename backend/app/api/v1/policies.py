@@ -1,16 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import os
-import shutil
 from pathlib import Path
 from app.db import get_db
 from app.models import Policy, PolicyStatus, User
 from app.api.v1.auth import get_current_user
 from app.schemas.policy import PolicyCreate, PolicyResponse
 from app.services.pinecone_service import index_policy_embedding, get_index
+from app.services.impact_service import get_impacted_controls, enqueue_reanalysis
 from app.services.ai_service import get_embedding
-from app.utils.text_extraction import extract_text_from_file
+from app.utils.text_extraction import extract_text_cached
+from app.utils.upload_pipeline import stream_upload_to_disk, max_upload_bytes
+from app.core.config import settings
+from app.core.metrics import time_stage
 
 router = APIRouter()
 
@@ -155,20 +157,21 @@ async def upload_policy_file(
     print(f"[API] Framework ID: {framework_id}")
     
     try:
-        # 1. Save file
+        # 1. Save file (single streaming pass: size limit, SHA-256, MIME sniffing)
         print(f"[API] Step 1: Saving file...")
-        folder = "uploads"
-        os.makedirs(folder, exist_ok=True)
-        file_path = os.path.join(folder, file.filename)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        stored = await stream_upload_to_disk(
+            file,
+            dest_dir=Path("uploads"),
+            max_bytes=max_upload_bytes(settings.MAX_UPLOAD_MB),
+            name_prefix="policy_"
+        )
+        file_path = str(stored.path)
         
-        print(f"[API] ✓ File saved to: {file_path}")
+        print(f"[API] ✓ File saved to: {file_path} ({stored.size} bytes, {stored.mime_type})")
         
-        # 2. Extract text
+        # 2. Extract text (hash from the upload pass keys the extraction cache)
         print(f"[API] Step 2: Extracting text from file...")
-        raw_text = extract_text_from_file(file_path)
+        raw_text = extract_text_cached(file_path, file_hash=stored.sha256)
         print(f"[API] ✓ Text extracted: {len(raw_text)} characters")
         
         if not raw_text or not raw_text.strip():
@@ -219,15 +222,16 @@ async def upload_policy_file(
         print(f"[API] Vector ID: {vector_id}")
         print(f"[API] Metadata: {list(metadata.keys())}")
         
-        pinecone_response = index.upsert(
-            vectors=[
-                {
-                    "id": vector_id,
-                    "values": embedding,
-                    "metadata": metadata
-                }
-            ]
-        )
+        with time_stage("vector_upsert", "policies"):
+            pinecone_response = index.upsert(
+                vectors=[
+                    {
+                        "id": vector_id,
+                        "values": embedding,
+                        "metadata": metadata
+                    }
+                ]
+            )
         
         print("🔵 Pinecone Upsert Response:", pinecone_response)
         print(f"[API] ✓✓✓ Policy {policy.id} indexed in Pinecone! ✓✓✓")
@@ -288,6 +292,7 @@ async def update_policy_status(
     
     # Update status if provided
     policy_approved = False
+    status_changed = False
     if "status" in status_update:
         try:
             status_value = status_update["status"].lower()
@@ -306,6 +311,7 @@ async def update_policy_status(
             
             old_status = policy.status
             policy.status = new_status
+            status_changed = old_status != new_status
             print(f"[API] Policy {policy_id} status updated from {old_status.value} to: {new_status.value}")
             
             # If policy is being approved, re-index in Pinecone with updated status
@@ -329,6 +335,7 @@ async def update_policy_status(
         policy.description = status_update["description"]
     if "content" in status_update:
         policy.content = status_update["content"]
+    content_changed = any(field in status_update for field in ("title", "description", "content"))
     
     # Commit changes with error handling
     try:
@@ -346,58 +353,140 @@ async def update_policy_status(
         )
     
     # Return updated policy immediately
-    # Re-index policy in Pinecone if approved (to update status metadata)
-    # Do this in background to avoid blocking the response
-    if policy_approved:
-        print(f"[API] Policy {policy_id} approved - re-indexing in Pinecone with APPROVED status...")
+    # Re-index policy in Pinecone when its status or approved content changed, then
+    # re-analyze only the controls whose verdicts depend on it.
+    # Both run on the background impact worker to avoid blocking the response.
+    reindex_needed = policy_approved or status_changed or (content_changed and policy.status == PolicyStatus.APPROVED)
+    if reindex_needed:
+        if policy_approved:
+            print(f"[API] Policy {policy_id} approved - re-indexing in Pinecone with APPROVED status...")
         try:
-            # Run Pinecone re-indexing in background thread to avoid blocking
-            from concurrent.futures import ThreadPoolExecutor
+            metadata = {
+                "company_id": current_user.company_id,
+                "framework_id": policy.framework_id,
+                "control_id": policy.control_id,
+                "policy_number": policy.policy_number,
+                "status": policy.status.value
+            }
+            policy_title = policy.title
+            policy_content = policy.content or policy.description or ""
             
             def reindex_in_background():
                 try:
                     from app.services.pinecone_service import index_policy_embedding
                     
-                    metadata = {
-                        "company_id": current_user.company_id,
-                        "framework_id": policy.framework_id,
-                        "control_id": policy.control_id,
-                        "policy_number": policy.policy_number,
-                        "status": "approved"
-                    }
-                    
-                    policy_content = policy.content or policy.description or ""
-                    
                     if policy_content.strip():
                         success = index_policy_embedding(
-                            policy_id=policy.id,
-                            policy_title=policy.title,
+                            policy_id=policy_id,
+                            policy_title=policy_title,
                             policy_content=policy_content,
                             metadata=metadata
                         )
                         if success:
-                            print(f"[API] ✓ Policy {policy_id} re-indexed with APPROVED status")
+                            print(f"[API] ✓ Policy {policy_id} re-indexed with {metadata['status'].upper()} status")
                         else:
                             print(f"[API] ⚠ Policy {policy_id} re-indexing returned False")
                     else:
                         print(f"[API] ⚠ Policy {policy_id} has no content, skipping re-indexing")
                 except Exception as e:
                     import traceback
-                    print(f"[API] ⚠ Error re-indexing approved policy {policy_id}: {str(e)}")
+                    print(f"[API] ⚠ Error re-indexing policy {policy_id}: {str(e)}")
                     print(f"[API] Traceback:\n{traceback.format_exc()}")
             
-            # Run in background thread (non-blocking)
-            executor = ThreadPoolExecutor(max_workers=1)
-            executor.submit(reindex_in_background)
-            executor.shutdown(wait=False)
+            impacted_control_ids = get_impacted_controls(db, current_user.company_id, policy)
+            enqueue_reanalysis(
+                company_id=current_user.company_id,
+                user_id=current_user.id,
+                control_ids=impacted_control_ids,
+                before=reindex_in_background
+            )
         except Exception as e:
             print(f"[API] ⚠ Failed to start background re-indexing: {str(e)}")
-            # Don't fail the approval if background task setup fails
+            # Don't fail the update if background task setup fails
     
     # Return policy immediately (don't wait for Pinecone)
     return policy
 
 
+def _get_company_policy(policy_id: int, current_user: User, db: Session) -> Policy:
+    """Load an active policy the current user's company may access (404 / 403 otherwise)."""
+    policy = db.query(Policy).filter(
+        Policy.id == policy_id,
+        Policy.is_active == True
+    ).first()
+    
+    if not policy:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Policy not found"
+        )
+    
+    if policy.owner and policy.owner.company_id != current_user.company_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to access this policy"
+        )
+    return policy
+
+
+@router.get("/{policy_id}/impact", status_code=status.HTTP_200_OK)
+async def get_policy_impact(
+    policy_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    List the selected controls whose gap verdicts depend on a policy.
+    Read-only; use POST /{policy_id}/impact/reanalyze to queue re-analysis.
+    
+    Args:
+        policy_id: ID of the policy
+        current_user: Current authenticated user
+        db: Database session
+    
+    Returns:
+        Impacted control IDs
+    """
+    policy = _get_company_policy(policy_id, current_user, db)
+    impacted_control_ids = get_impacted_controls(db, current_user.company_id, policy)
+    
+    return {
+        "policy_id": policy_id,
+        "impacted_control_ids": impacted_control_ids
+    }
+
+
+@router.post("/{policy_id}/impact/reanalyze", status_code=status.HTTP_202_ACCEPTED)
+async def reanalyze_policy_impact(
+    policy_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue background re-analysis of the selected controls that depend on a policy.
+    
+    Args:
+        policy_id: ID of the policy
+        current_user: Current authenticated user
+        db: Database session
+    
+    Returns:
+        Impacted control IDs and the controls queued for re-analysis
+        (controls already queued are not queued twice)
+    """
+    policy = _get_company_policy(policy_id, current_user, db)
+    impacted_control_ids = get_impacted_controls(db, current_user.company_id, policy)
+    queued = []
+    if impacted_control_ids:
+        queued = enqueue_reanalysis(current_user.company_id, current_user.id, impacted_control_ids)
+    
+    return {
+        "policy_id": policy_id,
+        "impacted_control_ids": impacted_control_ids,
+        "queued_control_ids": queued
+    }
+
+
 @router.get("/test-pinecone", status_code=status.HTTP_200_OK)
 async def test_pinecone_connection(
     current_user: User = Depends(get_current_user)
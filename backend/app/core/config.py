@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 import os
 from dotenv import load_dotenv
 from pathlib import Path
@@ -37,6 +37,104 @@ class Settings:
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = os.getenv("BACKEND_CORS_ORIGINS", "http://localhost:5173").split(",")
 
+    # Extraction cache (content-addressed text cache under storage/extraction_cache)
+    EXTRACTION_CACHE_ENABLED: bool = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+    EXTRACTION_CACHE_MAX_MB: int = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "512"))
+    EXTRACTION_CACHE_MAX_AGE_DAYS: int = int(os.getenv("EXTRACTION_CACHE_MAX_AGE_DAYS", "90"))
+
+    # Upload limits (policy/KB documents vs. audit evidence artifacts)
+    MAX_UPLOAD_MB: int = int(os.getenv("MAX_UPLOAD_MB", "50"))
+    MAX_ARTIFACT_UPLOAD_MB: int = int(os.getenv("MAX_ARTIFACT_UPLOAD_MB", "1024"))
+
+    # Artifact blob store (unreferenced blobs are kept this long before GC removes them)
+    ARTIFACT_BLOB_GC_GRACE_HOURS: int = int(os.getenv("ARTIFACT_BLOB_GC_GRACE_HOURS", "24"))
+
+    # Artifact downloads: "" serves files from the app, "x-accel-redirect" (nginx) or
+    # "x-sendfile" (Apache/lighttpd) hands the transfer to the reverse proxy after permission checks
+    ARTIFACT_SENDFILE_BACKEND: str = os.getenv("ARTIFACT_SENDFILE_BACKEND", "")
+    ARTIFACT_SENDFILE_PREFIX: str = os.getenv("ARTIFACT_SENDFILE_PREFIX", "/protected")
+
+    # Gap analysis result cache (reuse a control's LLM evaluation while its inputs are unchanged)
+    GAP_ANALYSIS_CACHE_ENABLED: bool = os.getenv("GAP_ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+
+    # Batched gap evaluation (several controls per chat completion, packed under a prompt token budget)
+    GAP_EVAL_BATCH_ENABLED: bool = os.getenv("GAP_EVAL_BATCH_ENABLED", "true").lower() == "true"
+    GAP_EVAL_BATCH_SIZE: int = int(os.getenv("GAP_EVAL_BATCH_SIZE", "5"))
+    GAP_EVAL_BATCH_TOKEN_BUDGET: int = int(os.getenv("GAP_EVAL_BATCH_TOKEN_BUDGET", "12000"))
+
+    # Gap evaluation cascade: deterministic rules -> short classification call -> full evaluation.
+    # The classification settles a control only at >= MIN_CONFIDENCE, and a COMPLIANT
+    # verdict only at >= COMPLIANT_SIMILARITY; everything else escalates to the full evaluation.
+    GAP_CASCADE_ENABLED: bool = os.getenv("GAP_CASCADE_ENABLED", "true").lower() == "true"
+    GAP_CASCADE_CLASSIFY_MODEL: str = os.getenv("GAP_CASCADE_CLASSIFY_MODEL", "gpt-4o-mini")
+    GAP_CASCADE_CLASSIFY_TOKEN_BUDGET: int = int(os.getenv("GAP_CASCADE_CLASSIFY_TOKEN_BUDGET", "2000"))
+    GAP_CASCADE_MIN_CONFIDENCE: float = float(os.getenv("GAP_CASCADE_MIN_CONFIDENCE", "0.85"))
+    GAP_CASCADE_COMPLIANT_SIMILARITY: float = float(os.getenv("GAP_CASCADE_COMPLIANT_SIMILARITY", "0.92"))
+
+    # Cross-framework control equivalence: equivalent controls analyzed in one run share one
+    # evaluation. Embedding candidates need MIN_SIMILARITY to be stored; they wait for review
+    # unless AUTO_ACCEPT is set, in which case candidates from that similarity on are approved.
+    CONTROL_EQUIVALENCE_ENABLED: bool = os.getenv("CONTROL_EQUIVALENCE_ENABLED", "true").lower() == "true"
+    CONTROL_EQUIVALENCE_MIN_SIMILARITY: float = float(os.getenv("CONTROL_EQUIVALENCE_MIN_SIMILARITY", "0.80"))
+    CONTROL_EQUIVALENCE_AUTO_ACCEPT: Optional[float] = (
+        float(os.getenv("CONTROL_EQUIVALENCE_AUTO_ACCEPT")) if os.getenv("CONTROL_EQUIVALENCE_AUTO_ACCEPT") else None
+    )
+
+    # LLM gateway: per-model rate limits (requests/tokens per minute), concurrency,
+    # retries (exponential backoff with jitter, honouring Retry-After), timeouts and connection pool
+    LLM_RPM_LIMIT: int = int(os.getenv("LLM_RPM_LIMIT", "500"))
+    LLM_TPM_LIMIT: int = int(os.getenv("LLM_TPM_LIMIT", "200000"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "5"))
+    LLM_RETRY_BASE_SECONDS: float = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+    LLM_RETRY_MAX_WAIT_SECONDS: float = float(os.getenv("LLM_RETRY_MAX_WAIT_SECONDS", "60"))
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    LLM_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+    LLM_POOL_MAX_CONNECTIONS: int = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+    LLM_POOL_MAX_KEEPALIVE: int = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))
+    LLM_POOL_KEEPALIVE_SECONDS: float = float(os.getenv("LLM_POOL_KEEPALIVE_SECONDS", "30"))
+
+    # LLM response cache for deterministic (low-temperature) prompts; bump a namespace in
+    # llm_cache.PROMPT_VERSIONS to invalidate it, force re-analysis bypasses lookups
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_TTL_HOURS: float = float(os.getenv("LLM_CACHE_TTL_HOURS", "168"))
+    LLM_CACHE_MAX_MB: int = int(os.getenv("LLM_CACHE_MAX_MB", "200"))
+    LLM_CACHE_MAX_TEMPERATURE: float = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2"))
+
+    # Offline stand-ins for development and benchmarks (no API keys or network):
+    # LLM_BACKEND=offline (canned schema-valid answers), EMBEDDING_BACKEND=hash
+    # (deterministic 1536-dim vectors), VECTOR_STORE_BACKEND=memory (in-process index)
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "openai").lower()
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+    VECTOR_STORE_BACKEND: str = os.getenv("VECTOR_STORE_BACKEND", "pinecone").lower()
+    OFFLINE_LLM_LATENCY_MS: float = float(os.getenv("OFFLINE_LLM_LATENCY_MS", "0"))
+    OFFLINE_LLM_MS_PER_OUTPUT_TOKEN: float = float(os.getenv("OFFLINE_LLM_MS_PER_OUTPUT_TOKEN", "0"))
+    OFFLINE_EMBEDDING_LATENCY_MS: float = float(os.getenv("OFFLINE_EMBEDDING_LATENCY_MS", "0"))
+
+    # Stage metrics: GET /metrics (Prometheus text format) and a Server-Timing header
+    # with per-stage durations (db, embedding, llm, vector_query, ...) on every response.
+    # /metrics is off by default; when METRICS_TOKEN is set it requires "Authorization: Bearer <token>"
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+
+    # Gap analysis traces (nested stage/DB/vector/LLM spans) exported to a local file:
+    # a TRACE_SAMPLE_RATE share of controls, plus any control slower than TRACE_SLOW_MS
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+    TRACE_SLOW_MS: float = float(os.getenv("TRACE_SLOW_MS", "0"))
+    TRACE_EXPORT_FORMAT: str = os.getenv("TRACE_EXPORT_FORMAT", "jsonl").lower()
+    TRACE_EXPORT_PATH: str = os.getenv("TRACE_EXPORT_PATH", "")
+    TRACE_MAX_MB: int = int(os.getenv("TRACE_MAX_MB", "100"))
+
+    # Prompt token budget per model for packed evidence prompts (chat + gap evaluation),
+    # e.g. "gpt-4o-mini=4000,gpt-4o=8000"; models not listed use LLM_CONTEXT_TOKEN_BUDGET
+    LLM_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", "4000"))
+    LLM_CONTEXT_TOKEN_BUDGETS: str = os.getenv("LLM_CONTEXT_TOKEN_BUDGETS", "")
+
+    # Framework catalog cache (frameworks, control groups, controls held in memory per worker):
+    # how often a worker compares its cached trees with frameworks.catalog_version (0 = every lookup)
+    FRAMEWORK_CATALOG_CHECK_SECONDS: float = float(os.getenv("FRAMEWORK_CATALOG_CHECK_SECONDS", "5"))
+
 
 settings = Settings()
 
@@ -0,0 +1,301 @@
+"""
+Metrics
+Stage timing for the request pipeline, exported two ways:
+
+- /metrics in Prometheus text format: histograms and counters per stage
+  (db, embedding, llm, vector_query, vector_upsert, extraction, ...) and per route
+- Server-Timing response header: the time each stage took within that request,
+  so a slow response can be attributed from the browser devtools or a load test
+
+Stages are recorded with time_stage(); the per-request totals live in a context
+variable set by MetricsMiddleware (propagated into threadpool calls, so sync endpoints
+and run_in_threadpool work too). Inside a trace (app.core.tracing) each stage and
+SQL statement is also recorded as a span. No third-party client library is needed.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from app.core import tracing
+
+# Seconds; spans a cached DB lookup up to a slow LLM evaluation
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry_lock = threading.Lock()
+_registry: List["_Metric"] = []
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter with labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], Dict] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0}
+            if position < len(self.buckets):
+                series["buckets"][position] += 1
+            series["count"] += 1
+            series["sum"] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            snapshot = {key: {"buckets": list(s["buckets"]), "count": s["count"], "sum": s["sum"]} for key, s in self._series.items()}
+        lines = []
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["buckets"]):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series['count']}")
+        return lines
+
+
+def render_metrics() -> str:
+    """All registered metrics in Prometheus text exposition format (version 0.0.4)."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_DURATION = Histogram(
+    "grc_stage_duration_seconds",
+    "Time spent in a pipeline stage (db, embedding, llm, vector_query, vector_upsert, extraction, ...)",
+    ("stage", "operation")
+)
+STAGE_CALLS = Counter(
+    "grc_stage_calls_total",
+    "Pipeline stage invocations by outcome",
+    ("stage", "operation", "outcome")
+)
+HTTP_DURATION = Histogram(
+    "grc_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status")
+)
+HTTP_REQUESTS = Counter(
+    "grc_http_requests_total",
+    "HTTP requests by route template",
+    ("method", "route", "status")
+)
+
+# Per-request stage totals: {stage: [milliseconds, calls]}
+_request_stages: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_stages", default=None)
+
+
+def record_stage(stage: str, seconds: float, operation: str = "", outcome: str = "success") -> None:
+    """
+    Record a completed stage.
+
+    Args:
+        stage: Stage name (a Server-Timing token: letters, digits, underscores)
+        seconds: Duration
+        operation: Finer-grained label (e.g. the prompt or file type); keep cardinality low
+        outcome: "success" or "error"
+    """
+    STAGE_DURATION.observe(seconds, stage=stage, operation=operation)
+    STAGE_CALLS.inc(stage=stage, operation=operation, outcome=outcome)
+    stages = _request_stages.get()
+    if stages is not None:
+        totals = stages.setdefault(stage, [0.0, 0])
+        totals[0] += seconds * 1000
+        totals[1] += 1
+
+
+@contextmanager
+def time_stage(stage: str, operation: str = ""):
+    """
+    Time a block as a pipeline stage. Yields the stage's trace span (a no-op
+    outside a trace) for attributes such as result sizes.
+
+    Usage:
+        with time_stage("vector_query", operation="kb") as span:
+            results = index.query(...)
+            span.set_attribute("matches", len(results.matches))
+    """
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with tracing.span(stage, **({"operation": operation} if operation else {})) as span:
+            yield span
+        outcome = "success"
+    finally:
+        record_stage(stage, time.perf_counter() - started, operation, outcome)
+
+
+def instrument_engine(engine) -> None:
+    """Record every SQL statement executed through a SQLAlchemy engine as the "db" stage."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if starts:
+            operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+            seconds = time.perf_counter() - starts.pop()
+            record_stage("db", seconds, operation)
+            tracing.record_span("db", seconds, operation=operation, statement=statement[:200], rows=cursor.rowcount)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        starts = conn.info.get("metrics_query_start") if conn is not None else None
+        if starts:
+            record_stage("db", time.perf_counter() - starts.pop(), "", "error")
+
+
+_TOKEN_RE = re.compile(r"[^A-Za-z0-9_\-]")
+
+
+def _server_timing(stages: Dict[str, List[float]], total_ms: float) -> str:
+    entries = [
+        f'{_TOKEN_RE.sub("_", stage)};dur={totals[0]:.1f};desc="{int(totals[1])} call(s)"'
+        for stage, totals in sorted(stages.items(), key=lambda item: item[1][0], reverse=True)
+    ]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+def _route_template(scope) -> str:
+    """
+    Route label for a request: the matched route's path_format, e.g.
+    /api/v1/policies/{policy_id}. FastAPI versions that resolve included routers
+    lazily put the router-local route in the scope, so the (literal) include
+    prefix is taken from the request path when the template lacks it.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path_format", None)
+    if template is None:
+        return "unmatched"
+    path = scope.get("path", "")
+    regex = getattr(route, "path_regex", None)
+    if regex is None or regex.match(path):
+        return template
+    for index in range(1, len(path) + 1):
+        if (index == len(path) or path[index] == "/") and regex.match(path[index:]):
+            return path[:index] + template
+    return template or "/"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that times each HTTP request, records it by route template and
+    adds a Server-Timing header with the request's per-stage totals.
+    """
+
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages: Dict[str, List[float]] = {}
+        token = _request_stages.set(stages)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def timing_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    total_ms = (time.perf_counter() - started) * 1000
+                    headers = list(message.get("headers") or [])
+                    headers.append((b"server-timing", _server_timing(stages, total_ms).encode("latin-1")))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timing_send)
+        finally:
+            _request_stages.reset(token)
+            labels = {"method": scope.get("method", ""), "route": _route_template(scope), "status": str(status_code)}
+            HTTP_DURATION.observe(time.perf_counter() - started, **labels)
+            HTTP_REQUESTS.inc(**labels)
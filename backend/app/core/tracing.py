@@ -0,0 +1,317 @@
+"""
+Tracing
+Nested timing traces for the gap analysis pipeline, written to a local file so a
+slow control can be diagnosed after the fact without re-running it.
+
+A trace is a tree of spans: the control analysis at the root, its pipeline stages
+(validate, policies, retrieve, knowledge_base, cache, evaluate, persist) below, and
+the individual DB statements, embeddings, vector queries and LLM calls below those.
+Spans carry attributes such as token counts and result sizes.
+
+Sampling:
+- TRACE_SAMPLE_RATE: share of traces kept (0 disables head sampling)
+- TRACE_SLOW_MS: traces at least this slow are kept even when not sampled
+  (0 disables); a trace is recorded whenever either could keep it
+
+Export (TRACE_EXPORT_FORMAT), appended to TRACE_EXPORT_PATH:
+- "jsonl": one JSON object per span (default; see trace_report.py)
+- "otlp": one OTLP/JSON ExportTraceServiceRequest per trace (OpenTelemetry file exporter layout)
+
+Spans opened outside a trace are no-ops, so instrumented code costs next to nothing
+when tracing is off.
+"""
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_EXPORT_PATH = BASE_DIR / "storage" / "traces" / "spans.jsonl"
+
+# Long framework runs issue many statements; cap what one trace holds
+MAX_SPANS_PER_TRACE = 2000
+
+SERVICE_NAME = "sanchalan-grc-backend"
+
+_export_lock = threading.Lock()
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ("trace_id", "name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace_id: str, name: str, parent_id: Optional[str], attributes: Dict[str, Any], start_ns: Optional[int] = None):
+        self.trace_id = trace_id
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes)
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+
+class _NoopSpan:
+    """Stand-in returned when no trace is being recorded."""
+
+    trace_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """The spans of one traced operation; exported when finish() is called."""
+
+    def __init__(self, name: str, sampled: bool, attributes: Dict[str, Any]):
+        self.trace_id = secrets.token_hex(16)
+        self.sampled = sampled
+        self.root = Span(self.trace_id, name, None, attributes)
+        self.spans: List[Span] = [self.root]
+        self.dropped = 0
+        self.finished = False
+
+    def new_span(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any], start_ns: Optional[int] = None):
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped += 1
+            return NOOP_SPAN
+        span = Span(self.trace_id, name, parent_id or self.root.span_id, attributes, start_ns)
+        self.spans.append(span)
+        return span
+
+    def add_span(self, name: str, start_ns: int, end_ns: int, parent_id: Optional[str] = None, **attributes) -> None:
+        """Record an already completed operation (defaults to a child of the root)."""
+        span = self.new_span(name, parent_id, attributes, start_ns)
+        if span is not NOOP_SPAN:
+            span.end_ns = end_ns
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """End the root span and export the trace if it was sampled or is slow."""
+        if self.finished:
+            return
+        self.finished = True
+        self.root.end_ns = time.time_ns()
+        if error is not None:
+            self.root.error = type(error).__name__
+        if self.dropped:
+            self.root.attributes["dropped_spans"] = self.dropped
+
+        slow = settings.TRACE_SLOW_MS > 0 and self.root.duration_ms >= settings.TRACE_SLOW_MS
+        if self.sampled or slow:
+            self.root.attributes["sampling"] = "sampled" if self.sampled else "slow"
+            _export(self)
+
+
+# The trace being recorded and the innermost open span
+_current: ContextVar[Optional[Tuple[Trace, Any]]] = ContextVar("current_trace", default=None)
+
+
+def tracing_enabled() -> bool:
+    return settings.TRACE_SAMPLE_RATE > 0 or settings.TRACE_SLOW_MS > 0
+
+
+def begin_trace(name: str, **attributes) -> Optional[Trace]:
+    """
+    Start a trace that is finished explicitly (for work that is not one with-block,
+    e.g. a control prepared and finalized in separate passes of a batch).
+
+    Returns:
+        The trace, or None when tracing is off or the trace cannot be kept
+    """
+    if not tracing_enabled():
+        return None
+    sampled = random.random() < settings.TRACE_SAMPLE_RATE
+    if not sampled and settings.TRACE_SLOW_MS <= 0:
+        return None
+    return Trace(name, sampled, attributes)
+
+
+@contextmanager
+def activate(trace: Optional[Trace]):
+    """Record spans opened in the block into trace (under its root span)."""
+    if trace is None:
+        yield
+        return
+    token = _current.set((trace, trace.root))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """
+    Trace a block. Inside an active trace this is just a child span.
+
+    Usage:
+        with start_trace("gap_analysis.control", control_id=control_id) as root:
+            ...
+            root.set_attribute("status", status)
+    """
+    if _current.get() is not None:
+        with span(name, **attributes) as child:
+            yield child
+        return
+
+    trace = begin_trace(name, **attributes)
+    if trace is None:
+        yield NOOP_SPAN
+        return
+
+    error = None
+    try:
+        with activate(trace):
+            yield trace.root
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        trace.finish(error)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span (no-op outside a trace)."""
+    current = _current.get()
+    if current is None:
+        yield NOOP_SPAN
+        return
+
+    trace, parent = current
+    child = trace.new_span(name, getattr(parent, "span_id", None), attributes)
+    if child is NOOP_SPAN:
+        yield NOOP_SPAN
+        return
+
+    token = _current.set((trace, child))
+    try:
+        yield child
+    except BaseException as e:
+        child.error = type(e).__name__
+        raise
+    finally:
+        child.end_ns = time.time_ns()
+        _current.reset(token)
+
+
+def record_span(name: str, seconds: float, **attributes) -> None:
+    """Record an operation that just completed (timed elsewhere) under the current span."""
+    current = _current.get()
+    if current is None:
+        return
+    trace, parent = current
+    end_ns = time.time_ns()
+    trace.add_span(name, end_ns - int(seconds * 1e9), end_ns, getattr(parent, "span_id", None), **attributes)
+
+
+def current_span():
+    """The innermost open span, or a no-op span outside a trace."""
+    current = _current.get()
+    return current[1] if current is not None else NOOP_SPAN
+
+
+def _export_path() -> Path:
+    return Path(settings.TRACE_EXPORT_PATH) if settings.TRACE_EXPORT_PATH else DEFAULT_EXPORT_PATH
+
+
+def _json_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    return str(value)
+
+
+def _jsonl_lines(trace: Trace) -> List[str]:
+    return [
+        json.dumps({
+            "trace_id": trace.trace_id,
+            "span_id": span.span_id,
+            "parent_span_id": span.parent_id,
+            "name": span.name,
+            "start_unix_nano": span.start_ns,
+            "duration_ms": round(span.duration_ms, 3),
+            "status": "error" if span.error else "ok",
+            "error": span.error,
+            "attributes": {key: _json_value(value) for key, value in span.attributes.items()}
+        })
+        for span in trace.spans
+    ]
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": "" if value is None else str(value)}
+
+
+def _otlp_lines(trace: Trace) -> List[str]:
+    spans = []
+    for span in trace.spans:
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns if span.end_ns is not None else span.start_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        spans.append(otlp_span)
+    return [json.dumps({
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}]
+        }]
+    })]
+
+
+def _export(trace: Trace) -> None:
+    """Append a finished trace to the export file (rotated to <file>.1 past TRACE_MAX_MB)."""
+    try:
+        lines = _otlp_lines(trace) if settings.TRACE_EXPORT_FORMAT == "otlp" else _jsonl_lines(trace)
+        path = _export_path()
+        with _export_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists() and path.stat().st_size > settings.TRACE_MAX_MB * 1024 * 1024:
+                os.replace(path, f"{path}.1")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+    except Exception as e:
+        # Tracing must never break the traced operation
+        print(f"[Tracing] ⚠️ Could not export trace {trace.trace_id}: {str(e)}")
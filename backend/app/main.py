@@ -1,9 +1,14 @@
-from fastapi import FastAPI
+import hmac
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from app.db import engine
 from app.core.config import settings
+from app.utils.upload_pipeline import UploadSizeLimitMiddleware, max_upload_bytes
+from app.core.metrics import MetricsMiddleware, instrument_engine, render_metrics
 
 app = FastAPI(
     title="SANCHALAN AI GRC Platform",
@@ -17,6 +22,13 @@ uploads_dir = BASE_DIR / "uploads"
 if uploads_dir.exists():
     app.mount("/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads")
 
+# Bound multipart bodies before they are spooled to disk
+# (per-endpoint limits are enforced by the upload pipeline)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=max_upload_bytes(max(settings.MAX_UPLOAD_MB, settings.MAX_ARTIFACT_UPLOAD_MB))
+)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -24,8 +36,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Stage timing: SQL statements are recorded as the "db" stage; added last so it
+# wraps the other middleware and times the whole request
+instrument_engine(engine)
+app.add_middleware(MetricsMiddleware, server_timing=settings.SERVER_TIMING_ENABLED)
+
 
 @app.get("/health")
 async def health_check():
@@ -35,6 +53,20 @@ async def health_check():
     return {"status": "healthy", "message": "SANCHALAN AI GRC Platform is running"}
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics(authorization: Optional[str] = Header(None)):
+        """
+        Stage and request metrics in Prometheus text format.
+        Requires "Authorization: Bearer <METRICS_TOKEN>" when a token is configured.
+        """
+        if settings.METRICS_TOKEN and not hmac.compare_digest(
+            (authorization or "").encode(), f"Bearer {settings.METRICS_TOKEN}".encode()
+        ):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # API routers
 from app.api.v1 import auth, onboarding, frameworks, policies, gaps, dashboard, chat, gap_analysis, reports, knowledge_base, artifacts
 
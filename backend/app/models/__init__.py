@@ -4,14 +4,20 @@ from app.models.company import Company
 from app.models.department import Department
 from app.models.role import Role
 from app.models.framework import Framework
-from app.models.control_group import ControlGroup
+from app.models.control_group import ControlGroup, ControlGroupClosure
 from app.models.control import Control, ControlStatus
-from app.models.control_selection import ControlSelection
+from app.models.control_selection import ControlSelection, CompanyControlSelection
 from app.models.policy import Policy, PolicyStatus
 from app.models.gap import Gap, GapSeverity, GapStatus
 from app.models.remediation import Remediation, RemediationStatus
 from app.models.artifact import Artifact, ArtifactType
+from app.models.artifact_blob import ArtifactBlob
 from app.models.knowledge_base import KnowledgeBaseDocument, KnowledgeSourceType
+from app.models.control_analysis_cache import ControlAnalysisCache
+from app.models.control_policy_dependency import ControlPolicyDependency
+from app.models.analysis_run import AnalysisRun, ControlResult
+from app.models.decision_thresholds import DecisionThresholds
+from app.models.control_equivalence import ControlEquivalence
 
 __all__ = [
     "User",
@@ -20,9 +26,11 @@ __all__ = [
     "Role",
     "Framework",
     "ControlGroup",
+    "ControlGroupClosure",
     "Control",
     "ControlStatus",
     "ControlSelection",
+    "CompanyControlSelection",
     "Policy",
     "PolicyStatus",
     "Gap",
@@ -32,6 +40,13 @@ __all__ = [
     "RemediationStatus",
     "Artifact",
     "ArtifactType",
+    "ArtifactBlob",
     "KnowledgeBaseDocument",
     "KnowledgeSourceType",
+    "ControlAnalysisCache",
+    "ControlPolicyDependency",
+    "AnalysisRun",
+    "ControlResult",
+    "DecisionThresholds",
+    "ControlEquivalence",
 ]
@@ -0,0 +1,74 @@
+"""
+Analysis Run Models
+A ledger of gap analysis runs: one AnalysisRun per run and one ControlResult per
+analyzed control, so a past run can be redisplayed without re-running it.
+
+Per-control results are stored compactly: scalar columns for what the UI filters
+and sorts on, Postgres arrays for the score/title/requirement lists and one JSONB
+column for the remaining decision details (SQLite stores the arrays as JSON).
+"""
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Boolean, Text, Float, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import ARRAY, JSON, JSONB
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+def _array(item_type):
+    return ARRAY(item_type).with_variant(JSON(), "sqlite")
+
+
+class AnalysisRun(Base):
+    """One gap analysis run (API, onboarding or framework-wide) and its totals."""
+    __tablename__ = "analysis_runs"
+    __table_args__ = (
+        Index("ix_analysis_runs_company_started", "company_id", "started_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    framework_id = Column(Integer, ForeignKey("frameworks.id", ondelete="SET NULL"), nullable=True)  # None = all selected frameworks
+    triggered_by_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    source = Column(String(30), nullable=False, default="api")  # api / onboarding / framework
+    force = Column(Boolean, nullable=False, default=False)
+    status = Column(String(20), nullable=False, default="RUNNING")  # RUNNING / COMPLETED / FAILED
+    total_controls = Column(Integer, nullable=False, default=0)
+    gaps_identified = Column(Integer, nullable=False, default=0)
+    compliant_controls = Column(Integer, nullable=False, default=0)
+    error_controls = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+
+    results = relationship("ControlResult", back_populates="run", passive_deletes=True)
+
+
+class ControlResult(Base):
+    """A control's verdict within an analysis run."""
+    __tablename__ = "control_results"
+    __table_args__ = (
+        # Paging through a run in ID order; a control's history across runs
+        Index("ix_control_results_run_id_id", "run_id", "id"),
+        Index("ix_control_results_control_run", "control_id", "run_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey("analysis_runs.id", ondelete="CASCADE"), nullable=False)
+    # No foreign keys to controls / gaps: the ledger keeps history after they are deleted
+    control_id = Column(Integer, nullable=False)
+    framework_id = Column(Integer, nullable=True)
+    gap_id = Column(Integer, nullable=True)
+    status = Column(String(20), nullable=False)  # GAP / COMPLIANT / ERROR
+    severity = Column(String(20), nullable=True)
+    risk_score = Column(SmallInteger, nullable=True)
+    gap_created = Column(Boolean, nullable=False, default=False)
+    max_similarity = Column(Float, nullable=True)
+    similarity_scores = Column(_array(Float), nullable=True)
+    matched_policy_titles = Column(_array(Text), nullable=True)
+    missing_requirements = Column(_array(Text), nullable=True)
+    reason = Column(Text, nullable=True)
+    decision_reason = Column(Text, nullable=True)
+    # coverage_level, kb_alignment, control/covered requirements, tier, fingerprint, cached
+    details = Column(JSONB, nullable=True)
+
+    run = relationship("AnalysisRun", back_populates="results")
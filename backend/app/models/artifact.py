@@ -29,6 +29,7 @@ class Artifact(Base):
     gap_id = Column(Integer, ForeignKey("gaps.id", ondelete="SET NULL"), nullable=True, index=True)
     control_id = Column(Integer, ForeignKey("controls.id", ondelete="SET NULL"), nullable=True, index=True)
     uploaded_by_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
+    blob_id = Column(Integer, ForeignKey("artifact_blobs.id", ondelete="SET NULL"), nullable=True, index=True)
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -38,3 +39,9 @@ class Artifact(Base):
     gap = relationship("Gap", back_populates="artifacts")
     control = relationship("Control", back_populates="artifacts")
     uploaded_by = relationship("User")
+    blob = relationship("ArtifactBlob", back_populates="artifacts")
+
+    @property
+    def content_hash(self):
+        """SHA-256 of the stored file (None for artifacts uploaded before the blob store)."""
+        return self.blob.sha256 if self.blob else None
@@ -0,0 +1,26 @@
+"""
+Artifact Blob Model
+One row per unique artifact file content (content-addressed by SHA-256).
+Artifact rows reference blobs, so repeated evidence is stored on disk once.
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+class ArtifactBlob(Base):
+    """Physical file backing one or more artifacts."""
+    __tablename__ = "artifact_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), nullable=False, unique=True, index=True)
+    size = Column(BigInteger, nullable=False)  # Size in bytes
+    mime_type = Column(String(100), nullable=True)
+    storage_path = Column(String(500), nullable=False)  # Relative path, e.g. uploads/artifacts/{sha256}{ext}
+    ref_count = Column(Integer, default=0, nullable=False)  # Number of active artifacts referencing this blob
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    # Relationships
+    artifacts = relationship("Artifact", back_populates="blob")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -14,6 +14,10 @@ class ControlStatus(str, enum.Enum):
 
 class Control(Base):
     __tablename__ = "controls"
+    __table_args__ = (
+        # Upsert key of imported catalogs (NULL for hand-seeded controls)
+        UniqueConstraint("control_group_id", "source_id", name="uq_controls_group_source"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
@@ -25,6 +29,7 @@ class Control(Base):
     evidence = Column(Text, nullable=True)
     order_index = Column(Integer, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
+    source_id = Column(String(100), nullable=True)  # ID in the imported catalog (e.g. OSCAL control "ac-2.1")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
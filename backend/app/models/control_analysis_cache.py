@@ -0,0 +1,28 @@
+"""
+Control Analysis Cache Model
+Stores the LLM evaluation of a control for a company together with a fingerprint
+of the inputs it was computed from (control text, matched policy chunks, KB chunks).
+"""
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+class ControlAnalysisCache(Base):
+    """Latest evaluation per (company, control), reused while the input fingerprint matches."""
+    __tablename__ = "control_analysis_cache"
+    __table_args__ = (
+        UniqueConstraint("company_id", "control_id", name="uq_control_analysis_cache_company_control"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False, index=True)
+    control_id = Column(Integer, ForeignKey("controls.id", ondelete="CASCADE"), nullable=False, index=True)
+    framework_id = Column(Integer, ForeignKey("frameworks.id", ondelete="CASCADE"), nullable=True, index=True)
+    input_fingerprint = Column(String(64), nullable=False)
+    control_requirements = Column(JSON, nullable=False)  # Decomposed requirements (LLM)
+    evaluation = Column(JSON, nullable=False)  # generate_gap_analysis() output (LLM)
+    status = Column(String(20), nullable=True)  # GAP / COMPLIANT at the time of evaluation
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
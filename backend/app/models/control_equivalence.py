@@ -0,0 +1,30 @@
+"""
+Control Equivalence Model
+Pairs of controls (usually from different frameworks) that ask for the same thing,
+e.g. ISO 27001 A.5.15 and NIST AC-1. For an approved pair the gap evaluation is
+done once per analysis run and projected onto the other control.
+"""
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, UniqueConstraint, CheckConstraint, Index
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+class ControlEquivalence(Base):
+    """One unordered pair of equivalent controls (stored with control_id < equivalent_control_id)."""
+    __tablename__ = "control_equivalences"
+    __table_args__ = (
+        UniqueConstraint("control_id", "equivalent_control_id", name="uq_control_equivalences_pair"),
+        CheckConstraint("control_id < equivalent_control_id", name="ck_control_equivalences_ordered"),
+        Index("ix_control_equivalences_equivalent_control_id", "equivalent_control_id"),
+        Index("ix_control_equivalences_status", "status"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    control_id = Column(Integer, ForeignKey("controls.id", ondelete="CASCADE"), nullable=False)
+    equivalent_control_id = Column(Integer, ForeignKey("controls.id", ondelete="CASCADE"), nullable=False)
+    source = Column(String(20), nullable=False)  # curated / embedding
+    similarity = Column(Float, nullable=True)  # Cosine similarity of the control texts (embedding candidates)
+    status = Column(String(20), nullable=False, default="CANDIDATE")  # APPROVED / CANDIDATE / REJECTED
+    reviewed_by_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,11 +1,16 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Index, UniqueConstraint, event, select, insert, delete, literal, and_, union_all
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import get_history
 from sqlalchemy.sql import func
 from app.db import Base
 
 
 class ControlGroup(Base):
     __tablename__ = "control_groups"
+    __table_args__ = (
+        # Upsert key of imported catalogs (NULL for hand-seeded groups)
+        UniqueConstraint("framework_id", "source_id", name="uq_control_groups_framework_source"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
@@ -15,6 +20,7 @@ class ControlGroup(Base):
     parent_group_id = Column(Integer, ForeignKey("control_groups.id", ondelete="CASCADE"), nullable=True, index=True)
     order_index = Column(Integer, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
+    source_id = Column(String(100), nullable=True)  # ID in the imported catalog (e.g. OSCAL group "ac")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
@@ -22,3 +28,65 @@ class ControlGroup(Base):
     framework = relationship("Framework", back_populates="control_groups")
     parent_group = relationship("ControlGroup", remote_side=[id], backref="child_groups")
     controls = relationship("Control", back_populates="control_group", cascade="all, delete-orphan")
+
+
+class ControlGroupClosure(Base):
+    """
+    Closure table of the control group hierarchy: one row per (ancestor, descendant)
+    pair, including each group with itself at depth 0. A subtree is one indexed
+    lookup on ancestor_id; the ancestors of a group one lookup on descendant_id.
+
+    Kept current by the ControlGroup insert / parent change hooks below; bulk
+    writes that bypass the ORM call control_hierarchy.rebuild_closure().
+    """
+    __tablename__ = "control_group_closure"
+
+    ancestor_id = Column(Integer, ForeignKey("control_groups.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("control_groups.id", ondelete="CASCADE"), primary_key=True)
+    depth = Column(Integer, nullable=False)  # 0 = the group itself, 1 = child, ...
+
+    __table_args__ = (
+        Index("ix_control_group_closure_descendant_depth", "descendant_id", "depth"),
+    )
+
+
+@event.listens_for(ControlGroup, "after_insert")
+def _closure_after_insert(mapper, connection, target):
+    """A new group is its own depth-0 entry plus one row per ancestor of its parent."""
+    closure = ControlGroupClosure.__table__
+    rows = select(literal(target.id), literal(target.id), literal(0))
+    if target.parent_group_id is not None:
+        rows = union_all(rows, select(
+            closure.c.ancestor_id, literal(target.id), closure.c.depth + 1
+        ).where(closure.c.descendant_id == target.parent_group_id))
+    connection.execute(insert(closure).from_select(["ancestor_id", "descendant_id", "depth"], rows))
+
+
+@event.listens_for(ControlGroup, "after_update")
+def _closure_after_update(mapper, connection, target):
+    """Moving a group re-links its whole subtree under the new parent (two statements)."""
+    history = get_history(target, "parent_group_id")
+    if not history.has_changes():
+        return
+    closure = ControlGroupClosure.__table__
+    subtree = select(closure.c.descendant_id).where(closure.c.ancestor_id == target.id)
+
+    if target.parent_group_id is not None and connection.execute(
+        select(closure.c.depth).where(closure.c.ancestor_id == target.id, closure.c.descendant_id == target.parent_group_id)
+    ).first():
+        raise ValueError(f"Control group {target.id} cannot be moved under its own subtree")
+
+    # Detach the subtree from its old ancestors
+    connection.execute(delete(closure).where(
+        closure.c.descendant_id.in_(subtree),
+        closure.c.ancestor_id.notin_(subtree)
+    ))
+    # Attach it to the new parent's ancestors (including the parent itself)
+    if target.parent_group_id is not None:
+        above = closure.alias("above")
+        below = closure.alias("below")
+        connection.execute(insert(closure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+            .select_from(above.join(below, and_(above.c.descendant_id == target.parent_group_id, below.c.ancestor_id == target.id)))
+        ))
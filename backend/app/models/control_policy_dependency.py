@@ -0,0 +1,25 @@
+"""
+Control Policy Dependency Model
+Records which policy chunks a control's last gap analysis matched, so a policy
+change can be traced back to the controls whose verdicts depend on it.
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+class ControlPolicyDependency(Base):
+    """One row per (company, control, matched policy chunk) from the latest analysis."""
+    __tablename__ = "control_policy_dependencies"
+    __table_args__ = (
+        Index("ix_control_policy_dependencies_company_policy", "company_id", "policy_id"),
+        Index("ix_control_policy_dependencies_company_control", "company_id", "control_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    control_id = Column(Integer, ForeignKey("controls.id", ondelete="CASCADE"), nullable=False)
+    policy_id = Column(Integer, ForeignKey("policies.id", ondelete="CASCADE"), nullable=False)
+    chunk_id = Column(String(255), nullable=True)  # Pinecone vector id, e.g. policy-12-3
+    score = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
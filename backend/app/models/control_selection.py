@@ -1,17 +1,30 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.sql import func
 from app.db import Base
 
 
 class ControlSelection(Base):
+    """A company's control selection for one framework (its controls: CompanyControlSelection)."""
     __tablename__ = "control_selections"
 
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"))
     framework_id = Column(Integer, ForeignKey("frameworks.id", ondelete="CASCADE"))
-    selected_control_ids = Column(JSON, nullable=False)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+
+class CompanyControlSelection(Base):
+    """One control selected by a company for a framework (one row per selected control)."""
+    __tablename__ = "company_control_selection"
+
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True)
+    framework_id = Column(Integer, ForeignKey("frameworks.id", ondelete="CASCADE"), primary_key=True)
+    control_id = Column(Integer, ForeignKey("controls.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Reverse lookups (which companies selected a control) and FK cascades
+        Index("ix_company_control_selection_control_id", "control_id"),
+    )
@@ -0,0 +1,24 @@
+"""
+Decision Thresholds Model
+Per-framework thresholds of the gap analysis decision logic (similarity floors and
+risk -> severity bands). Frameworks without a row use the built-in defaults.
+"""
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+class DecisionThresholds(Base):
+    """Thresholds applied to every company's analysis of one framework."""
+    __tablename__ = "decision_thresholds"
+
+    id = Column(Integer, primary_key=True, index=True)
+    framework_id = Column(Integer, ForeignKey("frameworks.id", ondelete="CASCADE"), nullable=False, unique=True)
+    similarity_min = Column(Float, nullable=False)  # Below: hard-rule GAP (and retrieval floor)
+    auto_compliant = Column(Float, nullable=False)  # Minimum similarity for COMPLIANT
+    default_risk_score = Column(Integer, nullable=False)  # Risk score when no similarity is available
+    high_risk_score = Column(Integer, nullable=False)  # Risk score from which severity is HIGH
+    medium_risk_score = Column(Integer, nullable=False)  # Risk score from which severity is MEDIUM
+    updated_by_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
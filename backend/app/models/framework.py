@@ -13,6 +13,7 @@ class Framework(Base):
     version = Column(String(50), nullable=True)
     category = Column(String(100), nullable=True)  # e.g., "Security", "Compliance", "Risk"
     is_active = Column(Boolean, default=True, nullable=False)
+    catalog_version = Column(Integer, default=1, server_default="1", nullable=False)  # Bumped when its groups/controls change
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
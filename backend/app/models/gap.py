@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum, Float, Index, text
+from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -20,8 +21,20 @@ class GapStatus(str, enum.Enum):
     CLOSED = "closed"
 
 
+# A company has at most one open gap per control; analysis runs update it in place
+OPEN_GAP_CONDITION = "is_active AND status IN ('IDENTIFIED', 'IN_REMEDIATION')"
+
+
 class Gap(Base):
     __tablename__ = "gaps"
+    __table_args__ = (
+        Index(
+            "uq_gaps_open_company_control", "company_id", "control_id",
+            unique=True,
+            postgresql_where=text(OPEN_GAP_CONDITION),
+            sqlite_where=text(OPEN_GAP_CONDITION)
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False, index=True)
@@ -32,10 +45,14 @@ class Gap(Base):
     control_id = Column(Integer, ForeignKey("controls.id", ondelete="SET NULL"), nullable=True, index=True)
     policy_id = Column(Integer, ForeignKey("policies.id", ondelete="SET NULL"), nullable=True, index=True)
     identified_by_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=True, index=True)
     assigned_to_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
     risk_score = Column(Float, nullable=True)
     impact = Column(Text, nullable=True)
     root_cause = Column(Text, nullable=True)
+    evidence = Column(JSON, nullable=True)  # Latest analysis: similarity, matched policies, missing requirements
+    run_count = Column(Integer, default=1, server_default="1", nullable=False)  # Analysis runs that found this gap
+    last_analyzed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=True)
     identified_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     target_remediation_date = Column(DateTime(timezone=True), nullable=True)
     actual_remediation_date = Column(DateTime(timezone=True), nullable=True)
@@ -68,3 +68,46 @@ class ControlTreeResponse(BaseModel):
     framework_id: int
     framework_name: str
     tree: List[ControlTreeNode]
+
+
+class ControlGroupRollup(BaseModel):
+    group_id: int
+    code: Optional[str] = None
+    name: str
+    parent_group_id: Optional[int] = None
+    controls: int  # Whole subtree
+    active_controls: int
+    selected_controls: int  # Selected by the user's company
+    open_gaps: int  # The company's open gaps
+
+
+class ControlGroupMove(BaseModel):
+    parent_group_id: Optional[int] = None  # None: move to the top level
+
+
+class EquivalentControlRef(BaseModel):
+    id: int
+    code: Optional[str] = None
+    name: Optional[str] = None
+    framework_id: Optional[int] = None
+
+
+class ControlEquivalenceResponse(BaseModel):
+    id: int
+    control: EquivalentControlRef
+    equivalent_control: EquivalentControlRef
+    source: str  # curated / embedding
+    similarity: Optional[float] = None
+    status: str  # APPROVED / CANDIDATE / REJECTED
+    reviewed_by_id: Optional[int] = None
+    updated_at: Optional[datetime] = None
+
+
+class ControlEquivalenceCreate(BaseModel):
+    control_id: int
+    equivalent_control_id: int
+
+
+class ControlEquivalenceReview(BaseModel):
+    status: str  # APPROVED / CANDIDATE / REJECTED
+
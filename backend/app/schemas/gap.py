@@ -17,6 +17,8 @@ class GapResponse(BaseModel):
     risk_score: Optional[float] = None
     impact: Optional[str] = None
     root_cause: Optional[str] = None
+    run_count: Optional[int] = None
+    last_analyzed_at: Optional[datetime] = None
     identified_date: datetime
     target_remediation_date: Optional[datetime] = None
     actual_remediation_date: Optional[datetime] = None
@@ -66,3 +68,12 @@ class RemediationResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class DecisionThresholdsUpdate(BaseModel):
+    """Per-framework decision thresholds (omitted fields keep their current value)."""
+    similarity_min: Optional[float] = None
+    auto_compliant: Optional[float] = None
+    default_risk_score: Optional[int] = None
+    high_risk_score: Optional[int] = None
+    medium_risk_score: Optional[int] = None
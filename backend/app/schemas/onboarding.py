@@ -111,6 +111,7 @@ class PolicyUploadResponse(BaseModel):
 class GapAnalysisRequest(BaseModel):
     framework_id: Optional[int] = None
     run_ai_analysis: bool = True
+    force: bool = False  # Ignore stored evaluations for unchanged controls
 
 
 class GapInfo(BaseModel):
@@ -132,7 +133,7 @@ class GapAnalysisResponse(BaseModel):
     status: str
     message: str
     gaps_identified: int
-    analysis_id: Optional[str] = None
+    analysis_id: Optional[int] = None  # AnalysisRun ID
     gaps: Optional[List[GapInfo]] = []
 
 
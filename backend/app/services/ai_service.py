@@ -3,11 +3,19 @@ AI Service for OpenAI integration.
 Handles embeddings and gap analysis generation.
 """
 from typing import List, Optional, Dict, Any
-from openai import OpenAI
 from app.core.config import settings
+from app.services.context_packer import count_tokens, get_context_budget, pack_context
+from app.services.llm_gateway import (
+    chat_completion,
+    create_embedding,
+    get_client,
+    track_llm_usage,
+    get_llm_usage,
+    reset_llm_usage
+)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# Shared OpenAI client (kept for callers that need the raw client; calls go through the gateway)
+client = get_client()
 
 
 def extract_control_requirements(control_name: str, control_description: str) -> List[str]:
@@ -44,7 +52,7 @@ Requirements:
 Return ONLY a JSON array of requirement strings, no additional text:
 ["requirement1", "requirement2", "requirement3"]"""
 
-        response = client.chat.completions.create(
+        response = chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {
@@ -57,7 +65,8 @@ Return ONLY a JSON array of requirement strings, no additional text:
                 }
             ],
             temperature=0.1,
-            max_tokens=500
+            max_tokens=500,
+            cache_namespace="control_requirements"
         )
         
         response_text = response.choices[0].message.content.strip()
@@ -101,10 +110,11 @@ CONTROL:
 {control_text}
 """
         
-        response = client.chat.completions.create(
+        response = chat_completion(
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
-            temperature=0
+            temperature=0,
+            cache_namespace="control_decomposition"
         )
         
         return parse_requirements(response)
@@ -203,7 +213,7 @@ def get_embedding(text: str, model: str = "text-embedding-3-small") -> List[floa
         
         # Use OpenAI client to get embeddings
         print(f"[Embedding] Calling OpenAI API...")
-        response = client.embeddings.create(
+        response = create_embedding(
             model=model,
             input=text
         )
@@ -219,6 +229,196 @@ def get_embedding(text: str, model: str = "text-embedding-3-small") -> List[floa
         raise Exception(f"Error generating embedding: {str(e)}")
 
 
+
+def get_embeddings(texts: List[str], model: str = "text-embedding-3-small") -> List[List[float]]:
+    """
+    Get embedding vectors for several texts with one OpenAI request.
+    
+    Args:
+        texts: The texts to embed (non-empty)
+        model: The embedding model to use (default: text-embedding-3-small)
+    
+    Returns:
+        One embedding per text, in input order
+    """
+    if not texts or any(not text or not text.strip() for text in texts):
+        raise Exception("Empty text provided for embedding")
+    
+    print(f"[Embedding] Generating {len(texts)} embeddings in one request using model: {model}")
+    response = create_embedding(model=model, input=texts)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+EVALUATOR_SYSTEM_PROMPT = "You are a compliance evaluator. Your role is to EVALUATE coverage and alignment, NOT to make compliance decisions. Provide accurate evaluation data: coverage_level, missing_requirements, kb_alignment, and explanation. Always respond with valid JSON only, no additional text."
+
+EVALUATION_RULES = """EVALUATION RULES:
+
+1. Coverage Level Assessment:
+   - FULL: ALL requirements are EXPLICITLY and CLEARLY covered in policies
+   - PARTIAL: Some requirements covered, some missing or not explicit
+   - NONE: No requirements explicitly covered
+
+2. Knowledge Base Alignment:
+   - MATCH: Policy aligns with KB requirements (same mandatory level, same scope)
+   - MISMATCH: Policy differs from KB (e.g., KB says MUST, policy says SHOULD; or KB clause omitted)
+   - CONTRADICTS: Policy contradicts KB requirements
+
+3. KB Alignment Rules:
+   - If KB says MUST and policy says SHOULD → MISMATCH
+   - If KB clause is omitted from policy → MISMATCH
+   - If policy contradicts KB requirement → CONTRADICTS
+   - FULL coverage is possible ONLY if KB alignment is MATCH
+
+4. Evaluation Criteria:
+   - Do NOT infer intent or general security statements
+   - Generic language like "we follow security best practices" does NOT count as coverage
+   - Must find EXPLICIT mention: specific procedures, clear processes, concrete steps
+
+5. Which REQUIRED clauses are EXPLICITLY covered?
+   - List ONLY clauses that are clearly and specifically addressed
+   - Must be explicit, not inferred
+
+6. Which REQUIRED clauses are MISSING or NOT EXPLICITLY covered?
+   - Identify EVERY clause that is NOT explicitly covered
+   - Be specific about what's missing
+
+IMPORTANT: You are an EVALUATOR. Do NOT make compliance decisions. Only provide evaluation data."""
+
+GAP_ANALYSIS_MODEL = "gpt-4o-mini"
+
+# Evidence packing: share of the evidence budget for policy chunks (KB gets the rest),
+# per-chunk cap for long KB passages, and tokens for the prompt's fixed instructions/JSON schema
+POLICY_EVIDENCE_SHARE = 0.6
+KB_CHUNK_MAX_TOKENS = 400
+PROMPT_FRAME_TOKENS = 250
+
+# Batched evaluation: output tokens reserved per control in one request
+BATCH_OUTPUT_TOKENS_PER_CONTROL = 700
+BATCH_MAX_OUTPUT_TOKENS = 8000
+
+# Cascade classification tier: labels + confidence + one-sentence reason + missing requirements
+CLASSIFY_MAX_OUTPUT_TOKENS = 250
+CLASSIFY_MAX_MISSING_REQUIREMENTS = 6
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of a prompt fragment for the gap evaluation model."""
+    return count_tokens(text, GAP_ANALYSIS_MODEL)
+
+
+def _build_evaluation_context(
+    control_name: str,
+    control_description: str,
+    similar_policies: List[Dict[str, Any]],
+    framework_name: Optional[str] = None,
+    control_requirements: Optional[List[str]] = None,
+    knowledge_base_chunks: Optional[List[Dict[str, Any]]] = None,
+    token_budget: Optional[int] = None
+) -> str:
+    """
+    Build the per-control part of the evaluation prompt (control, requirements, policies, KB).
+    
+    Policy and KB chunks are packed by score into the model's context budget
+    (see context_packer): policies get up to POLICY_EVIDENCE_SHARE of the evidence
+    budget, the KB gets the rest. Overlapping chunk text is only included once.
+    token_budget overrides the model budget (e.g. for the cheaper classification tier).
+    """
+    # Include control requirements if provided
+    requirements_context = ""
+    if control_requirements:
+        requirements_context = f"\n\nMANDATORY REQUIREMENTS TO CHECK:\n" + "\n".join([f"{idx + 1}. {req}" for idx, req in enumerate(control_requirements)])
+    
+    control_context = f"""Control Requirement:
+- Name: {control_name}
+- Description: {control_description}
+- Framework: {framework_name or "Not specified"}
+
+{requirements_context}"""
+    
+    # Evidence budget = model prompt budget minus everything else in the prompt
+    fixed_tokens = (
+        estimate_tokens(EVALUATOR_SYSTEM_PROMPT)
+        + estimate_tokens(EVALUATION_RULES)
+        + estimate_tokens(control_context)
+        + PROMPT_FRAME_TOKENS
+    )
+    evidence_budget = max(0, (token_budget or get_context_budget(GAP_ANALYSIS_MODEL)) - fixed_tokens)
+    policy_budget = int(evidence_budget * POLICY_EVIDENCE_SHARE) if knowledge_base_chunks else evidence_budget
+    
+    # Build context from similar policies
+    policies_context = ""
+    if similar_policies:
+        packed_policies = pack_context(similar_policies, policy_budget, text_key="content", model=GAP_ANALYSIS_MODEL)
+        policies_context = "\n\nSimilar Policies Found:\n"
+        for idx, policy in enumerate(packed_policies["chunks"], 1):
+            similarity_score = policy.get('score', 0)
+            policies_context += f"\n{idx}. {policy.get('title', 'Unknown')}\n"
+            policies_context += f"   Similarity Score: {similarity_score:.3f}\n"
+            policies_context += f"   Content: {policy.get('content', '')}\n"
+        evidence_budget -= packed_policies["tokens"]
+    else:
+        policies_context = "\n\n⚠️ NO POLICIES FOUND: This means the control requirement is NOT covered by any existing policies in the system."
+    
+    # Build context from knowledge base (ground truth)
+    kb_context = ""
+    if knowledge_base_chunks:
+        packed_kb = pack_context(
+            knowledge_base_chunks,
+            evidence_budget,
+            text_key="text",
+            model=GAP_ANALYSIS_MODEL,
+            max_chunk_tokens=KB_CHUNK_MAX_TOKENS
+        )
+        kb_context = "\n\nKNOWLEDGE BASE (Authoritative Reference):\n"
+        for idx, kb_chunk in enumerate(packed_kb["chunks"], 1):
+            kb_score = kb_chunk.get('score', 0)
+            kb_context += f"\n{idx}. {kb_chunk.get('title', 'Unknown')}\n"
+            kb_context += f"   Similarity Score: {kb_score:.3f}\n"
+            kb_context += f"   Reference Text: {kb_chunk.get('text', '')}\n"
+    else:
+        kb_context = "\n\n⚠️ NO KNOWLEDGE BASE REFERENCE FOUND: No authoritative reference available for comparison."
+    
+    return f"""{control_context}
+
+{policies_context}
+
+{kb_context}"""
+
+
+def _extract_json_text(response_text: str, array: bool = False) -> str:
+    """Extract the JSON payload from a model response (markdown code block or bare object/array)."""
+    import re
+    
+    json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
+    if json_match:
+        return json_match.group(1)
+    json_match = re.search(r'\[.*\]' if array else r'\{.*\}', response_text, re.DOTALL)
+    if json_match:
+        return json_match.group(0)
+    return response_text
+
+
+def _normalize_evaluation(analysis: Dict[str, Any], knowledge_base_chunks: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Validate model output and set defaults - AI returns EVALUATION DATA ONLY."""
+    coverage_level = str(analysis.get("coverage_level", "NONE")).upper()
+    if coverage_level not in ["FULL", "PARTIAL", "NONE"]:
+        coverage_level = "NONE"
+    
+    kb_alignment = str(analysis.get("kb_alignment", "MISMATCH")).upper()
+    if kb_alignment not in ["MATCH", "MISMATCH", "CONTRADICTS"]:
+        # Default based on KB availability
+        kb_alignment = "MISMATCH" if knowledge_base_chunks else "MISMATCH"
+    
+    # Return EVALUATION DATA ONLY (no compliance decision)
+    return {
+        "coverage_level": coverage_level,
+        "missing_requirements": analysis.get("missing_requirements", []),
+        "covered_requirements": analysis.get("covered_requirements", []),
+        "kb_alignment": kb_alignment,
+        "kb_reference": analysis.get("kb_reference", ""),
+        "explanation": analysis.get("explanation", "No explanation provided")
+    }
+
+
 def generate_gap_analysis(
     control_name: str,
     control_description: str,
@@ -248,36 +448,19 @@ def generate_gap_analysis(
         - missing_requirements: List[str]
         - covered_requirements: List[str]
         - coverage_level: str (FULL|PARTIAL|NONE)
+        - evaluation_failed: bool (only present on the error fallback)
     """
+    import json
+    
     try:
-        # Build context from similar policies
-        policies_context = ""
-        if similar_policies:
-            policies_context = "\n\nSimilar Policies Found:\n"
-            for idx, policy in enumerate(similar_policies[:5], 1):  # Limit to top 5
-                similarity_score = policy.get('score', 0)
-                policies_context += f"\n{idx}. {policy.get('title', 'Unknown')}\n"
-                policies_context += f"   Similarity Score: {similarity_score:.3f}\n"
-                policies_context += f"   Content: {policy.get('content', '')[:800]}...\n"
-        else:
-            policies_context = "\n\n⚠️ NO POLICIES FOUND: This means the control requirement is NOT covered by any existing policies in the system."
-        
-        # Build context from knowledge base (ground truth)
-        kb_context = ""
-        if knowledge_base_chunks:
-            kb_context = "\n\nKNOWLEDGE BASE (Authoritative Reference):\n"
-            for idx, kb_chunk in enumerate(knowledge_base_chunks[:3], 1):  # Limit to top 3
-                kb_score = kb_chunk.get('score', 0)
-                kb_context += f"\n{idx}. {kb_chunk.get('title', 'Unknown')}\n"
-                kb_context += f"   Similarity Score: {kb_score:.3f}\n"
-                kb_context += f"   Reference Text: {kb_chunk.get('text', '')[:1000]}...\n"
-        else:
-            kb_context = "\n\n⚠️ NO KNOWLEDGE BASE REFERENCE FOUND: No authoritative reference available for comparison."
-        
-        # Include control requirements if provided
-        requirements_context = ""
-        if control_requirements:
-            requirements_context = f"\n\nMANDATORY REQUIREMENTS TO CHECK:\n" + "\n".join([f"{idx + 1}. {req}" for idx, req in enumerate(control_requirements)])
+        control_context = _build_evaluation_context(
+            control_name,
+            control_description,
+            similar_policies,
+            framework_name=framework_name,
+            control_requirements=control_requirements,
+            knowledge_base_chunks=knowledge_base_chunks
+        )
         
         # STRICT AI PROMPT - AI is EVALUATOR ONLY, NOT DECISION MAKER
         prompt = f"""You are a compliance evaluator. Your role is to EVALUATE and ANALYZE, NOT to make compliance decisions.
@@ -287,49 +470,9 @@ Your task is to EVALUATE the coverage and alignment between:
 2. Existing policies
 3. Knowledge Base (authoritative reference)
 
-Control Requirement:
-- Name: {control_name}
-- Description: {control_description}
-- Framework: {framework_name or "Not specified"}
-
-{requirements_context}
-
-{policies_context}
-
-{kb_context}
+{control_context}
 
-EVALUATION RULES:
-
-1. Coverage Level Assessment:
-   - FULL: ALL requirements are EXPLICITLY and CLEARLY covered in policies
-   - PARTIAL: Some requirements covered, some missing or not explicit
-   - NONE: No requirements explicitly covered
-
-2. Knowledge Base Alignment:
-   - MATCH: Policy aligns with KB requirements (same mandatory level, same scope)
-   - MISMATCH: Policy differs from KB (e.g., KB says MUST, policy says SHOULD; or KB clause omitted)
-   - CONTRADICTS: Policy contradicts KB requirements
-
-3. KB Alignment Rules:
-   - If KB says MUST and policy says SHOULD → MISMATCH
-   - If KB clause is omitted from policy → MISMATCH
-   - If policy contradicts KB requirement → CONTRADICTS
-   - FULL coverage is possible ONLY if KB alignment is MATCH
-
-4. Evaluation Criteria:
-   - Do NOT infer intent or general security statements
-   - Generic language like "we follow security best practices" does NOT count as coverage
-   - Must find EXPLICIT mention: specific procedures, clear processes, concrete steps
-
-5. Which REQUIRED clauses are EXPLICITLY covered?
-   - List ONLY clauses that are clearly and specifically addressed
-   - Must be explicit, not inferred
-
-6. Which REQUIRED clauses are MISSING or NOT EXPLICITLY covered?
-   - Identify EVERY clause that is NOT explicitly covered
-   - Be specific about what's missing
-
-IMPORTANT: You are an EVALUATOR. Do NOT make compliance decisions. Only provide evaluation data.
+{EVALUATION_RULES}
 
 Analyze and provide JSON format:
 {{
@@ -344,12 +487,12 @@ Analyze and provide JSON format:
 Respond ONLY with valid JSON, no additional text:"""
 
         # Call OpenAI GPT with evaluator persona (NOT decision maker)
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = chat_completion(
+            model=GAP_ANALYSIS_MODEL,
             messages=[
                 {
                     "role": "system",
-                    "content": "You are a compliance evaluator. Your role is to EVALUATE coverage and alignment, NOT to make compliance decisions. Provide accurate evaluation data: coverage_level, missing_requirements, kb_alignment, and explanation. Always respond with valid JSON only, no additional text."
+                    "content": EVALUATOR_SYSTEM_PROMPT
                 },
                 {
                     "role": "user",
@@ -357,47 +500,15 @@ Respond ONLY with valid JSON, no additional text:"""
                 }
             ],
             temperature=0.1,  # Very low temperature for consistent results
-            max_tokens=1500
+            max_tokens=1500,
+            cache_namespace="gap_evaluation"
         )
         
         # Parse response
         response_text = response.choices[0].message.content.strip()
+        analysis = json.loads(_extract_json_text(response_text))
         
-        # Try to extract JSON from response
-        import json
-        import re
-        
-        # Extract JSON from markdown code blocks if present
-        json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
-        if json_match:
-            response_text = json_match.group(1)
-        else:
-            # Try to find JSON object
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                response_text = json_match.group(0)
-        
-        analysis = json.loads(response_text)
-        
-        # Validate and set defaults - AI returns EVALUATION DATA ONLY
-        coverage_level = analysis.get("coverage_level", "NONE").upper()
-        if coverage_level not in ["FULL", "PARTIAL", "NONE"]:
-            coverage_level = "NONE"
-        
-        kb_alignment = analysis.get("kb_alignment", "MISMATCH").upper()
-        if kb_alignment not in ["MATCH", "MISMATCH", "CONTRADICTS"]:
-            # Default based on KB availability
-            kb_alignment = "MISMATCH" if knowledge_base_chunks else "MISMATCH"
-        
-        # Return EVALUATION DATA ONLY (no compliance decision)
-        return {
-            "coverage_level": coverage_level,
-            "missing_requirements": analysis.get("missing_requirements", []),
-            "covered_requirements": analysis.get("covered_requirements", []),
-            "kb_alignment": kb_alignment,
-            "kb_reference": analysis.get("kb_reference", ""),
-            "explanation": analysis.get("explanation", "No explanation provided")
-        }
+        return _normalize_evaluation(analysis, knowledge_base_chunks)
         
     except json.JSONDecodeError as e:
         # Fallback: Return default evaluation data
@@ -408,7 +519,8 @@ Respond ONLY with valid JSON, no additional text:"""
             "covered_requirements": [],
             "kb_alignment": "MISMATCH",
             "kb_reference": "",
-            "explanation": f"Unable to parse AI response. Control: {control_name}. JSON parsing error: {str(e)}"
+            "explanation": f"Unable to parse AI response. Control: {control_name}. JSON parsing error: {str(e)}",
+            "evaluation_failed": True
         }
     except Exception as e:
         # Fallback: Return default evaluation data
@@ -419,5 +531,293 @@ Respond ONLY with valid JSON, no additional text:"""
             "covered_requirements": [],
             "kb_alignment": "MISMATCH",
             "kb_reference": "",
-            "explanation": f"Error analyzing control: {str(e)}"
+            "explanation": f"Error analyzing control: {str(e)}",
+            "evaluation_failed": True
+        }
+
+
+def classify_gap_coverage(
+    control_name: str,
+    control_description: str,
+    similar_policies: List[Dict[str, Any]],
+    framework_name: Optional[str] = None,
+    knowledge_base_chunks: Optional[List[Dict[str, Any]]] = None,
+    model: Optional[str] = None,
+    token_budget: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Cheap first-pass evaluation: a short-output classification of coverage and KB alignment
+    with a self-reported confidence. Used by the evaluation cascade to settle clear cases
+    without the full structured evaluation.
+    
+    Args:
+        control_name: Name of the control
+        control_description: Description of the control
+        similar_policies: Retrieved policy chunks
+        framework_name: Name of the framework (optional)
+        knowledge_base_chunks: Retrieved KB chunks (optional)
+        model: Chat model (default: GAP_CASCADE_CLASSIFY_MODEL)
+        token_budget: Prompt token budget (default: GAP_CASCADE_CLASSIFY_TOKEN_BUDGET)
+    
+    Returns:
+        Dictionary containing coverage_level, kb_alignment, confidence (0-1), explanation and
+        missing_requirements (short phrases, so a settled GAP still lists what is missing),
+        plus evaluation_failed on errors
+    """
+    import json
+    
+    model = model or settings.GAP_CASCADE_CLASSIFY_MODEL
+    control_context = _build_evaluation_context(
+        control_name,
+        control_description,
+        similar_policies,
+        framework_name=framework_name,
+        knowledge_base_chunks=knowledge_base_chunks,
+        token_budget=token_budget or settings.GAP_CASCADE_CLASSIFY_TOKEN_BUDGET
+    )
+    
+    prompt = f"""Classify how well the policies below cover the control, and whether they align with the Knowledge Base (authoritative reference).
+
+{control_context}
+
+- coverage: FULL only if every requirement of the control is EXPLICITLY covered; PARTIAL if some are; NONE if none are. Generic statements do not count.
+- kb: MATCH, MISMATCH (weaker wording, e.g. SHOULD vs MUST, or omitted clauses) or CONTRADICTS
+- confidence: 0.0-1.0, how certain you are of both labels
+- reason: one short sentence
+- missing: the control's requirements the policies do not explicitly cover, as short phrases (at most {CLASSIFY_MAX_MISSING_REQUIREMENTS}; empty for FULL)
+
+Respond ONLY with JSON: {{"coverage": "FULL|PARTIAL|NONE", "kb": "MATCH|MISMATCH|CONTRADICTS", "confidence": 0.0, "reason": "...", "missing": ["..."]}}"""
+    
+    try:
+        response = chat_completion(
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a compliance evaluator. Classify coverage precisely and conservatively. Respond with valid JSON only."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=0,
+            max_tokens=CLASSIFY_MAX_OUTPUT_TOKENS,
+            cache_namespace="coverage_classification"
+        )
+        
+        result = json.loads(_extract_json_text(response.choices[0].message.content.strip()))
+        coverage_level = str(result.get("coverage", "NONE")).upper()
+        kb_alignment = str(result.get("kb", "MISMATCH")).upper()
+        try:
+            confidence = max(0.0, min(1.0, float(result.get("confidence", 0))))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        missing = result.get("missing") if isinstance(result.get("missing"), list) else []
+        missing_requirements = [str(item).strip() for item in missing if str(item).strip()][:CLASSIFY_MAX_MISSING_REQUIREMENTS]
+        
+        return {
+            "coverage_level": coverage_level if coverage_level in ["FULL", "PARTIAL", "NONE"] else "NONE",
+            "kb_alignment": kb_alignment if kb_alignment in ["MATCH", "MISMATCH", "CONTRADICTS"] else "MISMATCH",
+            "confidence": confidence if coverage_level in ["FULL", "PARTIAL", "NONE"] else 0.0,
+            "explanation": str(result.get("reason", "")),
+            "missing_requirements": missing_requirements
+        }
+    except Exception as e:
+        print(f"[AI Service] ⚠️ Coverage classification failed: {str(e)}")
+        return {
+            "coverage_level": "NONE",
+            "kb_alignment": "MISMATCH",
+            "confidence": 0.0,
+            "explanation": f"Classification failed: {str(e)}",
+            "missing_requirements": [],
+            "evaluation_failed": True
         }
+
+
+def pack_evaluation_batches(
+    contexts: List[str],
+    token_budget: int,
+    max_batch_size: int
+) -> List[List[int]]:
+    """
+    Group per-control prompt contexts into batches that fit a prompt token budget.
+    
+    Args:
+        contexts: Per-control evaluation contexts (see _build_evaluation_context)
+        token_budget: Maximum estimated prompt tokens per request (shared rules included)
+        max_batch_size: Maximum number of controls per request
+    
+    Returns:
+        List of batches, each a list of indexes into contexts (input order preserved)
+    """
+    fixed_tokens = estimate_tokens(EVALUATOR_SYSTEM_PROMPT) + estimate_tokens(EVALUATION_RULES) + PROMPT_FRAME_TOKENS
+    batches = []
+    current = []
+    current_tokens = fixed_tokens
+    
+    for idx, context in enumerate(contexts):
+        context_tokens = estimate_tokens(context) + 20
+        if current and (current_tokens + context_tokens > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+            current_tokens = fixed_tokens
+        current.append(idx)
+        current_tokens += context_tokens
+    
+    if current:
+        batches.append(current)
+    return batches
+
+
+def generate_gap_analysis_batch(
+    items: List[Dict[str, Any]],
+    framework_name: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    max_batch_size: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate several controls per chat completion.
+    
+    The system prompt and evaluation rules are sent once per request, followed by
+    each control's own context. Controls are packed under a prompt token budget.
+    Any control missing from (or unparseable in) the batched answer falls back to
+    a single generate_gap_analysis() call.
+    
+    Args:
+        items: One dict per control with the generate_gap_analysis() keyword arguments
+            (control_name, control_description, similar_policies, control_requirements,
+            knowledge_base_chunks and optionally framework_name)
+        framework_name: Default framework name for items that don't set one
+        token_budget: Prompt token budget per request (default: GAP_EVAL_BATCH_TOKEN_BUDGET)
+        max_batch_size: Controls per request (default: GAP_EVAL_BATCH_SIZE)
+    
+    Returns:
+        Evaluations in the same order as items (same shape as generate_gap_analysis())
+    """
+    token_budget = token_budget or settings.GAP_EVAL_BATCH_TOKEN_BUDGET
+    max_batch_size = max_batch_size or settings.GAP_EVAL_BATCH_SIZE
+    
+    contexts = [
+        _build_evaluation_context(
+            item["control_name"],
+            item.get("control_description", ""),
+            item.get("similar_policies", []),
+            framework_name=item.get("framework_name") or framework_name,
+            control_requirements=item.get("control_requirements"),
+            knowledge_base_chunks=item.get("knowledge_base_chunks")
+        )
+        for item in items
+    ]
+    
+    def evaluate_single(idx: int) -> Dict[str, Any]:
+        item = items[idx]
+        return generate_gap_analysis(
+            control_name=item["control_name"],
+            control_description=item.get("control_description", ""),
+            similar_policies=item.get("similar_policies", []),
+            framework_name=item.get("framework_name") or framework_name,
+            control_requirements=item.get("control_requirements"),
+            knowledge_base_chunks=item.get("knowledge_base_chunks")
+        )
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    batches = pack_evaluation_batches(contexts, token_budget, max_batch_size)
+    print(f"[AI Service] Batched evaluation: {len(items)} controls in {len(batches)} request(s)")
+    
+    for batch in batches:
+        if len(batch) == 1:
+            results[batch[0]] = evaluate_single(batch[0])
+            continue
+        
+        evaluations = _evaluate_packed(batch, contexts, items)
+        for idx in batch:
+            if idx in evaluations:
+                results[idx] = evaluations[idx]
+            else:
+                print(f"[AI Service] ⚠️ No batched result for {items[idx]['control_name']} - falling back to single call")
+                results[idx] = evaluate_single(idx)
+    
+    return results
+
+
+def _evaluate_packed(batch: List[int], contexts: List[str], items: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """
+    Run one chat completion for a packed batch.
+    
+    Returns:
+        Mapping of item index -> evaluation for every control answered correctly
+        (empty on request or parse failure)
+    """
+    import json
+    
+    refs = {f"C{position + 1}": idx for position, idx in enumerate(batch)}
+    sections = "\n\n".join(
+        f"### CONTROL {ref}\n{contexts[idx]}" for ref, idx in refs.items()
+    )
+    
+    prompt = f"""You are a compliance evaluator. Your role is to EVALUATE and ANALYZE, NOT to make compliance decisions.
+
+Evaluate EACH of the {len(batch)} controls below INDEPENDENTLY. For each control, EVALUATE the coverage and alignment between:
+1. Its control requirements
+2. The policies listed under that control
+3. The Knowledge Base (authoritative reference) listed under that control
+
+Never use policies or knowledge base text listed under one control to evaluate another control.
+
+{EVALUATION_RULES}
+
+{sections}
+
+Provide a JSON array with exactly one object per control, in the same order:
+[
+    {{
+        "control_ref": "C1",
+        "coverage_level": "FULL|PARTIAL|NONE",
+        "missing_requirements": ["requirement1", "requirement2"],
+        "covered_requirements": ["requirement1"],
+        "kb_alignment": "MATCH|MISMATCH|CONTRADICTS",
+        "kb_reference": "Relevant KB text that was compared",
+        "explanation": "Detailed explanation of coverage and KB alignment"
+    }}
+]
+
+Respond ONLY with the valid JSON array, no additional text:"""
+    
+    try:
+        response = chat_completion(
+            model=GAP_ANALYSIS_MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": EVALUATOR_SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=0.1,
+            max_tokens=min(BATCH_MAX_OUTPUT_TOKENS, BATCH_OUTPUT_TOKENS_PER_CONTROL * len(batch)),
+            cache_namespace="gap_evaluation_batch"
+        )
+        
+        response_text = response.choices[0].message.content.strip()
+        parsed = json.loads(_extract_json_text(response_text, array=True))
+        if not isinstance(parsed, list):
+            raise ValueError("Batched response is not a JSON array")
+    except Exception as e:
+        print(f"[AI Service] ⚠️ Batched evaluation failed ({len(batch)} controls): {str(e)}")
+        return {}
+    
+    evaluations = {}
+    for position, entry in enumerate(parsed):
+        if not isinstance(entry, dict):
+            continue
+        ref = str(entry.get("control_ref") or f"C{position + 1}").strip().upper()
+        idx = refs.get(ref)
+        if idx is None or idx in evaluations:
+            continue
+        evaluations[idx] = _normalize_evaluation(entry, items[idx].get("knowledge_base_chunks"))
+    return evaluations
+
@@ -0,0 +1,252 @@
+"""
+Analysis Ledger
+Records gap analysis runs (AnalysisRun) and their per-control results (ControlResult)
+so a past run can be listed and paged through instead of re-running the analysis.
+
+A run costs four extra statements: the run row when it starts, one multi-row
+insert of its control results, and one count plus one update of its totals when
+it finishes.
+Ledger writes never fail the analysis they record.
+"""
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+from sqlalchemy import insert, func, case
+from sqlalchemy.orm import Session
+from app.models import AnalysisRun, ControlResult, Control
+
+# Result keys kept in ControlResult.details (everything else has its own column)
+DETAIL_KEYS = (
+    "coverage_level", "kb_alignment", "control_requirements", "covered_requirements",
+    "evaluation_tier", "equivalence", "input_fingerprint", "cached", "similar_policies_found",
+    "approved_policies_found", "kb_chunks_found"
+)
+
+MAX_PAGE_SIZE = 500
+
+# Monotonic start times of open runs, for duration_ms
+_run_started: Dict[int, float] = {}
+
+
+def start_analysis_run(
+    db: Session,
+    company_id: int,
+    user_id: Optional[int],
+    framework_id: Optional[int] = None,
+    source: str = "api",
+    force: bool = False
+) -> Optional[int]:
+    """
+    Open a run in the ledger.
+
+    Args:
+        db: Database session
+        company_id: ID of the company
+        user_id: ID of the user running the analysis
+        framework_id: Framework analyzed (None when the run covers all selected frameworks)
+        source: What triggered the run (api / onboarding / framework)
+        force: Whether stored evaluations were bypassed
+
+    Returns:
+        The run ID, or None if it could not be recorded
+    """
+    try:
+        run = AnalysisRun(
+            company_id=company_id,
+            framework_id=framework_id,
+            triggered_by_id=user_id,
+            source=source,
+            force=force,
+            status="RUNNING"
+        )
+        db.add(run)
+        db.flush()
+        run_id = run.id  # read before commit expires the row
+        db.commit()
+        _run_started[run_id] = time.perf_counter()
+        return run_id
+    except Exception as e:
+        db.rollback()
+        print(f"[Analysis Ledger] ⚠️ Could not record analysis run: {str(e)}")
+        return None
+
+
+def _result_row(run_id: int, result: Dict[str, Any]) -> Dict[str, Any]:
+    risk_score = result.get("risk_score")
+    return {
+        "run_id": run_id,
+        "control_id": result["control_id"],
+        "framework_id": result.get("framework_id"),
+        "gap_id": result.get("gap_id"),
+        "status": result.get("status") or "ERROR",
+        "severity": result.get("severity"),
+        "risk_score": int(risk_score) if risk_score is not None else None,
+        "gap_created": bool(result.get("gap_created")),
+        "max_similarity": result.get("max_similarity_score"),
+        "similarity_scores": [round(score, 4) for score in result.get("similarity_scores") or []],
+        "matched_policy_titles": list(result.get("matched_policy_titles") or []),
+        "missing_requirements": list(result.get("missing_requirements") or []),
+        "reason": result.get("reason"),
+        "decision_reason": result.get("decision_reason"),
+        "details": {key: result[key] for key in DETAIL_KEYS if result.get(key) is not None}
+    }
+
+
+def record_control_results(db: Session, run_id: Optional[int], results: List[Dict[str, Any]]) -> None:
+    """
+    Append control results to a run with one multi-row insert.
+
+    Args:
+        db: Database session
+        run_id: Run from start_analysis_run() (None records nothing)
+        results: Results of run_gap_analysis_for_control(s)
+    """
+    rows = [_result_row(run_id, result) for result in results if result.get("control_id") is not None]
+    if run_id is None or not rows:
+        return
+    try:
+        db.execute(insert(ControlResult), rows)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[Analysis Ledger] ⚠️ Could not record {len(rows)} result(s) for run {run_id}: {str(e)}")
+
+
+def finish_analysis_run(db: Session, run_id: Optional[int], status: str = "COMPLETED") -> None:
+    """
+    Close a run and store its totals (counted from its recorded results).
+    Call it with status FAILED when the analysis raised, so the run does not stay RUNNING.
+
+    Args:
+        db: Database session
+        run_id: Run from start_analysis_run() (None does nothing)
+        status: COMPLETED or FAILED
+    """
+    if run_id is None:
+        return
+    if status == "FAILED":
+        # The failure may have left the transaction aborted; the run row was already committed
+        db.rollback()
+    try:
+        total, gaps, compliant, errors = db.query(
+            func.count(ControlResult.id),
+            func.count(case((ControlResult.status == "GAP", 1))),
+            func.count(case((ControlResult.status == "COMPLIANT", 1))),
+            func.count(case((ControlResult.status == "ERROR", 1)))
+        ).filter(ControlResult.run_id == run_id).one()
+        started = _run_started.pop(run_id, None)
+        db.query(AnalysisRun).filter(AnalysisRun.id == run_id).update({
+            AnalysisRun.status: status,
+            AnalysisRun.total_controls: total,
+            AnalysisRun.gaps_identified: gaps,
+            AnalysisRun.compliant_controls: compliant,
+            AnalysisRun.error_controls: errors,
+            AnalysisRun.completed_at: datetime.now(timezone.utc),
+            AnalysisRun.duration_ms: int((time.perf_counter() - started) * 1000) if started is not None else None
+        }, synchronize_session=False)
+        db.commit()
+        print(f"[Analysis Ledger] ✓ Run {run_id} {status.lower()}: {total} control(s), {gaps} gap(s), {errors} error(s)")
+    except Exception as e:
+        db.rollback()
+        print(f"[Analysis Ledger] ⚠️ Could not finish run {run_id}: {str(e)}")
+
+
+def _run_summary(run: AnalysisRun) -> Dict[str, Any]:
+    return {
+        "analysis_id": run.id,
+        "framework_id": run.framework_id,
+        "source": run.source,
+        "force": run.force,
+        "status": run.status,
+        "total_controls": run.total_controls,
+        "gaps_identified": run.gaps_identified,
+        "compliant_controls": run.compliant_controls,
+        "error_controls": run.error_controls,
+        "started_at": run.started_at,
+        "completed_at": run.completed_at,
+        "duration_ms": run.duration_ms
+    }
+
+
+def list_analysis_runs(db: Session, company_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+    """The company's most recent runs, newest first."""
+    runs = (
+        db.query(AnalysisRun)
+        .filter(AnalysisRun.company_id == company_id)
+        .order_by(AnalysisRun.started_at.desc(), AnalysisRun.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [_run_summary(run) for run in runs]
+
+
+def get_analysis_run_results(
+    db: Session,
+    company_id: int,
+    run_id: int,
+    after: Optional[int] = None,
+    limit: int = 100,
+    status: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    One page of a past run's control results, in the order they were recorded.
+
+    Pages are keyed on the result ID (ix_control_results_run_id_id), so every page
+    is an index range scan however deep the client pages.
+
+    Args:
+        db: Database session
+        company_id: ID of the company (runs of other companies are not visible)
+        run_id: ID of the run
+        after: next_cursor of the previous page (None for the first page)
+        limit: Page size (capped at MAX_PAGE_SIZE)
+        status: Only results with this status (GAP / COMPLIANT / ERROR)
+
+    Returns:
+        Run summary with "results" and "next_cursor" (None on the last page),
+        or None if the run does not exist for this company
+    """
+    run = db.query(AnalysisRun).filter(AnalysisRun.id == run_id, AnalysisRun.company_id == company_id).first()
+    if not run:
+        return None
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = (
+        db.query(ControlResult, Control.code, Control.name)
+        .outerjoin(Control, Control.id == ControlResult.control_id)
+        .filter(ControlResult.run_id == run_id)
+    )
+    if status:
+        query = query.filter(ControlResult.status == status.upper())
+    if after is not None:
+        query = query.filter(ControlResult.id > after)
+    rows = query.order_by(ControlResult.id).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    results = []
+    for row, control_code, control_name in rows:
+        results.append({
+            "control_id": row.control_id,
+            "control_code": control_code,
+            "control_name": control_name,
+            "framework_id": row.framework_id,
+            "status": row.status,
+            "severity": row.severity,
+            "risk_score": row.risk_score,
+            "gap_id": row.gap_id,
+            "gap_created": row.gap_created,
+            "max_similarity_score": row.max_similarity,
+            "similarity_scores": row.similarity_scores or [],
+            "matched_policy_titles": row.matched_policy_titles or [],
+            "missing_requirements": row.missing_requirements or [],
+            "reason": row.reason,
+            "decision_reason": row.decision_reason,
+            **(row.details or {})
+        })
+
+    return {
+        **_run_summary(run),
+        "results": results,
+        "next_cursor": rows[-1][0].id if has_more else None
+    }
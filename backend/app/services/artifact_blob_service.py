@@ -0,0 +1,216 @@
+"""
+Artifact Blob Service
+Content-addressed storage for artifact files.
+
+Each unique file (by SHA-256) is stored once under uploads/artifacts/{sha256}{ext}
+and tracked by an ArtifactBlob row. Artifact rows reference blobs and the blob's
+ref_count tracks how many active artifacts point at it, so attaching the same
+evidence to another gap is a metadata insert. Blobs whose ref_count has been zero
+for longer than the grace period are removed by collect_orphan_blobs().
+"""
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional, Dict, Any
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import Artifact, ArtifactBlob, User
+from app.utils.upload_pipeline import StoredUpload
+from app.core.config import settings
+
+# Blob paths are stored relative to the app directory (e.g. uploads/artifacts/{sha256}.pdf)
+BASE_DIR = Path(__file__).resolve().parent.parent
+STORAGE_DIR = BASE_DIR / "uploads" / "artifacts"
+
+# Only files the blob store itself writes are ever collected as strays;
+# legacy {user_id}_{filename} uploads are left alone.
+MANAGED_FILE_PATTERN = re.compile(r"^(?:[0-9a-f]{64}(?:\.[A-Za-z0-9]+)?|\.upload-.*\.part)$")
+
+
+def blob_file_path(blob: ArtifactBlob) -> Path:
+    """Absolute path of the file backing a blob."""
+    return BASE_DIR / blob.storage_path
+
+
+def find_blob(db: Session, sha256: str, company_id: int, lock: bool = False) -> Optional[ArtifactBlob]:
+    """
+    Look up a blob by content hash among the files a company has already uploaded.
+    Blobs only referenced by other companies' artifacts are not returned, so a
+    known hash never grants access to (or reveals) another tenant's file.
+
+    Args:
+        db: Database session
+        sha256: Hex SHA-256 of the content
+        company_id: Company whose artifacts must reference the blob
+        lock: Lock the row (SELECT ... FOR UPDATE) so the GC cannot remove it mid-request
+
+    Returns:
+        The blob if the company references it and its file is present on disk, otherwise None
+    """
+    owned = (
+        select(Artifact.id)
+        .join(User, User.id == Artifact.uploaded_by_id)
+        .where(Artifact.blob_id == ArtifactBlob.id, User.company_id == company_id)
+        .exists()
+    )
+    query = db.query(ArtifactBlob).filter(ArtifactBlob.sha256 == sha256.lower(), owned)
+    if lock:
+        query = query.with_for_update(of=ArtifactBlob)
+    blob = query.first()
+    if blob and not blob_file_path(blob).exists():
+        print(f"[Artifact Blobs] ⚠️ Blob {blob.id} ({sha256[:12]}) has no file on disk")
+        return None
+    return blob
+
+
+def register_blob(db: Session, stored: StoredUpload) -> ArtifactBlob:
+    """
+    Return the blob for a freshly streamed upload, creating the row if needed.
+    The returned row is locked for the rest of the transaction.
+
+    Args:
+        db: Database session
+        stored: Result of stream_upload_to_disk() into STORAGE_DIR
+
+    Returns:
+        ArtifactBlob for the upload's content
+    """
+    blob = db.query(ArtifactBlob).filter(ArtifactBlob.sha256 == stored.sha256).with_for_update().first()
+    if blob:
+        return blob
+
+    blob = ArtifactBlob(
+        sha256=stored.sha256,
+        size=stored.size,
+        mime_type=stored.mime_type,
+        storage_path=f"uploads/artifacts/{stored.path.name}",
+        ref_count=0
+    )
+    try:
+        # Savepoint so a concurrent insert of the same hash doesn't abort the request
+        with db.begin_nested():
+            db.add(blob)
+        print(f"[Artifact Blobs] ✓ New blob {blob.id} for {stored.sha256[:12]} ({stored.size} bytes)")
+        return blob
+    except IntegrityError:
+        return db.query(ArtifactBlob).filter(ArtifactBlob.sha256 == stored.sha256).with_for_update().one()
+
+
+def acquire_blob(db: Session, blob: ArtifactBlob) -> None:
+    """Increment a blob's reference count (atomic UPDATE, committed with the caller's transaction)."""
+    db.query(ArtifactBlob).filter(ArtifactBlob.id == blob.id).update(
+        {ArtifactBlob.ref_count: ArtifactBlob.ref_count + 1},
+        synchronize_session=False
+    )
+
+
+def release_blob(db: Session, blob_id: Optional[int]) -> None:
+    """Decrement a blob's reference count. The file itself is removed later by the GC."""
+    if not blob_id:
+        return
+    db.query(ArtifactBlob).filter(
+        ArtifactBlob.id == blob_id,
+        ArtifactBlob.ref_count > 0
+    ).update(
+        {ArtifactBlob.ref_count: ArtifactBlob.ref_count - 1},
+        synchronize_session=False
+    )
+
+
+def collect_orphan_blobs(db: Session, grace_hours: Optional[int] = None, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Garbage-collect artifact blobs that no active artifact references.
+
+    1. Reconciles ref_count with the actual number of active artifacts per blob
+       (rows removed through ORM cascades never call release_blob()).
+    2. Deletes blobs whose ref_count is zero and unchanged for grace_hours, then their files.
+    3. Deletes content-addressed and temp files in the artifact directory that no
+       row points at (e.g. abandoned uploads), once older than grace_hours.
+
+    Args:
+        db: Database session
+        grace_hours: Minimum age before anything is removed (default: ARTIFACT_BLOB_GC_GRACE_HOURS)
+        dry_run: Only report what would be removed
+
+    Returns:
+        Dictionary with reconciliation and removal counts
+    """
+    if grace_hours is None:
+        grace_hours = settings.ARTIFACT_BLOB_GC_GRACE_HOURS
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+    cutoff_ts = time.time() - grace_hours * 3600
+
+    active_refs = select(func.count(Artifact.id)).where(
+        Artifact.blob_id == ArtifactBlob.id,
+        Artifact.is_active == True
+    ).scalar_subquery()
+
+    # Step 1: fix drifted reference counts (only touches rows that differ)
+    reconciled = 0
+    if not dry_run:
+        reconciled = db.query(ArtifactBlob).filter(ArtifactBlob.ref_count != active_refs).update(
+            {ArtifactBlob.ref_count: active_refs},
+            synchronize_session=False
+        )
+        db.commit()
+
+    # Step 2: remove unreferenced blobs (skip rows an upload currently holds locked)
+    candidates = db.query(ArtifactBlob).filter(
+        ArtifactBlob.ref_count == 0,
+        ArtifactBlob.updated_at < cutoff,
+        active_refs == 0
+    ).with_for_update(skip_locked=True).all()
+
+    removed_paths = [blob_file_path(blob) for blob in candidates]
+    freed_bytes = sum(blob.size or 0 for blob in candidates)
+    if candidates and not dry_run:
+        blob_ids = [blob.id for blob in candidates]
+        db.query(Artifact).filter(Artifact.blob_id.in_(blob_ids)).update(
+            {Artifact.blob_id: None},
+            synchronize_session=False
+        )
+        db.query(ArtifactBlob).filter(ArtifactBlob.id.in_(blob_ids)).delete(synchronize_session=False)
+    db.commit()
+
+    # Files are unlinked only after the rows are gone. A file touched by an upload
+    # within the grace period is kept - that upload is about to register it again.
+    files_removed = 0
+    if not dry_run:
+        for path in removed_paths:
+            try:
+                if path.stat().st_mtime < cutoff_ts:
+                    path.unlink()
+                    files_removed += 1
+            except FileNotFoundError:
+                continue
+
+    # Step 3: stray files no row points at
+    referenced = {Path(p).name for (p,) in db.query(ArtifactBlob.storage_path).all()}
+    referenced.update(Path(p).name for (p,) in db.query(Artifact.file_path).filter(Artifact.file_path.isnot(None)).all())
+
+    stray_removed = 0
+    if STORAGE_DIR.exists():
+        for path in STORAGE_DIR.iterdir():
+            if not path.is_file() or path.name in referenced or not MANAGED_FILE_PATTERN.match(path.name):
+                continue
+            try:
+                if path.stat().st_mtime >= cutoff_ts:
+                    continue
+                if not dry_run:
+                    path.unlink()
+                stray_removed += 1
+            except FileNotFoundError:
+                continue
+
+    result = {
+        "reconciled": reconciled,
+        "blobs_removed": len(candidates),
+        "files_removed": files_removed,
+        "stray_files_removed": stray_removed,
+        "bytes_freed": freed_bytes,
+        "dry_run": dry_run
+    }
+    print(f"[Artifact Blobs] GC complete: {result}")
+    return result
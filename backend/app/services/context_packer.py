@@ -0,0 +1,197 @@
+"""
+Context Packer
+Token-budgeted packing of retrieved evidence (policy chunks, KB chunks) into LLM prompts.
+
+- Tokens are counted locally (tiktoken when installed, otherwise a ~4 chars/token estimate)
+- Chunks of the same document share 150-char overlaps (see chunk_text()); the overlapping
+  text is trimmed so it is only sent once, and exact duplicates are dropped
+- The highest-scoring chunks are packed first until the budget is spent; the last chunk
+  that does not fit is truncated at a token boundary instead of being dropped
+- Budgets are configured per model (LLM_CONTEXT_TOKEN_BUDGETS), so prompts are never
+  oversized for the model they are sent to
+"""
+import threading
+from typing import List, Dict, Any, Optional
+from app.core.config import settings
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Chunks of the same document overlap by 150 chars; shorter matches are coincidental
+MIN_OVERLAP_CHARS = 40
+MAX_OVERLAP_CHARS = 400
+
+# Don't bother adding a truncated chunk smaller than this
+MIN_PARTIAL_CHUNK_TOKENS = 40
+
+_encodings: Dict[str, Any] = {}
+_encodings_lock = threading.Lock()
+
+
+def _get_encoding(model: str):
+    """tiktoken encoding for a model, or None if tiktoken is not available."""
+    with _encodings_lock:
+        if model in _encodings:
+            return _encodings[model]
+        try:
+            import tiktoken
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # Not installed, or the encoding files cannot be fetched - use the estimate
+            print(f"[Context Packer] ⚠️ tiktoken unavailable for {model}, estimating tokens: {str(e)}")
+            encoding = None
+        _encodings[model] = encoding
+        return encoding
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    """
+    Count the tokens of a text for a model.
+
+    Args:
+        text: Text to count
+        model: Model the text will be sent to
+
+    Returns:
+        Token count (exact with tiktoken, otherwise a slight over-estimate)
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = DEFAULT_MODEL) -> str:
+    """Cut a text to at most max_tokens tokens."""
+    if max_tokens <= 0 or not text:
+        return ""
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
+    return text[:max(0, (max_tokens - 1) * 4)]
+
+
+def get_context_budget(model: str = DEFAULT_MODEL) -> int:
+    """
+    Prompt token budget for a model.
+
+    LLM_CONTEXT_TOKEN_BUDGETS is a comma-separated list of model=tokens pairs
+    (e.g. "gpt-4o-mini=6000,gpt-4o=12000"); other models use LLM_CONTEXT_TOKEN_BUDGET.
+    """
+    for entry in settings.LLM_CONTEXT_TOKEN_BUDGETS.split(","):
+        name, _, value = entry.partition("=")
+        if name.strip() == model and value.strip().isdigit():
+            return int(value.strip())
+    return settings.LLM_CONTEXT_TOKEN_BUDGET
+
+
+def _source_key(chunk: Dict[str, Any]) -> Optional[str]:
+    """Identify the document a chunk was cut from (chunks only overlap within one document)."""
+    for key in ("policy_id", "kb_doc_id", "control_id"):
+        if chunk.get(key) is not None:
+            return f"{key}:{chunk.get(key)}"
+    return None
+
+
+def _overlap_length(first: str, second: str) -> int:
+    """Length of the longest suffix of first that is a prefix of second (0 if under MIN_OVERLAP_CHARS)."""
+    longest = min(len(first), len(second), MAX_OVERLAP_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def _trim_overlap(text: str, selected_texts: List[str]) -> str:
+    """Remove the parts of text already present at the edges of selected chunks of the same document."""
+    for other in selected_texts:
+        if not text:
+            break
+        if text in other:
+            return ""
+        # other ... | overlap | ... text
+        head = _overlap_length(other, text)
+        if head:
+            text = text[head:]
+        # text ... | overlap | ... other
+        tail = _overlap_length(text, other)
+        if tail:
+            text = text[:-tail]
+    return text.strip()
+
+
+def pack_context(
+    chunks: List[Dict[str, Any]],
+    token_budget: int,
+    text_key: str = "content",
+    model: str = DEFAULT_MODEL,
+    max_chunk_tokens: Optional[int] = None,
+    per_chunk_overhead: int = 20
+) -> Dict[str, Any]:
+    """
+    Select the highest-scoring chunks that fit a token budget, without overlapping text.
+
+    Args:
+        chunks: Retrieved chunks (dicts with a score and the text under text_key)
+        token_budget: Maximum tokens for the packed evidence
+        text_key: Key of the chunk text ("content" for policies, "text" for KB chunks)
+        model: Model the prompt will be sent to (for token counting)
+        max_chunk_tokens: Optional cap per chunk so one long chunk can't take the whole budget
+        per_chunk_overhead: Tokens reserved per chunk for its title/score lines in the prompt
+
+    Returns:
+        Dictionary with:
+        - chunks: selected chunks in score order (copies, text_key holds the packed text)
+        - tokens: tokens used by the packed texts (overhead included)
+        - dropped: chunks left out (duplicates or no budget left)
+        - trimmed_chars: overlapping characters removed
+    """
+    ordered = sorted(chunks, key=lambda c: float(c.get("score") or 0), reverse=True)
+
+    packed = []
+    selected_by_source: Dict[Optional[str], List[str]] = {}
+    seen_texts = set()
+    used = 0
+    trimmed_chars = 0
+
+    for chunk in ordered:
+        remaining = token_budget - used - per_chunk_overhead
+        if remaining < MIN_PARTIAL_CHUNK_TOKENS:
+            break
+
+        original = (chunk.get(text_key) or "").strip()
+        if not original or original in seen_texts:
+            continue
+
+        source = _source_key(chunk)
+        text = _trim_overlap(original, selected_by_source.get(source, [])) if source else original
+        trimmed_chars += len(original) - len(text)
+        if not text:
+            continue
+
+        limit = min(remaining, max_chunk_tokens) if max_chunk_tokens else remaining
+        tokens = count_tokens(text, model)
+        if tokens > limit:
+            text = truncate_to_tokens(text, limit, model)
+            tokens = count_tokens(text, model)
+
+        seen_texts.add(original)
+        selected_by_source.setdefault(source, []).append(original)
+        packed_chunk = dict(chunk)
+        packed_chunk[text_key] = text
+        packed.append(packed_chunk)
+        used += tokens + per_chunk_overhead
+
+    return {
+        "chunks": packed,
+        "tokens": used,
+        "dropped": len(chunks) - len(packed),
+        "trimmed_chars": trimmed_chars
+    }
@@ -0,0 +1,364 @@
+"""
+Control Equivalence Service
+Cross-framework control equivalence index (control_equivalences): pairs of controls
+that ask for the same thing, so gap analysis can evaluate one control of an approved
+pair and project the verdict onto the other.
+
+- Curated mappings (e.g. ISO 27001 <-> NIST 800-53 crosswalks) are APPROVED pairs
+- Embedding candidates are computed in bulk between two frameworks: every active
+  control is embedded (one request per 100 controls) and compared with every control
+  of the other framework in memory; the best matches above
+  CONTROL_EQUIVALENCE_MIN_SIMILARITY are stored as CANDIDATE for review (APPROVED
+  from CONTROL_EQUIVALENCE_AUTO_ACCEPT on only when that threshold is configured).
+  Reviewed pairs keep their status on recompute
+- An evaluation is only reused across a direct APPROVED pair: equivalence is not
+  treated as transitive (A ~ B and B ~ C does not make A ~ C)
+"""
+import math
+import operator
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import insert, tuple_, or_
+from sqlalchemy.orm import Session
+from app.models import ControlEquivalence
+from app.services import framework_catalog
+from app.services.ai_service import get_embeddings
+from app.core.config import settings
+
+SOURCE_CURATED = "curated"
+SOURCE_EMBEDDING = "embedding"
+STATUSES = ("APPROVED", "CANDIDATE", "REJECTED")
+
+EMBED_BATCH_SIZE = 100
+
+
+def _pair(control_id: int, equivalent_control_id: int) -> Tuple[int, int]:
+    return (control_id, equivalent_control_id) if control_id < equivalent_control_id else (equivalent_control_id, control_id)
+
+
+def store_pairs(db: Session, pairs: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Add or refresh equivalence pairs with one lookup and one multi-row insert (the
+    caller commits). A curated pair approves an existing pair whatever its status;
+    an embedding pair only refreshes the similarity (and approves a CANDIDATE when it
+    reaches a configured auto-accept threshold), so reviewers' decisions are kept.
+
+    Args:
+        db: Database session
+        pairs: Dicts with control_id, equivalent_control_id, source, status and optionally similarity
+
+    Returns:
+        Dictionary with the number of pairs added and updated
+    """
+    wanted: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for pair in pairs:
+        key = _pair(pair["control_id"], pair["equivalent_control_id"])
+        if key[0] != key[1]:
+            wanted[key] = {**pair, "control_id": key[0], "equivalent_control_id": key[1]}
+    if not wanted:
+        return {"added": 0, "updated": 0}
+
+    existing = {
+        (row.control_id, row.equivalent_control_id): row
+        for row in db.query(ControlEquivalence).filter(
+            tuple_(ControlEquivalence.control_id, ControlEquivalence.equivalent_control_id).in_(list(wanted))
+        )
+    }
+
+    new_rows = []
+    updated = 0
+    for key, pair in wanted.items():
+        row = existing.get(key)
+        if row is None:
+            new_rows.append({
+                "control_id": pair["control_id"],
+                "equivalent_control_id": pair["equivalent_control_id"],
+                "source": pair["source"],
+                "similarity": pair.get("similarity"),
+                "status": pair["status"],
+                "reviewed_by_id": pair.get("reviewed_by_id")
+            })
+            continue
+        if pair["source"] == SOURCE_CURATED:
+            row.source = SOURCE_CURATED
+            row.status = "APPROVED"
+            row.reviewed_by_id = pair.get("reviewed_by_id") or row.reviewed_by_id
+        else:
+            row.similarity = pair.get("similarity")
+            if row.status == "CANDIDATE" and pair["status"] == "APPROVED":
+                row.status = "APPROVED"
+        updated += 1
+
+    if new_rows:
+        db.execute(insert(ControlEquivalence), new_rows)
+    return {"added": len(new_rows), "updated": updated}
+
+
+def _resolve_framework(db: Session, framework: Any) -> Optional[framework_catalog.FrameworkTree]:
+    """A framework tree by ID or (case-insensitive) name."""
+    if isinstance(framework, int) or str(framework).isdigit():
+        return framework_catalog.get_framework_tree(db, int(framework))
+    name = str(framework).strip().lower()
+    for candidate in framework_catalog.list_frameworks(db, active_only=False):
+        if candidate.name.lower() == name:
+            return framework_catalog.get_framework_tree(db, candidate.id)
+    return None
+
+
+def import_curated_mappings(db: Session, mappings: Iterable[Dict[str, Any]], user_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Store curated mappings given by framework (ID or name) and control code, e.g.
+    {"source_framework": "ISO 27001", "source_code": "A.5.15",
+     "target_framework": "NIST SP 800-53", "target_code": "AC-1"} (the caller commits).
+
+    Returns:
+        Dictionary with the pairs added and updated and the mappings that could not be resolved
+    """
+    trees: Dict[str, Optional[framework_catalog.FrameworkTree]] = {}
+    pairs = []
+    unresolved = []
+    for mapping in mappings:
+        ids = []
+        for side in ("source", "target"):
+            framework = str(mapping.get(f"{side}_framework") or "").strip()
+            if framework not in trees:
+                trees[framework] = _resolve_framework(db, framework) if framework else None
+            tree = trees[framework]
+            control = tree.controls_by_code.get(str(mapping.get(f"{side}_code") or "").strip()) if tree else None
+            ids.append(control.id if control else None)
+        if None in ids:
+            unresolved.append(mapping)
+            continue
+        pairs.append({
+            "control_id": ids[0],
+            "equivalent_control_id": ids[1],
+            "source": SOURCE_CURATED,
+            "status": "APPROVED",
+            "reviewed_by_id": user_id
+        })
+
+    result = store_pairs(db, pairs)
+    result["unresolved"] = unresolved
+    print(f"[Control Equivalence] ✓ Curated mappings: +{result['added']} added, {result['updated']} updated, {len(unresolved)} unresolved")
+    return result
+
+
+def _embed_controls(controls: List[Any]) -> List[List[float]]:
+    """Unit-length embeddings of control texts, one request per EMBED_BATCH_SIZE controls."""
+    vectors = []
+    for start in range(0, len(controls), EMBED_BATCH_SIZE):
+        batch = controls[start:start + EMBED_BATCH_SIZE]
+        for embedding in get_embeddings([f"{control.name}\n\n{control.description or ''}".strip() for control in batch]):
+            norm = math.sqrt(sum(value * value for value in embedding)) or 1.0
+            vectors.append([value / norm for value in embedding])
+    return vectors
+
+
+def compute_embedding_candidates(
+    db: Session,
+    framework_id: int,
+    other_framework_id: int,
+    min_similarity: Optional[float] = None,
+    auto_accept: Optional[float] = None,
+    top_k: int = 3
+) -> Dict[str, Any]:
+    """
+    Compare every active control of one framework with every active control of
+    another and store the best matches as equivalence pairs (the caller commits).
+
+    Args:
+        db: Database session
+        framework_id: First framework
+        other_framework_id: Framework to match against
+        min_similarity: Minimum cosine similarity of a candidate (default CONTROL_EQUIVALENCE_MIN_SIMILARITY)
+        auto_accept: Similarity from which a candidate is APPROVED without review
+            (default CONTROL_EQUIVALENCE_AUTO_ACCEPT; None keeps every candidate for review)
+        top_k: Matches kept per control, in each direction
+
+    Returns:
+        Dictionary with the controls compared, candidates found, pairs added/updated and auto-approved pairs
+
+    Raises:
+        ValueError: If a framework does not exist or both are the same
+    """
+    min_similarity = settings.CONTROL_EQUIVALENCE_MIN_SIMILARITY if min_similarity is None else min_similarity
+    auto_accept = settings.CONTROL_EQUIVALENCE_AUTO_ACCEPT if auto_accept is None else auto_accept
+    if framework_id == other_framework_id:
+        raise ValueError("Equivalence candidates are computed between two different frameworks")
+    trees = [framework_catalog.get_framework_tree(db, fw_id) for fw_id in (framework_id, other_framework_id)]
+    if not all(trees):
+        raise ValueError("Framework not found")
+
+    left, right = [[c for c in tree.active_controls() if c.name or c.description] for tree in trees]
+    if not left or not right:
+        return {"controls": len(left) + len(right), "candidates": 0, "added": 0, "updated": 0, "approved": 0}
+    print(f"[Control Equivalence] Embedding {len(left)} + {len(right)} controls ({trees[0].framework.name} / {trees[1].framework.name})")
+    left_vectors, right_vectors = _embed_controls(left), _embed_controls(right)
+
+    # Full similarity matrix, keeping each control's top_k matches in both directions
+    best_right: List[List[Tuple[float, int]]] = [[] for _ in right]
+    scores: Dict[Tuple[int, int], float] = {}
+    for i, vector in enumerate(left_vectors):
+        row = [(sum(map(operator.mul, vector, other)), j) for j, other in enumerate(right_vectors)]
+        for score, j in sorted(row, reverse=True)[:top_k]:
+            if score >= min_similarity:
+                scores[(i, j)] = score
+        for score, j in row:
+            if score >= min_similarity:
+                best_right[j].append((score, i))
+    for j, matches in enumerate(best_right):
+        for score, i in sorted(matches, reverse=True)[:top_k]:
+            scores[(i, j)] = score
+
+    pairs = [
+        {
+            "control_id": left[i].id,
+            "equivalent_control_id": right[j].id,
+            "source": SOURCE_EMBEDDING,
+            "similarity": round(score, 4),
+            "status": "APPROVED" if auto_accept is not None and score >= auto_accept else "CANDIDATE"
+        }
+        for (i, j), score in scores.items()
+    ]
+    result = store_pairs(db, pairs)
+    result.update({
+        "controls": len(left) + len(right),
+        "candidates": len(pairs),
+        "approved": sum(1 for pair in pairs if pair["status"] == "APPROVED")
+    })
+    approved = f"{result['approved']} auto-approved >= {auto_accept}" if auto_accept is not None else "none auto-approved"
+    print(
+        f"[Control Equivalence] ✓ {len(pairs)} candidate pair(s) >= {min_similarity} "
+        f"({approved}): +{result['added']} added, {result['updated']} updated"
+    )
+    return result
+
+
+def get_equivalent_controls(db: Session, control_ids: Iterable[int]) -> Dict[int, Dict[int, str]]:
+    """
+    Direct APPROVED equivalents among the given controls (one query). Only pairs
+    with both controls in the set count, and pairs are not chained: a control's
+    equivalents are exactly the controls it has an approved pair with.
+
+    Returns:
+        Control ID -> {equivalent control ID: pair source} for every control with
+        at least one approved equivalent in the set
+    """
+    control_ids = sorted(set(control_ids))
+    if len(control_ids) < 2 or not settings.CONTROL_EQUIVALENCE_ENABLED:
+        return {}
+    rows = db.query(
+        ControlEquivalence.control_id, ControlEquivalence.equivalent_control_id, ControlEquivalence.source
+    ).filter(
+        ControlEquivalence.status == "APPROVED",
+        ControlEquivalence.control_id.in_(control_ids),
+        ControlEquivalence.equivalent_control_id.in_(control_ids)
+    ).all()
+
+    equivalents: Dict[int, Dict[int, str]] = {}
+    for control_id, equivalent_control_id, source in rows:
+        equivalents.setdefault(control_id, {})[equivalent_control_id] = source
+        equivalents.setdefault(equivalent_control_id, {})[control_id] = source
+    return equivalents
+
+
+def list_equivalences(
+    db: Session,
+    framework_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Equivalence pairs (optionally of one framework and / or status), best similarity
+    first, with both controls' codes and frameworks.
+    """
+    query = db.query(ControlEquivalence)
+    if status:
+        query = query.filter(ControlEquivalence.status == status)
+    if framework_id is not None:
+        tree = framework_catalog.get_framework_tree(db, framework_id)
+        control_ids = list(tree.controls_by_id) if tree else []
+        query = query.filter(or_(
+            ControlEquivalence.control_id.in_(control_ids),
+            ControlEquivalence.equivalent_control_id.in_(control_ids)
+        ))
+    rows = query.order_by(
+        ControlEquivalence.similarity.desc().nullslast(), ControlEquivalence.id
+    ).offset(offset).limit(limit).all()
+    return _describe(db, rows)
+
+
+def get_equivalence(db: Session, equivalence_id: int) -> Optional[Dict[str, Any]]:
+    """One equivalence pair as listed by list_equivalences() (None if it does not exist)."""
+    rows = _describe(db, db.query(ControlEquivalence).filter(ControlEquivalence.id == equivalence_id).all())
+    return rows[0] if rows else None
+
+
+def _describe(db: Session, rows: List[ControlEquivalence]) -> List[Dict[str, Any]]:
+    controls = framework_catalog.get_controls(db, [row.control_id for row in rows] + [row.equivalent_control_id for row in rows])
+
+    def describe(control_id):
+        control = controls.get(control_id)
+        return {
+            "id": control_id,
+            "code": control.code if control else None,
+            "name": control.name if control else None,
+            "framework_id": control.framework_id if control else None
+        }
+
+    return [
+        {
+            "id": row.id,
+            "control": describe(row.control_id),
+            "equivalent_control": describe(row.equivalent_control_id),
+            "source": row.source,
+            "similarity": row.similarity,
+            "status": row.status,
+            "reviewed_by_id": row.reviewed_by_id,
+            "updated_at": row.updated_at
+        }
+        for row in rows
+    ]
+
+
+def add_curated_pair(db: Session, control_id: int, equivalent_control_id: int, user_id: Optional[int] = None) -> int:
+    """
+    Approve two controls as equivalent (the caller commits).
+
+    Returns:
+        ID of the equivalence pair
+
+    Raises:
+        ValueError: If the controls are the same or do not exist
+    """
+    if control_id == equivalent_control_id or len(framework_catalog.get_controls(db, [control_id, equivalent_control_id])) != 2:
+        raise ValueError("Two different existing controls are required")
+    store_pairs(db, [{
+        "control_id": control_id,
+        "equivalent_control_id": equivalent_control_id,
+        "source": SOURCE_CURATED,
+        "status": "APPROVED",
+        "reviewed_by_id": user_id
+    }])
+    low, high = _pair(control_id, equivalent_control_id)
+    return db.query(ControlEquivalence.id).filter(
+        ControlEquivalence.control_id == low,
+        ControlEquivalence.equivalent_control_id == high
+    ).scalar()
+
+
+def review_equivalence(db: Session, equivalence_id: int, status: str, user_id: Optional[int]) -> Optional[ControlEquivalence]:
+    """
+    Approve or reject a pair (the caller commits).
+
+    Raises:
+        ValueError: If the status is not APPROVED / CANDIDATE / REJECTED
+    """
+    status = (status or "").upper()
+    if status not in STATUSES:
+        raise ValueError(f"Status must be one of {', '.join(STATUSES)}")
+    row = db.query(ControlEquivalence).filter(ControlEquivalence.id == equivalence_id).first()
+    if row:
+        row.status = status
+        row.reviewed_by_id = user_id
+    return row
@@ -0,0 +1,240 @@
+"""
+Control Hierarchy Service
+Queries over nested control groups (families -> controls -> enhancements) through
+the control_group_closure table, so a whole subtree is one indexed lookup on
+ancestor_id instead of recursive Python or one query per level:
+
+- controls under a subtree
+- depth-limited subtrees (groups and their controls)
+- rollups: control, selection and open-gap counts of a group and its children
+- ancestors (breadcrumbs) and moves
+
+The closure rows are maintained by the ControlGroup insert / update hooks
+(app/models/control_group.py). Writes that bypass the ORM rebuild them with
+rebuild_closure().
+"""
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select, insert, delete, literal, func, case, and_
+from sqlalchemy.orm import Session
+from app.models import (
+    ControlGroup, ControlGroupClosure, Control, Gap, GapStatus, CompanyControlSelection
+)
+from app.services import framework_catalog
+
+# Guard against cycles in data written without the hooks
+MAX_DEPTH = 32
+
+
+def rebuild_closure(db: Session, framework_id: Optional[int] = None) -> int:
+    """
+    Recompute the closure rows of a framework's groups (every framework when None)
+    from parent_group_id with one recursive query (the caller commits).
+
+    Returns:
+        Number of closure rows written
+    """
+    closure = ControlGroupClosure.__table__
+    groups = ControlGroup.__table__
+
+    scope = select(groups.c.id)
+    if framework_id is not None:
+        scope = scope.where(groups.c.framework_id == framework_id)
+    db.execute(delete(closure).where(closure.c.descendant_id.in_(scope)))
+
+    base = select(
+        groups.c.id.label("ancestor_id"), groups.c.id.label("descendant_id"), literal(0).label("depth")
+    )
+    if framework_id is not None:
+        base = base.where(groups.c.framework_id == framework_id)
+    paths = base.cte("paths", recursive=True)
+    paths = paths.union_all(
+        select(paths.c.ancestor_id, groups.c.id, paths.c.depth + 1)
+        .where(groups.c.parent_group_id == paths.c.descendant_id, paths.c.depth < MAX_DEPTH)
+    )
+    db.execute(insert(closure).from_select(
+        ["ancestor_id", "descendant_id", "depth"],
+        select(paths.c.ancestor_id, paths.c.descendant_id, func.min(paths.c.depth))
+        .group_by(paths.c.ancestor_id, paths.c.descendant_id)
+    ))
+    # rowcount of INSERT ... WITH RECURSIVE is not reported by every driver
+    rows = db.execute(
+        select(func.count()).select_from(closure).where(closure.c.descendant_id.in_(scope))
+    ).scalar()
+    print(f"[Control Hierarchy] ✓ Rebuilt {rows} closure row(s) for {'all frameworks' if framework_id is None else f'framework {framework_id}'}")
+    return rows
+
+
+def get_subtree_controls(db: Session, group_id: int, include_inactive: bool = False) -> List[Control]:
+    """
+    All controls under a group, at any depth (one query).
+
+    Returns:
+        Controls ordered by depth, group order and control order
+    """
+    query = (
+        db.query(Control)
+        .join(ControlGroupClosure, ControlGroupClosure.descendant_id == Control.control_group_id)
+        .join(ControlGroup, ControlGroup.id == Control.control_group_id)
+        .filter(ControlGroupClosure.ancestor_id == group_id)
+    )
+    if not include_inactive:
+        query = query.filter(Control.is_active == True, ControlGroup.is_active == True)
+    return query.order_by(
+        ControlGroupClosure.depth, ControlGroup.order_index, ControlGroup.id, Control.order_index, Control.code
+    ).all()
+
+
+def get_subtree(db: Session, group_id: int, max_depth: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    A group with its active descendants down to max_depth levels below it, nested,
+    each group listing its controls followed by its subgroups (ControlTreeNode dicts).
+
+    Args:
+        db: Database session
+        group_id: Root of the subtree
+        max_depth: Levels of subgroups to include (None: all, 0: the group and its controls)
+
+    Returns:
+        Nested node of the group, or None if it does not exist
+    """
+    query = (
+        db.query(ControlGroup, ControlGroupClosure.depth)
+        .join(ControlGroupClosure, ControlGroupClosure.descendant_id == ControlGroup.id)
+        .filter(ControlGroupClosure.ancestor_id == group_id)
+    )
+    if max_depth is not None:
+        query = query.filter(ControlGroupClosure.depth <= max_depth)
+    rows = query.order_by(ControlGroupClosure.depth, ControlGroup.order_index, ControlGroup.code).all()
+    if not rows:
+        return None
+
+    nodes: Dict[int, Dict[str, Any]] = {}
+    root = None
+    for group, depth in rows:
+        if depth > 0 and (not group.is_active or group.parent_group_id not in nodes):
+            continue  # inactive, or under an inactive group
+        nodes[group.id] = {
+            "id": group.id,
+            "name": group.name,
+            "code": group.code,
+            "description": group.description,
+            "type": "group",
+            "children": []
+        }
+        if depth == 0:
+            root = nodes[group.id]
+
+    controls = (
+        db.query(Control)
+        .filter(Control.control_group_id.in_(list(nodes)), Control.is_active == True)
+        .order_by(Control.order_index, Control.code)
+        .all()
+    )
+    for control in controls:
+        nodes[control.control_group_id]["children"].append({
+            "id": control.id,
+            "name": control.name,
+            "code": control.code,
+            "description": control.description,
+            "type": "control",
+            "children": []
+        })
+    for group, depth in rows:
+        if depth > 0 and group.id in nodes:
+            nodes[group.parent_group_id]["children"].append(nodes[group.id])
+    return root
+
+
+def get_rollup(db: Session, group_id: int, company_id: int) -> List[Dict[str, Any]]:
+    """
+    Counts over the whole subtree of a group and of each of its direct children
+    (one aggregate query): controls, active controls, controls selected by the
+    company and the company's open gaps.
+
+    Returns:
+        The group's row first, then its children's, ordered by order_index, code
+    """
+    closure = ControlGroupClosure.__table__
+    targets = select(closure.c.descendant_id).where(closure.c.ancestor_id == group_id, closure.c.depth <= 1)
+    below = closure.alias("below")
+
+    rows = db.execute(
+        select(
+            ControlGroup.id,
+            ControlGroup.code,
+            ControlGroup.name,
+            ControlGroup.parent_group_id,
+            func.count(func.distinct(Control.id)).label("controls"),
+            func.count(func.distinct(case((Control.is_active == True, Control.id)))).label("active_controls"),
+            func.count(func.distinct(CompanyControlSelection.control_id)).label("selected_controls"),
+            func.count(func.distinct(Gap.id)).label("open_gaps")
+        )
+        .select_from(ControlGroup)
+        .join(below, below.c.ancestor_id == ControlGroup.id)
+        .outerjoin(Control, Control.control_group_id == below.c.descendant_id)
+        .outerjoin(CompanyControlSelection, and_(
+            CompanyControlSelection.control_id == Control.id,
+            CompanyControlSelection.company_id == company_id
+        ))
+        .outerjoin(Gap, and_(
+            Gap.control_id == Control.id,
+            Gap.company_id == company_id,
+            Gap.is_active == True,
+            Gap.status.in_([GapStatus.IDENTIFIED, GapStatus.IN_REMEDIATION])
+        ))
+        .where(ControlGroup.id.in_(targets))
+        .group_by(ControlGroup.id, ControlGroup.code, ControlGroup.name, ControlGroup.parent_group_id, ControlGroup.order_index)
+        .order_by(case((ControlGroup.id == group_id, 0), else_=1), ControlGroup.order_index, ControlGroup.code)
+    ).all()
+
+    return [
+        {
+            "group_id": row.id,
+            "code": row.code,
+            "name": row.name,
+            "parent_group_id": row.parent_group_id,
+            "controls": row.controls,
+            "active_controls": row.active_controls,
+            "selected_controls": row.selected_controls,
+            "open_gaps": row.open_gaps
+        }
+        for row in rows
+    ]
+
+
+def get_ancestors(db: Session, group_id: int) -> List[ControlGroup]:
+    """The ancestors of a group, root first (one lookup on the descendant index)."""
+    return (
+        db.query(ControlGroup)
+        .join(ControlGroupClosure, ControlGroupClosure.ancestor_id == ControlGroup.id)
+        .filter(ControlGroupClosure.descendant_id == group_id, ControlGroupClosure.depth > 0)
+        .order_by(ControlGroupClosure.depth.desc())
+        .all()
+    )
+
+
+def move_control_group(db: Session, group: ControlGroup, parent_group_id: Optional[int]) -> ControlGroup:
+    """
+    Move a group (with its subtree) under another group of the same framework, or
+    to the top level. The closure rows follow through the update hook; the
+    framework catalog is invalidated. The caller commits.
+
+    Raises:
+        ValueError: If the parent does not exist, belongs to another framework or is inside the group's subtree
+    """
+    if parent_group_id is not None:
+        parent = db.query(ControlGroup).filter(ControlGroup.id == parent_group_id).first()
+        if not parent or parent.framework_id != group.framework_id:
+            raise ValueError(f"Parent group {parent_group_id} not found in framework {group.framework_id}")
+        inside = db.query(ControlGroupClosure.depth).filter(
+            ControlGroupClosure.ancestor_id == group.id,
+            ControlGroupClosure.descendant_id == parent_group_id
+        ).first()
+        if inside:
+            raise ValueError("A control group cannot be moved under its own subtree")
+
+    group.parent_group_id = parent_group_id
+    db.flush()
+    framework_catalog.invalidate_framework(db, group.framework_id)
+    print(f"[Control Hierarchy] ✓ Moved control group {group.id} under {parent_group_id or 'the top level'}")
+    return group
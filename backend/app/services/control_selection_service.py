@@ -0,0 +1,114 @@
+"""
+Control Selection Service
+A company's selected controls, one row per (company, framework, control) in
+company_control_selection (composite primary key).
+
+Saving a selection applies the difference to the stored one as two set
+operations in SQL (DELETE the controls no longer selected, INSERT ... SELECT the
+new ones), so unchanged rows are not touched and a selection of any size costs
+two statements. Readers (gap analysis, policy impact) query or join the table
+directly: no JSON decoding or de-duplication in Python.
+"""
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import select, delete, insert, literal, and_, exists, func
+from sqlalchemy.orm import Session
+from app.models import ControlSelection, CompanyControlSelection, Control
+
+
+def replace_control_selection(
+    db: Session,
+    company_id: int,
+    framework_id: int,
+    control_ids: Iterable[int]
+) -> Dict[str, int]:
+    """
+    Replace a company's selection for a framework with the given controls
+    (the caller commits).
+
+    Args:
+        db: Database session
+        company_id: ID of the company
+        framework_id: ID of the framework the selection is for
+        control_ids: Validated control IDs (duplicates are ignored)
+
+    Returns:
+        Dictionary with the number of controls added, removed and requested
+    """
+    control_ids = sorted(set(control_ids))
+    ccs = CompanyControlSelection.__table__
+
+    header = db.query(ControlSelection.id).filter(
+        ControlSelection.company_id == company_id,
+        ControlSelection.framework_id == framework_id
+    ).first()
+    if header:
+        db.query(ControlSelection).filter(ControlSelection.id == header[0]).update(
+            {ControlSelection.updated_at: func.now()}, synchronize_session=False
+        )
+    else:
+        db.add(ControlSelection(company_id=company_id, framework_id=framework_id))
+        db.flush()
+
+    scope = and_(ccs.c.company_id == company_id, ccs.c.framework_id == framework_id)
+
+    # Stored - requested
+    removed = db.execute(
+        delete(ccs).where(scope, ccs.c.control_id.notin_(control_ids))
+    ).rowcount
+
+    # Requested - stored (only controls that exist)
+    added = db.execute(
+        insert(ccs).from_select(
+            ["company_id", "framework_id", "control_id"],
+            select(literal(company_id), literal(framework_id), Control.id).where(
+                Control.id.in_(control_ids),
+                ~exists().where(scope, ccs.c.control_id == Control.id)
+            )
+        )
+    ).rowcount
+
+    print(f"[Control Selection] Company {company_id}, framework {framework_id}: +{added} / -{removed} control(s)")
+    return {"added": added, "removed": removed, "requested": len(control_ids)}
+
+
+def get_selected_control_ids(db: Session, company_id: int, framework_id: Optional[int] = None) -> List[int]:
+    """
+    Control IDs selected by a company, for one framework or across all of them.
+
+    Returns:
+        Sorted list of distinct control IDs
+    """
+    query = db.query(CompanyControlSelection.control_id).filter(CompanyControlSelection.company_id == company_id)
+    if framework_id is not None:
+        query = query.filter(CompanyControlSelection.framework_id == framework_id)
+    return [control_id for (control_id,) in query.distinct().order_by(CompanyControlSelection.control_id).all()]
+
+
+def get_selected_framework_ids(db: Session, company_id: int) -> List[int]:
+    """Frameworks with at least one selected control for a company."""
+    return [
+        framework_id for (framework_id,) in
+        db.query(CompanyControlSelection.framework_id)
+        .filter(CompanyControlSelection.company_id == company_id)
+        .distinct()
+        .order_by(CompanyControlSelection.framework_id)
+        .all()
+    ]
+
+
+def filter_selected(db: Session, company_id: int, control_ids: Iterable[int]) -> List[int]:
+    """The given control IDs that a company has selected (in any framework), sorted."""
+    control_ids = list(set(control_ids))
+    if not control_ids:
+        return []
+    return [
+        control_id for (control_id,) in
+        db.query(CompanyControlSelection.control_id)
+        .filter(
+            CompanyControlSelection.company_id == company_id,
+            CompanyControlSelection.control_id.in_(control_ids)
+        )
+        .distinct()
+        .order_by(CompanyControlSelection.control_id)
+        .all()
+    ]
@@ -0,0 +1,129 @@
+"""
+Decision Thresholds
+The numbers behind a gap analysis verdict, configurable per framework:
+
+- similarity_min: policy chunks below it are not retrieved; a control whose best
+  match is below it fails a hard rule (GAP)
+- auto_compliant: minimum best-match similarity for a COMPLIANT verdict
+- default_risk_score: risk score of a gap without any similarity score
+- high_risk_score / medium_risk_score: risk score bands for HIGH / MEDIUM severity
+
+Risk score = min(100, int((1 - max_similarity) * 100)). The same rules are
+available as SQL expressions so stored results can be re-scored in the database
+(see threshold_replay).
+"""
+from typing import Dict, Any, Optional
+from sqlalchemy import case, func, cast, Integer
+from sqlalchemy.orm import Session
+from app.models import DecisionThresholds, GapSeverity
+
+DEFAULT_THRESHOLDS: Dict[str, Any] = {
+    "similarity_min": 0.72,
+    "auto_compliant": 0.85,
+    "default_risk_score": 90,
+    "high_risk_score": 75,
+    "medium_risk_score": 40
+}
+
+THRESHOLD_FIELDS = tuple(DEFAULT_THRESHOLDS)
+
+
+def get_thresholds(db: Session, framework_id: Optional[int], cache: Optional[Dict[int, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Thresholds in effect for a framework.
+
+    Args:
+        db: Database session
+        framework_id: ID of the framework (None gives the defaults)
+        cache: Optional dict reused across the controls of one run (one lookup per framework)
+
+    Returns:
+        Dictionary with every THRESHOLD_FIELDS key
+    """
+    if framework_id is None:
+        return dict(DEFAULT_THRESHOLDS)
+    if cache is not None and framework_id in cache:
+        return cache[framework_id]
+    row = db.query(DecisionThresholds).filter(DecisionThresholds.framework_id == framework_id).first()
+    thresholds = {field: getattr(row, field) for field in THRESHOLD_FIELDS} if row else dict(DEFAULT_THRESHOLDS)
+    if cache is not None:
+        cache[framework_id] = thresholds
+    return thresholds
+
+
+def validate_thresholds(values: Dict[str, Any], base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Merge threshold overrides into base (defaults if omitted) and check them.
+
+    Raises:
+        ValueError: If a value is out of range or the bands are inconsistent
+    """
+    thresholds = dict(base or DEFAULT_THRESHOLDS)
+    thresholds.update({key: value for key, value in values.items() if key in THRESHOLD_FIELDS and value is not None})
+    for field in ("similarity_min", "auto_compliant"):
+        if not 0.0 <= float(thresholds[field]) <= 1.0:
+            raise ValueError(f"{field} must be between 0 and 1")
+    for field in ("default_risk_score", "high_risk_score", "medium_risk_score"):
+        if not 0 <= int(thresholds[field]) <= 100:
+            raise ValueError(f"{field} must be between 0 and 100")
+    if thresholds["auto_compliant"] < thresholds["similarity_min"]:
+        raise ValueError("auto_compliant must not be below similarity_min")
+    if thresholds["medium_risk_score"] > thresholds["high_risk_score"]:
+        raise ValueError("medium_risk_score must not be above high_risk_score")
+    return thresholds
+
+
+def save_thresholds(db: Session, framework_id: int, thresholds: Dict[str, Any], user_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Store a framework's thresholds (validated; missing keys keep their current value).
+
+    Returns:
+        The stored thresholds
+    """
+    thresholds = validate_thresholds(thresholds, get_thresholds(db, framework_id))
+    row = db.query(DecisionThresholds).filter(DecisionThresholds.framework_id == framework_id).first()
+    if row is None:
+        row = DecisionThresholds(framework_id=framework_id)
+        db.add(row)
+    for field in THRESHOLD_FIELDS:
+        setattr(row, field, thresholds[field])
+    row.updated_by_id = user_id
+    db.commit()
+    print(f"[Decision Thresholds] ✓ Saved thresholds for framework {framework_id}: {thresholds}")
+    return thresholds
+
+
+def risk_score_for(max_similarity: float, thresholds: Optional[Dict[str, Any]] = None) -> int:
+    """Risk score of a gap from its best policy match."""
+    thresholds = thresholds or DEFAULT_THRESHOLDS
+    if max_similarity > 0:
+        return min(100, int((1 - max_similarity) * 100))
+    return int(thresholds["default_risk_score"])
+
+
+def severity_for(risk_score: int, thresholds: Optional[Dict[str, Any]] = None) -> tuple:
+    """(GapSeverity, "HIGH"/"MEDIUM"/"LOW") for a risk score."""
+    thresholds = thresholds or DEFAULT_THRESHOLDS
+    if risk_score >= thresholds["high_risk_score"]:
+        return (GapSeverity.HIGH, "HIGH")
+    elif risk_score >= thresholds["medium_risk_score"]:
+        return (GapSeverity.MEDIUM, "MEDIUM")
+    else:
+        return (GapSeverity.LOW, "LOW")
+
+
+def risk_score_expr(max_similarity, thresholds: Dict[str, Any]):
+    """SQL equivalent of risk_score_for() over a similarity column."""
+    return case(
+        (max_similarity > 0, cast(func.floor((1 - max_similarity) * 100), Integer)),
+        else_=int(thresholds["default_risk_score"])
+    )
+
+
+def severity_expr(risk_score, thresholds: Dict[str, Any]):
+    """SQL equivalent of severity_for() (GapSeverity member names, as stored in gaps.severity)."""
+    return case(
+        (risk_score >= thresholds["high_risk_score"], GapSeverity.HIGH.name),
+        (risk_score >= thresholds["medium_risk_score"], GapSeverity.MEDIUM.name),
+        else_=GapSeverity.LOW.name
+    )
@@ -0,0 +1,191 @@
+"""
+Evaluation Cascade
+Tiered gap evaluation: settle obvious controls cheaply and only send ambiguous ones
+to the full structured evaluation.
+
+Tiers (each with its own thresholds and accounting):
+1. rules    - deterministic, no LLM call. A control that failed a hard rule (no approved
+              policy, no similar chunks, similarity below the minimum, no KB reference)
+              is a GAP whatever the model says.
+2. classify - one short-output call (labels + confidence + one-sentence reason + the
+              missing requirements) on a smaller evidence budget. Settles the control when the verdict can no longer
+              be COMPLIANT (similarity below the compliance threshold), when the model is
+              confident there is no coverage, or when it is confident of FULL coverage with
+              a KB MATCH at very high similarity (GAP_CASCADE_COMPLIANT_SIMILARITY).
+3. full     - the structured evaluation (requirement decomposition + generate_gap_analysis).
+
+Controls that would reach the full tier but are equivalent to a control already
+evaluated in the run reuse its evaluation instead (equivalence, no LLM call; see
+control_equivalence).
+
+Settled evaluations have the same shape as generate_gap_analysis() plus "evaluation_tier";
+classification-settled GAPs keep the missing requirements the classifier reported.
+"""
+import threading
+import time
+from typing import List, Dict, Any, Optional
+from app.core.config import settings
+from app.services.ai_service import classify_gap_coverage, track_llm_usage
+
+TIER_RULES = "rules"
+TIER_CLASSIFY = "classify"
+TIER_FULL = "full"
+TIER_EQUIVALENCE = "equivalence"
+TIERS = (TIER_RULES, TIER_CLASSIFY, TIER_FULL, TIER_EQUIVALENCE)
+
+_stats_lock = threading.Lock()
+
+
+def _empty_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        tier: {"evaluations": 0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+        for tier in TIERS
+    }
+
+
+_stats = _empty_stats()
+_escalations = {"count": 0}
+
+
+def record_tier(tier: str, seconds: float, usage: Optional[Dict[str, int]] = None, evaluations: int = 1) -> None:
+    """
+    Add evaluations to a tier's accounting.
+
+    Args:
+        tier: TIER_RULES, TIER_CLASSIFY, TIER_FULL or TIER_EQUIVALENCE
+        seconds: Wall time spent in the tier
+        usage: LLM usage from track_llm_usage() (calls and tokens)
+        evaluations: Number of controls evaluated
+    """
+    with _stats_lock:
+        stats = _stats[tier]
+        stats["evaluations"] += evaluations
+        stats["seconds"] += seconds
+        if usage:
+            stats["llm_calls"] += usage.get("calls", 0)
+            stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            stats["completion_tokens"] += usage.get("completion_tokens", 0)
+
+
+def get_cascade_stats() -> Dict[str, Any]:
+    """
+    Per-tier accounting since start (or the last reset): evaluations (controls that
+    reached the tier), LLM calls, tokens and latency, plus classify -> full escalations.
+    """
+    with _stats_lock:
+        tiers = {}
+        for tier, stats in _stats.items():
+            tiers[tier] = dict(stats)
+            tiers[tier]["seconds"] = round(stats["seconds"], 3)
+            tiers[tier]["avg_ms"] = round(stats["seconds"] * 1000 / stats["evaluations"], 1) if stats["evaluations"] else 0.0
+        return {"tiers": tiers, "escalations": _escalations["count"]}
+
+
+def reset_cascade_stats() -> None:
+    """Reset the per-tier accounting."""
+    global _stats
+    with _stats_lock:
+        _stats = _empty_stats()
+        _escalations["count"] = 0
+
+
+def _settled(
+    tier: str,
+    explanation: str,
+    coverage_level: str = "NONE",
+    kb_alignment: str = "MISMATCH",
+    confidence: Optional[float] = None,
+    missing_requirements: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    evaluation = {
+        "coverage_level": coverage_level,
+        "missing_requirements": list(missing_requirements or []),
+        "covered_requirements": [],
+        "kb_alignment": kb_alignment,
+        "kb_reference": "",
+        "explanation": explanation,
+        "evaluation_tier": tier
+    }
+    if confidence is not None:
+        evaluation["confidence"] = confidence
+    return evaluation
+
+
+def evaluate_cheap_tiers(
+    control_name: str,
+    control_description: str,
+    framework_name: str,
+    similar_policies: List[Dict[str, Any]],
+    knowledge_base_chunks: List[Dict[str, Any]],
+    hard_rule_failed: bool,
+    hard_rule_reason: Optional[str],
+    compliance_possible: bool,
+    max_similarity: float
+) -> Optional[Dict[str, Any]]:
+    """
+    Run the rules and classification tiers for a control.
+
+    Args:
+        control_name: Name of the control
+        control_description: Description of the control
+        framework_name: Name of the framework
+        similar_policies: Retrieved policy chunks
+        knowledge_base_chunks: Retrieved KB chunks
+        hard_rule_failed: Whether a hard rule already forces a GAP
+        hard_rule_reason: Why the hard rule failed
+        compliance_possible: Whether the deterministic criteria still allow COMPLIANT
+            (approved policy, similarity >= compliance threshold, KB reference present)
+        max_similarity: Highest policy chunk similarity
+
+    Returns:
+        The settled evaluation, or None when the control needs the full evaluation
+    """
+    # Tier 1: deterministic rules
+    started = time.perf_counter()
+    if hard_rule_failed or not knowledge_base_chunks:
+        reason = hard_rule_reason or "No authoritative knowledge base reference found"
+        record_tier(TIER_RULES, time.perf_counter() - started)
+        print(f"[Evaluation Cascade] Settled by rules: {reason}")
+        return _settled(TIER_RULES, reason)
+
+    # Tier 2: short-output classification
+    started = time.perf_counter()
+    with track_llm_usage() as usage:
+        classification = classify_gap_coverage(
+            control_name=control_name,
+            control_description=control_description,
+            similar_policies=similar_policies,
+            framework_name=framework_name,
+            knowledge_base_chunks=knowledge_base_chunks
+        )
+    record_tier(TIER_CLASSIFY, time.perf_counter() - started, usage)
+
+    coverage_level = classification["coverage_level"]
+    kb_alignment = classification["kb_alignment"]
+    confidence = classification["confidence"]
+    confident = not classification.get("evaluation_failed") and confidence >= settings.GAP_CASCADE_MIN_CONFIDENCE
+
+    settle = False
+    if not compliance_possible and not classification.get("evaluation_failed"):
+        settle = True  # Verdict is GAP either way; the reason and missing requirements are enough
+    elif confident and coverage_level == "NONE":
+        settle = True
+    elif (
+        confident
+        and coverage_level == "FULL"
+        and kb_alignment == "MATCH"
+        and max_similarity >= settings.GAP_CASCADE_COMPLIANT_SIMILARITY
+    ):
+        settle = True
+
+    if settle:
+        print(f"[Evaluation Cascade] Settled by classification: {coverage_level}/{kb_alignment} (confidence {confidence:.2f})")
+        return _settled(
+            TIER_CLASSIFY, classification["explanation"], coverage_level, kb_alignment, confidence,
+            missing_requirements=classification.get("missing_requirements")
+        )
+
+    with _stats_lock:
+        _escalations["count"] += 1
+    print(f"[Evaluation Cascade] Escalating to full evaluation: {coverage_level}/{kb_alignment} (confidence {confidence:.2f})")
+    return None
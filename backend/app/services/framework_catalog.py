@@ -0,0 +1,429 @@
+"""
+Framework Catalog
+In-process, read-through cache of the framework reference data (Framework,
+ControlGroup, Control). A framework's whole tree is loaded once (three queries)
+and then served from memory with O(1) lookups by control / group ID and code.
+
+Entries are immutable snapshots (dataclasses with the model's column attributes),
+safe to share between requests and threads and never bound to a session.
+
+Staleness across workers: every framework row carries a catalog_version that
+invalidate_framework() bumps whenever its tree changes (seeding, control
+configuration, new frameworks). Each worker compares its cached versions against
+the table at most every FRAMEWORK_CATALOG_CHECK_SECONDS (one small query), and
+drops the trees that changed (0: check on every lookup).
+
+Each tree also carries its control tree (groups nested by parent_group_id, with
+their controls) serialized once as JSON with a strong ETag, so the control-tree
+endpoint answers repeat loads (If-None-Match -> 304) without touching the database.
+"""
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.models import Framework, ControlGroup, Control
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class CatalogFramework:
+    id: int
+    name: str
+    description: Optional[str]
+    version: Optional[str]
+    category: Optional[str]
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+    catalog_version: int
+
+
+@dataclass(frozen=True)
+class CatalogGroup:
+    id: int
+    name: str
+    description: Optional[str]
+    code: Optional[str]
+    framework_id: int
+    parent_group_id: Optional[int]
+    order_index: Optional[int]
+    is_active: bool
+    controls_count: int
+
+
+@dataclass(frozen=True)
+class CatalogControl:
+    id: int
+    name: str
+    description: Optional[str]
+    code: Optional[str]
+    control_group_id: int
+    framework_id: int
+    status: Any
+    implementation_notes: Optional[str]
+    evidence: Optional[str]
+    order_index: Optional[int]
+    is_active: bool
+
+
+def _order_key(*values) -> Tuple:
+    # ORDER BY semantics of the endpoints on Postgres (NULLs last)
+    return tuple(item for value in values for item in (value is None, value if value is not None else 0))
+
+
+@dataclass
+class FrameworkTree:
+    """A framework with all its groups and controls (active and inactive)."""
+    framework: CatalogFramework
+    groups: List[CatalogGroup]  # order_index, code
+    controls: List[CatalogControl]  # group order_index, control order_index, code
+    groups_by_id: Dict[int, CatalogGroup] = field(default_factory=dict)
+    controls_by_id: Dict[int, CatalogControl] = field(default_factory=dict)
+    controls_by_code: Dict[str, CatalogControl] = field(default_factory=dict)
+    groups_by_code: Dict[str, CatalogGroup] = field(default_factory=dict)
+    _document: Optional[Tuple[bytes, str]] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.groups_by_id = {group.id: group for group in self.groups}
+        self.controls_by_id = {control.id: control for control in self.controls}
+        self.controls_by_code = {control.code: control for control in self.controls if control.code}
+        self.groups_by_code = {group.code: group for group in self.groups if group.code}
+
+    @property
+    def version(self) -> int:
+        return self.framework.catalog_version
+
+    def active_groups(self) -> List[CatalogGroup]:
+        return [group for group in self.groups if group.is_active]
+
+    def active_controls(self, control_group_id: Optional[int] = None) -> List[CatalogControl]:
+        return [
+            control for control in self.controls
+            if control.is_active and (control_group_id is None or control.control_group_id == control_group_id)
+        ]
+
+    def control_tree(self) -> List[Dict[str, Any]]:
+        """
+        Active groups nested by parent_group_id, each with its active controls
+        followed by its subgroups (ControlTreeNode dicts).
+
+        Groups whose parent is inactive, missing or part of a cycle are listed at the top level.
+        """
+        groups = self.active_groups()
+        active_ids = {group.id for group in groups}
+        subgroups: Dict[int, List[CatalogGroup]] = {}
+        for group in groups:
+            if group.parent_group_id in active_ids and group.parent_group_id != group.id:
+                subgroups.setdefault(group.parent_group_id, []).append(group)
+        controls_by_group: Dict[int, List[CatalogControl]] = {}
+        for control in self.active_controls():
+            controls_by_group.setdefault(control.control_group_id, []).append(control)
+
+        placed = set()
+
+        def group_node(group: CatalogGroup) -> Dict[str, Any]:
+            placed.add(group.id)
+            children = [
+                {
+                    "id": control.id,
+                    "name": control.name,
+                    "code": control.code,
+                    "description": control.description,
+                    "type": "control",
+                    "children": []
+                }
+                for control in controls_by_group.get(group.id, [])
+            ]
+            children.extend(group_node(child) for child in subgroups.get(group.id, []) if child.id not in placed)
+            return {
+                "id": group.id,
+                "name": group.name,
+                "code": group.code,
+                "description": group.description,
+                "type": "group",
+                "children": children
+            }
+
+        roots = [group for group in groups if group.parent_group_id not in active_ids or group.parent_group_id == group.id]
+        tree = [group_node(group) for group in roots]
+        # Cycles have no root: list their groups at the top level
+        tree.extend(group_node(group) for group in groups if group.id not in placed)
+        return tree
+
+    def control_tree_document(self) -> Tuple[bytes, str]:
+        """
+        The control tree as ControlTreeResponse JSON and its strong ETag
+        (content SHA-256), built once per loaded tree.
+
+        Returns:
+            (body, quoted ETag)
+        """
+        if self._document is None:
+            body = json.dumps({
+                "framework_id": self.framework.id,
+                "framework_name": self.framework.name,
+                "tree": self.control_tree()
+            }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self._document = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+        return self._document
+
+
+_lock = threading.Lock()
+_trees: Dict[int, FrameworkTree] = {}
+_control_frameworks: Dict[int, int] = {}  # control ID -> framework ID, for cached trees
+_frameworks: Optional[List[CatalogFramework]] = None  # all frameworks, ordered by name
+_last_check = 0.0
+_stats = {"hits": 0, "loads": 0, "invalidations": 0}
+
+
+def _snapshot_framework(framework: Framework) -> CatalogFramework:
+    return CatalogFramework(
+        id=framework.id,
+        name=framework.name,
+        description=framework.description,
+        version=framework.version,
+        category=framework.category,
+        is_active=framework.is_active,
+        created_at=framework.created_at,
+        updated_at=framework.updated_at,
+        catalog_version=framework.catalog_version or 1
+    )
+
+
+def _drop(framework_id: int) -> None:
+    """Forget a cached tree (caller holds _lock)."""
+    tree = _trees.pop(framework_id, None)
+    if tree:
+        for control_id in tree.controls_by_id:
+            _control_frameworks.pop(control_id, None)
+
+
+def _check_versions(db: Session) -> None:
+    """Drop cached trees whose framework changed since they were loaded (rate-limited)."""
+    global _last_check, _frameworks
+    if not _trees and _frameworks is None:
+        return
+    now = time.monotonic()
+    if now - _last_check < settings.FRAMEWORK_CATALOG_CHECK_SECONDS:
+        return
+    versions = dict(db.query(Framework.id, Framework.catalog_version).all())
+    with _lock:
+        _last_check = now
+        for framework_id, tree in list(_trees.items()):
+            if versions.get(framework_id) != tree.version:
+                _drop(framework_id)
+                _stats["invalidations"] += 1
+        if _frameworks is not None and {fw.id: fw.catalog_version for fw in _frameworks} != versions:
+            _frameworks = None
+
+
+def _load_tree(db: Session, framework_id: int) -> Optional[FrameworkTree]:
+    framework = db.query(Framework).filter(Framework.id == framework_id).first()
+    if not framework:
+        return None
+    groups = db.query(ControlGroup).filter(ControlGroup.framework_id == framework_id).all()
+    controls = (
+        db.query(Control)
+        .join(ControlGroup, Control.control_group_id == ControlGroup.id)
+        .filter(ControlGroup.framework_id == framework_id)
+        .all()
+    )
+
+    counts: Dict[int, int] = {}
+    for control in controls:
+        counts[control.control_group_id] = counts.get(control.control_group_id, 0) + 1
+    group_rows = sorted(groups, key=lambda group: _order_key(group.order_index, group.code))
+    group_order = {group.id: position for position, group in enumerate(group_rows)}
+    group_index = {group.id: group for group in groups}
+    control_rows = sorted(controls, key=lambda control: _order_key(
+        group_index[control.control_group_id].order_index, control.order_index, control.code
+    ) + (group_order[control.control_group_id],))
+
+    tree = FrameworkTree(
+        framework=_snapshot_framework(framework),
+        groups=[
+            CatalogGroup(
+                id=group.id,
+                name=group.name,
+                description=group.description,
+                code=group.code,
+                framework_id=group.framework_id,
+                parent_group_id=group.parent_group_id,
+                order_index=group.order_index,
+                is_active=group.is_active,
+                controls_count=counts.get(group.id, 0)
+            )
+            for group in group_rows
+        ],
+        controls=[
+            CatalogControl(
+                id=control.id,
+                name=control.name,
+                description=control.description,
+                code=control.code,
+                control_group_id=control.control_group_id,
+                framework_id=framework_id,
+                status=control.status,
+                implementation_notes=control.implementation_notes,
+                evidence=control.evidence,
+                order_index=control.order_index,
+                is_active=control.is_active
+            )
+            for control in control_rows
+        ]
+    )
+    print(f"[Framework Catalog] Loaded {tree.framework.name} (v{tree.version}): {len(tree.groups)} groups, {len(tree.controls)} controls")
+    return tree
+
+
+def get_framework_tree(db: Session, framework_id: int) -> Optional[FrameworkTree]:
+    """
+    A framework's cached tree, loaded on first use.
+
+    Args:
+        db: Database session (only used on a miss or a version check)
+        framework_id: ID of the framework
+
+    Returns:
+        The FrameworkTree, or None if the framework does not exist
+    """
+    global _last_check
+    _check_versions(db)
+    tree = _trees.get(framework_id)
+    if tree is not None:
+        _stats["hits"] += 1
+        return tree
+
+    if not _trees and _frameworks is None:
+        # Nothing was cached: what is loaded now is current, next check in
+        # FRAMEWORK_CATALOG_CHECK_SECONDS
+        _last_check = time.monotonic()
+    tree = _load_tree(db, framework_id)
+    if tree is None:
+        return None
+    with _lock:
+        _stats["loads"] += 1
+        _drop(framework_id)
+        _trees[framework_id] = tree
+        for control_id in tree.controls_by_id:
+            _control_frameworks[control_id] = framework_id
+    return tree
+
+
+def get_framework(db: Session, framework_id: int) -> Optional[CatalogFramework]:
+    """A framework by ID (None if it does not exist)."""
+    tree = get_framework_tree(db, framework_id)
+    return tree.framework if tree else None
+
+
+def list_frameworks(db: Session, active_only: bool = True) -> List[CatalogFramework]:
+    """All frameworks ordered by name (cached until one of them changes)."""
+    global _frameworks
+    _check_versions(db)
+    frameworks = _frameworks
+    if frameworks is None:
+        frameworks = [_snapshot_framework(fw) for fw in db.query(Framework).order_by(Framework.name).all()]
+        with _lock:
+            _frameworks = frameworks
+    return [fw for fw in frameworks if fw.is_active or not active_only]
+
+
+def lookup_control(db: Session, control_id: int) -> Tuple[Optional[CatalogControl], Optional[FrameworkTree]]:
+    """
+    A control and its framework's tree.
+
+    Returns:
+        (control, tree), or (None, None) if the control does not exist
+    """
+    _check_versions(db)
+    framework_id = _control_frameworks.get(control_id)
+    if framework_id is None:
+        row = (
+            db.query(ControlGroup.framework_id)
+            .join(Control, Control.control_group_id == ControlGroup.id)
+            .filter(Control.id == control_id)
+            .first()
+        )
+        if not row:
+            return None, None
+        framework_id = row[0]
+    tree = get_framework_tree(db, framework_id)
+    control = tree.controls_by_id.get(control_id) if tree else None
+    return (control, tree) if control else (None, None)
+
+
+def get_controls(db: Session, control_ids: Iterable[int]) -> Dict[int, CatalogControl]:
+    """
+    Controls by ID, loading the trees of frameworks not cached yet with one lookup.
+
+    Returns:
+        Control ID -> CatalogControl for the IDs that exist
+    """
+    _check_versions(db)
+    control_ids = set(control_ids)
+    missing = [control_id for control_id in control_ids if control_id not in _control_frameworks]
+    if missing:
+        framework_ids = {
+            framework_id for (framework_id,) in
+            db.query(ControlGroup.framework_id)
+            .join(Control, Control.control_group_id == ControlGroup.id)
+            .filter(Control.id.in_(missing))
+            .distinct()
+            .all()
+        }
+        for framework_id in framework_ids:
+            get_framework_tree(db, framework_id)
+
+    found = {}
+    for control_id in control_ids:
+        framework_id = _control_frameworks.get(control_id)
+        tree = _trees.get(framework_id) if framework_id is not None else None
+        if tree and control_id in tree.controls_by_id:
+            found[control_id] = tree.controls_by_id[control_id]
+    return found
+
+
+def invalidate_framework(db: Session, framework_id: Optional[int] = None) -> None:
+    """
+    Mark a framework's tree as changed (every framework when None). Bumps its
+    catalog_version in the caller's transaction, so other workers notice once
+    it is committed, and drops this worker's copy right away.
+    """
+    global _frameworks
+    query = update(Framework).values(catalog_version=Framework.catalog_version + 1)
+    if framework_id is not None:
+        query = query.where(Framework.id == framework_id)
+    db.execute(query)
+    with _lock:
+        if framework_id is None:
+            for cached_id in list(_trees):
+                _drop(cached_id)
+        else:
+            _drop(framework_id)
+        _frameworks = None
+        _stats["invalidations"] += 1
+    print(f"[Framework Catalog] Invalidated {'all frameworks' if framework_id is None else f'framework {framework_id}'}")
+
+
+def clear_catalog() -> None:
+    """Drop this worker's cached catalog (the next lookup reloads it)."""
+    global _frameworks, _last_check
+    with _lock:
+        _trees.clear()
+        _control_frameworks.clear()
+        _frameworks = None
+        _last_check = 0.0
+
+
+def get_catalog_stats() -> Dict[str, Any]:
+    """Cached frameworks with their versions, plus hit / load / invalidation counts."""
+    return {
+        "frameworks": {tree.framework.id: tree.version for tree in list(_trees.values())},
+        "controls": len(_control_frameworks),
+        **_stats
+    }
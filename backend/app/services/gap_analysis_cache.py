@@ -0,0 +1,213 @@
+"""
+Gap Analysis Cache
+Persists each control's LLM evaluation together with a fingerprint of its inputs.
+
+The fingerprint covers everything the evaluation is computed from:
+- the control text and framework name (prompt inputs)
+- the approved policies mapped to the control (id + updated_at)
+- the matched policy chunks (vector id + content hash + rounded score)
+- the knowledge base chunks (vector id + text hash)
+
+While the fingerprint matches, run_gap_analysis_for_control() reuses the stored
+requirements/evaluation instead of calling the LLM, and only re-runs the
+deterministic decision logic. Changing one policy therefore only invalidates
+the controls whose approved policies or retrieved chunks changed.
+"""
+import hashlib
+import json
+from typing import List, Dict, Any, Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import Control, Policy, ControlAnalysisCache
+from app.core.config import settings
+from app.services.evaluation_cascade import TIER_EQUIVALENCE
+
+# Bump when prompts, models or evaluation parsing change so stale verdicts are never reused
+ANALYSIS_CACHE_VERSION = 3
+
+
+def _text_hash(text: Optional[str]) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def compute_analysis_fingerprint(
+    control: Control,
+    framework_name: str,
+    approved_policies: List[Policy],
+    similar_policies: List[Dict[str, Any]],
+    knowledge_base_chunks: List[Dict[str, Any]]
+) -> str:
+    """
+    Compute the input fingerprint for a control's evaluation.
+
+    Args:
+        control: Control being analyzed
+        framework_name: Framework name (part of the prompt)
+        approved_policies: Approved policies mapped to the control
+        similar_policies: Policy chunks returned by query_similar_policies()
+        knowledge_base_chunks: Chunks returned by query_knowledge_base_chunks()
+
+    Returns:
+        Hex SHA-256 fingerprint
+    """
+    payload = {
+        "version": ANALYSIS_CACHE_VERSION,
+        "control": {
+            "name": control.name,
+            "description": control.description or "",
+        },
+        "framework": framework_name,
+        "approved_policies": sorted(
+            [policy.id, policy.updated_at.isoformat() if policy.updated_at else None]
+            for policy in approved_policies
+        ),
+        "policy_chunks": [
+            [chunk.get("id"), chunk.get("policy_id"), _text_hash(chunk.get("content")), round(float(chunk.get("score", 0)), 3)]
+            for chunk in similar_policies
+        ],
+        "kb_chunks": [
+            [chunk.get("id"), _text_hash(chunk.get("text"))]
+            for chunk in knowledge_base_chunks
+        ],
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def get_cached_evaluation(
+    db: Session,
+    company_id: int,
+    control_id: int,
+    fingerprint: str
+) -> Optional[ControlAnalysisCache]:
+    """
+    Return the stored evaluation for a control if its fingerprint still matches.
+
+    Args:
+        db: Database session
+        company_id: ID of the company
+        control_id: ID of the control
+        fingerprint: Fingerprint of the current inputs
+
+    Returns:
+        ControlAnalysisCache row on a hit, otherwise None
+    """
+    if not settings.GAP_ANALYSIS_CACHE_ENABLED:
+        return None
+
+    entry = db.query(ControlAnalysisCache).filter(
+        ControlAnalysisCache.company_id == company_id,
+        ControlAnalysisCache.control_id == control_id
+    ).first()
+
+    # Evaluations projected from an equivalent control are never reused: they depend on
+    # inputs the fingerprint does not cover
+    if entry and entry.input_fingerprint == fingerprint and (entry.evaluation or {}).get("evaluation_tier") != TIER_EQUIVALENCE:
+        return entry
+    return None
+
+
+def store_evaluation(
+    db: Session,
+    company_id: int,
+    control_id: int,
+    framework_id: Optional[int],
+    fingerprint: str,
+    control_requirements: List[str],
+    evaluation: Dict[str, Any],
+    status: str
+) -> None:
+    """
+    Store (or replace) the evaluation for a control. Committed with the caller's transaction.
+    Failed LLM evaluations are never stored, so they are retried on the next run.
+    """
+    if not settings.GAP_ANALYSIS_CACHE_ENABLED or evaluation.get("evaluation_failed"):
+        return
+
+    entry = db.query(ControlAnalysisCache).filter(
+        ControlAnalysisCache.company_id == company_id,
+        ControlAnalysisCache.control_id == control_id
+    ).first()
+
+    if entry:
+        entry.framework_id = framework_id
+        entry.input_fingerprint = fingerprint
+        entry.control_requirements = control_requirements
+        entry.evaluation = evaluation
+        entry.status = status
+        return
+
+    entry = ControlAnalysisCache(
+        company_id=company_id,
+        control_id=control_id,
+        framework_id=framework_id,
+        input_fingerprint=fingerprint,
+        control_requirements=control_requirements,
+        evaluation=evaluation,
+        status=status
+    )
+    try:
+        # Savepoint so a concurrent run for the same control doesn't abort the analysis
+        with db.begin_nested():
+            db.add(entry)
+    except IntegrityError:
+        print(f"[Gap Analysis Cache] ⚠️ Concurrent cache write for control {control_id}, keeping the other result")
+
+
+def store_evaluations(db: Session, company_id: int, entries: List[Dict[str, Any]]) -> None:
+    """
+    Store (or replace) the evaluations of several controls with one lookup and one
+    multi-row insert. Committed with the caller's transaction.
+
+    Args:
+        db: Database session
+        company_id: ID of the company
+        entries: store_evaluation() keyword arguments per control (control_id, framework_id,
+            fingerprint, control_requirements, evaluation, status)
+    """
+    if not settings.GAP_ANALYSIS_CACHE_ENABLED:
+        return
+    entries = [entry for entry in entries if not entry["evaluation"].get("evaluation_failed")]
+    if not entries:
+        return
+
+    existing = {
+        row.control_id: row
+        for row in db.query(ControlAnalysisCache).filter(
+            ControlAnalysisCache.company_id == company_id,
+            ControlAnalysisCache.control_id.in_([entry["control_id"] for entry in entries])
+        )
+    }
+
+    new_rows = []
+    for entry in entries:
+        row = existing.get(entry["control_id"])
+        if row:
+            row.framework_id = entry["framework_id"]
+            row.input_fingerprint = entry["fingerprint"]
+            row.control_requirements = entry["control_requirements"]
+            row.evaluation = entry["evaluation"]
+            row.status = entry["status"]
+        else:
+            new_rows.append({
+                "company_id": company_id,
+                "control_id": entry["control_id"],
+                "framework_id": entry["framework_id"],
+                "input_fingerprint": entry["fingerprint"],
+                "control_requirements": entry["control_requirements"],
+                "evaluation": entry["evaluation"],
+                "status": entry["status"]
+            })
+
+    if not new_rows:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(ControlAnalysisCache), new_rows)
+    except IntegrityError:
+        # A concurrent run stored some of these controls first: fall back to per-row writes
+        print(f"[Gap Analysis Cache] ⚠️ Concurrent cache writes, storing {len(new_rows)} evaluation(s) one by one")
+        for entry in entries:
+            if entry["control_id"] not in existing:
+                store_evaluation(db, company_id=company_id, **entry)
@@ -2,53 +2,60 @@
 Gap Analysis Service.
 Orchestrates the gap analysis workflow using AI and Pinecone.
 """
+from contextlib import contextmanager, nullcontext
+import copy
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from datetime import datetime
 import re
+import threading
+import time
 from app.models import (
-    Framework, ControlGroup, Control, Policy, Gap, Remediation,
-    GapSeverity, GapStatus, RemediationStatus, PolicyStatus, ControlSelection
+    Framework, Control, Policy, Gap,
+    GapSeverity, GapStatus, RemediationStatus, PolicyStatus
 )
-from app.services.ai_service import get_embedding, generate_gap_analysis, extract_control_requirements
+from app.services.ai_service import get_embedding, generate_gap_analysis, generate_gap_analysis_batch, extract_control_requirements, track_llm_usage
 from app.services.pinecone_service import query_similar_policies, index_policy_embedding, query_knowledge_base_chunks
+from app.services.gap_analysis_cache import compute_analysis_fingerprint, get_cached_evaluation
+from app.services.gap_persistence import GapResultWriter
+from app.services.control_selection_service import get_selected_control_ids
+from app.services.analysis_ledger import start_analysis_run, record_control_results, finish_analysis_run
+from app.services.decision_thresholds import DEFAULT_THRESHOLDS, get_thresholds, risk_score_for, severity_for
+from app.services.evaluation_cascade import evaluate_cheap_tiers, record_tier, TIER_FULL, TIER_EQUIVALENCE
+from app.services.control_equivalence import get_equivalent_controls
+from app.services.llm_cache import llm_cache_bypass
 from app.core.config import settings
+from app.core import tracing
+from app.services import framework_catalog
 
 # PART 5: STRICT SIMILARITY RULES
-SIMILARITY_MIN = 0.72  # Minimum similarity threshold for AI analysis
-AUTO_COMPLIANT = 0.85  # Minimum similarity threshold for auto-compliant status
+# Defaults; frameworks can override them (DecisionThresholds, see decision_thresholds)
+SIMILARITY_MIN = DEFAULT_THRESHOLDS["similarity_min"]  # Minimum similarity threshold for AI analysis
+AUTO_COMPLIANT = DEFAULT_THRESHOLDS["auto_compliant"]  # Minimum similarity threshold for auto-compliant status
 
 
-def calculate_risk_score(max_similarity: float) -> int:
+def calculate_risk_score(max_similarity: float, thresholds: Optional[Dict[str, Any]] = None) -> int:
     """
     FIX 3: Dynamic risk score calculation.
     risk_score = min(100, int((1 - max_similarity) * 100))
-    If similarity is unavailable, default to 90.
+    If similarity is unavailable, default to the framework's default_risk_score (90).
     """
-    if max_similarity > 0:
-        return min(100, int((1 - max_similarity) * 100))
-    else:
-        return 90  # Default when similarity unavailable
+    return risk_score_for(max_similarity, thresholds)
 
 
-def calculate_severity_from_risk(risk_score: int) -> tuple:
+def calculate_severity_from_risk(risk_score: int, thresholds: Optional[Dict[str, Any]] = None) -> tuple:
     """
-    FIX 4: Calculate severity based on risk score.
+    FIX 4: Calculate severity based on risk score (framework bands, by default):
     - HIGH if risk_score >= 75
     - MEDIUM if risk_score >= 40
     - LOW otherwise
     """
-    if risk_score >= 75:
-        return (GapSeverity.HIGH, "HIGH")
-    elif risk_score >= 40:
-        return (GapSeverity.MEDIUM, "MEDIUM")
-    else:
-        return (GapSeverity.LOW, "LOW")
+    return severity_for(risk_score, thresholds)
 
 
 def get_selected_controls(db: Session, company_id: int, framework_id: int) -> List[Control]:
     """
-    Get selected controls for a company and framework from ControlSelection table.
+    Get selected controls for a company and framework from the company_control_selection table.
     
     Args:
         db: Database session
@@ -56,45 +63,22 @@ def get_selected_controls(db: Session, company_id: int, framework_id: int) -> Li
         framework_id: ID of the framework
     
     Returns:
-        List of Control objects that were selected during onboarding
+        List of controls (framework catalog snapshots) that were selected during onboarding
     """
-    selection = (
-        db.query(ControlSelection)
-        .filter(
-            ControlSelection.company_id == company_id,
-            ControlSelection.framework_id == framework_id
-        )
-        .first()
-    )
+    # One indexed range scan of the composite primary key (distinct IDs, no decoding)
+    control_ids = get_selected_control_ids(db, company_id, framework_id)
     
-    if not selection or not selection.selected_control_ids:
+    if not control_ids:
         print(f"[Gap Analysis] No control selection found for company {company_id}, framework {framework_id}")
         return []
     
-    # Handle both list and JSON array formats
-    control_ids = selection.selected_control_ids
-    if isinstance(control_ids, str):
-        import json
-        control_ids = json.loads(control_ids)
-    
-    if not isinstance(control_ids, list) or len(control_ids) == 0:
-        print(f"[Gap Analysis] Empty or invalid selected_control_ids for company {company_id}, framework {framework_id}")
-        return []
-    
     print(f"[Gap Analysis] Found {len(control_ids)} selected controls for framework {framework_id}")
     
-    # FIX 7: Deduplicate control IDs to prevent processing same control multiple times
-    unique_control_ids = list(set(control_ids))
-    if len(unique_control_ids) != len(control_ids):
-        print(f"[Gap Analysis] Deduplicated {len(control_ids)} -> {len(unique_control_ids)} unique control IDs")
-    
-    controls = (
-        db.query(Control)
-        .filter(Control.id.in_(unique_control_ids))
-        .all()
-    )
+    # Served from the framework catalog cache (no query once the framework is loaded)
+    catalog_controls = framework_catalog.get_controls(db, control_ids)
+    controls = [catalog_controls[control_id] for control_id in control_ids if control_id in catalog_controls]
     
-    print(f"[Gap Analysis] Retrieved {len(controls)} controls from database")
+    print(f"[Gap Analysis] Retrieved {len(controls)} controls from the framework catalog")
     return controls
 
 
@@ -239,27 +223,24 @@ def run_gap_analysis_for_framework(
         - total_controls: int
         - gaps_identified: int
         - gaps_created: int
-        - analysis_id: str
+        - analysis_id: int (AnalysisRun ID; results via GET /gap-analysis/runs/{id}/results)
     """
-    # Get framework
-    framework = db.query(Framework).filter(Framework.id == framework_id).first()
-    if not framework:
+    # Get framework and all its active controls (framework catalog cache)
+    tree = framework_catalog.get_framework_tree(db, framework_id)
+    if not tree:
         raise ValueError(f"Framework {framework_id} not found")
-    
-    # Get all controls for this framework
-    controls = db.query(Control).join(
-        ControlGroup, Control.control_group_id == ControlGroup.id
-    ).filter(
-        ControlGroup.framework_id == framework_id,
-        Control.is_active == True
-    ).order_by(ControlGroup.order_index, Control.order_index).all()
+    framework = tree.framework
+    controls = tree.active_controls()
     
     if limit_controls:
         controls = controls[:limit_controls]
     
     total_controls = len(controls)
     gaps_identified = 0
-    gaps_created = 0
+    writer = GapResultWriter(company_id)
+    queued: List[Dict[str, Any]] = []
+    results: List[Dict[str, Any]] = []
+    run_id = start_analysis_run(db, company_id, user_id, framework_id=framework_id, source="framework")
     
     # Iterate through each control
     for control in controls:
@@ -306,22 +287,20 @@ def run_gap_analysis_for_framework(
                     GapSeverity.MEDIUM
                 )
                 
-                # Create Gap
-                gap = Gap(
-                    title=f"Gap in {control.code or control.name}",
-                    description=gap_analysis.get("gap_description", "Gap identified"),
-                    severity=severity,
-                    status=GapStatus.IDENTIFIED,
-                    framework_id=framework_id,
-                    control_id=control.id,
-                    identified_by_id=user_id,
-                    risk_score=gap_analysis.get("risk_score", 50.0),
-                    root_cause="AI-identified gap based on control analysis",
-                    identified_date=datetime.utcnow(),
-                    is_active=True
-                )
-                db.add(gap)
-                db.flush()
+                # Gap (written in bulk with the others at the end of the run)
+                gap_row = {
+                    "title": f"Gap in {control.code or control.name}",
+                    "description": gap_analysis.get("gap_description", "Gap identified"),
+                    "severity": severity,
+                    "status": GapStatus.IDENTIFIED,
+                    "framework_id": framework_id,
+                    "control_id": control.id,
+                    "identified_by_id": user_id,
+                    "risk_score": gap_analysis.get("risk_score", 50.0),
+                    "root_cause": "AI-identified gap based on control analysis",
+                    "identified_date": datetime.utcnow(),
+                    "is_active": True
+                }
                 
                 # Create Remediation with suggestions
                 remediation_suggestions = gap_analysis.get("remediation_suggestions", [])
@@ -333,69 +312,144 @@ def run_gap_analysis_for_framework(
                 else:
                     action_plan = "Review and implement control requirements"
                 
-                remediation = Remediation(
-                    title=f"Remediation for {control.code or control.name}",
-                    description="AI-generated remediation plan",
-                    action_plan=action_plan,
-                    status=RemediationStatus.PLANNED,
-                    gap_id=gap.id,
-                    assigned_to_id=user_id,
-                    is_active=True
-                )
-                db.add(remediation)
-                gaps_created += 1
+                remediation_row = {
+                    "title": f"Remediation for {control.code or control.name}",
+                    "description": "AI-generated remediation plan",
+                    "action_plan": action_plan,
+                    "status": RemediationStatus.PLANNED,
+                    "assigned_to_id": user_id,
+                    "is_active": True
+                }
+                queued.append({
+                    "control_id": control.id,
+                    "framework_id": framework_id,
+                    "status": "GAP",
+                    "severity": severity.value,
+                    "risk_score": gap_row["risk_score"],
+                    "reason": gap_row["description"]
+                })
+                writer.add(queued[-1], None, gap=gap_row, remediation=remediation_row)
+                results.append(queued[-1])
+            else:
+                results.append({
+                    "control_id": control.id,
+                    "framework_id": framework_id,
+                    "status": "COMPLIANT",
+                    "risk_score": 0,
+                    "reason": gap_analysis.get("gap_description")
+                })
                 
         except Exception as e:
             # Log error but continue with next control
             print(f"Error analyzing control {control.id}: {str(e)}")
+            results.append({
+                "control_id": control.id,
+                "framework_id": framework_id,
+                "status": "ERROR",
+                "reason": f"Error analyzing control: {str(e)}"
+            })
             continue
     
-    # Commit all gaps and remediations
-    db.commit()
-    
-    analysis_id = f"gap_analysis_{framework_id}_{company_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+    # Commit all gaps and remediations (open gaps are updated in place, not duplicated)
+    try:
+        writer.flush(db)
+        record_control_results(db, run_id, results)
+    except Exception:
+        finish_analysis_run(db, run_id, status="FAILED")
+        raise
+    gaps_created = sum(1 for result in queued if result.get("gap_created"))
+    finish_analysis_run(db, run_id)
     
     return {
         "total_controls": total_controls,
         "gaps_identified": gaps_identified,
         "gaps_created": gaps_created,
-        "analysis_id": analysis_id,
+        "analysis_id": run_id,
         "framework_id": framework_id,
         "framework_name": framework.name
     }
 
 
-def run_gap_analysis_for_control(
-    control_id: int,
-    company_id: int,
-    user_id: int,
-    db: Session
-) -> Dict[str, Any]:
+def find_open_gap(db: Session, company_id: int, control_id: int) -> Optional[Gap]:
     """
-    Run gap analysis for a single control.
-    
-    Args:
-        control_id: ID of the control to analyze
-        company_id: ID of the company
-        user_id: ID of the user running the analysis
-        db: Database session
+    Get the open (identified / in remediation) gap for a control in a company.
+    Analysis runs keep at most one open gap per company and control (updated in place).
+    """
+    return (
+        db.query(Gap)
+        .filter(
+            Gap.company_id == company_id,
+            Gap.control_id == control_id,
+            Gap.is_active == True,
+            Gap.status.in_([GapStatus.IDENTIFIED, GapStatus.IN_REMEDIATION])
+        )
+        .order_by(Gap.id.desc())
+        .first()
+    )
+
+
+# Process-wide per-stage latency totals (across controls and runs)
+_stage_stats_lock = threading.Lock()
+_stage_stats: Dict[str, Dict[str, float]] = {}
+
+
+@contextmanager
+def _stage(timings: Dict[str, float], name: str):
+    """
+    Time a pipeline stage into timings[name] (milliseconds) and the process-wide stage stats.
+    Yields the stage's trace span (a no-op when the control is not being traced).
+    """
+    started = time.perf_counter()
+    try:
+        with tracing.span(name) as span:
+            yield span
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        timings[name] = round(elapsed_ms, 1)
+        with _stage_stats_lock:
+            stats = _stage_stats.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+
+def get_stage_stats() -> Dict[str, Dict[str, float]]:
+    """Per-stage count, total/average/max latency (ms) since start (or the last reset)."""
+    with _stage_stats_lock:
+        return {
+            name: {
+                "count": stats["count"],
+                "total_ms": round(stats["total_ms"], 1),
+                "avg_ms": round(stats["total_ms"] / stats["count"], 1) if stats["count"] else 0.0,
+                "max_ms": round(stats["max_ms"], 1)
+            }
+            for name, stats in _stage_stats.items()
+        }
+
+
+def reset_stage_stats() -> None:
+    """Reset the per-stage latency totals."""
+    with _stage_stats_lock:
+        _stage_stats.clear()
+
+
+def _validate_control(control_id: int, db: Session):
+    """
+    Load a control and its framework from the framework catalog cache.
     
     Returns:
-        Dictionary with analysis results
+        (control, framework, None) or (None, None, error_result) when the control can't be analyzed
+        (control and framework are catalog snapshots with the model's column attributes)
     """
     # PART 1: VALIDATE CONTROL IDS BEFORE GAP ANALYSIS
-    # First, get framework from control_group to validate control belongs to framework
-    # We need to validate control exists and belongs to the correct framework
-    control = db.query(Control).join(
-        ControlGroup, Control.control_group_id == ControlGroup.id
-    ).filter(
-        Control.id == control_id
-    ).first()
+    # The catalog resolves control -> group -> framework from memory once the
+    # framework's tree is loaded (no per-control queries)
+    control, tree = framework_catalog.lookup_control(db, control_id)
     
     if not control:
         print(f"[Gap Analysis] ⚠️ Control {control_id} not found in database")
         # Return error result instead of raising exception
-        return {
+        return None, None, {
             "control_id": control_id,
             "control_code": None,
             "control_name": None,
@@ -415,101 +469,18 @@ def run_gap_analysis_for_control(
             "decision_reason": "Control not found in database"
         }
     
-    # Get framework
-    control_group = db.query(ControlGroup).filter(
-        ControlGroup.id == control.control_group_id
-    ).first()
-    
-    if not control_group:
-        print(f"[Gap Analysis] ⚠️ Control group not found for control {control_id}")
-        return {
-            "control_id": control_id,
-            "control_code": control.code,
-            "control_name": control.name,
-            "gap_identified": False,
-            "status": "ERROR",
-            "severity": None,
-            "risk_score": 0,
-            "reason": "Control group not found for this control",
-            "gap_created": False,
-            "gap_id": None,
-            "similar_policies_found": 0,
-            "max_similarity_score": 0.0,
-            "similarity_scores": [],
-            "matched_policy_titles": [],
-            "missing_requirements": [],
-            "control_requirements": [],
-            "decision_reason": "Control group not found"
-        }
-    
-    framework = db.query(Framework).filter(
-        Framework.id == control_group.framework_id
-    ).first()
-    
-    if not framework:
-        print(f"[Gap Analysis] ⚠️ Framework not found for control {control_id}")
-        return {
-            "control_id": control_id,
-            "control_code": control.code,
-            "control_name": control.name,
-            "gap_identified": False,
-            "status": "ERROR",
-            "severity": None,
-            "risk_score": 0,
-            "reason": "Framework not found for this control",
-            "gap_created": False,
-            "gap_id": None,
-            "similar_policies_found": 0,
-            "max_similarity_score": 0.0,
-            "similarity_scores": [],
-            "matched_policy_titles": [],
-            "missing_requirements": [],
-            "control_requirements": [],
-            "decision_reason": "Framework not found"
-        }
-    
-    # FIX 1: CONTROL-SCOPED POLICY CHECK
-    # Check approved policies at control level (not framework level)
-    # This ensures each control is evaluated independently
-    approved_policies_for_control = get_approved_policies_for_control(db, company_id, framework.id, control_id)
-    
-    # FIX 2: REMOVE EARLY RETURNS - Use flags instead
-    # Initialize hard rule flags - these will be checked later, but we continue execution
-    hard_rule_failed = False
-    hard_rule_reason = None
-    
-    if not approved_policies_for_control:
-        print(f"[Gap Analysis] ⚠️ HARD RULE FLAG: No approved policies found for control {control_id}")
-        hard_rule_failed = True
-        hard_rule_reason = "No approved policies found for this control"
-    else:
-        print(f"[Gap Analysis] Found {len(approved_policies_for_control)} approved policies for control {control_id}")
-    
-    # Step 1: Prepare control text and decompose requirements
+    return control, tree.framework, None
+
+
+def _retrieve_policy_chunks(
+    control: Control,
+    framework: Framework,
+    company_id: int,
+    similarity_min: float = SIMILARITY_MIN
+) -> List[Dict[str, Any]]:
+    """Search Pinecone for APPROVED policy chunks mapped to the control (with a name-only fallback search)."""
+    control_id = control.id
     control_text = f"{control.name}\n\n{control.description or ''}"
-    print(f"\n[Gap Analysis] ===== Analyzing Control: {control.name} =====")
-    print(f"[Gap Analysis] Control ID: {control_id}")
-    print(f"[Gap Analysis] Framework: {framework.name} (ID: {framework.id})")
-    print(f"[Gap Analysis] Control text length: {len(control_text)} characters")
-    
-    # STEP 1: CONTROL REQUIREMENT DECOMPOSITION (MANDATORY)
-    control_requirements = decompose_control_requirements(control.name, control.description or "")
-    print(f"[Gap Analysis] Control Requirements ({len(control_requirements)}):")
-    for idx, req in enumerate(control_requirements, 1):
-        print(f"  {idx}. {req}")
-    
-    # Step 1: Prepare control text and decompose requirements
-    control_text = f"{control.name}\n\n{control.description or ''}"
-    print(f"\n[Gap Analysis] ===== Analyzing Control: {control.name} =====")
-    print(f"[Gap Analysis] Control ID: {control_id}")
-    print(f"[Gap Analysis] Framework: {framework.name} (ID: {framework.id})")
-    print(f"[Gap Analysis] Control text length: {len(control_text)} characters")
-    
-    # STEP 1: CONTROL REQUIREMENT DECOMPOSITION (MANDATORY)
-    control_requirements = decompose_control_requirements(control.name, control.description or "")
-    print(f"[Gap Analysis] Control Requirements ({len(control_requirements)}):")
-    for idx, req in enumerate(control_requirements, 1):
-        print(f"  {idx}. {req}")
     
     # Step 2: Search Pinecone for similar policies
     # CRITICAL: Filter by framework_id, control_id, and APPROVED status
@@ -527,18 +498,18 @@ def run_gap_analysis_for_control(
     }
     
     # STEP 2: STRICT SIMILARITY THRESHOLDS
-    # Use SIMILARITY_MIN constant for consistency
+    # The framework's similarity floor (SIMILARITY_MIN unless overridden)
     similar_policies = query_similar_policies(
         query_text=control_text,
         top_k=8,
         filter_metadata=filter_metadata,
-        similarity_threshold=SIMILARITY_MIN  # PART 5: Use constant
+        similarity_threshold=similarity_min  # PART 5: Use framework threshold
     )
-    print(f"[Gap Analysis] Found {len(similar_policies)} similar policies (after {SIMILARITY_MIN} threshold filter)")
+    print(f"[Gap Analysis] Found {len(similar_policies)} similar policies (after {similarity_min} threshold filter)")
     
     # Log similarity scores and policy details
     if similar_policies:
-        print(f"[Gap Analysis] Policy matches (similarity >= {SIMILARITY_MIN}):")
+        print(f"[Gap Analysis] Policy matches (similarity >= {similarity_min}):")
         for idx, policy in enumerate(similar_policies, 1):
             chunk_info = f"chunk {policy.get('chunk_index', 'N/A')}" if policy.get('chunk_index') is not None else "full"
             print(f"  {idx}. {policy.get('title', 'Unknown')} (score: {policy.get('score', 0):.3f}, {chunk_info})")
@@ -552,7 +523,7 @@ def run_gap_analysis_for_control(
             query_text=control.name,  # Just the control name
             top_k=8,
             filter_metadata=filter_metadata,
-            similarity_threshold=SIMILARITY_MIN  # PART 5: Use constant
+            similarity_threshold=similarity_min  # PART 5: Use framework threshold
         )
         if fallback_policies:
             print(f"[Gap Analysis] Fallback search found {len(fallback_policies)} policies")
@@ -561,14 +532,12 @@ def run_gap_analysis_for_control(
                 print(f"  {idx}. {policy.get('title', 'Unknown')} (score: {policy.get('score', 0):.3f}, {chunk_info})")
             similar_policies = fallback_policies
     
-    # Store similarity scores for audit (before AI analysis)
-    similarity_scores = [p.get('score', 0) for p in similar_policies]
-    max_similarity = max(similarity_scores) if similarity_scores else 0.0
-    policy_ids = [p.get('policy_id') for p in similar_policies if p.get('policy_id')]
-    matched_policy_titles = [p.get('title', 'Unknown') for p in similar_policies]
-    
-    print(f"[Gap Analysis] Similarity scores: {similarity_scores}")
-    print(f"[Gap Analysis] Max similarity: {max_similarity:.3f}")
+    return similar_policies
+
+
+def _retrieve_kb_chunks(control: Control, framework: Framework) -> List[Dict[str, Any]]:
+    """Query the framework's Knowledge Base namespace for authoritative reference text."""
+    control_text = f"{control.name}\n\n{control.description or ''}"
     
     # TASK 1: Query Knowledge Base for authoritative reference
     print(f"[Gap Analysis] Querying Knowledge Base for framework {framework.id}...")
@@ -587,30 +556,441 @@ def run_gap_analysis_for_control(
         for idx, kb_chunk in enumerate(knowledge_base_chunks, 1):
             print(f"  {idx}. {kb_chunk.get('title', 'Unknown')} (score: {kb_chunk.get('score', 0):.3f})")
     
-    # FIX 2: REMOVE EARLY RETURNS - Continue execution even if no policies found
+    return knowledge_base_chunks
+
+
+def _format_evidence(
+    approved_policies: List[Policy],
+    similar_policies: List[Dict[str, Any]],
+    knowledge_base_chunks: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Evidence behind a verdict, in the shape returned to the UI."""
+    return {
+        "approved_policies": [
+            {"id": policy.id, "title": policy.title}
+            for policy in approved_policies
+        ],
+        "similar_policies": [
+            {
+                "policy_id": p.get("policy_id"),
+                "title": p.get("title"),
+                "score": p.get("score"),
+                "chunk_index": p.get("chunk_index"),
+                "content": p.get("content")
+            }
+            for p in similar_policies
+        ],
+        "knowledge_base_chunks": [
+            {
+                "kb_doc_id": c.get("kb_doc_id"),
+                "title": c.get("title"),
+                "score": c.get("score"),
+                "text": c.get("text")
+            }
+            for c in knowledge_base_chunks
+        ]
+    }
+
+
+def get_control_evidence(control_id: int, company_id: int, db: Session) -> Dict[str, Any]:
+    """
+    Fetch the full evidence for a control on demand (approved policies, policy chunks,
+    KB chunks), including what a short-circuited analysis skipped. Read-only: no LLM
+    calls and nothing is persisted.
+    
+    Args:
+        control_id: ID of the control
+        company_id: ID of the company
+        db: Database session
+    
+    Returns:
+        Dictionary with control info, evidence and per-stage timings,
+        or an ERROR result when the control cannot be found
+    """
+    timings: Dict[str, float] = {}
+    with _stage(timings, "validate"):
+        control, framework, error_result = _validate_control(control_id, db)
+    if error_result:
+        return error_result
+    
+    with _stage(timings, "policies"):
+        approved_policies = get_approved_policies_for_control(db, company_id, framework.id, control_id)
+    with _stage(timings, "retrieve"):
+        thresholds = get_thresholds(db, framework.id)
+        similar_policies = _retrieve_policy_chunks(control, framework, company_id, thresholds["similarity_min"])
+    with _stage(timings, "knowledge_base"):
+        knowledge_base_chunks = _retrieve_kb_chunks(control, framework)
+    
+    return {
+        "control_id": control_id,
+        "control_code": control.code,
+        "control_name": control.name,
+        "framework_id": framework.id,
+        "framework_name": framework.name,
+        "evidence": _format_evidence(approved_policies, similar_policies, knowledge_base_chunks),
+        "stage_timings_ms": timings
+    }
+
+
+def prepare_control_analysis(
+    control_id: int,
+    company_id: int,
+    db: Session,
+    force: bool = False,
+    detail: bool = False,
+    thresholds_cache: Optional[Dict[int, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Validate a control and gather everything its evaluation depends on
+    (approved policies, retrieved policy chunks, KB chunks, hard-rule flags,
+    input fingerprint and any reusable stored evaluation). Makes no LLM calls.
+    
+    Runs as a staged pipeline with per-stage timing (ctx["timings"]). Stages whose
+    output can no longer change the verdict are skipped: without an approved policy
+    the control is a GAP, so policy-chunk and KB retrieval are not run; without
+    similar chunks above the framework's similarity_min the KB is not queried. With detail=True the
+    skipped retrieval still runs so the evidence can be shown; its results are kept in
+    separate display-only keys (ctx["detail_similar_policies"] / ctx["detail_knowledge_base_chunks"])
+    and never reach the similarity scores, hard rules, risk or the input fingerprint,
+    so the verdict is the same as for a non-detail run.
+    
+    Args:
+        control_id: ID of the control to analyze
+        company_id: ID of the company
+        db: Database session
+        force: Ignore the stored evaluation (and cached LLM responses) even if the inputs are unchanged
+        detail: Also fetch evidence that short-circuited stages would skip
+        thresholds_cache: Framework thresholds already loaded in this run (filled in)
+    
+    Returns:
+        Analysis context for evaluate_control_analysis() / finalize_control_analysis(),
+        or {"error_result": {...}} when the control cannot be analyzed
+    """
+    timings: Dict[str, float] = {}
+    short_circuit = None
+    
+    # Stage: validate
+    with _stage(timings, "validate"):
+        control, framework, error_result = _validate_control(control_id, db)
+        if not error_result:
+            thresholds = get_thresholds(db, framework.id, cache=thresholds_cache)
+    if error_result:
+        return {"error_result": error_result}
+    
+    print(f"\n[Gap Analysis] ===== Analyzing Control: {control.name} =====")
+    print(f"[Gap Analysis] Control ID: {control_id}")
+    print(f"[Gap Analysis] Framework: {framework.name} (ID: {framework.id})")
+    
+    # Stage: approved policies
+    # FIX 1: CONTROL-SCOPED POLICY CHECK
+    # Check approved policies at control level (not framework level)
+    # This ensures each control is evaluated independently
+    with _stage(timings, "policies") as span:
+        approved_policies_for_control = get_approved_policies_for_control(db, company_id, framework.id, control_id)
+        span.set_attribute("approved_policies", len(approved_policies_for_control))
+    
+    # Initialize hard rule flags - a failed hard rule forces a GAP verdict
+    hard_rule_failed = False
+    hard_rule_reason = None
+    
+    if not approved_policies_for_control:
+        print(f"[Gap Analysis] ⚠️ HARD RULE FLAG: No approved policies found for control {control_id}")
+        hard_rule_failed = True
+        hard_rule_reason = "No approved policies found for this control"
+        short_circuit = "policies"
+    else:
+        print(f"[Gap Analysis] Found {len(approved_policies_for_control)} approved policies for control {control_id}")
+    
+    # Stage: retrieve policy chunks (only approved chunks are indexed for retrieval,
+    # so without an approved policy there is nothing to find)
+    # (with detail=True a skipped stage still runs, but only for display)
+    similar_policies = []
+    detail_similar_policies = []
+    if not short_circuit or detail:
+        with _stage(timings, "retrieve") as span:
+            retrieved = _retrieve_policy_chunks(control, framework, company_id, thresholds["similarity_min"])
+            span.set_attributes(
+                chunks=len(retrieved),
+                max_similarity=round(max((p.get('score', 0) for p in retrieved), default=0.0), 4)
+            )
+        if short_circuit:
+            detail_similar_policies = retrieved
+        else:
+            similar_policies = detail_similar_policies = retrieved
+    
+    # Store similarity scores for audit (before AI analysis)
+    similarity_scores = [p.get('score', 0) for p in similar_policies]
+    max_similarity = max(similarity_scores) if similarity_scores else 0.0
+    matched_policy_titles = [p.get('title', 'Unknown') for p in similar_policies]
+    
+    print(f"[Gap Analysis] Similarity scores: {similarity_scores}")
+    print(f"[Gap Analysis] Max similarity: {max_similarity:.3f}")
+    
     # Update hard rule flags based on similarity results
     if not similar_policies or len(similar_policies) == 0:
         print(f"[Gap Analysis] ⚠️ HARD RULE FLAG: No similar policies found (similarity search completed)")
         if not hard_rule_failed:  # Only set if not already set by policy check
             hard_rule_failed = True
             hard_rule_reason = "No similar policies found for this control"
-    elif max_similarity < SIMILARITY_MIN:
-        print(f"[Gap Analysis] ⚠️ HARD RULE FLAG: Max similarity {max_similarity:.3f} < {SIMILARITY_MIN}")
+    elif max_similarity < thresholds["similarity_min"]:
+        print(f"[Gap Analysis] ⚠️ HARD RULE FLAG: Max similarity {max_similarity:.3f} < {thresholds['similarity_min']}")
         if not hard_rule_failed:  # Only set if not already set
             hard_rule_failed = True
-            hard_rule_reason = f"Policy similarity below threshold ({max_similarity:.3f} < {SIMILARITY_MIN})"
+            hard_rule_reason = f"Policy similarity below threshold ({max_similarity:.3f} < {thresholds['similarity_min']})"
+    if hard_rule_failed and not short_circuit:
+        short_circuit = "retrieve"
+    
+    # Stage: knowledge base (only consulted when the verdict is still open)
+    knowledge_base_chunks = []
+    detail_knowledge_base_chunks = []
+    if not short_circuit or detail:
+        with _stage(timings, "knowledge_base") as span:
+            retrieved = _retrieve_kb_chunks(control, framework)
+            span.set_attribute("chunks", len(retrieved))
+        if short_circuit:
+            detail_knowledge_base_chunks = retrieved
+        else:
+            knowledge_base_chunks = detail_knowledge_base_chunks = retrieved
+    
+    if short_circuit:
+        print(f"[Gap Analysis] ⚡ Short-circuit after '{short_circuit}' stage: {hard_rule_reason}")
+    
+    # Stage: cache - reuse the stored evaluation when none of its inputs changed.
+    with _stage(timings, "cache") as span:
+        input_fingerprint = compute_analysis_fingerprint(
+            control=control,
+            framework_name=framework.name,
+            approved_policies=approved_policies_for_control,
+            similar_policies=similar_policies,
+            knowledge_base_chunks=knowledge_base_chunks
+        )
+        cached_entry = None if force else get_cached_evaluation(db, company_id, control_id, input_fingerprint)
+        span.set_attribute("hit", cached_entry is not None)
+    if cached_entry:
+        print(f"[Gap Analysis] ✓ Inputs unchanged (fingerprint {input_fingerprint[:12]}) - reusing stored evaluation")
     
-    # FIX 2: AI ANALYSIS ALWAYS RUNS (even if hard rules failed)
-    # This ensures AI evaluation influences the output
-    print(f"[Gap Analysis] Calling OpenAI for gap analysis evaluation...")
-    gap_analysis = generate_gap_analysis(
+    return {
+        "control_id": control_id,
+        "control": control,
+        "framework": framework,
+        "thresholds": thresholds,
+        "approved_policies_for_control": approved_policies_for_control,
+        "hard_rule_failed": hard_rule_failed,
+        "hard_rule_reason": hard_rule_reason,
+        "short_circuit": short_circuit,
+        "detail": detail,
+        "force": force,
+        "timings": timings,
+        "similar_policies": similar_policies,
+        "similarity_scores": similarity_scores,
+        "max_similarity": max_similarity,
+        "matched_policy_titles": matched_policy_titles,
+        "knowledge_base_chunks": knowledge_base_chunks,
+        "detail_similar_policies": detail_similar_policies,
+        "detail_knowledge_base_chunks": detail_knowledge_base_chunks,
+        "input_fingerprint": input_fingerprint,
+        "cached_entry": cached_entry,
+        "control_requirements": cached_entry.control_requirements if cached_entry else None,
+        "gap_analysis": cached_entry.evaluation if cached_entry else None
+    }
+
+
+def _evaluate_cheap_tiers(ctx: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Run the cascade's rules/classification tiers for a prepared control (None = needs full evaluation)."""
+    # Short-circuited controls are settled by the rules tier even with the cascade disabled
+    if not settings.GAP_CASCADE_ENABLED and not ctx.get("short_circuit"):
+        return None
+    control = ctx["control"]
+    compliance_possible = (
+        len(ctx["approved_policies_for_control"]) > 0
+        and ctx["max_similarity"] >= ctx["thresholds"]["auto_compliant"]
+    )
+    return evaluate_cheap_tiers(
         control_name=control.name,
         control_description=control.description or "",
-        similar_policies=similar_policies,
-        framework_name=framework.name,
-        control_requirements=control_requirements,
-        knowledge_base_chunks=knowledge_base_chunks
+        framework_name=ctx["framework"].name,
+        similar_policies=ctx["similar_policies"],
+        knowledge_base_chunks=ctx["knowledge_base_chunks"],
+        hard_rule_failed=ctx["hard_rule_failed"],
+        hard_rule_reason=ctx["hard_rule_reason"],
+        compliance_possible=compliance_possible,
+        max_similarity=ctx["max_similarity"]
     )
+
+
+def evaluate_control_analysis(ctx: Dict[str, Any]) -> None:
+    """
+    Run the LLM steps for a prepared control through the evaluation cascade:
+    deterministic rules, then a short classification call, and only for ambiguous
+    controls requirement decomposition + the full evaluation.
+    Stores control_requirements and gap_analysis in the context.
+    """
+    with _stage(ctx["timings"], "evaluate") as span, _llm_cache_scope(ctx):
+        _evaluate_control(ctx)
+        span.set_attributes(
+            tier=ctx["gap_analysis"].get("evaluation_tier"),
+            coverage_level=ctx["gap_analysis"].get("coverage_level"),
+            requirements=len(ctx["control_requirements"] or [])
+        )
+
+
+def _llm_cache_scope(ctx: Dict[str, Any]):
+    """Forced re-analysis must reach the model, not the LLM response cache."""
+    return llm_cache_bypass() if ctx.get("force") else nullcontext()
+
+
+def _direct_equivalent(
+    equivalents: Dict[int, Dict[int, str]],
+    ctx: Dict[str, Any],
+    candidates: Dict[int, Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """First of candidates (control ID -> context) with a direct approved pair to the control, if any."""
+    for equivalent_id in sorted(equivalents.get(ctx.get("control_id"), {})):
+        if equivalent_id in candidates:
+            return candidates[equivalent_id]
+    return None
+
+
+def _is_projectable(evaluation: Optional[Dict[str, Any]]) -> bool:
+    """Only successful full evaluations of the control itself are projected onto equivalent controls."""
+    return bool(evaluation) and evaluation.get("evaluation_tier") == TIER_FULL and not evaluation.get("evaluation_failed")
+
+
+def _project_evaluation(ctx: Dict[str, Any], source_ctx: Dict[str, Any], pair_source: str) -> None:
+    """
+    Reuse the full evaluation of a directly equivalent control for a prepared
+    control, with its provenance. The control's own evidence (approved policies,
+    similarity, KB chunks) still drives its decision in finalize_control_analysis().
+    """
+    started = time.perf_counter()
+    source = source_ctx["control"]
+    evaluation = copy.deepcopy(source_ctx["gap_analysis"])
+    evaluation["evaluation_tier"] = TIER_EQUIVALENCE
+    evaluation["equivalence"] = {
+        "projected_from_control_id": source.id,
+        "projected_from_code": source.code,
+        "projected_from_framework_id": source_ctx["framework"].id,
+        "pair_source": pair_source
+    }
+    ctx["control_requirements"] = list(source_ctx["control_requirements"] or [])
+    ctx["gap_analysis"] = evaluation
+    record_tier(TIER_EQUIVALENCE, time.perf_counter() - started)
+    print(f"[Gap Analysis] ✓ Control {ctx['control_id']}: reusing the evaluation of equivalent control {source.code or source.id}")
+
+
+def _evaluate_control(ctx: Dict[str, Any]) -> None:
+    control = ctx["control"]
+    framework = ctx["framework"]
+    similar_policies = ctx["similar_policies"]
+    knowledge_base_chunks = ctx["knowledge_base_chunks"]
+    
+    settled = _evaluate_cheap_tiers(ctx)
+    if settled is not None:
+        ctx["control_requirements"] = []
+        ctx["gap_analysis"] = settled
+        return
+    
+    started = time.perf_counter()
+    with track_llm_usage() as usage:
+        # STEP 1: CONTROL REQUIREMENT DECOMPOSITION (MANDATORY)
+        control_requirements = decompose_control_requirements(control.name, control.description or "")
+        print(f"[Gap Analysis] Control Requirements ({len(control_requirements)}):")
+        for idx, req in enumerate(control_requirements, 1):
+            print(f"  {idx}. {req}")
+        
+        print(f"[Gap Analysis] Calling OpenAI for gap analysis evaluation...")
+        gap_analysis = generate_gap_analysis(
+            control_name=control.name,
+            control_description=control.description or "",
+            similar_policies=similar_policies,
+            framework_name=framework.name,
+            control_requirements=control_requirements,
+            knowledge_base_chunks=knowledge_base_chunks
+        )
+    record_tier(TIER_FULL, time.perf_counter() - started, usage)
+    gap_analysis["evaluation_tier"] = TIER_FULL
+    
+    ctx["control_requirements"] = control_requirements
+    ctx["gap_analysis"] = gap_analysis
+
+
+def finalize_control_analysis(
+    ctx: Dict[str, Any],
+    company_id: int,
+    user_id: int,
+    db: Session,
+    writer: Optional[GapResultWriter] = None
+) -> Dict[str, Any]:
+    """
+    Apply the centralized decision logic to an evaluated control and persist the
+    evaluation, policy dependencies and gap/remediation.
+    
+    Args:
+        ctx: Context from prepare_control_analysis() / evaluate_control_analysis()
+        company_id: ID of the company
+        user_id: ID of the user running the analysis
+        db: Database session
+        writer: Run-wide writer to queue the writes on (the caller flushes it, which
+            fills in gap_id / gap_created); without one they are committed right away
+    
+    Returns:
+        Dictionary with analysis results, including the short-circuit stage (if any),
+        per-stage timings and, for detail runs, the retrieved evidence
+    """
+    timings = ctx["timings"]
+    with _stage(timings, "persist") as span:
+        if writer is None:
+            own_writer = GapResultWriter(company_id)
+            result = _finalize_control(ctx, user_id, own_writer)
+            failed = own_writer.flush(db)
+            if failed:
+                raise failed[ctx["control_id"]]
+            span.set_attributes(gap_created=result.get("gap_created"), gap_id=result.get("gap_id"))
+        else:
+            result = _finalize_control(ctx, user_id, writer)
+    
+    tracing.current_span().set_attributes(
+        control_code=result.get("control_code"),
+        status=result.get("status"),
+        evaluation_tier=result.get("evaluation_tier"),
+        cached=result.get("cached"),
+        short_circuit=ctx["short_circuit"]
+    )
+    result["short_circuit"] = ctx["short_circuit"]
+    result["stage_timings_ms"] = timings
+    print(f"[Gap Analysis] Stage timings (ms) for control {ctx['control_id']}: {timings}")
+    if ctx["detail"]:
+        result["evidence"] = _format_evidence(
+            ctx["approved_policies_for_control"],
+            ctx["detail_similar_policies"],
+            ctx["detail_knowledge_base_chunks"]
+        )
+    return result
+
+
+def _finalize_control(
+    ctx: Dict[str, Any],
+    user_id: int,
+    writer: GapResultWriter
+) -> Dict[str, Any]:
+    control_id = ctx["control_id"]
+    control = ctx["control"]
+    framework = ctx["framework"]
+    approved_policies_for_control = ctx["approved_policies_for_control"]
+    hard_rule_failed = ctx["hard_rule_failed"]
+    hard_rule_reason = ctx["hard_rule_reason"]
+    similar_policies = ctx["similar_policies"]
+    similarity_scores = ctx["similarity_scores"]
+    max_similarity = ctx["max_similarity"]
+    matched_policy_titles = ctx["matched_policy_titles"]
+    knowledge_base_chunks = ctx["knowledge_base_chunks"]
+    input_fingerprint = ctx["input_fingerprint"]
+    cached_entry = ctx["cached_entry"]
+    control_requirements = ctx["control_requirements"]
+    gap_analysis = ctx["gap_analysis"]
+    thresholds = ctx["thresholds"]
+    auto_compliant = thresholds["auto_compliant"]
+    
     print(f"[Gap Analysis] AI Evaluation Result:")
     print(f"  - Coverage Level: {gap_analysis.get('coverage_level', 'NONE')}")
     print(f"  - Missing Requirements: {gap_analysis.get('missing_requirements', [])}")
@@ -644,18 +1024,18 @@ def run_gap_analysis_for_control(
     
     # A control is COMPLIANT only if ALL conditions are met:
     # - At least one APPROVED policy exists (control-scoped)
-    # - max_policy_similarity >= 0.85
+    # - max_policy_similarity >= auto_compliant (0.85 unless the framework overrides it)
     # - coverage_level == "FULL"
     # - knowledge_base_alignment == "MATCH"
     
     has_approved_policy = len(approved_policies_for_control) > 0  # FIX 1: Use control-scoped policies
-    similarity_meets_threshold = max_similarity >= 0.85
+    similarity_meets_threshold = max_similarity >= auto_compliant
     coverage_is_full = coverage_level == "FULL"
     kb_alignment_matches = kb_alignment == "MATCH"
     
     print(f"[Gap Analysis] Decision Criteria:")
     print(f"  - Has Approved Policy (control-scoped): {has_approved_policy}")
-    print(f"  - Similarity >= 0.85: {similarity_meets_threshold} ({max_similarity:.3f})")
+    print(f"  - Similarity >= {auto_compliant}: {similarity_meets_threshold} ({max_similarity:.3f})")
     print(f"  - Coverage FULL: {coverage_is_full} ({coverage_level})")
     print(f"  - KB Alignment MATCH: {kb_alignment_matches} ({kb_alignment})")
     print(f"  - Hard Rule Failed: {hard_rule_failed} ({hard_rule_reason})")
@@ -675,7 +1055,7 @@ def run_gap_analysis_for_control(
         if not has_approved_policy:
             print(f"  - Missing: Approved policy for this control")
         if not similarity_meets_threshold:
-            print(f"  - Missing: Similarity >= 0.85 (current: {max_similarity:.3f})")
+            print(f"  - Missing: Similarity >= {auto_compliant} (current: {max_similarity:.3f})")
         if not coverage_is_full:
             print(f"  - Missing: Coverage FULL (current: {coverage_level})")
         if not kb_alignment_matches:
@@ -683,14 +1063,27 @@ def run_gap_analysis_for_control(
         if hard_rule_failed:
             print(f"  - Hard Rule Failed: {hard_rule_reason}")
     
+    # Stored evaluation for unchanged-input reuse (kept as is when this run reused it).
+    # A projected evaluation is not stored: its fingerprint would only cover this control's
+    # inputs, not the source control's evidence or the equivalence pair, so it is redone each run.
+    projected = (gap_analysis or {}).get("evaluation_tier") == TIER_EQUIVALENCE
+    evaluation_entry = None if cached_entry or projected else {
+        "control_id": control_id,
+        "framework_id": framework.id,
+        "fingerprint": input_fingerprint,
+        "control_requirements": control_requirements,
+        "evaluation": gap_analysis,
+        "status": status
+    }
+    
     # If status is GAP, create gap record
     if status == "GAP":
         # FIX 3: DYNAMIC RISK SCORE CALCULATION
         # Calculate risk score based on similarity (not hardcoded)
-        risk_score = calculate_risk_score(max_similarity)
+        risk_score = calculate_risk_score(max_similarity, thresholds)
         
         # FIX 4: SEVERITY BASED ON RISK SCORE
-        severity, severity_str = calculate_severity_from_risk(risk_score)
+        severity, severity_str = calculate_severity_from_risk(risk_score, thresholds)
         
         # FIX 5: AI RESULT SHOULD OVERRIDE GENERIC HARD-RULE TEXT
         # Use AI explanation if available, otherwise use hard rule reason
@@ -707,24 +1100,32 @@ def run_gap_analysis_for_control(
             if missing_requirements:
                 gap_description += f". Missing requirements: {', '.join(missing_requirements[:3])}"
         
-        gap = Gap(
-            title=f"Gap in {control.code or control.name}",
-            description=gap_description,
-            severity=severity,
-            status=GapStatus.IDENTIFIED,
-            framework_id=framework.id,
-            control_id=control.id,
-            identified_by_id=user_id,
-            risk_score=float(risk_score),
-            root_cause=f"Centralized Decision: similarity={max_similarity:.3f}, coverage={coverage_level}, kb_alignment={kb_alignment}, hard_rule={hard_rule_reason or 'None'}",
-            identified_date=datetime.utcnow(),
-            is_active=True
-        )
-        db.add(gap)
-        db.flush()
-        gap_id = gap.id
+        gap_row = {
+            "title": f"Gap in {control.code or control.name}",
+            "description": gap_description,
+            "severity": severity,
+            "status": GapStatus.IDENTIFIED,
+            "framework_id": framework.id,
+            "control_id": control.id,
+            "identified_by_id": user_id,
+            "risk_score": float(risk_score),
+            "root_cause": f"Centralized Decision: similarity={max_similarity:.3f}, coverage={coverage_level}, kb_alignment={kb_alignment}, hard_rule={hard_rule_reason or 'None'}",
+            "identified_date": datetime.utcnow(),
+            "evidence": {
+                "max_similarity": round(max_similarity, 4),
+                "similarity_scores": [round(score, 4) for score in similarity_scores],
+                "matched_policy_titles": matched_policy_titles,
+                "missing_requirements": missing_requirements,
+                "coverage_level": coverage_level,
+                "kb_alignment": kb_alignment,
+                "evaluation_tier": gap_analysis.get("evaluation_tier"),
+                "equivalence": gap_analysis.get("equivalence"),
+                "input_fingerprint": input_fingerprint
+            },
+            "is_active": True
+        }
         
-        # Create remediation
+        # Remediation (only used when the control has no open gap yet)
         remediation_suggestions = gap_analysis.get("remediation_suggestions", [
             "Review and update policies to address all control requirements",
             "Ensure policy explicitly covers all mandatory requirements",
@@ -732,31 +1133,30 @@ def run_gap_analysis_for_control(
             "Document implementation steps",
             "Establish monitoring to verify compliance"
         ])
-        
-        remediation = Remediation(
-            title=f"Remediation for {control.code or control.name}",
-            description="Remediation plan to address identified gap",
-            action_plan="\n".join([f"{idx + 1}. {suggestion}" for idx, suggestion in enumerate(remediation_suggestions)]),
-            status=RemediationStatus.PLANNED,
-            gap_id=gap.id,
-            assigned_to_id=user_id,
-            is_active=True
-        )
-        db.add(remediation)
-        db.commit()
+        remediation_row = {
+            "title": f"Remediation for {control.code or control.name}",
+            "description": "Remediation plan to address identified gap",
+            "action_plan": "\n".join([f"{idx + 1}. {suggestion}" for idx, suggestion in enumerate(remediation_suggestions)]),
+            "status": RemediationStatus.PLANNED,
+            "assigned_to_id": user_id,
+            "is_active": True
+        }
         
         # FIX 8: PRESERVE EXISTING OUTPUT FORMAT
-        return {
+        result = {
             "control_id": control_id,
             "control_code": control.code,
             "control_name": control.name,
+            "framework_id": framework.id,
             "gap_identified": True,
             "status": status,
             "severity": severity_str,
             "risk_score": risk_score,  # FIX 3: Dynamic risk score
-            "gap_created": True,
-            "gap_id": gap_id,
+            "gap_created": False,  # Filled in when the writer is flushed
+            "gap_id": None,
             "similar_policies_found": len(similar_policies),
+            "approved_policies_found": len(approved_policies_for_control),
+            "kb_chunks_found": len(knowledge_base_chunks),
             "max_similarity_score": max_similarity,
             "similarity_scores": similarity_scores,
             "reason": gap_description,  # FIX 5: AI result or hard rule reason
@@ -765,17 +1165,31 @@ def run_gap_analysis_for_control(
             "control_requirements": control_requirements,
             "coverage_level": coverage_level,
             "kb_alignment": kb_alignment,
-            "decision_reason": hard_rule_reason or f"Centralized Decision: similarity={max_similarity:.3f}, coverage={coverage_level}, kb_alignment={kb_alignment}"
+            "decision_reason": hard_rule_reason or f"Centralized Decision: similarity={max_similarity:.3f}, coverage={coverage_level}, kb_alignment={kb_alignment}",
+            "cached": cached_entry is not None,
+            "evaluation_tier": gap_analysis.get("evaluation_tier"),
+            "equivalence": gap_analysis.get("equivalence"),
+            "input_fingerprint": input_fingerprint
         }
+        # Upserted on (company, control, open): a gap already open for this control
+        # is refreshed in place instead of duplicated
+        writer.add(
+            result,
+            similar_policies,
+            evaluation=evaluation_entry,
+            gap=gap_row,
+            remediation=remediation_row
+        )
+        return result
     else:
         # Status is COMPLIANT - no gap created
         print(f"[Gap Analysis] ✓✓✓ COMPLIANT - No gap created")
-        db.commit()
         # FIX 8: PRESERVE EXISTING OUTPUT FORMAT
-        return {
+        result = {
             "control_id": control_id,
             "control_code": control.code,
             "control_name": control.name,
+            "framework_id": framework.id,
             "gap_identified": False,
             "status": status,
             "severity": None,
@@ -783,6 +1197,8 @@ def run_gap_analysis_for_control(
             "gap_created": False,
             "gap_id": None,
             "similar_policies_found": len(similar_policies),
+            "approved_policies_found": len(approved_policies_for_control),
+            "kb_chunks_found": len(knowledge_base_chunks),
             "max_similarity_score": max_similarity,
             "similarity_scores": similarity_scores,
             "matched_policy_titles": matched_policy_titles,
@@ -792,331 +1208,274 @@ def run_gap_analysis_for_control(
             "missing_requirements": [],
             "covered_requirements": covered_requirements,
             "control_requirements": control_requirements,
-            "decision_reason": f"All conditions met: similarity={max_similarity:.3f}, coverage={coverage_level}, kb_alignment={kb_alignment}"
+            "decision_reason": f"All conditions met: similarity={max_similarity:.3f}, coverage={coverage_level}, kb_alignment={kb_alignment}",
+            "cached": cached_entry is not None,
+            "evaluation_tier": gap_analysis.get("evaluation_tier"),
+            "equivalence": gap_analysis.get("equivalence"),
+            "input_fingerprint": input_fingerprint
         }
+        writer.add(result, similar_policies, evaluation=evaluation_entry)
+        return result
+
+
+def run_gap_analysis_for_control(
+    control_id: int,
+    company_id: int,
+    user_id: int,
+    db: Session,
+    force: bool = False,
+    detail: bool = False
+) -> Dict[str, Any]:
+    """
+    Run gap analysis for a single control.
     
-    # Legacy code below - should not be reached due to centralized decision above
-    # PART 6: HARD RULE - PARTIAL or NONE coverage ALWAYS results in GAP
-    if coverage_level in ["PARTIAL", "NONE"]:
-        print(f"[Gap Analysis] ⚠️ HARD RULE: Coverage level is {coverage_level} → GAP IDENTIFIED (no partial compliance allowed)")
-        gap_identified = True
-        
-        # Calculate risk score based on coverage level
-        if coverage_level == "NONE":
-            risk_score = 85
-            severity_str = "HIGH"
-            severity = GapSeverity.HIGH
-        else:  # PARTIAL
-            risk_score = 65  # Medium-high risk for partial coverage
-            severity_str = "HIGH"
-            severity = GapSeverity.HIGH
-        
-        # Create gap immediately
-        gap = Gap(
-            title=f"Gap in {control.code or control.name}",
-            description=f"Control requirements not fully covered ({coverage_level} coverage). Missing requirements: {', '.join(missing_requirements[:3]) if missing_requirements else 'N/A'}",
-            severity=severity,
-            status=GapStatus.IDENTIFIED,
-            framework_id=framework.id,
-            control_id=control.id,
-            identified_by_id=user_id,
-            risk_score=float(risk_score),
-            root_cause=f"HARD RULE: Coverage level is {coverage_level} (not FULL). Control requirements: {', '.join(control_requirements[:5])}. Missing requirements: {', '.join(missing_requirements[:5]) if missing_requirements else 'All requirements'}. Similarity: {max_similarity:.3f}.",
-            identified_date=datetime.utcnow(),
-            is_active=True
-        )
-        db.add(gap)
-        db.flush()
-        gap_id = gap.id
-        
-        # Create remediation
-        remediation_suggestions = [
-            f"Update policy to fully address all control requirements (currently {coverage_level} coverage)",
-            "Ensure policy explicitly covers all mandatory requirements",
-            "Review and enhance policy content to achieve FULL coverage",
-            "Document implementation steps for missing requirements",
-            "Establish monitoring to verify full compliance"
-        ]
+    The LLM evaluation is stored with a fingerprint of its inputs (control text,
+    approved policies, matched policy chunks, KB chunks). When the fingerprint
+    matches, the stored evaluation is reused and only the decision logic re-runs.
+    
+    Args:
+        control_id: ID of the control to analyze
+        company_id: ID of the company
+        user_id: ID of the user running the analysis
+        db: Database session
+        force: Re-run the LLM evaluation even if the inputs are unchanged
+        detail: Also fetch and return the evidence that short-circuited stages skip
+    
+    Returns:
+        Dictionary with analysis results
+    """
+    with tracing.start_trace("gap_analysis.control", control_id=control_id, company_id=company_id, force=force):
+        ctx = prepare_control_analysis(control_id, company_id, db, force=force, detail=detail)
+        if "error_result" in ctx:
+            return ctx["error_result"]
         
-        remediation = Remediation(
-            title=f"Remediation for {control.code or control.name}",
-            description=f"Remediation plan to achieve FULL coverage (currently {coverage_level})",
-            action_plan="\n".join([f"{idx + 1}. {suggestion}" for idx, suggestion in enumerate(remediation_suggestions)]),
-            status=RemediationStatus.PLANNED,
-            gap_id=gap.id,
-            assigned_to_id=user_id,
-            is_active=True
-        )
-        db.add(remediation)
-        db.commit()
+        if not ctx["cached_entry"]:
+            evaluate_control_analysis(ctx)
         
+        return finalize_control_analysis(ctx, company_id, user_id, db)
+
+
+def run_gap_analysis_for_controls(
+    control_ids: List[int],
+    company_id: int,
+    user_id: int,
+    db: Session,
+    force: bool = False,
+    detail: bool = False,
+    run_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run gap analysis for several controls, packing the LLM evaluations of
+    controls that need one into batched requests (see generate_gap_analysis_batch;
+    with GAP_EVAL_BATCH_ENABLED off each control is evaluated on its own).
+    All gaps, remediations and stored evaluations of the run are written in bulk
+    in one transaction (see GapResultWriter).
+    
+    Args:
+        control_ids: IDs of the controls to analyze
+        company_id: ID of the company
+        user_id: ID of the user running the analysis
+        db: Database session
+        force: Re-run the LLM evaluation even if the inputs are unchanged
+        detail: Also fetch and return the evidence that short-circuited stages skip
+        run_id: Analysis run (start_analysis_run) to record the results in
+    
+    Returns:
+        One result per control ID, in input order (same shape as run_gap_analysis_for_control;
+        failures are returned with status "ERROR")
+    """
+    def error_result(control_id: int, error: Exception) -> Dict[str, Any]:
         return {
             "control_id": control_id,
-            "control_code": control.code,
-            "control_name": control.name,
-            "gap_identified": True,
-            "status": "GAP",
-            "severity": severity_str,
-            "risk_score": risk_score,
-            "gap_created": True,
-            "gap_id": gap_id,
-            "similar_policies_found": len(similar_policies),
-            "max_similarity_score": max_similarity,
-            "similarity_scores": similarity_scores,
-            "reason": f"Control requirements not fully covered ({coverage_level} coverage)",
-            "matched_policy_titles": matched_policy_titles,
-            "missing_requirements": missing_requirements if missing_requirements else control_requirements,
-            "control_requirements": control_requirements,
-            "decision_reason": f"HARD RULE: Coverage level is {coverage_level} (not FULL)",
-            "gap_description": f"Control requirements not fully covered ({coverage_level} coverage)",
-            "remediation_suggestions": remediation_suggestions,
-            "coverage_level": coverage_level
+            "control_code": None,
+            "control_name": None,
+            "gap_identified": False,
+            "status": "ERROR",
+            "severity": None,
+            "risk_score": 0,
+            "reason": f"Error analyzing control: {str(error)}",
+            "gap_created": False,
+            "gap_id": None
         }
     
-    # Check if all control requirements are covered (only if coverage_level == "FULL")
-    all_requirements_covered = False
-    if control_requirements:
-        # Normalize for comparison
-        covered_normalized = [r.lower().strip() for r in covered_requirements]
-        required_normalized = [r.lower().strip() for r in control_requirements]
-        
-        # Check if all requirements have corresponding coverage
-        all_covered = all(
-            any(
-                req in covered or covered in req or 
-                any(keyword in covered for keyword in req.split()[:3] if len(keyword) > 4)
-                for covered in covered_normalized
-            )
-            for req in required_normalized
+    # Stage 1: retrieval and cache lookup for every control (no LLM calls).
+    # Each control keeps its own trace across the three passes.
+    contexts: List[Any] = []
+    traces: List[Optional[tracing.Trace]] = []
+    thresholds_cache: Dict[int, Dict[str, Any]] = {}
+    for control_id in control_ids:
+        trace = tracing.begin_trace(
+            "gap_analysis.control", control_id=control_id, company_id=company_id, force=force,
+            batched=settings.GAP_EVAL_BATCH_ENABLED
         )
-        all_requirements_covered = all_covered
-        print(f"[Gap Analysis] Requirements coverage: {len(covered_requirements)}/{len(control_requirements)} covered")
-    
-    # PART 5: GAP DECISION (FINAL TRUTH TABLE)
-    # Evaluate all conditions for explicit gap decision
-    
-    # Check all conditions
-    no_approved_policy = len(approved_policies) == 0
-    no_similar_policy = len(similar_policies) == 0
-    similarity_below_threshold = max_similarity < SIMILARITY_MIN
-    coverage_not_full = coverage_level != "FULL"
-    requirements_not_covered = not all_requirements_covered if control_requirements else True
-    
-    # PART 5: GAP DECISION (FINAL TRUTH TABLE)
-    # gap_identified = (
-    #     no_approved_policy
-    #     or no_similar_policy
-    #     or max_similarity < 0.72
-    #     or coverage_level != "FULL"
-    #     or not all_requirements_covered
-    # )
-    gap_identified = (
-        no_approved_policy
-        or no_similar_policy
-        or similarity_below_threshold
-        or coverage_not_full
-        or requirements_not_covered
-    )
-    
-    # PART 6: Only compliant if max_similarity >= AUTO_COMPLIANT AND coverage_level == "FULL"
-    # Since we already checked for PARTIAL/NONE above, at this point coverage_level must be "FULL"
-    auto_compliant = (max_similarity >= AUTO_COMPLIANT and coverage_level == "FULL")
-    
-    # If auto-compliant, override gap_identified
-    if auto_compliant:
-        gap_identified = False
-        decision_reason = f"Auto-compliant: similarity {max_similarity:.3f} >= {AUTO_COMPLIANT} and coverage_level == FULL"
-        reason = "Control requirements fully covered"
-        risk_score = round(max_similarity * 100)
-        severity_str = "low"
-        print(f"[Gap Analysis] ✓ Auto-compliant: similarity {max_similarity:.3f} >= {AUTO_COMPLIANT} AND coverage == FULL")
-    else:
-        # Even if coverage is FULL, if similarity < AUTO_COMPLIANT, it's still a gap
-        if coverage_level == "FULL" and max_similarity < AUTO_COMPLIANT:
-            print(f"[Gap Analysis] ⚠️ Coverage is FULL but similarity {max_similarity:.3f} < {AUTO_COMPLIANT} → GAP")
-            gap_identified = True
-        
-        # Determine reason and risk score based on which condition(s) triggered
-        reasons_list = []
-        if no_approved_policy:
-            reasons_list.append("No approved policies")
-        if no_similar_policy:
-            reasons_list.append("No similar policies found")
-        if similarity_below_threshold:
-            reasons_list.append(f"Similarity {max_similarity:.3f} < {SIMILARITY_MIN}")
-        if coverage_not_full:
-            reasons_list.append(f"Coverage level: {coverage_level} (not FULL)")
-        if requirements_not_covered:
-            reasons_list.append("Not all requirements covered")
-        
-        decision_reason = "Gap identified: " + ", ".join(reasons_list) if reasons_list else "Gap identified"
-        
-        # Set reason and risk score
-        if missing_requirements:
-            reason = f"Missing requirements: {', '.join(missing_requirements[:3])}"
-        elif coverage_not_full:
-            reason = gap_analysis.get("gap_description", f"Control requirements not fully covered ({coverage_level} coverage)")
-        elif requirements_not_covered:
-            reason = "Not all control requirements explicitly covered"
+        traces.append(trace)
+        try:
+            with tracing.activate(trace):
+                contexts.append(prepare_control_analysis(
+                    control_id, company_id, db, force=force, detail=detail, thresholds_cache=thresholds_cache
+                ))
+        except Exception as e:
+            db.rollback()
+            print(f"[Gap Analysis] Error preparing control {control_id}: {str(e)}")
+            contexts.append(error_result(control_id, e))
+            if trace:
+                trace.finish(e)
+    
+    # Stage 2: settle clear-cut controls with the cheap cascade tiers, then decompose
+    # requirements and evaluate the rest in packed batches. A control with a direct
+    # approved equivalence pair to one already evaluated (stored or in this run)
+    # reuses that evaluation instead.
+    equivalents = get_equivalent_controls(db, [ctx["control_id"] for ctx in contexts if "control" in ctx])
+    evaluated: Dict[int, Dict[str, Any]] = {
+        ctx["control_id"]: ctx for ctx in contexts
+        if "control" in ctx and ctx["control_id"] in equivalents
+        and ctx.get("cached_entry") and _is_projectable(ctx["gap_analysis"])
+    }
+    pending = []
+    pending_by_id: Dict[int, Dict[str, Any]] = {}
+    pending_traces = []
+    projected = []
+    for idx, (control_id, ctx, trace) in enumerate(zip(control_ids, contexts, traces)):
+        if "control" not in ctx or ctx["cached_entry"]:
+            continue
+        has_equivalents = control_id in equivalents
+        if not settings.GAP_EVAL_BATCH_ENABLED and not _direct_equivalent(equivalents, ctx, evaluated):
+            try:
+                with tracing.activate(trace):
+                    evaluate_control_analysis(ctx)
+                if has_equivalents and _is_projectable(ctx["gap_analysis"]):
+                    evaluated[control_id] = ctx
+            except Exception as e:
+                print(f"[Gap Analysis] Error evaluating control {control_id}: {str(e)}")
+                contexts[idx] = error_result(control_id, e)
+                if trace:
+                    trace.finish(e)
+            continue
+        with tracing.activate(trace), _stage(ctx["timings"], "evaluate") as span, _llm_cache_scope(ctx):
+            settled = _evaluate_cheap_tiers(ctx)
+            if settled is not None:
+                span.set_attributes(tier=settled.get("evaluation_tier"), coverage_level=settled.get("coverage_level"))
+        if settled is not None:
+            ctx["control_requirements"] = []
+            ctx["gap_analysis"] = settled
+        elif has_equivalents and (_direct_equivalent(equivalents, ctx, evaluated) or _direct_equivalent(equivalents, ctx, pending_by_id)):
+            projected.append((ctx, trace))
         else:
-            reason = gap_analysis.get("gap_description", "Control requirements not fully covered")
-        
-        # Calculate risk score based on conditions
-        if no_approved_policy or no_similar_policy:
-            risk_score = 85.0
-        elif similarity_below_threshold:
-            risk_score = round((1 - max_similarity) * 100) if max_similarity > 0 else 85.0
+            pending.append(ctx)
+            pending_by_id[control_id] = ctx
+            pending_traces.append(trace)
+    
+    if pending:
+        started = time.perf_counter()
+        started_ns = time.time_ns()
+        # The shared batch gets a trace of its own (decomposition and batched LLM calls)
+        with tracing.start_trace("gap_analysis.evaluate_batch", controls=len(pending), company_id=company_id) as batch_span, \
+                track_llm_usage() as usage, (llm_cache_bypass() if force else nullcontext()):
+            items = []
+            for ctx in pending:
+                control = ctx["control"]
+                ctx["control_requirements"] = decompose_control_requirements(control.name, control.description or "")
+                items.append({
+                    "control_name": control.name,
+                    "control_description": control.description or "",
+                    "similar_policies": ctx["similar_policies"],
+                    "framework_name": ctx["framework"].name,
+                    "control_requirements": ctx["control_requirements"],
+                    "knowledge_base_chunks": ctx["knowledge_base_chunks"]
+                })
+            print(f"[Gap Analysis] Evaluating {len(pending)} control(s) with batched prompts ({len(contexts) - len(pending)} settled/reused/errored)")
+            evaluations = generate_gap_analysis_batch(items)
+            batch_span.set_attributes(prompt_tokens=usage["prompt_tokens"], completion_tokens=usage["completion_tokens"])
+        elapsed = time.perf_counter() - started
+        record_tier(TIER_FULL, elapsed, usage, evaluations=len(pending))
+        finished_ns = time.time_ns()
+        for ctx, trace, evaluation in zip(pending, pending_traces, evaluations):
+            evaluation["evaluation_tier"] = TIER_FULL
+            ctx["gap_analysis"] = evaluation
+            # Shared batched request: each control reports the batch's wall time
+            ctx["timings"]["evaluate"] = round(ctx["timings"].get("evaluate", 0) + elapsed * 1000, 1)
+            if trace:
+                trace.add_span(
+                    "evaluate_batch", started_ns, finished_ns,
+                    batch_size=len(pending),
+                    batch_trace_id=batch_span.trace_id,
+                    tier=TIER_FULL,
+                    coverage_level=evaluation.get("coverage_level"),
+                    requirements=len(ctx["control_requirements"] or [])
+                )
+    
+    # Project the evaluations onto the controls directly equivalent to an evaluated one
+    for ctx in pending:
+        if ctx["control_id"] in equivalents and _is_projectable(ctx.get("gap_analysis")):
+            evaluated[ctx["control_id"]] = ctx
+    for ctx, trace in projected:
+        source = _direct_equivalent(equivalents, ctx, evaluated)
+        try:
+            with tracing.activate(trace):
+                if source is None:
+                    # The equivalent control's evaluation failed: evaluate the control on its own
+                    evaluate_control_analysis(ctx)
+                    continue
+                with _stage(ctx["timings"], "evaluate") as span:
+                    _project_evaluation(ctx, source, equivalents[ctx["control_id"]][source["control_id"]])
+                    span.set_attributes(tier=TIER_EQUIVALENCE, projected_from=source["control_id"])
+        except Exception as e:
+            print(f"[Gap Analysis] Error evaluating control {ctx['control_id']}: {str(e)}")
+            contexts[contexts.index(ctx)] = error_result(ctx["control_id"], e)
+            if trace:
+                trace.finish(e)
+    
+    # Stage 3: decision per control, then one bulk write (and commit) for the whole run
+    writer = GapResultWriter(company_id)
+    results = []
+    errors: Dict[int, Exception] = {}
+    for control_id, ctx, trace in zip(control_ids, contexts, traces):
+        if "error_result" in ctx:
+            results.append(ctx["error_result"])
+        elif "control" not in ctx:
+            results.append(ctx)
         else:
-            risk_score = float(gap_analysis.get("risk_score", 60))
-    
-    # PART 7: Severity mapping based on risk score
-    if risk_score >= 80:
-        severity_str = "critical"
-    elif risk_score >= 60:
-        severity_str = "high"
-    elif risk_score >= 40:
-        severity_str = "medium"
-    else:
-        severity_str = "low"
-    
-    # Log truth table evaluation
-    print(f"[Gap Analysis] Truth Table Evaluation:")
-    print(f"  - no_approved_policy: {no_approved_policy}")
-    print(f"  - no_similar_policy: {no_similar_policy}")
-    print(f"  - similarity_below_threshold (< {SIMILARITY_MIN}): {similarity_below_threshold} (max_similarity: {max_similarity:.3f})")
-    print(f"  - coverage_not_full: {coverage_not_full} (coverage_level: {coverage_level})")
-    print(f"  - requirements_not_covered: {requirements_not_covered} (all_covered: {all_requirements_covered})")
-    print(f"  - Auto-compliant: {auto_compliant} (requires: similarity >= {AUTO_COMPLIANT} AND coverage == FULL)")
-    print(f"[Gap Analysis] Final Decision:")
-    print(f"  - Gap Identified: {gap_identified}")
-    print(f"  - Decision Reason: {decision_reason}")
-    print(f"  - Reason: {reason}")
-    print(f"  - Risk Score: {risk_score}")
-    print(f"  - Severity: {severity_str}")
-    print(f"  - Coverage Level: {coverage_level}")
+            try:
+                with tracing.activate(trace):
+                    results.append(finalize_control_analysis(ctx, company_id, user_id, db, writer=writer))
+            except Exception as e:
+                errors[control_id] = e
+                print(f"[Gap Analysis] Error finalizing control {control_id}: {str(e)}")
+                results.append(error_result(control_id, e))
+    
+    if len(writer):
+        started = time.perf_counter()
+        started_ns = time.time_ns()
+        with tracing.start_trace("gap_analysis.persist_batch", controls=len(writer), company_id=company_id) as persist_span, \
+                _stage({}, "persist_batch"):
+            failed = writer.flush(db)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        finished_ns = time.time_ns()
+        errors.update(failed)
+        for idx, (control_id, ctx) in enumerate(zip(control_ids, contexts)):
+            if "control" not in ctx or control_id in errors:
+                continue
+            # Shared bulk write: each control reports the write's wall time
+            ctx["timings"]["persist"] = round(ctx["timings"].get("persist", 0) + elapsed_ms, 1)
+            if traces[idx]:
+                traces[idx].add_span(
+                    "persist_batch", started_ns, finished_ns,
+                    batch_size=len(control_ids),
+                    batch_trace_id=persist_span.trace_id,
+                    gap_id=results[idx].get("gap_id"),
+                    gap_created=results[idx].get("gap_created")
+                )
+        for idx, control_id in enumerate(control_ids):
+            if control_id in failed:
+                results[idx] = error_result(control_id, failed[control_id])
     
-    gap_created = False
-    gap_id = None
-    
-    # PART 7: GAP CREATION ENFORCEMENT
-    # Whenever gap_identified == True, ALWAYS create a Gap record
-    if gap_identified:
-        # Map severity string to enum
-        severity_map = {
-            "low": GapSeverity.LOW,
-            "medium": GapSeverity.MEDIUM,
-            "high": GapSeverity.HIGH,
-            "critical": GapSeverity.CRITICAL
-        }
-        severity = severity_map.get(severity_str.lower(), GapSeverity.MEDIUM)
-        
-        # Create Gap with comprehensive audit information
-        gap_description = gap_analysis.get("gap_description", reason) if gap_analysis else reason
-        # Use AI-provided missing requirements, fallback to our list if not provided
-        missing_requirements_final = gap_analysis.get("missing_requirements", []) if gap_analysis else []
-        if not missing_requirements_final and missing_requirements:
-            missing_requirements_final = missing_requirements
-        if not missing_requirements_final and control_requirements:
-            # If no missing requirements identified, assume all are missing
-            missing_requirements_final = control_requirements
-        
-        # Add missing requirements to description
-        if missing_requirements_final:
-            missing_text = "\n\nMissing Requirements:\n" + "\n".join([f"- {req}" for req in missing_requirements_final])
-            gap_description = gap_description + missing_text
-        
-        # PART 8: AUDIT TRANSPARENCY - Store comprehensive audit trail
-        similarity_info = f"Max similarity score: {max_similarity:.3f}" if similar_policies else "No policies found"
-        policy_ids_str = ", ".join([str(pid) for pid in policy_ids]) if policy_ids else "None"
-        matched_titles_str = ", ".join(matched_policy_titles[:5]) if matched_policy_titles else "None"
-        
-        root_cause = (
-            f"Decision: {decision_reason}. "
-            f"Reason: {reason}. "
-            f"{similarity_info}. "
-            f"Policies found: {len(similar_policies)}. "
-            f"Similarity scores: {similarity_scores}. "
-            f"Policy IDs: [{policy_ids_str}]. "
-            f"Matched policies: {matched_titles_str}. "
-            f"Coverage level: {coverage_level}. "
-            f"Control requirements: {', '.join(control_requirements[:5])}. "
-            f"Missing requirements: {', '.join(missing_requirements_final[:5]) if missing_requirements_final else 'All requirements'}. "
-            f"Covered requirements: {', '.join(covered_requirements[:5]) if covered_requirements else 'None'}."
-        )
-        
-        gap = Gap(
-            title=f"Gap in {control.code or control.name}",
-            description=gap_description,
-            severity=severity,
-            status=GapStatus.IDENTIFIED,
-            framework_id=framework.id,
-            control_id=control.id,
-            identified_by_id=user_id,
-            risk_score=risk_score,
-            root_cause=root_cause,
-            identified_date=datetime.utcnow(),
-            is_active=True
-        )
-        db.add(gap)
-        db.flush()
-        gap_id = gap.id
-        
-        print(f"[Gap Analysis] ✓ Gap created: ID {gap_id}, Severity: {severity.value}, Risk: {gap.risk_score}")
-        
-        # Create Remediation
-        remediation_suggestions = gap_analysis.get("remediation_suggestions", []) if gap_analysis else []
-        if not remediation_suggestions:
-            remediation_suggestions = [
-                f"Create or update policy document addressing: {control.name}",
-                "Define clear procedures and processes to meet the control requirement",
-                "Document implementation steps and assign responsibilities",
-                "Establish monitoring and review mechanisms"
-            ]
-        
-        action_plan = "\n".join([
-            f"{idx + 1}. {suggestion}"
-            for idx, suggestion in enumerate(remediation_suggestions)
-        ])
-        
-        remediation = Remediation(
-            title=f"Remediation for {control.code or control.name}",
-            description="Remediation plan to address identified gap",
-            action_plan=action_plan,
-            status=RemediationStatus.PLANNED,
-            gap_id=gap.id,
-            assigned_to_id=user_id,
-            is_active=True
-        )
-        db.add(remediation)
-        gap_created = True
-        gap_id = gap.id
-        
-        db.commit()
-        print(f"[Gap Analysis] ✓ Gap created: ID {gap_id}, Severity: {severity.value}, Risk: {risk_score}")
+    for control_id, trace in zip(control_ids, traces):
+        if trace:
+            trace.finish(errors.get(control_id))
     
-    # PART 6: Return detailed response with audit information
-    return {
-        "control_id": control_id,
-        "control_code": control.code,
-        "control_name": control.name,
-        "gap_identified": gap_identified,
-        "status": "GAP" if gap_identified else "COMPLIANT",
-        "severity": severity_str,
-        "risk_score": int(risk_score),
-        "reason": reason,
-        "decision_reason": decision_reason,
-        "gap_created": gap_created,
-        "gap_id": gap_id,
-        "similar_policies_found": len(similar_policies),
-        "max_similarity_score": max_similarity,
-        "similarity_scores": similarity_scores,
-        "matched_policy_titles": matched_policy_titles,
-        "policy_ids": policy_ids,
-        "missing_requirements": missing_requirements_final if gap_identified else [],
-        "covered_requirements": covered_requirements if not gap_identified else [],
-        "control_requirements": control_requirements,
-        "coverage_level": coverage_level
-    }
+    # Ledger of the run, so the results can be redisplayed without re-running it
+    record_control_results(db, run_id, results)
+    return results
 
 
 def index_all_policies(db: Session, company_id: Optional[int] = None) -> Dict[str, Any]:
@@ -0,0 +1,182 @@
+"""
+Gap Persistence
+Bulk writes for gap analysis results. An analysis run queues each finalized
+control (policy dependencies, stored evaluation, gap + remediation) and writes
+them together in one transaction:
+
+- dependencies: one delete + one multi-row insert
+- stored evaluations: one lookup + one multi-row insert (existing rows updated)
+- gaps are upserted on (company, control, open): one lookup of the open gaps,
+  one executemany UPDATE refreshing them in place (risk score, severity,
+  description, evidence, run_count + 1) and one multi-row INSERT ... RETURNING id
+  for controls without an open gap
+- remediations: one multi-row insert linked to the new gap IDs (an updated gap
+  keeps its remediation)
+
+A run therefore costs a handful of statements and one commit instead of several
+round trips and a commit per control, and row locks are held only for the write.
+If the bulk write fails, each control is retried in its own transaction so one
+bad row doesn't fail the others.
+"""
+from typing import List, Dict, Any, Optional
+from sqlalchemy import insert, update, bindparam, func
+from sqlalchemy.orm import Session
+from app.models import Gap, GapStatus, Remediation
+from app.services.gap_analysis_cache import store_evaluations
+from app.services.impact_service import record_dependencies_for_controls
+
+
+def find_open_gaps(db: Session, company_id: int, control_ids: List[int]) -> Dict[int, int]:
+    """
+    Open (identified / in remediation) gap ID per control, in one query.
+    """
+    if not control_ids:
+        return {}
+    rows = (
+        db.query(Gap.control_id, Gap.id)
+        .filter(
+            Gap.company_id == company_id,
+            Gap.control_id.in_(control_ids),
+            Gap.is_active == True,
+            Gap.status.in_([GapStatus.IDENTIFIED, GapStatus.IN_REMEDIATION])
+        )
+        .order_by(Gap.id)
+        .all()
+    )
+    return {control_id: gap_id for control_id, gap_id in rows}  # highest ID wins
+
+
+# Gap columns an analysis run refreshes on the open gap it finds again
+REFRESHED_GAP_FIELDS = ("description", "severity", "risk_score", "root_cause", "evidence", "framework_id")
+
+
+class GapResultWriter:
+    """Collects the writes of finalized controls and persists them in bulk."""
+
+    def __init__(self, company_id: int):
+        self.company_id = company_id
+        self._pending: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(
+        self,
+        result: Dict[str, Any],
+        similar_policies: Optional[List[Dict[str, Any]]],
+        evaluation: Optional[Dict[str, Any]] = None,
+        gap: Optional[Dict[str, Any]] = None,
+        remediation: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Queue a finalized control. result["gap_id"] / result["gap_created"] are
+        filled in when the queue is flushed.
+
+        Args:
+            result: The control's analysis result
+            similar_policies: Matched policy chunks for the policy-change dependency index
+                (None leaves the control's dependencies as they are)
+            evaluation: store_evaluation() keyword arguments, or None to keep the stored one
+            gap: Gap column values when the verdict is GAP (updates the control's open gap
+                if there is one, otherwise inserts a new gap)
+            remediation: Remediation column values for a new gap (gap_id is filled in)
+        """
+        self._pending.append({
+            "control_id": result["control_id"],
+            "result": result,
+            "similar_policies": similar_policies,
+            "evaluation": evaluation,
+            "gap": gap,
+            "remediation": remediation
+        })
+
+    def flush(self, db: Session) -> Dict[int, Exception]:
+        """
+        Write and commit everything queued.
+
+        Returns:
+            Control ID -> error for the controls that could not be persisted
+            (empty when everything was written)
+        """
+        entries, self._pending = self._pending, []
+        if not entries:
+            return {}
+        try:
+            self._write(db, entries)
+            db.commit()
+            self._report(entries)
+            print(f"[Gap Persistence] ✓ Persisted {len(entries)} control result(s) in one transaction")
+            return {}
+        except Exception as e:
+            db.rollback()
+            if len(entries) == 1:
+                return {entries[0]["control_id"]: e}
+            print(f"[Gap Persistence] ⚠️ Bulk write failed ({str(e)}), retrying {len(entries)} control(s) one by one")
+
+        failed = {}
+        for entry in entries:
+            try:
+                self._write(db, [entry])
+                db.commit()
+                self._report([entry])
+            except Exception as e:
+                db.rollback()
+                print(f"[Gap Persistence] ✗ Could not persist control {entry['control_id']}: {str(e)}")
+                failed[entry["control_id"]] = e
+        return failed
+
+    def _write(self, db: Session, entries: List[Dict[str, Any]]) -> None:
+        record_dependencies_for_controls(db, self.company_id, {
+            entry["control_id"]: entry["similar_policies"]
+            for entry in entries if entry["similar_policies"] is not None
+        })
+        store_evaluations(db, self.company_id, [entry["evaluation"] for entry in entries if entry["evaluation"]])
+
+        gap_entries = [entry for entry in entries if entry["gap"]]
+        open_gaps = find_open_gaps(db, self.company_id, [entry["control_id"] for entry in gap_entries])
+
+        new_entries = []
+        refreshed = []
+        for entry in gap_entries:
+            open_gap_id = open_gaps.get(entry["control_id"])
+            entry["gap_created"] = open_gap_id is None
+            if open_gap_id:
+                entry["gap_id"] = open_gap_id
+                refreshed.append({"b_id": open_gap_id, **{f"b_{field}": entry["gap"].get(field) for field in REFRESHED_GAP_FIELDS}})
+            else:
+                new_entries.append(entry)
+
+        if refreshed:
+            gaps = Gap.__table__
+            db.execute(
+                update(gaps)
+                .where(gaps.c.id == bindparam("b_id"))
+                .values(
+                    run_count=gaps.c.run_count + 1,
+                    last_analyzed_at=func.now(),
+                    **{field: bindparam(f"b_{field}") for field in REFRESHED_GAP_FIELDS}
+                ),
+                refreshed
+            )
+            print(f"[Gap Persistence] Updated {len(refreshed)} open gap(s) in place")
+
+        if new_entries:
+            gap_ids = db.execute(
+                insert(Gap).returning(Gap.id, sort_by_parameter_order=True),
+                [{**entry["gap"], "company_id": self.company_id} for entry in new_entries]
+            ).scalars().all()
+            remediations = []
+            for entry, gap_id in zip(new_entries, gap_ids):
+                entry["gap_id"] = gap_id
+                if entry["remediation"]:
+                    remediations.append({**entry["remediation"], "gap_id": gap_id})
+            if remediations:
+                db.execute(insert(Remediation), remediations)
+
+    @staticmethod
+    def _report(entries: List[Dict[str, Any]]) -> None:
+        """Fill in the gap IDs once committed (results of a failed write stay untouched)."""
+        for entry in entries:
+            if entry["gap"]:
+                entry["result"]["gap_id"] = entry["gap_id"]
+                entry["result"]["gap_created"] = entry["gap_created"]
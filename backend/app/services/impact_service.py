@@ -0,0 +1,204 @@
+"""
+Policy Impact Service
+Dependency index between policies and the controls whose gap verdicts use them,
+and incremental re-analysis of only the impacted controls after a policy change.
+
+A control depends on a policy when:
+- its last analysis matched one of the policy's chunks (control_policy_dependencies), or
+- the policy is mapped to the control, so its chunks pass the control's retrieval
+  filter (framework/control/approved) and can newly match after the change.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Set
+from sqlalchemy.orm import Session
+from app.models import ControlPolicyDependency, Policy
+from app.services.control_selection_service import filter_selected
+
+# Single worker: re-analysis jobs run one at a time, in the order they were enqueued
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="policy-impact")
+_pending_lock = threading.Lock()
+_pending: Set[tuple] = set()  # (company_id, control_id) already queued
+
+
+def record_control_dependencies(
+    db: Session,
+    company_id: int,
+    control_id: int,
+    similar_policies: List[Dict[str, Any]]
+) -> None:
+    """
+    Replace the dependency rows for a control with the policy chunks its analysis matched.
+    Committed with the caller's transaction.
+
+    Args:
+        db: Database session
+        company_id: ID of the company
+        control_id: ID of the analyzed control
+        similar_policies: Policy chunks returned by query_similar_policies()
+    """
+    record_dependencies_for_controls(db, company_id, {control_id: similar_policies})
+
+
+def record_dependencies_for_controls(
+    db: Session,
+    company_id: int,
+    dependencies: Dict[int, List[Dict[str, Any]]]
+) -> None:
+    """
+    Replace the dependency rows of several controls in two statements (one delete,
+    one multi-row insert). Committed with the caller's transaction.
+
+    Args:
+        db: Database session
+        company_id: ID of the company
+        dependencies: Matched policy chunks per analyzed control ID
+    """
+    if not dependencies:
+        return
+
+    db.query(ControlPolicyDependency).filter(
+        ControlPolicyDependency.company_id == company_id,
+        ControlPolicyDependency.control_id.in_(list(dependencies))
+    ).delete(synchronize_session=False)
+
+    rows = []
+    for control_id, similar_policies in dependencies.items():
+        seen = set()
+        for match in similar_policies:
+            policy_id = match.get("policy_id")
+            if not policy_id:
+                continue
+            key = (int(policy_id), match.get("id"))
+            if key in seen:
+                continue
+            seen.add(key)
+            rows.append({
+                "company_id": company_id,
+                "control_id": control_id,
+                "policy_id": int(policy_id),
+                "chunk_id": match.get("id"),
+                "score": match.get("score")
+            })
+
+    if rows:
+        db.execute(ControlPolicyDependency.__table__.insert(), rows)
+
+
+def get_impacted_controls(
+    db: Session,
+    company_id: int,
+    policy: Policy
+) -> List[int]:
+    """
+    Get the selected controls whose verdict may change when a policy changes.
+
+    Args:
+        db: Database session
+        company_id: ID of the company owning the policy
+        policy: The changed policy
+
+    Returns:
+        Sorted list of impacted control IDs
+    """
+    impacted = {
+        control_id for (control_id,) in db.query(ControlPolicyDependency.control_id).filter(
+            ControlPolicyDependency.company_id == company_id,
+            ControlPolicyDependency.policy_id == policy.id
+        ).distinct().all()
+    }
+
+    # The control whose retrieval filter admits this policy's chunks
+    if policy.control_id:
+        impacted.add(policy.control_id)
+
+    impacted = filter_selected(db, company_id, impacted)
+    print(f"[Policy Impact] Policy {policy.id} impacts {len(impacted)} control(s): {impacted}")
+    return impacted
+
+
+def reanalyze_controls(company_id: int, user_id: int, control_ids: List[int]) -> Dict[str, Any]:
+    """
+    Re-run gap analysis for the given controls in a fresh session.
+    Controls whose inputs did not actually change are answered from the analysis cache.
+
+    Returns:
+        Dictionary with per-status counts
+    """
+    from app.db import SessionLocal
+    from app.services.gap_analysis_service import run_gap_analysis_for_control
+
+    db = SessionLocal()
+    summary = {"analyzed": 0, "gaps": 0, "compliant": 0, "cached": 0, "errors": 0}
+    try:
+        for control_id in control_ids:
+            with _pending_lock:
+                _pending.discard((company_id, control_id))
+            try:
+                result = run_gap_analysis_for_control(
+                    control_id=control_id,
+                    company_id=company_id,
+                    user_id=user_id,
+                    db=db
+                )
+                summary["analyzed"] += 1
+                if result.get("status") == "GAP":
+                    summary["gaps"] += 1
+                elif result.get("status") == "COMPLIANT":
+                    summary["compliant"] += 1
+                else:
+                    summary["errors"] += 1
+                if result.get("cached"):
+                    summary["cached"] += 1
+            except Exception as e:
+                db.rollback()
+                summary["errors"] += 1
+                print(f"[Policy Impact] ⚠ Error re-analyzing control {control_id}: {str(e)}")
+    finally:
+        db.close()
+
+    print(f"[Policy Impact] Re-analysis complete for company {company_id}: {summary}")
+    return summary
+
+
+def enqueue_reanalysis(company_id: int, user_id: int, control_ids: List[int], before=None) -> List[int]:
+    """
+    Queue re-analysis of impacted controls on the background worker.
+    Controls already waiting in the queue are not queued twice.
+
+    Args:
+        company_id: ID of the company
+        user_id: User recorded as identifying any new gaps
+        control_ids: Impacted control IDs
+        before: Optional callable run first in the same job (e.g. re-indexing the policy)
+
+    Returns:
+        Control IDs that were queued
+    """
+    with _pending_lock:
+        queued = [cid for cid in control_ids if (company_id, cid) not in _pending]
+        _pending.update((company_id, cid) for cid in queued)
+
+    if not queued and before is None:
+        return []
+
+    def job():
+        if before is not None:
+            try:
+                before()
+            except Exception as e:
+                print(f"[Policy Impact] ⚠ Pre-analysis step failed: {str(e)}")
+        if queued:
+            reanalyze_controls(company_id, user_id, queued)
+
+    _executor.submit(job)
+    print(f"[Policy Impact] Queued re-analysis of {len(queued)} control(s) for company {company_id}")
+    return queued
+
+
+def wait_for_pending(timeout: Optional[float] = None) -> None:
+    """
+    Block until every job queued so far (re-indexing and re-analysis) has run.
+    The worker runs jobs in order, so waiting on a no-op job queued last is enough.
+    """
+    _executor.submit(lambda: None).result(timeout=timeout)
@@ -0,0 +1,207 @@
+"""
+LLM Response Cache
+Persistent cache of deterministic chat completions, keyed by a fingerprint of
+(prompt namespace + version, model, messages, parameters).
+
+Only low-temperature calls that opt in with a namespace are cached (requirement
+extraction, gap evaluation, coverage classification). A hit returns the stored
+response without an API call and without spending tokens.
+
+- TTL: entries older than LLM_CACHE_TTL_HOURS are ignored and evicted
+- Versioned invalidation: bump a namespace in PROMPT_VERSIONS when its prompt
+  template or response parsing changes; old entries are never matched again
+- Bypass: LLM_CACHE_ENABLED=false, or llm_cache_bypass() for a block of calls
+  (used by forced re-analysis)
+
+Layout: storage/llm_cache/{key[:2]}/{key}.json
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from app.core.config import settings
+
+# Bump a namespace when its prompt template or parsing changes
+PROMPT_VERSIONS = {
+    "control_requirements": 1,
+    "control_decomposition": 1,
+    "gap_evaluation": 1,
+    "gap_evaluation_batch": 1,
+    "coverage_classification": 2,
+}
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CACHE_DIR = BASE_DIR / "storage" / "llm_cache"
+
+# Size-based eviction scans the directory, so it runs at most this often
+EVICTION_INTERVAL_SECONDS = 300
+
+_bypass = threading.local()
+_eviction_lock = threading.Lock()
+_last_eviction = {"at": 0.0}
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stores": 0}
+
+
+@contextmanager
+def llm_cache_bypass():
+    """Skip cache reads (fresh answers are still stored) for calls made by this thread inside the block."""
+    previous = getattr(_bypass, "active", False)
+    _bypass.active = True
+    try:
+        yield
+    finally:
+        _bypass.active = previous
+
+
+def is_cacheable(namespace: Optional[str], params: Dict[str, Any]) -> bool:
+    """Whether a call may be cached: opted in, known namespace, deterministic sampling."""
+    if not settings.LLM_CACHE_ENABLED or not namespace or namespace not in PROMPT_VERSIONS:
+        return False
+    temperature = params.get("temperature", 1.0)
+    return temperature is not None and float(temperature) <= settings.LLM_CACHE_MAX_TEMPERATURE
+
+
+def compute_cache_key(namespace: str, model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """
+    Fingerprint of a chat completion request.
+
+    Args:
+        namespace: Prompt namespace (see PROMPT_VERSIONS)
+        model: Chat model
+        messages: Chat messages
+        params: Other request parameters (temperature, max_tokens, ...)
+
+    Returns:
+        Hex SHA-256 cache key
+    """
+    payload = {
+        "namespace": namespace,
+        "version": PROMPT_VERSIONS[namespace],
+        "model": model,
+        "messages": messages,
+        "params": params,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str) -> Path:
+    return CACHE_DIR / key[:2] / f"{key}.json"
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def get_cached_response(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the stored response payload for a key, or None on a miss, expiry or bypass.
+    """
+    if getattr(_bypass, "active", False):
+        return None
+
+    path = _entry_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        _count("misses")
+        return None
+    except Exception as e:
+        print(f"[LLM Cache] ⚠️ Could not read cache entry {key[:12]}: {str(e)}")
+        _count("misses")
+        return None
+
+    if time.time() - entry.get("created_at", 0) > settings.LLM_CACHE_TTL_HOURS * 3600:
+        _count("misses")
+        return None
+
+    _count("hits")
+    return entry.get("response")
+
+
+def store_response(key: str, namespace: str, model: str, response: Dict[str, Any]) -> None:
+    """
+    Store a response payload. Writes atomically (temp file + rename).
+    Cache failures are logged and swallowed - the cache must never fail an LLM call.
+    """
+    path = _entry_path(key)
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": time.time(),
+                "namespace": namespace,
+                "version": PROMPT_VERSIONS[namespace],
+                "model": model,
+                "response": response
+            }, f)
+        os.replace(tmp_path, path)
+        _count("stores")
+    except Exception as e:
+        print(f"[LLM Cache] ⚠️ Could not store cache entry {key[:12]}: {str(e)}")
+        try:
+            tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+        return
+
+    if time.time() - _last_eviction["at"] > EVICTION_INTERVAL_SECONDS and _eviction_lock.acquire(blocking=False):
+        try:
+            _last_eviction["at"] = time.time()
+            evict_expired()
+        finally:
+            _eviction_lock.release()
+
+
+def evict_expired(max_bytes: Optional[int] = None) -> int:
+    """
+    Remove expired entries, then the oldest entries until the cache fits LLM_CACHE_MAX_MB.
+
+    Returns:
+        Number of entries evicted
+    """
+    if max_bytes is None:
+        max_bytes = settings.LLM_CACHE_MAX_MB * 1024 * 1024
+    if not CACHE_DIR.exists():
+        return 0
+
+    entries = []
+    total_bytes = 0
+    for path in CACHE_DIR.rglob("*.json"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total_bytes += stat.st_size
+
+    cutoff = time.time() - settings.LLM_CACHE_TTL_HOURS * 3600
+    evicted = 0
+    entries.sort(key=lambda e: e[0])
+    for mtime, size, path in entries:
+        if mtime >= cutoff and total_bytes <= max_bytes:
+            break
+        try:
+            path.unlink()
+            total_bytes -= size
+            evicted += 1
+        except FileNotFoundError:
+            continue
+
+    if evicted:
+        print(f"[LLM Cache] Evicted {evicted} entries (cache size now {total_bytes} bytes)")
+    return evicted
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """Hits, misses and stores since start."""
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,366 @@
+"""
+LLM Gateway
+Single entry point for OpenAI calls (chat completions and embeddings).
+
+- One shared client with a keep-alive connection pool and explicit timeouts
+- Token buckets per model for requests/minute and tokens/minute, so parallel work
+  waits for quota instead of hitting 429s
+- A concurrency semaphore bounding in-flight requests
+- Retries with exponential backoff + full jitter for 429/5xx/connection errors,
+  honouring Retry-After / retry-after-ms when the API sends them
+- Usage counters (calls, prompt/completion tokens), globally and per thread scope
+- Optional response cache for deterministic calls (see llm_cache)
+- Offline stand-ins (LLM_BACKEND=offline, EMBEDDING_BACKEND=hash, see offline_llm)
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+import httpx
+import openai
+from openai import OpenAI
+from openai.types.chat import ChatCompletion
+from app.core.config import settings
+from app.services.context_packer import count_tokens
+from app.services import llm_cache
+from app.core.metrics import Counter, time_stage, record_stage
+from app.core import tracing
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+_offline_client = None
+
+
+def _get_offline_client():
+    global _offline_client
+    with _client_lock:
+        if _offline_client is None:
+            from app.services.offline_llm import OfflineOpenAI
+            _offline_client = OfflineOpenAI()
+            print("[LLM Gateway] Using offline LLM stand-in")
+        return _offline_client
+
+
+def get_client() -> OpenAI:
+    """Shared OpenAI client (created on first use); the offline stand-in when LLM_BACKEND=offline."""
+    global _client
+    if settings.LLM_BACKEND == "offline":
+        return _get_offline_client()
+    with _client_lock:
+        if _client is None:
+            http_client = openai.DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.LLM_POOL_KEEPALIVE_SECONDS
+                )
+            )
+            _client = OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                http_client=http_client,
+                timeout=openai.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS),
+                max_retries=0  # Retries are handled here, with the rate limiter in the loop
+            )
+        return _client
+
+
+def get_embedding_client():
+    """Client for embeddings: the hash-based stand-in when EMBEDDING_BACKEND=hash."""
+    if settings.EMBEDDING_BACKEND == "hash":
+        return _get_offline_client()
+    return get_client()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at capacity per minute.
+    acquire() blocks until the requested amount is available.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float) -> float:
+        """Take amount from the bucket, waiting if needed. Returns seconds waited."""
+        amount = min(float(amount), self.capacity)  # A single oversized request must still pass
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return waited
+                delay = (amount - self.available) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def refund(self, amount: float) -> None:
+        """Return unused quota (e.g. when the actual token usage was below the estimate)."""
+        with self.lock:
+            self._refill()
+            self.available = min(self.capacity, self.available + amount)
+
+    def drain(self) -> None:
+        """Empty the bucket after the API reported the limit as exhausted."""
+        with self.lock:
+            self._refill()
+            self.available = 0.0
+
+
+_buckets: Dict[str, Dict[str, TokenBucket]] = {}
+_buckets_lock = threading.Lock()
+_semaphore = threading.BoundedSemaphore(max(1, settings.LLM_MAX_CONCURRENCY))
+
+
+def _get_buckets(model: str) -> Dict[str, TokenBucket]:
+    """Request and token buckets for a model (OpenAI rate limits are per model)."""
+    with _buckets_lock:
+        if model not in _buckets:
+            _buckets[model] = {
+                "requests": TokenBucket(settings.LLM_RPM_LIMIT),
+                "tokens": TokenBucket(settings.LLM_TPM_LIMIT)
+            }
+        return _buckets[model]
+
+
+# Usage counters (chat completions made through the gateway)
+_usage_lock = threading.Lock()
+_usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "retries": 0, "rate_limited": 0}
+
+# Per-thread usage scopes opened with track_llm_usage()
+_usage_scopes = threading.local()
+
+LLM_TOKENS = Counter(
+    "grc_llm_tokens_total",
+    "Chat completion tokens by model and kind (prompt / completion)",
+    ("model", "kind")
+)
+
+
+def _record_usage(response) -> None:
+    """Add a chat completion's token usage to the counters and any open usage scopes."""
+    usage = getattr(response, "usage", None)
+    prompt_tokens = (getattr(usage, "prompt_tokens", 0) or 0) if usage is not None else 0
+    completion_tokens = (getattr(usage, "completion_tokens", 0) or 0) if usage is not None else 0
+    with _usage_lock:
+        _usage["calls"] += 1
+        _usage["prompt_tokens"] += prompt_tokens
+        _usage["completion_tokens"] += completion_tokens
+    model = getattr(response, "model", None) or "unknown"
+    LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+    for scope in getattr(_usage_scopes, "stack", []):
+        scope["calls"] += 1
+        scope["prompt_tokens"] += prompt_tokens
+        scope["completion_tokens"] += completion_tokens
+
+
+def _count(key: str) -> None:
+    with _usage_lock:
+        _usage[key] += 1
+
+
+@contextmanager
+def track_llm_usage():
+    """
+    Count the chat completions made by the current thread inside a with-block.
+
+    Usage:
+        with track_llm_usage() as usage:
+            generate_gap_analysis(...)
+        usage["prompt_tokens"]
+    """
+    scope = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    stack = getattr(_usage_scopes, "stack", None)
+    if stack is None:
+        stack = _usage_scopes.stack = []
+    stack.append(scope)
+    try:
+        yield scope
+    finally:
+        stack.remove(scope)
+
+
+def get_llm_usage() -> Dict[str, int]:
+    """Snapshot of chat completion calls, tokens, retries and 429s since start (or the last reset)."""
+    with _usage_lock:
+        return dict(_usage)
+
+
+def reset_llm_usage() -> None:
+    """Reset the usage counters."""
+    with _usage_lock:
+        for key in _usage:
+            _usage[key] = 0
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-requested delay from retry-after-ms / Retry-After headers, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None  # HTTP-date form: fall back to backoff
+    return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def _estimate_chat_tokens(messages: List[Dict[str, Any]], model: str, max_tokens: Optional[int]) -> int:
+    """Tokens a chat completion may consume (prompt + reserved completion) for the TPM bucket."""
+    prompt_tokens = sum(count_tokens(str(message.get("content") or ""), model) + 4 for message in messages) + 3
+    return prompt_tokens + (max_tokens or 1000)
+
+
+def _call(model: str, estimated_tokens: int, operation, label: str):
+    """Run one API operation under the rate limiter, semaphore and retry policy."""
+    buckets = _get_buckets(model)
+    attempt = 0
+    while True:
+        waited = buckets["requests"].acquire(1)
+        waited += buckets["tokens"].acquire(estimated_tokens)
+        if waited > 1:
+            print(f"[LLM Gateway] Waited {waited:.1f}s for {model} rate limit quota")
+
+        try:
+            with _semaphore:
+                return operation()
+        except Exception as e:
+            if not _is_retryable(e) or attempt >= settings.LLM_MAX_RETRIES:
+                raise
+            attempt += 1
+            _count("retries")
+
+            retry_after = _retry_after_seconds(e)
+            if isinstance(e, openai.RateLimitError):
+                _count("rate_limited")
+                buckets["tokens"].drain()
+            backoff = min(settings.LLM_RETRY_MAX_WAIT_SECONDS, settings.LLM_RETRY_BASE_SECONDS * (2 ** (attempt - 1)))
+            delay = retry_after if retry_after is not None else random.uniform(0, backoff)  # full jitter
+            delay = min(delay, settings.LLM_RETRY_MAX_WAIT_SECONDS) + random.uniform(0, 0.25)
+            print(f"[LLM Gateway] ⚠️ {label} failed ({type(e).__name__}), retry {attempt}/{settings.LLM_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def chat_completion(
+    model: str,
+    messages: List[Dict[str, Any]],
+    max_tokens: Optional[int] = None,
+    cache_namespace: Optional[str] = None,
+    bypass_cache: bool = False,
+    operation: Optional[str] = None,
+    **params
+):
+    """
+    Create a chat completion through the gateway.
+
+    Args:
+        model: Chat model
+        messages: Chat messages
+        max_tokens: Completion token limit (also reserved against the TPM limit)
+        cache_namespace: Prompt namespace from llm_cache.PROMPT_VERSIONS to cache the
+            response under (only low-temperature calls are cached); None disables caching
+        bypass_cache: Skip the cache lookup for this call (the fresh response is still stored)
+        operation: Metrics label for the call (defaults to cache_namespace)
+        **params: Other chat.completions.create() parameters (temperature, ...)
+
+    Returns:
+        The OpenAI chat completion response
+    """
+    if max_tokens is not None:
+        params["max_tokens"] = max_tokens
+    operation = operation or cache_namespace or "other"
+
+    cache_key = None
+    if llm_cache.is_cacheable(cache_namespace, params):
+        cache_key = llm_cache.compute_cache_key(cache_namespace, model, messages, params)
+        cached = None
+        if not bypass_cache:
+            started = time.perf_counter()
+            cached = llm_cache.get_cached_response(cache_key)
+            elapsed = time.perf_counter() - started
+            record_stage("llm_cache", elapsed, "hit" if cached is not None else "miss")
+            tracing.record_span("llm_cache", elapsed, operation=operation, hit=cached is not None)
+        if cached is not None:
+            try:
+                return ChatCompletion.model_validate(cached)
+            except Exception as e:
+                print(f"[LLM Gateway] ⚠️ Ignoring unreadable cached response: {str(e)}")
+
+    estimated = _estimate_chat_tokens(messages, model, max_tokens)
+    with time_stage("llm", operation) as span:
+        response = _call(
+            model,
+            estimated,
+            lambda: get_client().chat.completions.create(model=model, messages=messages, **params),
+            f"chat completion ({model})"
+        )
+        usage = getattr(response, "usage", None)
+        choices = getattr(response, "choices", None) or []
+        span.set_attributes(
+            model=model,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            finish_reason=getattr(choices[0], "finish_reason", None) if choices else None
+        )
+    _record_usage(response)
+
+    # Give back the part of the reservation that wasn't used
+    total = getattr(usage, "total_tokens", None) if usage is not None else None
+    if total and total < estimated:
+        _get_buckets(model)["tokens"].refund(estimated - total)
+
+    if cache_key is not None:
+        choices = getattr(response, "choices", None) or []
+        # Don't pin truncated or empty answers for the whole TTL
+        if choices and getattr(choices[0], "finish_reason", None) == "stop" and hasattr(response, "model_dump"):
+            llm_cache.store_response(cache_key, cache_namespace, model, response.model_dump(mode="json"))
+    return response
+
+
+def create_embedding(input, model: str = "text-embedding-3-small", **params):
+    """
+    Create embeddings through the gateway.
+
+    Args:
+        input: Text or list of texts
+        model: Embedding model
+        **params: Other embeddings.create() parameters
+
+    Returns:
+        The OpenAI embeddings response
+    """
+    texts = input if isinstance(input, list) else [input]
+    estimated = sum(count_tokens(str(text), model) for text in texts) or 1
+    with time_stage("embedding", model) as span:
+        span.set_attributes(inputs=len(texts), estimated_tokens=estimated)
+        return _call(
+            model,
+            estimated,
+            lambda: get_embedding_client().embeddings.create(input=input, model=model, **params),
+            f"embedding ({model})"
+        )
@@ -0,0 +1,196 @@
+"""
+In-Memory Vector Store
+Local replacement for the Pinecone index, selected with VECTOR_STORE_BACKEND=memory.
+Lives in the process (nothing is persisted), so it suits development and benchmarks.
+
+Implements the index API the app uses - upsert, query, fetch, delete and
+describe_index_stats - with Pinecone semantics:
+- namespaces (default "")
+- cosine similarity scores
+- metadata filters: implicit equality, $eq, $ne, $in, $nin, $gt, $gte, $lt, $lte,
+  $exists, $and, $or; list-valued metadata matches $eq/$in when any element matches
+"""
+import math
+import operator
+import threading
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional
+
+DEFAULT_DIMENSION = 1536
+
+
+def _as_list(value) -> list:
+    return value if isinstance(value, list) else [value]
+
+
+def _condition_matches(value, op: str, operand) -> bool:
+    if op == "$exists":
+        return (value is not None) == bool(operand)
+    if op == "$eq":
+        return value is not None and operand in _as_list(value)
+    if op == "$ne":
+        return value is None or operand not in _as_list(value)
+    if op == "$in":
+        return value is not None and any(item in operand for item in _as_list(value))
+    if op == "$nin":
+        return value is None or not any(item in operand for item in _as_list(value))
+    comparisons = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+    if op in comparisons:
+        try:
+            return value is not None and comparisons[op](value, operand)
+        except TypeError:
+            return False
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def matches_filter(metadata: Dict[str, Any], metadata_filter: Optional[Dict[str, Any]]) -> bool:
+    """Whether vector metadata satisfies a Pinecone-style metadata filter."""
+    if not metadata_filter:
+        return True
+    for key, condition in metadata_filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            if not all(_condition_matches(value, op, operand) for op, operand in condition.items()):
+                return False
+    return True
+
+
+class InMemoryIndex:
+    """Thread-safe in-memory index with Pinecone's upsert/query/fetch/delete API."""
+
+    def __init__(self, dimension: int = DEFAULT_DIMENSION):
+        self.dimension = dimension
+        self._namespaces: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _normalize(self, values: List[float]) -> List[float]:
+        if len(values) != self.dimension:
+            raise ValueError(f"Vector dimension {len(values)} does not match the dimension of the index {self.dimension}")
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [float(v) / norm for v in values]
+
+    def upsert(self, vectors: List[Any], namespace: str = "", **kwargs):
+        """Insert or replace vectors given as dicts (id, values, metadata) or (id, values[, metadata]) tuples."""
+        records = []
+        for vector in vectors:
+            if isinstance(vector, dict):
+                vector_id, values, metadata = vector["id"], vector["values"], vector.get("metadata")
+            else:
+                vector_id, values = vector[0], vector[1]
+                metadata = vector[2] if len(vector) > 2 else None
+            records.append((str(vector_id), {
+                "values": list(values),
+                "unit": self._normalize(values),
+                "metadata": dict(metadata or {})
+            }))
+        with self._lock:
+            store = self._namespaces.setdefault(namespace or "", {})
+            for vector_id, record in records:
+                store[vector_id] = record
+        return SimpleNamespace(upserted_count=len(records))
+
+    def query(
+        self,
+        vector: Optional[List[float]] = None,
+        id: Optional[str] = None,
+        top_k: int = 10,
+        namespace: str = "",
+        filter: Optional[Dict[str, Any]] = None,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        **kwargs
+    ):
+        """Top-k vectors by cosine similarity, optionally restricted by a metadata filter."""
+        with self._lock:
+            store = dict(self._namespaces.get(namespace or "", {}))
+
+        if vector is None:
+            if id is None or id not in store:
+                return SimpleNamespace(matches=[], namespace=namespace or "")
+            query_unit = store[id]["unit"]
+        else:
+            query_unit = self._normalize(vector)
+
+        scored = []
+        for vector_id, record in store.items():
+            if filter and not matches_filter(record["metadata"], filter):
+                continue
+            score = sum(map(operator.mul, query_unit, record["unit"]))
+            scored.append((score, vector_id, record))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        matches = [
+            SimpleNamespace(
+                id=vector_id,
+                score=score,
+                metadata=dict(record["metadata"]) if include_metadata else None,
+                values=list(record["values"]) if include_values else []
+            )
+            for score, vector_id, record in scored[:top_k]
+        ]
+        return SimpleNamespace(matches=matches, namespace=namespace or "")
+
+    def fetch(self, ids: List[str], namespace: str = "", **kwargs):
+        """Stored vectors by ID (missing IDs are omitted)."""
+        with self._lock:
+            store = self._namespaces.get(namespace or "", {})
+            vectors = {
+                vector_id: SimpleNamespace(id=vector_id, values=list(store[vector_id]["values"]), metadata=dict(store[vector_id]["metadata"]))
+                for vector_id in ids if vector_id in store
+            }
+        return SimpleNamespace(vectors=vectors, namespace=namespace or "")
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        delete_all: bool = False,
+        namespace: str = "",
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs
+    ):
+        """Delete vectors by ID, by metadata filter, or all vectors of a namespace."""
+        with self._lock:
+            store = self._namespaces.get(namespace or "", {})
+            if delete_all:
+                store.clear()
+            elif ids:
+                for vector_id in ids:
+                    store.pop(str(vector_id), None)
+            elif filter:
+                for vector_id in [vid for vid, record in store.items() if matches_filter(record["metadata"], filter)]:
+                    del store[vector_id]
+        return {}
+
+    def describe_index_stats(self, **kwargs):
+        """Dimension, total vector count and per-namespace counts."""
+        with self._lock:
+            namespaces = {
+                name: SimpleNamespace(vector_count=len(store))
+                for name, store in self._namespaces.items() if store
+            }
+        return SimpleNamespace(
+            dimension=self.dimension,
+            total_vector_count=sum(ns.vector_count for ns in namespaces.values()),
+            namespaces=namespaces
+        )
+
+
+_memory_index: Optional[InMemoryIndex] = None
+_memory_index_lock = threading.Lock()
+
+
+def get_memory_index() -> InMemoryIndex:
+    """Process-wide in-memory index (created on first use)."""
+    global _memory_index
+    with _memory_index_lock:
+        if _memory_index is None:
+            _memory_index = InMemoryIndex()
+        return _memory_index
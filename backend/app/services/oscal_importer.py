@@ -0,0 +1,702 @@
+"""
+OSCAL Importer
+Imports NIST OSCAL catalogs and profiles (JSON or XML) as a Framework with its
+control groups and controls.
+
+- Streaming: a catalog is read one top-level group at a time (JSON with ijson
+  when it is installed, XML with ElementTree.iterparse), so memory stays flat
+  whatever the catalog size
+- Bulk upsert: groups and controls are written with multi-row
+  INSERT ... ON CONFLICT DO UPDATE on their catalog IDs (source_id), a few
+  statements per control family instead of a get-or-create query per control.
+  Re-importing a newer revision updates rows in place, so control IDs (and the
+  selections, gaps and results that reference them) are kept; imported rows
+  missing from the new revision are deactivated
+- Mapping: OSCAL groups -> ControlGroup (nested by parent_group_id), controls ->
+  Control (code = label, description = statement with parameters rendered).
+  A control's enhancements go to a child group named after the control
+  (families -> controls -> enhancements). Withdrawn controls are inactive
+- Profiles: the imported catalog(s) are filtered by include-all /
+  include-controls / exclude-controls (with-ids, with-child-controls, matching).
+  Modify (parameter settings, alters) is not applied
+- Embeddings: active controls are embedded and upserted to the vector store in
+  batches (one embeddings request and one upsert per batch)
+"""
+import fnmatch
+import json
+import re
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import update, func
+from sqlalchemy.orm import Session
+from app.models import Framework, ControlGroup, Control
+from app.services import framework_catalog
+from app.services.control_hierarchy import rebuild_closure
+from app.services.pinecone_service import index_control_embeddings
+
+# Rows per multi-row INSERT ... ON CONFLICT
+UPSERT_BATCH_SIZE = 500
+# Controls per embeddings request / vector upsert
+EMBED_BATCH_SIZE = 100
+
+_INSERT_PARAM = re.compile(r"\{\{\s*insert:\s*param,\s*([^\s}]+)\s*\}\}")
+# XML elements that are structure, not prose, inside a part
+_XML_STRUCTURE = {"title", "prop", "link", "part", "param", "control", "group", "remarks"}
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def _is_xml(path: Path) -> bool:
+    if path.suffix.lower() == ".xml":
+        return True
+    if path.suffix.lower() == ".json":
+        return False
+    with open(path, "rb") as f:
+        return f.read(512).lstrip().startswith(b"<")
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _children(elem, name: str) -> list:
+    return [child for child in elem if _local(child.tag) == name]
+
+
+def _xml_inline(elem) -> str:
+    """Text of a prose element, with <insert> as the JSON {{ insert: ... }} form."""
+    text = [elem.text or ""]
+    for child in elem:
+        if _local(child.tag) == "insert":
+            text.append("{{ insert: %s, %s }}" % (child.get("type", "param"), child.get("id-ref")))
+        else:
+            text.append(_xml_inline(child))
+        text.append(child.tail or "")
+    return "".join(text)
+
+
+def _xml_title(elem) -> Optional[str]:
+    titles = _children(elem, "title")
+    return _xml_inline(titles[0]).strip() if titles else None
+
+
+def _xml_props(elem) -> List[Dict[str, Any]]:
+    return [
+        {"name": prop.get("name"), "value": prop.get("value"), "class": prop.get("class")}
+        for prop in _children(elem, "prop")
+    ]
+
+
+def _xml_part(elem) -> Dict[str, Any]:
+    prose = []
+    for child in elem:
+        name = _local(child.tag)
+        if name in _XML_STRUCTURE:
+            continue
+        if name in ("ul", "ol"):
+            prose.extend(_xml_inline(item).strip() for item in child)
+        else:
+            prose.append(_xml_inline(child).strip())
+    return {
+        "id": elem.get("id"),
+        "name": elem.get("name"),
+        "props": _xml_props(elem),
+        "prose": "\n".join(line for line in prose if line),
+        "parts": [_xml_part(part) for part in _children(elem, "part")]
+    }
+
+
+def _xml_param(elem) -> Dict[str, Any]:
+    param = {"id": elem.get("id")}
+    labels = _children(elem, "label")
+    if labels:
+        param["label"] = _xml_inline(labels[0]).strip()
+    values = _children(elem, "value")
+    if values:
+        param["values"] = [_xml_inline(value).strip() for value in values]
+    selects = _children(elem, "select")
+    if selects:
+        param["select"] = {
+            "how-many": selects[0].get("how-many"),
+            "choice": [_xml_inline(choice).strip() for choice in _children(selects[0], "choice")]
+        }
+    return param
+
+
+def _xml_control(elem) -> Dict[str, Any]:
+    return {
+        "id": elem.get("id"),
+        "class": elem.get("class"),
+        "title": _xml_title(elem),
+        "params": [_xml_param(param) for param in _children(elem, "param")],
+        "props": _xml_props(elem),
+        "parts": [_xml_part(part) for part in _children(elem, "part")],
+        "controls": [_xml_control(control) for control in _children(elem, "control")]
+    }
+
+
+def _xml_group(elem) -> Dict[str, Any]:
+    return {
+        "id": elem.get("id"),
+        "class": elem.get("class"),
+        "title": _xml_title(elem),
+        "props": _xml_props(elem),
+        "groups": [_xml_group(group) for group in _children(elem, "group")],
+        "controls": [_xml_control(control) for control in _children(elem, "control")]
+    }
+
+
+def _xml_metadata(elem) -> Dict[str, Any]:
+    versions = _children(elem, "version")
+    return {
+        "title": _xml_title(elem),
+        "version": _xml_inline(versions[0]).strip() if versions else None
+    }
+
+
+def _iter_xml_catalog(path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    depth = 0
+    for event, elem in ET.iterparse(str(path), events=("start", "end")):
+        if event == "start":
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        # Direct child of <catalog> is complete: convert it and free it
+        name = _local(elem.tag)
+        if name == "metadata":
+            yield "metadata", _xml_metadata(elem)
+        elif name == "group":
+            yield "group", _xml_group(elem)
+        elif name == "control":
+            yield "control", _xml_control(elem)
+        elem.clear()
+
+
+def _iter_json_catalog(path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    try:
+        import ijson
+    except ImportError:
+        ijson = None
+
+    if ijson is None:
+        print("[OSCAL Import] ⚠️ ijson not installed, loading the whole JSON document")
+        with open(path, "rb") as f:
+            catalog = json.load(f).get("catalog") or {}
+        yield "metadata", catalog.get("metadata") or {}
+        for group in catalog.get("groups") or []:
+            yield "group", group
+        for control in catalog.get("controls") or []:
+            yield "control", control
+        return
+
+    with open(path, "rb") as f:
+        for metadata in ijson.items(f, "catalog.metadata"):
+            yield "metadata", metadata
+            break
+    for prefix, kind in (("catalog.groups.item", "group"), ("catalog.controls.item", "control")):
+        with open(path, "rb") as f:
+            for item in ijson.items(f, prefix, use_float=True):
+                yield kind, item
+
+
+def iter_catalog(path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Stream an OSCAL catalog: ("metadata", {...}) first, then one
+    ("group", {...}) or ("control", {...}) per top-level item, as OSCAL JSON dicts.
+    """
+    return _iter_xml_catalog(path) if _is_xml(path) else _iter_json_catalog(path)
+
+
+# ---------------------------------------------------------------------------
+# Profiles
+# ---------------------------------------------------------------------------
+
+class _ControlFilter:
+    """include-controls / exclude-controls rules of one profile import."""
+
+    def __init__(self):
+        self.include_all = False
+        self.ids = set()
+        self.child_ids = set()  # with-child-controls="yes"
+        self.patterns: List[Tuple[str, bool]] = []
+        self.exclude_ids = set()
+        self.exclude_patterns: List[str] = []
+
+    def add_selection(self, selection: Dict[str, Any], exclude: bool = False) -> None:
+        with_children = selection.get("with-child-controls") == "yes"
+        ids = selection.get("with-ids") or []
+        patterns = [match.get("pattern") for match in selection.get("matching") or [] if match.get("pattern")]
+        if exclude:
+            self.exclude_ids.update(ids)
+            self.exclude_patterns.extend(patterns)
+            return
+        self.ids.update(ids)
+        if with_children:
+            self.child_ids.update(ids)
+        self.patterns.extend((pattern, with_children) for pattern in patterns)
+
+    def decide(self, control_id: str, inherited: bool) -> Tuple[bool, bool]:
+        """(include the control, include its child controls)."""
+        if control_id in self.exclude_ids or any(fnmatch.fnmatchcase(control_id, p) for p in self.exclude_patterns):
+            return False, False
+        matched = [children for pattern, children in self.patterns if fnmatch.fnmatchcase(control_id, pattern)]
+        include = self.include_all or inherited or control_id in self.ids or bool(matched)
+        children = self.include_all or inherited or control_id in self.child_ids or any(matched)
+        return include, children
+
+
+def _xml_profile(path: Path) -> Dict[str, Any]:
+    root = ET.parse(str(path)).getroot()
+    metadata = _children(root, "metadata")
+    profile = {"metadata": _xml_metadata(metadata[0]) if metadata else {}, "imports": [], "back-matter": {"resources": []}}
+    for imported in _children(root, "import"):
+        entry = {"href": imported.get("href")}
+        if _children(imported, "include-all"):
+            entry["include-all"] = {}
+        for key in ("include-controls", "exclude-controls"):
+            entry[key] = [
+                {
+                    "with-child-controls": selection.get("with-child-controls"),
+                    "with-ids": [_xml_inline(item).strip() for item in _children(selection, "with-id")],
+                    "matching": [{"pattern": match.get("pattern")} for match in _children(selection, "matching")]
+                }
+                for selection in _children(imported, key)
+            ]
+        profile["imports"].append(entry)
+    for back_matter in _children(root, "back-matter"):
+        for resource in _children(back_matter, "resource"):
+            profile["back-matter"]["resources"].append({
+                "uuid": resource.get("uuid"),
+                "rlinks": [{"href": rlink.get("href")} for rlink in _children(resource, "rlink")]
+            })
+    return profile
+
+
+def _resolve_href(href: str, profile_path: Path, resources: List[Dict[str, Any]]) -> Path:
+    """Local catalog path of a profile import (relative paths, #uuid back-matter links)."""
+    candidates = [href]
+    if href and href.startswith("#"):
+        resource = next((r for r in resources if r.get("uuid") == href[1:]), None)
+        candidates = [rlink.get("href") for rlink in (resource or {}).get("rlinks") or [] if rlink.get("href")]
+    for candidate in candidates:
+        local = candidate.split("://", 1)[-1].rsplit("/", 1)[-1] if "://" in candidate else candidate
+        path = (profile_path.parent / local).resolve()
+        if path.exists():
+            return path
+    raise ValueError(
+        f"Catalog '{href}' imported by the profile was not found next to it; "
+        f"download it and pass its path as the catalog"
+    )
+
+
+def load_profile(path: Path, catalog_path: Optional[Path] = None) -> Tuple[Dict[str, Any], List[Tuple[Path, _ControlFilter]]]:
+    """
+    Read an OSCAL profile (small enough to load whole).
+
+    Args:
+        path: Profile file
+        catalog_path: Catalog to use for every import instead of resolving the hrefs
+
+    Returns:
+        (metadata, [(catalog path, control filter), ...])
+    """
+    if _is_xml(path):
+        profile = _xml_profile(path)
+    else:
+        with open(path, "rb") as f:
+            profile = json.load(f).get("profile") or {}
+    resources = (profile.get("back-matter") or {}).get("resources") or []
+
+    imports = []
+    for imported in profile.get("imports") or []:
+        control_filter = _ControlFilter()
+        control_filter.include_all = "include-all" in imported
+        for selection in imported.get("include-controls") or []:
+            control_filter.add_selection(selection)
+        for selection in imported.get("exclude-controls") or []:
+            control_filter.add_selection(selection, exclude=True)
+        source = catalog_path or _resolve_href(imported.get("href") or "", path, resources)
+        imports.append((source, control_filter))
+    if not imports:
+        raise ValueError("The profile imports no catalog")
+    return profile.get("metadata") or {}, imports
+
+
+def _document_kind(path: Path) -> str:
+    """"catalog" or "profile" (from the root element / key)."""
+    if _is_xml(path):
+        for _, elem in ET.iterparse(str(path), events=("start",)):
+            return _local(elem.tag)
+    with open(path, "rb") as f:
+        head = f.read(4096).decode("utf-8", errors="ignore")
+    match = re.search(r'"(catalog|profile)"\s*:', head)
+    return match.group(1) if match else "catalog"
+
+
+# ---------------------------------------------------------------------------
+# Mapping
+# ---------------------------------------------------------------------------
+
+def _prop(item: Dict[str, Any], name: str) -> Optional[str]:
+    return next((prop.get("value") for prop in item.get("props") or [] if prop.get("name") == name), None)
+
+
+def _label(item: Dict[str, Any]) -> str:
+    """Display code: the label prop without a class (e.g. "AC-2(1)"), else the ID."""
+    labels = [prop for prop in item.get("props") or [] if prop.get("name") == "label"]
+    plain = [prop for prop in labels if not prop.get("class")]
+    label = (plain or labels or [{}])[0].get("value")
+    return (label or item.get("id") or "").upper()[:50]
+
+
+def _render(text: str, params: Dict[str, Dict[str, Any]], depth: int = 0) -> str:
+    """Replace {{ insert: param, id }} with the parameter's assignment / selection text."""
+    def param_text(match):
+        param = params.get(match.group(1))
+        if not param or depth > 3:
+            return match.group(0)
+        select = param.get("select")
+        if select:
+            choices = "; ".join(_render(str(choice), params, depth + 1) for choice in select.get("choice") or [])
+            how_many = " (one or more)" if select.get("how-many") == "one-or-more" else ""
+            return f"[Selection{how_many}: {choices}]"
+        if param.get("values"):
+            return ", ".join(str(value) for value in param["values"])
+        return f"[Assignment: {param.get('label') or param.get('id')}]"
+    return _INSERT_PARAM.sub(param_text, text or "")
+
+
+def _statement(control: Dict[str, Any], params: Dict[str, Dict[str, Any]]) -> Optional[str]:
+    lines = []
+
+    def walk(part, indent):
+        label = _prop(part, "label")
+        prose = _render(part.get("prose") or "", params).strip()
+        text = " ".join(value for value in (label, prose) if value)
+        if text:
+            lines.append("  " * indent + text)
+            indent += 1
+        for child in part.get("parts") or []:
+            walk(child, indent)
+
+    for part in control.get("parts") or []:
+        if part.get("name") == "statement":
+            walk(part, 0)
+    return "\n".join(lines) or None
+
+
+class _FamilyBatch:
+    """Groups and controls of one top-level catalog item, flattened for bulk upsert."""
+
+    def __init__(self):
+        self.groups: List[Dict[str, Any]] = []
+        self.controls: List[Dict[str, Any]] = []
+
+    def add_group(self, group: Dict[str, Any], parent: Optional[str], depth: int, order: int, control_filter) -> None:
+        self.groups.append({
+            "source_id": group.get("id"),
+            "parent": parent,
+            "depth": depth,
+            "code": _label(group),
+            "name": (group.get("title") or group.get("id") or "")[:255],
+            "description": None,
+            "order_index": order
+        })
+        for position, control in enumerate(group.get("controls") or [], 1):
+            self.add_control(control, group.get("id"), depth, position, {}, control_filter, False)
+        for position, child in enumerate(group.get("groups") or [], 1):
+            self.add_group(child, group.get("id"), depth + 1, position, control_filter)
+
+    def add_control(self, control, group_source, depth, order, inherited_params, control_filter, inherited) -> None:
+        include, children = control_filter.decide(control.get("id"), inherited) if control_filter else (True, True)
+        params = dict(inherited_params)
+        params.update({param.get("id"): param for param in control.get("params") or [] if param.get("id")})
+        if include:
+            self.controls.append({
+                "source_id": control.get("id"),
+                "group": group_source,
+                "code": _label(control),
+                "name": (control.get("title") or control.get("id") or "")[:255],
+                "description": _statement(control, params),
+                "order_index": order,
+                "is_active": _prop(control, "status") != "withdrawn"
+            })
+        enhancements = control.get("controls") or []
+        if enhancements:
+            # Enhancements live in a child group named after their control
+            self.groups.append({
+                "source_id": control.get("id"),
+                "parent": group_source,
+                "depth": depth + 1,
+                "code": _label(control),
+                "name": (control.get("title") or control.get("id") or "")[:255],
+                "description": f"Enhancements of {_label(control)}",
+                "order_index": order
+            })
+            for position, enhancement in enumerate(enhancements, 1):
+                self.add_control(enhancement, control.get("id"), depth + 1, position, params, control_filter, children)
+
+    def prune(self) -> None:
+        """Drop groups without any included control below them."""
+        parents = {group["source_id"]: group["parent"] for group in self.groups}
+        keep = set()
+        for control in self.controls:
+            source = control["group"]
+            while source is not None and source not in keep:
+                keep.add(source)
+                source = parents.get(source)
+        self.groups = [group for group in self.groups if group["source_id"] in keep]
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+def _dialect_insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"INSERT ... ON CONFLICT is not supported on {dialect}")
+    return insert
+
+
+class _CatalogWriter:
+    """Bulk upserts of one framework's groups and controls (one transaction)."""
+
+    def __init__(self, db: Session, framework_id: int):
+        self.db = db
+        self.framework_id = framework_id
+        self.insert = _dialect_insert(db)
+        self.group_ids: Dict[str, int] = {}
+        self.seen_controls: List[int] = []
+        self.imported: List[Dict[str, Any]] = []  # active controls, for embeddings
+        self.statements = 0
+        self.controls = 0
+        self.withdrawn = 0
+
+    def _upsert(self, model, rows, conflict, returning):
+        results = []
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            statement = self.insert(model.__table__).values(rows[start:start + UPSERT_BATCH_SIZE])
+            updates = {
+                column: statement.excluded[column]
+                for column in rows[0] if column not in conflict
+            }
+            updates["updated_at"] = func.now()
+            statement = statement.on_conflict_do_update(index_elements=conflict, set_=updates)
+            results.extend(self.db.execute(statement.returning(*returning)).all())
+            self.statements += 1
+        return results
+
+    def write(self, batch: _FamilyBatch) -> None:
+        batch.prune()
+        # Parents before children: one upsert per nesting level
+        for depth in sorted({group["depth"] for group in batch.groups}):
+            rows = [
+                {
+                    "framework_id": self.framework_id,
+                    "source_id": group["source_id"],
+                    "parent_group_id": self.group_ids.get(group["parent"]) if group["parent"] else None,
+                    "code": group["code"],
+                    "name": group["name"],
+                    "description": group["description"],
+                    "order_index": group["order_index"],
+                    "is_active": True
+                }
+                for group in batch.groups if group["depth"] == depth
+            ]
+            for group_id, source_id in self._upsert(
+                ControlGroup, rows, ["framework_id", "source_id"], [ControlGroup.id, ControlGroup.source_id]
+            ):
+                self.group_ids[source_id] = group_id
+
+        if not batch.controls:
+            return
+        rows = [
+            {
+                "control_group_id": self.group_ids[control["group"]],
+                "source_id": control["source_id"],
+                "code": control["code"],
+                "name": control["name"],
+                "description": control["description"],
+                "order_index": control["order_index"],
+                "is_active": control["is_active"]
+            }
+            for control in batch.controls
+        ]
+        returned = {
+            (group_id, source_id): control_id
+            for control_id, source_id, group_id in self._upsert(
+                Control, rows, ["control_group_id", "source_id"], [Control.id, Control.source_id, Control.control_group_id]
+            )
+        }
+        for row in rows:
+            control_id = returned[(row["control_group_id"], row["source_id"])]
+            self.seen_controls.append(control_id)
+            self.controls += 1
+            if not row["is_active"]:
+                self.withdrawn += 1
+            elif row["description"]:
+                self.imported.append({
+                    "control_id": control_id,
+                    "control_code": row["code"],
+                    "control_name": row["name"],
+                    "control_description": row["description"],
+                    "framework_id": self.framework_id,
+                    "control_group_id": row["control_group_id"]
+                })
+
+    def deactivate_missing(self) -> int:
+        """Deactivate imported groups / controls absent from this import (two UPDATEs)."""
+        group_ids = list(self.group_ids.values())
+        framework_groups = ControlGroup.__table__.select().with_only_columns(ControlGroup.id).where(
+            ControlGroup.framework_id == self.framework_id
+        )
+        controls = self.db.execute(
+            update(Control)
+            .where(
+                Control.control_group_id.in_(framework_groups),
+                Control.source_id.isnot(None),
+                Control.id.notin_(self.seen_controls),
+                Control.is_active == True
+            )
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        self.db.execute(
+            update(ControlGroup)
+            .where(
+                ControlGroup.framework_id == self.framework_id,
+                ControlGroup.source_id.isnot(None),
+                ControlGroup.id.notin_(group_ids),
+                ControlGroup.is_active == True
+            )
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+        self.statements += 2
+        return controls
+
+
+def _upsert_framework(db: Session, name: str, version: Optional[str], category: Optional[str], description: Optional[str]) -> int:
+    insert = _dialect_insert(db)
+    statement = insert(Framework.__table__).values(
+        name=name[:255], version=(version or None) and version[:50], category=category,
+        description=description, is_active=True, catalog_version=1
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"version": statement.excluded.version, "is_active": True, "updated_at": func.now()}
+    )
+    return db.execute(statement.returning(Framework.id)).scalar_one()
+
+
+def import_oscal(
+    db: Session,
+    path: str,
+    framework_name: Optional[str] = None,
+    catalog_path: Optional[str] = None,
+    category: Optional[str] = "Security",
+    embed: bool = True
+) -> Dict[str, Any]:
+    """
+    Import an OSCAL catalog or profile (JSON or XML) as a framework.
+
+    Args:
+        db: Database session (committed once, after the whole import)
+        path: Catalog or profile file
+        framework_name: Framework name (default: the document's metadata title)
+        catalog_path: For a profile, the catalog to resolve its imports to
+        category: Framework category
+        embed: Embed the active controls into the vector store after the import
+
+    Returns:
+        Dictionary with the framework, counts (groups, controls, withdrawn,
+        deactivated, embedded), statements issued and duration
+
+    Raises:
+        ValueError: If the document cannot be imported (unknown type, catalog not found)
+    """
+    started = time.perf_counter()
+    source = Path(path)
+    kind = _document_kind(source)
+    if kind == "profile":
+        metadata, imports = load_profile(source, Path(catalog_path) if catalog_path else None)
+    elif kind == "catalog":
+        metadata, imports = None, [(source, None)]
+    else:
+        raise ValueError(f"Not an OSCAL catalog or profile: <{kind}>")
+
+    writer = None
+    position = 0
+    for catalog, control_filter in imports:
+        print(f"[OSCAL Import] Reading {kind} {source.name}" + (f" -> catalog {catalog.name}" if kind == "profile" else ""))
+        for item_kind, item in iter_catalog(catalog):
+            if item_kind == "metadata":
+                if writer is None:
+                    metadata = metadata or item
+                    name = framework_name or metadata.get("title") or source.stem
+                    description = f"Imported from OSCAL {kind} {source.name}"
+                    writer = _CatalogWriter(db, _upsert_framework(db, name, metadata.get("version"), category, description))
+                    writer.statements += 1
+                continue
+            if writer is None:
+                raise ValueError(f"{catalog.name} has no metadata before its controls")
+            position += 1
+            batch = _FamilyBatch()
+            if item_kind == "group":
+                batch.add_group(item, None, 0, position, control_filter)
+            else:
+                # Top-level controls go to a group named after the catalog
+                batch.groups.append({
+                    "source_id": "_controls", "parent": None, "depth": 0, "code": None,
+                    "name": "Controls", "description": None, "order_index": 0
+                })
+                batch.add_control(item, "_controls", 0, position, {}, control_filter, False)
+            writer.write(batch)
+
+    if writer is None:
+        raise ValueError(f"{source.name} contains no OSCAL metadata")
+
+    deactivated = writer.deactivate_missing()
+    rebuild_closure(db, writer.framework_id)
+    framework_catalog.invalidate_framework(db, writer.framework_id)
+    db.commit()
+    imported_seconds = time.perf_counter() - started
+    print(
+        f"[OSCAL Import] ✓ {name}: {len(writer.group_ids)} groups, {writer.controls} controls "
+        f"({writer.withdrawn} withdrawn, {deactivated} deactivated) in {writer.statements} upsert statements, "
+        f"{imported_seconds:.2f}s"
+    )
+
+    embedded = 0
+    if embed and writer.imported:
+        try:
+            embedded = index_control_embeddings(writer.imported, batch_size=EMBED_BATCH_SIZE)
+            print(f"[OSCAL Import] ✓ Embedded {embedded} controls")
+        except Exception as e:
+            # The catalog is imported; embeddings can be rebuilt by re-running the import
+            print(f"[OSCAL Import] ⚠️ Embedding controls failed: {str(e)}")
+
+    return {
+        "framework_id": writer.framework_id,
+        "framework_name": name,
+        "document": kind,
+        "groups": len(writer.group_ids),
+        "controls": writer.controls,
+        "withdrawn": writer.withdrawn,
+        "deactivated": deactivated,
+        "embedded": embedded,
+        "statements": writer.statements,
+        "import_seconds": round(imported_seconds, 3),
+        "total_seconds": round(time.perf_counter() - started, 3)
+    }
@@ -5,7 +5,8 @@ Handles policy embeddings and similarity search.
 from typing import List, Dict, Any, Optional
 from pinecone import Pinecone
 from app.core.config import settings
-from app.services.ai_service import get_embedding
+from app.core.metrics import time_stage
+from app.services.ai_service import get_embedding, get_embeddings
 
 # Initialize Pinecone client and index (lazy initialization)
 print("[Pinecone] Pinecone service module loaded")
@@ -33,6 +34,15 @@ def get_index():
     """
     global _index, _pc, _index_verified
     
+    # Local in-memory stand-in (no API key or network needed)
+    if settings.VECTOR_STORE_BACKEND == "memory":
+        if _index is None:
+            from app.services.memory_index import get_memory_index
+            _index = get_memory_index()
+            _index_verified = True
+            print("[Pinecone] Using in-memory vector store (VECTOR_STORE_BACKEND=memory)")
+        return _index
+    
     # Check configuration
     if not settings.PINECONE_API_KEY:
         error_msg = "PINECONE_API_KEY not set in environment variables"
@@ -216,7 +226,8 @@ def index_policy_embedding(
             # Add control_ids if available
             if control_ids:
                 chunk_metadata["control_ids"] = control_ids
-            elif control_id:
+            # Gap analysis retrieval filters on control_id
+            if control_id is not None:
                 chunk_metadata["control_id"] = control_id
             
             # Add policy title and status
@@ -261,7 +272,9 @@ def index_policy_embedding(
             batch_size = 100
             for i in range(0, len(vectors_to_upsert), batch_size):
                 batch = vectors_to_upsert[i:i + batch_size]
-                pinecone_response = index.upsert(vectors=batch)
+                with time_stage("vector_upsert", "policies") as span:
+                    pinecone_response = index.upsert(vectors=batch)
+                    span.set_attribute("vectors", len(batch))
                 
                 # Log response
                 if hasattr(pinecone_response, 'upserted_count'):
@@ -383,11 +396,12 @@ def index_control_embedding(
         print(f"[Pinecone] Embedding dimension: {embedding_dim}")
         
         try:
-            index.upsert(vectors=[{
-                "id": vector_id,
-                "values": embedding,
-                "metadata": base_metadata
-            }])
+            with time_stage("vector_upsert", "controls"):
+                index.upsert(vectors=[{
+                    "id": vector_id,
+                    "values": embedding,
+                    "metadata": base_metadata
+                }])
             
             print(f"[Pinecone] ✓✓✓ Control {control_id} indexed successfully! ✓✓✓")
             print(f"[Pinecone] ===== Indexing Complete =====\n")
@@ -406,6 +420,55 @@ def index_control_embedding(
         raise Exception(f"Error indexing control embedding: {str(e)}")
 
 
+
+def index_control_embeddings(controls: List[Dict[str, Any]], batch_size: int = 100) -> int:
+    """
+    Index many controls' embeddings in Pinecone: one embeddings request and one
+    upsert per batch (same vector IDs and metadata as index_control_embedding).
+    
+    Args:
+        controls: Dicts with control_id, control_code, control_name, control_description
+            and optionally framework_id, control_group_id
+        batch_size: Controls per embeddings request / upsert (Pinecone accepts up to 100 vectors)
+    
+    Returns:
+        Number of controls indexed (controls without a description are skipped)
+    """
+    controls = [control for control in controls if control.get("control_description") and control["control_description"].strip()]
+    if not controls:
+        return 0
+    
+    index = get_index()
+    indexed = 0
+    for start in range(0, len(controls), batch_size):
+        batch = controls[start:start + batch_size]
+        embeddings = get_embeddings([
+            f"Control {control['control_code']}: {control['control_name']}\n\n{control['control_description']}"
+            for control in batch
+        ])
+        vectors = []
+        for control, embedding in zip(batch, embeddings):
+            metadata = {
+                "control_id": control["control_id"],
+                "control_code": str(control["control_code"]),
+                "title": str(control["control_name"]),
+                "content": control["control_description"],
+                "type": "control",
+            }
+            if control.get("framework_id"):
+                metadata["framework_id"] = control["framework_id"]
+            if control.get("control_group_id"):
+                metadata["control_group_id"] = control["control_group_id"]
+            vectors.append({"id": f"control_{control['control_id']}", "values": embedding, "metadata": metadata})
+        
+        with time_stage("vector_upsert", "controls") as span:
+            index.upsert(vectors=vectors)
+            span.set_attribute("vectors", len(vectors))
+        indexed += len(vectors)
+        print(f"[Pinecone] ✓ Indexed controls {start + 1}-{start + len(batch)} of {len(controls)}")
+    
+    return indexed
+
 def query_similar_policies(
     query_text: str,
     top_k: int = 8,
@@ -424,6 +487,7 @@ def query_similar_policies(
     
     Returns:
         List of dictionaries containing:
+        - id: str (vector id)
         - policy_id: int
         - title: str
         - content: str
@@ -476,13 +540,17 @@ def query_similar_policies(
         
         # Query Pinecone
         try:
-            results = index.query(**query_kwargs)
+            with time_stage("vector_query", "policies") as span:
+                results = index.query(**query_kwargs)
+                span.set_attributes(top_k=query_kwargs.get("top_k"), matches=len(results.matches))
         except Exception as query_error:
             # If query with filter fails, try without filter
             if filter_metadata:
                 print(f"[Pinecone Query] Warning: Query with filter failed, retrying without filter: {str(query_error)}")
                 query_kwargs.pop("filter", None)
-                results = index.query(**query_kwargs)
+                with time_stage("vector_query", "policies") as span:
+                    results = index.query(**query_kwargs)
+                    span.set_attributes(top_k=query_kwargs.get("top_k"), matches=len(results.matches), filtered=False)
             else:
                 raise
         
@@ -514,6 +582,7 @@ def query_similar_policies(
                 # Get chunk text - use "text" (new) or fallback to "content" (old) for backward compatibility
                 chunk_text = metadata.get("text") or metadata.get("content", "")
                 policy_data = {
+                    "id": match.id,
                     "policy_id": metadata.get("policy_id"),
                     "title": metadata.get("policy_title") or metadata.get("title", "Unknown"),
                     "content": chunk_text,  # Full chunk text (stored as "text" in new format)
@@ -552,7 +621,8 @@ def delete_policy_embedding(policy_id: int) -> bool:
     """
     try:
         index = get_index()
-        index.delete(ids=[f"policy_{policy_id}"])
+        with time_stage("vector_delete", "policies"):
+            index.delete(ids=[f"policy_{policy_id}"])
         return True
     except Exception as e:
         raise Exception(f"Error deleting policy embedding: {str(e)}")
@@ -576,6 +646,7 @@ def query_knowledge_base_chunks(
     
     Returns:
         List of dictionaries containing:
+        - id: str (vector id)
         - kb_doc_id: int
         - title: str
         - text: str (chunk content)
@@ -599,7 +670,9 @@ def query_knowledge_base_chunks(
         }
         
         print(f"[KB Query] Querying namespace: {namespace}")
-        results = index.query(**query_kwargs)
+        with time_stage("vector_query", "kb") as span:
+            results = index.query(**query_kwargs)
+            span.set_attributes(top_k=query_kwargs.get("top_k"), matches=len(results.matches))
         
         # Format results and apply similarity threshold
         kb_chunks = []
@@ -615,6 +688,7 @@ def query_knowledge_base_chunks(
             chunk_text = metadata.get("text", "")
             
             kb_data = {
+                "id": match.id,
                 "kb_doc_id": metadata.get("kb_doc_id"),
                 "title": metadata.get("title", "Unknown"),
                 "text": chunk_text,
@@ -0,0 +1,196 @@
+"""
+Threshold Replay
+Re-applies the gap analysis decision logic to stored results with different
+thresholds, without retrieval or LLM calls.
+
+- preview: one SELECT over the latest ledger result per control of a framework
+  (ControlResult: best similarity, coverage level, KB alignment, policy / KB
+  evidence counts) computes the new verdict, risk score and severity of every
+  control in SQL, so a what-if costs one query whatever the framework size
+- apply: the thresholds are stored for the framework and one UPDATE re-scores
+  the risk score and severity of every open gap of the framework from its
+  stored evidence (gaps.evidence)
+
+Verdict changes (GAP <-> COMPLIANT) are reported but not applied here: the next
+analysis run applies them, reusing the stored LLM evaluations. A control that was
+settled by the hard rules only because its best match was under the old
+similarity_min has never been evaluated, so it is reported as needing re-analysis.
+"""
+from typing import Dict, Any, Optional
+from sqlalchemy import select, update, func, case, cast, and_, or_
+from sqlalchemy.orm import Session
+from app.models import AnalysisRun, ControlResult, Control, Gap, GapStatus
+from app.services.decision_thresholds import (
+    get_thresholds, validate_thresholds, save_thresholds, risk_score_expr, severity_expr
+)
+
+# Changed controls listed in a preview
+PREVIEW_SAMPLE = 50
+
+
+def _replay_query(company_id: int, framework_id: int, thresholds: Dict[str, Any], current: Dict[str, Any]):
+    """Latest result per control with its replayed verdict, as one SELECT."""
+    latest = (
+        select(func.max(ControlResult.id).label("id"))
+        .join(AnalysisRun, AnalysisRun.id == ControlResult.run_id)
+        .where(
+            AnalysisRun.company_id == company_id,
+            ControlResult.framework_id == framework_id,
+            ControlResult.status.in_(["GAP", "COMPLIANT"])
+        )
+        .group_by(ControlResult.control_id)
+        .subquery()
+    )
+
+    details = ControlResult.details
+    similarity = func.coalesce(ControlResult.max_similarity, 0.0)
+    approved = func.coalesce(details["approved_policies_found"].as_integer(), 0)
+    kb_chunks = func.coalesce(details["kb_chunks_found"].as_integer(), 0)
+    # Mirrors the centralized decision in gap_analysis_service._finalize_control
+    compliant = and_(
+        approved > 0,
+        kb_chunks > 0,
+        similarity >= thresholds["similarity_min"],
+        similarity >= thresholds["auto_compliant"],
+        details["coverage_level"].as_string() == "FULL",
+        details["kb_alignment"].as_string() == "MATCH"
+    )
+    risk_score = risk_score_expr(similarity, thresholds)
+    needs_reanalysis = and_(
+        details["evaluation_tier"].as_string() == "rules",
+        approved > 0,
+        similarity >= thresholds["similarity_min"],
+        similarity < current["similarity_min"]
+    )
+
+    return (
+        select(
+            ControlResult.control_id,
+            Control.code.label("control_code"),
+            ControlResult.status,
+            ControlResult.severity,
+            ControlResult.risk_score,
+            case((compliant, "COMPLIANT"), else_="GAP").label("new_status"),
+            case((compliant, 0), else_=risk_score).label("new_risk_score"),
+            case((compliant, None), else_=severity_expr(risk_score, thresholds)).label("new_severity"),
+            needs_reanalysis.label("needs_reanalysis")
+        )
+        .join(latest, latest.c.id == ControlResult.id)
+        .outerjoin(Control, Control.id == ControlResult.control_id)
+        .order_by(ControlResult.control_id)
+    )
+
+
+def preview_thresholds(
+    db: Session,
+    company_id: int,
+    framework_id: int,
+    overrides: Optional[Dict[str, Any]] = None,
+    sample: int = PREVIEW_SAMPLE
+) -> Dict[str, Any]:
+    """
+    What-if: the verdicts, risk scores and severities a company's latest results of
+    a framework would get under other thresholds. Nothing is written.
+
+    Args:
+        db: Database session
+        company_id: ID of the company whose results are replayed
+        framework_id: ID of the framework
+        overrides: Thresholds to try (missing keys keep the framework's current value)
+        sample: Maximum number of changed controls to list
+
+    Returns:
+        Dictionary with the current and proposed thresholds, transition counts
+        ("GAP -> COMPLIANT", "MEDIUM -> HIGH", ...) and a sample of changed controls
+
+    Raises:
+        ValueError: If the overrides are invalid
+    """
+    current = get_thresholds(db, framework_id)
+    thresholds = validate_thresholds(overrides or {}, current)
+    rows = db.execute(_replay_query(company_id, framework_id, thresholds, current)).all()
+
+    status_changes: Dict[str, int] = {}
+    severity_changes: Dict[str, int] = {}
+    changed = []
+    needs_reanalysis = 0
+    for row in rows:
+        if row.needs_reanalysis:
+            needs_reanalysis += 1
+        status_changed = row.status != row.new_status
+        severity_changed = row.new_status == "GAP" and row.status == "GAP" and row.severity != row.new_severity
+        if status_changed:
+            key = f"{row.status} -> {row.new_status}"
+            status_changes[key] = status_changes.get(key, 0) + 1
+        if severity_changed:
+            key = f"{row.severity} -> {row.new_severity}"
+            severity_changes[key] = severity_changes.get(key, 0) + 1
+        if (status_changed or severity_changed or row.risk_score != row.new_risk_score) and len(changed) < sample:
+            changed.append({
+                "control_id": row.control_id,
+                "control_code": row.control_code,
+                "status": row.status,
+                "new_status": row.new_status,
+                "severity": row.severity,
+                "new_severity": row.new_severity,
+                "risk_score": row.risk_score,
+                "new_risk_score": row.new_risk_score,
+                "needs_reanalysis": bool(row.needs_reanalysis)
+            })
+
+    return {
+        "framework_id": framework_id,
+        "current_thresholds": current,
+        "thresholds": thresholds,
+        "controls_replayed": len(rows),
+        "gaps": sum(1 for row in rows if row.new_status == "GAP"),
+        "status_changes": status_changes,
+        "severity_changes": severity_changes,
+        "needs_reanalysis": needs_reanalysis,
+        "changed": changed
+    }
+
+
+def apply_thresholds(
+    db: Session,
+    framework_id: int,
+    overrides: Dict[str, Any],
+    user_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Store new thresholds for a framework and re-score its open gaps in one UPDATE
+    (every company: thresholds are per framework).
+
+    Gaps without stored evidence (written before it was recorded) keep their scores
+    until their control is analyzed again.
+
+    Returns:
+        Dictionary with the stored thresholds and the number of gaps re-scored
+
+    Raises:
+        ValueError: If the overrides are invalid
+    """
+    thresholds = save_thresholds(db, framework_id, overrides, user_id)
+
+    gaps = Gap.__table__
+    similarity = gaps.c.evidence["max_similarity"].as_float()
+    risk_score = risk_score_expr(similarity, thresholds)
+    severity = cast(severity_expr(risk_score, thresholds), gaps.c.severity.type)
+    result = db.execute(
+        update(gaps)
+        .where(
+            gaps.c.framework_id == framework_id,
+            gaps.c.is_active == True,
+            gaps.c.status.in_([GapStatus.IDENTIFIED, GapStatus.IN_REMEDIATION]),
+            similarity.isnot(None),
+            or_(gaps.c.risk_score != risk_score, gaps.c.severity != severity)
+        )
+        .values(risk_score=risk_score, severity=severity)
+    )
+    db.commit()
+    print(f"[Threshold Replay] ✓ Re-scored {result.rowcount} open gap(s) of framework {framework_id}")
+    return {
+        "framework_id": framework_id,
+        "thresholds": thresholds,
+        "gaps_rescored": result.rowcount
+    }
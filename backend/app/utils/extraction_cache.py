@@ -0,0 +1,143 @@
+"""
+Extraction Cache
+Content-addressed cache of extracted text, keyed by SHA-256 of the file bytes.
+
+Layout: storage/extraction_cache/v{EXTRACTOR_VERSION}/{hash[:2]}/{hash}.txt
+Eviction: entries older than EXTRACTION_CACHE_MAX_AGE_DAYS are dropped, then the
+least recently used entries are dropped until the cache fits EXTRACTION_CACHE_MAX_MB.
+"""
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Optional
+from app.core.config import settings
+
+# Bump when extraction logic changes so stale text is never served
+EXTRACTOR_VERSION = 1
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CACHE_ROOT = BASE_DIR / "storage" / "extraction_cache"
+CACHE_DIR = CACHE_ROOT / f"v{EXTRACTOR_VERSION}"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def compute_file_hash(file_path: str) -> str:
+    """
+    Compute the SHA-256 of a file without loading it fully into memory.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex digest of the file contents
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _entry_path(file_hash: str) -> Path:
+    return CACHE_DIR / file_hash[:2] / f"{file_hash}.txt"
+
+
+def get_cached_text(file_hash: str) -> Optional[str]:
+    """
+    Return cached text for a file hash, or None on a miss.
+    A hit refreshes the entry's mtime so LRU eviction keeps it.
+    """
+    if not settings.EXTRACTION_CACHE_ENABLED:
+        return None
+
+    path = _entry_path(file_hash)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        os.utime(path, None)
+        return text
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[Extraction Cache] ⚠️ Could not read cache entry {file_hash[:12]}: {str(e)}")
+        return None
+
+
+def store_text(file_hash: str, text: str) -> None:
+    """
+    Store extracted text for a file hash.
+    Writes atomically (temp file + rename) so concurrent readers never see partial entries.
+    Cache failures are logged and swallowed - the cache must never fail an upload.
+    """
+    if not settings.EXTRACTION_CACHE_ENABLED:
+        return
+
+    path = _entry_path(file_hash)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        print(f"[Extraction Cache] ✓ Stored {len(text)} characters for {file_hash[:12]}")
+    except Exception as e:
+        print(f"[Extraction Cache] ⚠️ Could not store cache entry {file_hash[:12]}: {str(e)}")
+        try:
+            tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+        return
+
+    evict_if_needed()
+
+
+def evict_if_needed(max_bytes: Optional[int] = None, max_age_days: Optional[int] = None) -> int:
+    """
+    Enforce the cache's age and size limits.
+
+    Args:
+        max_bytes: Size limit in bytes (default: EXTRACTION_CACHE_MAX_MB)
+        max_age_days: Age limit in days since last use (default: EXTRACTION_CACHE_MAX_AGE_DAYS)
+
+    Returns:
+        Number of entries evicted
+    """
+    if max_bytes is None:
+        max_bytes = settings.EXTRACTION_CACHE_MAX_MB * 1024 * 1024
+    if max_age_days is None:
+        max_age_days = settings.EXTRACTION_CACHE_MAX_AGE_DAYS
+
+    if not CACHE_ROOT.exists():
+        return 0
+
+    entries = []
+    total_bytes = 0
+    for path in CACHE_ROOT.rglob("*.txt"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total_bytes += stat.st_size
+
+    evicted = 0
+    cutoff = time.time() - max_age_days * 86400 if max_age_days > 0 else None
+
+    # Oldest first - entries from older extractor versions naturally age out
+    entries.sort(key=lambda e: e[0])
+    for mtime, size, path in entries:
+        expired = cutoff is not None and mtime < cutoff
+        if not expired and total_bytes <= max_bytes:
+            break
+        try:
+            path.unlink()
+            total_bytes -= size
+            evicted += 1
+        except FileNotFoundError:
+            continue
+
+    if evicted:
+        print(f"[Extraction Cache] Evicted {evicted} entries (cache size now {total_bytes} bytes)")
+    return evicted
@@ -0,0 +1,119 @@
+"""
+File Responses
+Conditional, resumable file downloads for stored artifacts.
+
+- Strong ETag (the content SHA-256 when known) with If-None-Match -> 304
+- HTTP Range / If-Range (single and multi-range) via Starlette's FileResponse,
+  which also uses the ASGI pathsend extension (zero-copy) when the server offers it
+- Optional offload to a reverse proxy (nginx X-Accel-Redirect / Apache X-Sendfile)
+  so the proxy serves the bytes with sendfile() after the app has checked permissions
+"""
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from app.core.config import settings
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB (Starlette default is 64 KB)
+
+# Downloads may be cached, but must be revalidated (cheap 304) before reuse
+CACHE_CONTROL = "private, max-age=0, must-revalidate"
+
+
+class ArtifactFileResponse(FileResponse):
+    """FileResponse with larger read chunks for multi-hundred-MB evidence files."""
+    chunk_size = DOWNLOAD_CHUNK_SIZE
+
+
+def make_etag(stat_result: os.stat_result, content_hash: Optional[str] = None) -> str:
+    """
+    Build a strong ETag for a stored file.
+
+    Args:
+        stat_result: os.stat() of the file
+        content_hash: SHA-256 of the content, if known
+
+    Returns:
+        Quoted ETag value
+    """
+    if content_hash:
+        return f'"{content_hash}"'
+    basis = f"{stat_result.st_mtime_ns}-{stat_result.st_size}"
+    return f'"{hashlib.sha256(basis.encode()).hexdigest()[:32]}"'
+
+
+def content_disposition(filename: str) -> str:
+    """Attachment Content-Disposition header value (RFC 5987 encoding for non-ASCII names)."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def file_download_response(
+    request: Request,
+    file_path: Path,
+    relative_path: str,
+    filename: str,
+    media_type: Optional[str] = None,
+    content_hash: Optional[str] = None
+) -> Response:
+    """
+    Build the response for an already-authorized file download.
+
+    Args:
+        request: Incoming request (for conditional and Range headers)
+        file_path: Absolute path of the file
+        relative_path: Path relative to the uploads root's parent (e.g. uploads/artifacts/x.pdf),
+            used for reverse-proxy offload
+        filename: Download filename for Content-Disposition
+        media_type: Content type
+        content_hash: SHA-256 of the content, if known (used as the ETag)
+
+    Returns:
+        304, proxy-offload, or (partial) file response
+    """
+    stat_result = file_path.stat()
+    etag = make_etag(stat_result, content_hash)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    media_type = media_type or "application/octet-stream"
+    backend = settings.ARTIFACT_SENDFILE_BACKEND.lower()
+    if backend in ("x-accel-redirect", "x-sendfile"):
+        # The proxy handles Range requests and streams the file with sendfile()
+        headers["Content-Disposition"] = content_disposition(filename)
+        if backend == "x-accel-redirect":
+            headers["X-Accel-Redirect"] = settings.ARTIFACT_SENDFILE_PREFIX.rstrip("/") + "/" + quote(relative_path.lstrip("/"))
+        else:
+            headers["X-Sendfile"] = str(file_path)
+        return Response(status_code=200, media_type=media_type, headers=headers)
+
+    return ArtifactFileResponse(
+        path=str(file_path),
+        filename=filename,
+        media_type=media_type,
+        headers=headers,
+        stat_result=stat_result
+    )
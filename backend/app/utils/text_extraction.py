@@ -3,13 +3,16 @@ Text Extraction Utility
 Extracts text from various file formats (PDF, DOCX, TXT, MD)
 """
 import os
+import time
 from pathlib import Path
 from typing import Optional
+from app.core.metrics import time_stage, record_stage
 
 
 def extract_text_from_file(file_path: str) -> str:
     """
     Extract text content from a file based on its extension.
+    Timed as the "extraction" stage, labelled by file type.
     
     Args:
         file_path: Path to the file
@@ -17,6 +20,11 @@ def extract_text_from_file(file_path: str) -> str:
     Returns:
         Extracted text content
     """
+    with time_stage("extraction", operation=Path(file_path).suffix.lower().lstrip(".") or "none"):
+        return _extract_text_from_file(file_path)
+
+
+def _extract_text_from_file(file_path: str) -> str:
     print(f"[Text Extraction] Extracting text from: {file_path}")
     
     if not os.path.exists(file_path):
@@ -121,3 +129,34 @@ def extract_text_from_file(file_path: str) -> str:
         print(f"[Text Extraction] ✗ ERROR extracting text: {str(e)}")
         raise
 
+
+
+def extract_text_cached(file_path: str, file_hash: Optional[str] = None) -> str:
+    """
+    Extract text content from a file through the content-addressed extraction cache.
+    Repeat uploads of the same bytes (new version, re-onboarding, another endpoint)
+    skip parsing entirely.
+    
+    Args:
+        file_path: Path to the file
+        file_hash: SHA-256 of the file bytes, if the caller already computed it
+        
+    Returns:
+        Extracted text content
+    """
+    from app.utils.extraction_cache import compute_file_hash, get_cached_text, store_text
+    
+    if not file_hash:
+        file_hash = compute_file_hash(file_path)
+    
+    started = time.perf_counter()
+    cached_text = get_cached_text(file_hash)
+    record_stage("extraction_cache", time.perf_counter() - started, "hit" if cached_text is not None else "miss")
+    if cached_text is not None:
+        print(f"[Text Extraction] ✓ Cache hit for {file_hash[:12]}: {len(cached_text)} characters (parsing skipped)")
+        return cached_text
+    
+    text = extract_text_from_file(file_path)
+    if text and text.strip():
+        store_text(file_hash, text)
+    return text
@@ -0,0 +1,270 @@
+"""
+Upload Pipeline
+Shared streaming upload handling for policy, knowledge base and artifact uploads.
+
+In a single pass over the uploaded body this:
+- enforces a maximum size (HTTP 413 as soon as the limit is crossed)
+- computes the SHA-256 of the content
+- counts bytes
+- sniffs the MIME type from the leading bytes
+- writes to a temp file that is atomically renamed to a content-addressed name
+"""
+import hashlib
+import mimetypes
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, List
+from fastapi import HTTPException, UploadFile, status
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+ZIP_CONTAINER_MIMES = {
+    ".docx": DOCX_MIME,
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+# (magic prefix, mime type) - checked in order
+MAGIC_SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword"),
+    (b"\x1f\x8b", "application/gzip"),
+]
+
+
+@dataclass
+class StoredUpload:
+    """Result of streaming an upload to disk."""
+    path: Path
+    sha256: str
+    size: int
+    mime_type: str
+    original_filename: str
+    extension: str
+    created: bool  # False when identical content was already stored
+
+
+def sniff_mime_type(head: bytes, filename: str, declared: Optional[str] = None) -> str:
+    """
+    Determine the MIME type from the first bytes of the content.
+    Falls back to the filename extension, then the client-declared type.
+    """
+    extension = Path(filename or "").suffix.lower()
+
+    if head.startswith(b"PK\x03\x04"):
+        return ZIP_CONTAINER_MIMES.get(extension, "application/zip")
+
+    for signature, mime_type in MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+
+    if len(head) >= 12 and head[4:8] == b"ftyp":
+        return "video/mp4"
+
+    if head and b"\x00" not in head:
+        try:
+            head.decode("utf-8")
+            return "text/markdown" if extension == ".md" else "text/plain"
+        except UnicodeDecodeError:
+            # A multi-byte character may be cut at the sniff boundary
+            try:
+                head[:-3].decode("utf-8")
+                return "text/markdown" if extension == ".md" else "text/plain"
+            except UnicodeDecodeError:
+                pass
+
+    guessed, _ = mimetypes.guess_type(filename or "")
+    return guessed or declared or "application/octet-stream"
+
+
+def max_upload_bytes(megabytes: int) -> int:
+    return megabytes * 1024 * 1024
+
+
+async def stream_upload_to_disk(
+    upload: UploadFile,
+    dest_dir: Path,
+    max_bytes: int,
+    name_prefix: str = "",
+    allowed_extensions: Optional[List[str]] = None
+) -> StoredUpload:
+    """
+    Stream an UploadFile to a content-addressed file in dest_dir.
+
+    The final filename is "{name_prefix}{sha256}{extension}", so identical
+    content always maps to the same file and different uploads can never
+    collide on a user-supplied filename.
+
+    Args:
+        upload: Incoming upload
+        dest_dir: Directory to store the file in
+        max_bytes: Maximum accepted size in bytes
+        name_prefix: Optional prefix for the stored filename
+        allowed_extensions: Optional list of permitted extensions (e.g. [".pdf", ".docx"])
+
+    Returns:
+        StoredUpload describing the stored file
+
+    Raises:
+        HTTPException: 400 for a missing/unsupported file, 413 when max_bytes is exceeded
+    """
+    if not upload or not upload.filename:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No file provided"
+        )
+
+    extension = Path(upload.filename).suffix.lower()
+    if allowed_extensions is not None and extension not in allowed_extensions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported file type: {extension}. Allowed: {', '.join(allowed_extensions)}"
+        )
+
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+
+    sha256 = hashlib.sha256()
+    size = 0
+    head = b""
+
+    fd, tmp_name = tempfile.mkstemp(dir=str(dest_dir), prefix=".upload-", suffix=".part")
+    tmp_path = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File exceeds the maximum upload size of {max_bytes // (1024 * 1024)} MB"
+                    )
+                if len(head) < 512:
+                    head += chunk[:512 - len(head)]
+                sha256.update(chunk)
+                out.write(chunk)
+
+        if size == 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Uploaded file is empty"
+            )
+
+        digest = sha256.hexdigest()
+        final_path = dest_dir / f"{name_prefix}{digest}{extension}"
+        created = not final_path.exists()
+        if created:
+            os.replace(tmp_path, final_path)
+        else:
+            tmp_path.unlink()
+            # Refresh mtime so garbage collectors treat the existing file as recently used
+            os.utime(final_path, None)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+    mime_type = sniff_mime_type(head, upload.filename, upload.content_type)
+    print(f"[Upload] ✓ Stored {upload.filename} → {final_path.name} ({size} bytes, {mime_type}, {'new' if created else 'existing'})")
+
+    return StoredUpload(
+        path=final_path,
+        sha256=digest,
+        size=size,
+        mime_type=mime_type,
+        original_filename=upload.filename,
+        extension=extension,
+        created=created
+    )
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware that bounds multipart request bodies before they are spooled.
+
+    Requests whose Content-Length exceeds max_bytes are rejected up front; bodies
+    without a Content-Length are cut off once max_bytes have been received.
+    Per-endpoint limits are still enforced by stream_upload_to_disk.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_type = headers.get(b"content-type", b"")
+        if not content_type.startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = headers.get(b"content-length")
+        if content_length is not None:
+            try:
+                if int(content_length) > self.max_bytes:
+                    await self._reject(send)
+                    return
+            except ValueError:
+                pass
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if not response_started:
+                await self._reject(send)
+
+    async def _reject(self, send):
+        body = b'{"detail":"Request body exceeds the maximum upload size"}'
+        await send({
+            "type": "http.response.start",
+            "status": status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class _BodyTooLarge(HTTPException):
+    """Raised from receive(); an HTTPException so FastAPI's body parsing re-raises it as a 413."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Request body exceeds the maximum upload size"
+        )
@@ -0,0 +1,124 @@
+"""
+Benchmark single-control vs batched gap evaluation.
+Retrieves the real inputs (policy chunks, KB chunks, requirements) for a company's
+selected controls once, then evaluates them with one request per control and with
+packed multi-control requests, and compares requests, tokens and wall time.
+
+Nothing is written to the database (the session is rolled back), and the LLM
+response cache is bypassed so both passes make real requests.
+
+Usage:
+    python benchmark_gap_evaluation.py <framework_id> <company_id> [--limit N] [--batch-size N] [--token-budget N]
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.db import SessionLocal
+from app.services.ai_service import (
+    generate_gap_analysis,
+    generate_gap_analysis_batch,
+    get_llm_usage,
+    reset_llm_usage
+)
+from app.services.llm_cache import llm_cache_bypass
+from app.services.gap_analysis_service import (
+    get_selected_controls,
+    prepare_control_analysis,
+    decompose_control_requirements
+)
+
+
+def run_pass(label, evaluate):
+    """Run one evaluation pass and return its usage/timing."""
+    reset_llm_usage()
+    started = time.perf_counter()
+    with llm_cache_bypass():
+        evaluations = evaluate()
+    elapsed = time.perf_counter() - started
+    usage = get_llm_usage()
+    usage["seconds"] = elapsed
+    usage["gaps"] = sum(1 for e in evaluations if e.get("gap_identified"))
+    usage["failed"] = sum(1 for e in evaluations if e.get("evaluation_failed"))
+    print(f"✓ {label}: {usage['calls']} request(s), {usage['prompt_tokens']} prompt + "
+          f"{usage['completion_tokens']} completion tokens, {elapsed:.1f}s")
+    return usage, evaluations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched gap evaluation")
+    parser.add_argument("framework_id", type=int)
+    parser.add_argument("company_id", type=int)
+    parser.add_argument("--limit", type=int, default=None, help="Only evaluate the first N selected controls")
+    parser.add_argument("--batch-size", type=int, default=None, help="Controls per batched request (default: GAP_EVAL_BATCH_SIZE)")
+    parser.add_argument("--token-budget", type=int, default=None, help="Prompt token budget per request (default: GAP_EVAL_BATCH_TOKEN_BUDGET)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print("\n" + "="*80)
+        print("GAP EVALUATION BENCHMARK: SINGLE vs BATCHED")
+        print("="*80 + "\n")
+
+        controls = get_selected_controls(db, args.company_id, args.framework_id)
+        if args.limit:
+            controls = controls[:args.limit]
+        if not controls:
+            print("No selected controls for this company/framework. Exiting.\n")
+            return
+
+        # Retrieval and requirement extraction are shared by both passes
+        items = []
+        for control in controls:
+            ctx = prepare_control_analysis(control.id, args.company_id, db, force=True)
+            if "error_result" in ctx:
+                print(f"⚠ SKIPPED: {ctx['error_result'].get('reason')}")
+                continue
+            items.append({
+                "control_name": control.name,
+                "control_description": control.description or "",
+                "similar_policies": ctx["similar_policies"],
+                "framework_name": ctx["framework"].name,
+                "control_requirements": decompose_control_requirements(control.name, control.description or ""),
+                "knowledge_base_chunks": ctx["knowledge_base_chunks"]
+            })
+        db.rollback()
+
+        print(f"\nPrepared {len(items)} control(s)\n")
+
+        single, single_results = run_pass(
+            "Single",
+            lambda: [generate_gap_analysis(**item) for item in items]
+        )
+        batched, batched_results = run_pass(
+            "Batched",
+            lambda: generate_gap_analysis_batch(items, token_budget=args.token_budget, max_batch_size=args.batch_size)
+        )
+
+        agreement = sum(
+            1 for a, b in zip(single_results, batched_results)
+            if a.get("coverage_level") == b.get("coverage_level")
+        )
+
+        print("\n" + "="*80)
+        print(f"{'':<22}{'Single':>14}{'Batched':>14}")
+        for key in ("calls", "prompt_tokens", "completion_tokens", "gaps", "failed"):
+            print(f"{key:<22}{single[key]:>14}{batched[key]:>14}")
+        print(f"{'seconds':<22}{single['seconds']:>14.1f}{batched['seconds']:>14.1f}")
+        if single["prompt_tokens"]:
+            saved = 1 - batched["prompt_tokens"] / single["prompt_tokens"]
+            print(f"\nPrompt tokens saved: {saved:.0%}")
+        print(f"Coverage level agreement: {agreement}/{len(items)}")
+        print("="*80 + "\n")
+    except Exception as e:
+        db.rollback()
+        print(f"✗ Benchmark failed: {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+End-to-end pipeline benchmark on the offline stand-ins.
+Drives the real API (policy upload + approval, KB upload, /gap-analysis/run and
+/chat/query) over synthetic tenants with LLM_BACKEND=offline, EMBEDDING_BACKEND=hash
+and VECTOR_STORE_BACKEND=memory, so no OpenAI or Pinecone keys are needed and runs
+are repeatable.
+
+Each tenant gets its own framework (one control group, --controls controls), a
+company and admin user (seeded directly, with a minted access token), a KB document, approved policies for --coverage of its
+controls, two gap analysis runs (cold, then warm with stored evaluations reused)
+and --chat-queries chat questions.
+
+Reports per-operation latency (mean/p50/p95/max) and throughput, the gap analysis
+per-stage breakdown (validate, policies, retrieve, knowledge_base, cache, evaluate,
+persist), LLM calls/tokens and cascade tiers. With --baseline, exits with status 1
+when an operation's p95 latency regressed by more than --max-regression, so the
+benchmark can gate CI.
+
+Uses a throwaway SQLite database (and deletes the KB files it uploaded) unless
+--database-url is given. Rate limits are lifted and the LLM response cache is
+disabled for the run.
+
+Usage:
+    python benchmark_pipeline.py [--tenants N] [--controls N] [--coverage 0.75] [--chat-queries N]
+                                 [--llm-latency-ms MS] [--embedding-latency-ms MS]
+                                 [--output results.json] [--baseline results.json] [--max-regression 0.25]
+"""
+import sys
+import os
+import io
+import json
+import time
+import re
+import uuid
+import argparse
+import tempfile
+import statistics
+from contextlib import redirect_stdout, nullcontext
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+CONTROL_TEMPLATES = [
+    ("Access Control Policy", "Access to information and systems shall be granted on a least privilege basis. User access rights shall be approved by the asset owner and reviewed every quarter. Access shall be revoked promptly when employment ends."),
+    ("Backup Management", "Backup copies of information, software and system images shall be taken daily. Backups shall be encrypted and stored offsite. Restoration of backups shall be tested at least twice a year."),
+    ("Cryptographic Controls", "Encryption shall protect confidential data at rest and in transit. Cryptographic keys shall be generated, stored and rotated under a documented key management procedure. Deprecated algorithms shall not be used."),
+    ("Incident Response", "Information security incidents shall be reported through a defined channel. Incidents shall be classified by severity and responded to within defined timelines. Lessons learned shall be recorded after every major incident."),
+    ("Logging and Monitoring", "Event logs recording user activities, exceptions and security events shall be produced and retained for one year. Logs shall be protected against tampering. Logs shall be reviewed regularly for anomalies."),
+    ("Supplier Security", "Information security requirements shall be agreed with each supplier that accesses organisational assets. Supplier service delivery shall be monitored and reviewed annually. Supplier access shall be removed at contract end."),
+    ("Vulnerability Management", "Technical vulnerabilities of information systems shall be identified through monthly scanning. Critical vulnerabilities shall be remediated within fourteen days. Patch status shall be reported to management."),
+    ("Change Management", "Changes to information processing facilities and systems shall follow a formal change procedure. Changes shall be risk assessed, approved and tested before deployment. Emergency changes shall be reviewed afterwards."),
+    ("Asset Inventory", "An inventory of information assets and their owners shall be maintained. Assets shall be classified according to sensitivity. Acceptable use rules shall be documented for each asset class."),
+    ("Business Continuity", "Business continuity plans shall be documented for critical processes. Recovery time objectives shall be defined and approved. Continuity plans shall be exercised and updated every year."),
+    ("Security Awareness Training", "All personnel shall complete security awareness training at onboarding and annually. Training completion shall be tracked. Phishing simulations shall be run every quarter."),
+    ("Physical Security", "Secure areas shall be protected by entry controls allowing only authorised personnel. Visitor access shall be logged and escorted. Equipment shall be protected from environmental threats."),
+]
+
+CHAT_QUESTIONS = [
+    "Which policy covers {name}?",
+    "Summarise our requirements for {name}",
+    "Where do we document {name} responsibilities?",
+]
+
+OPERATIONS = ("kb_upload", "policy_upload", "policy_approve", "gap_analysis_cold", "gap_analysis_warm", "chat_query")
+
+
+def configure_environment(args):
+    """Select the offline stand-ins before any app module reads the settings."""
+    os.environ["LLM_BACKEND"] = "offline"
+    os.environ["EMBEDDING_BACKEND"] = "hash"
+    os.environ["VECTOR_STORE_BACKEND"] = "memory"
+    os.environ["OFFLINE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["OFFLINE_LLM_MS_PER_OUTPUT_TOKEN"] = str(args.llm_ms_per_token)
+    os.environ["OFFLINE_EMBEDDING_LATENCY_MS"] = str(args.embedding_latency_ms)
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ["LLM_RPM_LIMIT"] = "100000000"
+    os.environ["LLM_TPM_LIMIT"] = "100000000000"
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{Path(tempfile.mkdtemp(prefix='grc-bench-')) / 'benchmark.db'}"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[position]
+
+
+def summarize(samples):
+    """Latency summary (ms) for one operation."""
+    if not samples:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0, "per_second": 0.0}
+    total_seconds = sum(samples) / 1000.0
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.mean(samples), 1),
+        "p50_ms": round(percentile(samples, 0.50), 1),
+        "p95_ms": round(percentile(samples, 0.95), 1),
+        "max_ms": round(max(samples), 1),
+        "per_second": round(len(samples) / total_seconds, 2) if total_seconds else 0.0
+    }
+
+
+def build_kb_docx(controls):
+    """KB reference document: one section per control."""
+    from docx import Document
+    document = Document()
+    for name, description in controls:
+        document.add_heading(name, level=2)
+        document.add_paragraph(f"{name}. {description}")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+class PipelineBenchmark:
+    def __init__(self, args):
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.db import Base, engine, SessionLocal
+        from app import models  # noqa: F401 - register the tables
+
+        Base.metadata.create_all(bind=engine)
+        self.args = args
+        self.client = TestClient(app)
+        self.SessionLocal = SessionLocal
+        engine.echo = args.verbose
+        self.run_id = uuid.uuid4().hex[:8]
+        self.samples = {operation: [] for operation in OPERATIONS}
+        self.stage_ms = {operation: {} for operation in OPERATIONS}
+        self.errors = []
+
+    def quiet(self):
+        """Silence the app's console logging during measured calls (unless --verbose)."""
+        return nullcontext() if self.args.verbose else redirect_stdout(io.StringIO())
+
+    def call(self, operation, method, url, expected=(200, 201), **kwargs):
+        """Make one API call and record its latency under operation."""
+        with self.quiet():
+            started = time.perf_counter()
+            response = self.client.request(method, url, **kwargs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        if response.status_code not in expected:
+            self.errors.append(f"{operation}: {method} {url} -> {response.status_code} {response.text[:200]}")
+            return None
+        if operation:
+            self.samples[operation].append(elapsed_ms)
+            self.record_server_timing(operation, response.headers.get("server-timing", ""))
+        return response.json()
+
+    def record_server_timing(self, operation, header):
+        """Add a response's Server-Timing stage durations to the operation's totals."""
+        for entry in header.split(","):
+            name, _, params = entry.strip().partition(";")
+            match = re.search(r"dur=([0-9.]+)", params)
+            if name and name != "total" and match:
+                totals = self.stage_ms[operation]
+                totals[name] = totals.get(name, 0.0) + float(match.group(1))
+
+    def seed_tenant(self, tenant):
+        """Company, admin user, framework, controls and the control selection (setup, not measured)."""
+        from app.models import Framework, ControlGroup, Control, Company, User
+        from app.core.security import create_access_token
+        from app.services.control_selection_service import replace_control_selection
+
+        controls = [
+            CONTROL_TEMPLATES[i % len(CONTROL_TEMPLATES)]
+            for i in range(self.args.controls)
+        ]
+
+        db = self.SessionLocal()
+        try:
+            with self.quiet():
+                company = Company(name=f"Benchmark Tenant {self.run_id}-{tenant}", industry="Technology", is_active=True)
+                db.add(company)
+                db.flush()
+                # Superuser: allowed to upload KB documents. Tokens are minted directly,
+                # so the account needs no usable password.
+                user = User(
+                    email=f"bench-{self.run_id}-{tenant}@example.com",
+                    hashed_password="!",
+                    first_name="Bench",
+                    last_name=f"Tenant{tenant}",
+                    company_id=company.id,
+                    is_active=True,
+                    is_superuser=True
+                )
+                db.add(user)
+                framework = Framework(name=f"Benchmark Framework {self.run_id}-{tenant}", version="1.0", is_active=True)
+                db.add(framework)
+                db.flush()
+                group = ControlGroup(name="Benchmark Controls", code="BM", framework_id=framework.id, order_index=1, is_active=True)
+                db.add(group)
+                db.flush()
+                control_rows = []
+                for i, (name, description) in enumerate(controls, 1):
+                    control = Control(
+                        name=name if i <= len(CONTROL_TEMPLATES) else f"{name} {i}",
+                        description=description,
+                        code=f"BM-{i}",
+                        control_group_id=group.id,
+                        order_index=i,
+                        is_active=True
+                    )
+                    db.add(control)
+                    control_rows.append(control)
+                db.flush()
+                replace_control_selection(db, company.id, framework.id, [control.id for control in control_rows])
+                db.commit()
+            token = create_access_token(data={"sub": user.email, "user_id": user.id})
+            return {
+                "headers": {"Authorization": f"Bearer {token}"},
+                "framework_id": framework.id,
+                "controls": [(c.id, c.name, c.description) for c in control_rows]
+            }
+        finally:
+            db.close()
+
+    def run_tenant(self, tenant):
+        from app.services.impact_service import wait_for_pending
+
+        seeded = self.seed_tenant(tenant)
+        headers = seeded["headers"]
+        framework_id = seeded["framework_id"]
+        controls = seeded["controls"]
+
+        # Knowledge base reference document for the tenant's framework
+        self.call("kb_upload", "POST", "/api/v1/knowledge-base/upload", headers=headers,
+                  data={"framework_id": str(framework_id), "title": f"Reference {self.run_id}-{tenant}", "version": "1"},
+                  files={"file": ("reference.docx", build_kb_docx([(name, description) for _, name, description in controls]),
+                                  "application/vnd.openxmlformats-officedocument.wordprocessingml.document")})
+
+        # Policies for the covered share of controls, then approval (re-indexing runs in the background)
+        covered = controls[:int(round(len(controls) * self.args.coverage))]
+        for control_id, name, description in covered:
+            policy = self.call("policy_upload", "POST", "/api/v1/policies/upload", headers=headers, json={
+                "title": f"{name} Policy",
+                "content": f"{name}\n\n{description} This policy is owned by the security team and reviewed annually.",
+                "framework_id": framework_id,
+                "control_id": control_id
+            })
+            if policy:
+                self.call("policy_approve", "PATCH", f"/api/v1/policies/{policy['id']}", headers=headers, json={"status": "approved"})
+        with self.quiet():
+            wait_for_pending()
+
+        # Gap analysis: cold (every control evaluated), then warm (unchanged inputs reuse stored evaluations)
+        self.call("gap_analysis_cold", "POST", f"/api/v1/gap-analysis/run?framework_id={framework_id}&force=true", headers=headers)
+        self.call("gap_analysis_warm", "POST", f"/api/v1/gap-analysis/run?framework_id={framework_id}", headers=headers)
+
+        for i in range(self.args.chat_queries):
+            _, name, _ = controls[i % len(controls)]
+            question = CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)].format(name=name.lower())
+            self.call("chat_query", "POST", "/api/v1/chat/query", headers=headers, json={"query": question})
+
+    def cleanup(self):
+        """Delete the KB files uploaded by this run (only used with the throwaway database)."""
+        from app.models import KnowledgeBaseDocument
+        db = self.SessionLocal()
+        try:
+            for (file_path,) in db.query(KnowledgeBaseDocument.file_path).all():
+                if file_path and Path(file_path).exists():
+                    Path(file_path).unlink()
+        finally:
+            db.close()
+
+    def run(self):
+        from app.services.gap_analysis_service import get_stage_stats, reset_stage_stats
+        from app.services.llm_gateway import get_llm_usage, reset_llm_usage
+        from app.services.evaluation_cascade import get_cascade_stats, reset_cascade_stats
+
+        reset_stage_stats()
+        reset_llm_usage()
+        reset_cascade_stats()
+
+        started = time.perf_counter()
+        for tenant in range(1, self.args.tenants + 1):
+            tenant_started = time.perf_counter()
+            self.run_tenant(tenant)
+            print(f"✓ Tenant {tenant}/{self.args.tenants} done in {time.perf_counter() - tenant_started:.1f}s")
+        elapsed = time.perf_counter() - started
+
+        return {
+            "config": {
+                "tenants": self.args.tenants,
+                "controls": self.args.controls,
+                "coverage": self.args.coverage,
+                "chat_queries": self.args.chat_queries,
+                "llm_latency_ms": self.args.llm_latency_ms,
+                "llm_ms_per_token": self.args.llm_ms_per_token,
+                "embedding_latency_ms": self.args.embedding_latency_ms
+            },
+            "seconds": round(elapsed, 2),
+            "operations": {operation: summarize(samples) for operation, samples in self.samples.items()},
+            "request_stages_ms": {
+                operation: {stage: round(ms / max(len(self.samples[operation]), 1), 1) for stage, ms in sorted(stages.items())}
+                for operation, stages in self.stage_ms.items() if stages
+            },
+            "gap_analysis_stages": get_stage_stats(),
+            "llm_usage": get_llm_usage(),
+            "cascade": get_cascade_stats(),
+            "errors": self.errors
+        }
+
+
+def print_report(results):
+    print("\n" + "="*80)
+    print("PIPELINE BENCHMARK (offline stand-ins)")
+    print("="*80)
+    print(f"{'operation':<22}{'count':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'ops/s':>9}")
+    for operation, summary in results["operations"].items():
+        print(f"{operation:<22}{summary['count']:>7}{summary['mean_ms']:>10.1f}{summary['p50_ms']:>10.1f}"
+              f"{summary['p95_ms']:>10.1f}{summary['max_ms']:>10.1f}{summary['per_second']:>9.2f}")
+
+    print("\nMean per-request stage time (Server-Timing):")
+    for operation, stages in results["request_stages_ms"].items():
+        print(f"  {operation:<20}" + ", ".join(f"{stage}={ms:.1f}ms" for stage, ms in stages.items()))
+
+    print(f"\n{'gap analysis stage':<22}{'count':>7}{'avg ms':>10}{'max ms':>10}{'total ms':>12}")
+    for stage, stats in results["gap_analysis_stages"].items():
+        print(f"{stage:<22}{stats['count']:>7}{stats['avg_ms']:>10.1f}{stats['max_ms']:>10.1f}{stats['total_ms']:>12.1f}")
+
+    usage = results["llm_usage"]
+    print(f"\nLLM: {usage['calls']} call(s), {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion tokens")
+    tiers = results["cascade"]["tiers"]
+    print("Cascade: " + ", ".join(f"{tier}={stats['evaluations']}" for tier, stats in tiers.items())
+          + f", escalations={results['cascade']['escalations']}")
+    print(f"Total: {results['seconds']:.1f}s")
+    if results["errors"]:
+        print(f"\n⚠ {len(results['errors'])} failed call(s):")
+        for error in results["errors"][:10]:
+            print(f"  - {error}")
+    print("="*80 + "\n")
+
+
+def compare_with_baseline(results, baseline_path, max_regression):
+    """Return the operations whose p95 latency regressed by more than max_regression."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    regressions = []
+    for operation, summary in results["operations"].items():
+        before = baseline.get("operations", {}).get(operation)
+        if not before or not before.get("p95_ms") or not summary["count"]:
+            continue
+        change = summary["p95_ms"] / before["p95_ms"] - 1
+        marker = "✗" if change > max_regression else "✓"
+        print(f"{marker} {operation}: p95 {before['p95_ms']:.1f} -> {summary['p95_ms']:.1f} ms ({change:+.0%})")
+        if change > max_regression:
+            regressions.append(operation)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on offline stand-ins")
+    parser.add_argument("--tenants", type=int, default=3)
+    parser.add_argument("--controls", type=int, default=12, help="Controls per tenant framework")
+    parser.add_argument("--coverage", type=float, default=0.75, help="Share of controls with an approved policy")
+    parser.add_argument("--chat-queries", type=int, default=5, help="Chat questions per tenant")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Simulated latency per chat completion")
+    parser.add_argument("--llm-ms-per-token", type=float, default=0, help="Simulated latency per completion token")
+    parser.add_argument("--embedding-latency-ms", type=float, default=0, help="Simulated latency per embedding request")
+    parser.add_argument("--database-url", default=None, help="Database to use (default: a throwaway SQLite file)")
+    parser.add_argument("--output", default=None, help="Write the results as JSON")
+    parser.add_argument("--baseline", default=None, help="Results JSON to compare p95 latencies against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed p95 increase over the baseline (0.25 = 25%%)")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's logs")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    with nullcontext() if args.verbose else redirect_stdout(io.StringIO()):
+        benchmark = PipelineBenchmark(args)
+
+    try:
+        results = benchmark.run()
+    except Exception as e:
+        print(f"✗ Benchmark failed: {str(e)}")
+        sys.exit(1)
+    finally:
+        if not args.database_url:
+            benchmark.cleanup()
+
+    print_report(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"✓ Results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.max_regression)
+        if regressions:
+            print(f"\n✗ p95 regression over {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+    if results["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
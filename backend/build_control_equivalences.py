@@ -0,0 +1,72 @@
+"""
+Script to build the cross-framework control equivalence index.
+Loads curated mappings from a CSV crosswalk and / or computes embedding-similarity
+candidates between two frameworks.
+
+CSV columns: source_framework, source_code, target_framework, target_code
+(frameworks by ID or name).
+
+Usage:
+    python build_control_equivalences.py [--curated CSV] [--frameworks ID ID] [--min-similarity X] [--auto-accept X] [--top-k N]
+
+Example:
+    python build_control_equivalences.py --curated iso27001_nist80053.csv
+    python build_control_equivalences.py --frameworks 3 7 --auto-accept 0.95
+"""
+import sys
+import csv
+import argparse
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.db import SessionLocal
+from app.services.control_equivalence import import_curated_mappings, compute_embedding_candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the cross-framework control equivalence index")
+    parser.add_argument("--curated", default=None, help="CSV crosswalk of curated mappings")
+    parser.add_argument("--frameworks", type=int, nargs=2, metavar="ID", default=None, help="Compute embedding candidates between two frameworks")
+    parser.add_argument("--min-similarity", type=float, default=None, help="Minimum similarity of a candidate")
+    parser.add_argument("--auto-accept", type=float, default=None, help="Similarity from which candidates are approved without review (default CONTROL_EQUIVALENCE_AUTO_ACCEPT; unset = all wait for review)")
+    parser.add_argument("--top-k", type=int, default=3, help="Candidates kept per control")
+    args = parser.parse_args()
+    if not args.curated and not args.frameworks:
+        parser.error("give --curated and/or --frameworks")
+
+    db = SessionLocal()
+    try:
+        print("\n" + "="*80)
+        print("CONTROL EQUIVALENCE INDEX")
+        print("="*80 + "\n")
+
+        if args.curated:
+            with open(args.curated, newline="", encoding="utf-8") as f:
+                result = import_curated_mappings(db, list(csv.DictReader(f)))
+            db.commit()
+            print(f"Curated pairs added:     {result['added']}")
+            print(f"Curated pairs updated:   {result['updated']}")
+            print(f"Unresolved mappings:     {len(result['unresolved'])}")
+            for mapping in result["unresolved"][:20]:
+                print(f"  - {mapping.get('source_framework')} {mapping.get('source_code')} -> {mapping.get('target_framework')} {mapping.get('target_code')}")
+
+        if args.frameworks:
+            result = compute_embedding_candidates(
+                db, args.frameworks[0], args.frameworks[1],
+                min_similarity=args.min_similarity, auto_accept=args.auto_accept, top_k=args.top_k
+            )
+            db.commit()
+            print(f"Controls compared:       {result['controls']}")
+            print(f"Candidate pairs:         {result['candidates']} ({result['approved']} auto-approved)")
+            print(f"Pairs added / updated:   {result['added']} / {result['updated']}")
+        print()
+    except Exception as e:
+        db.rollback()
+        print(f"✗ Building the equivalence index failed: {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
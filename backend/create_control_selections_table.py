@@ -1,5 +1,5 @@
 """
-Script to create control_selections table if it doesn't exist
+Script to create control_selections (and company_control_selection) tables if they don't exist
 """
 import sys
 from pathlib import Path
@@ -7,7 +7,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from sqlalchemy import inspect, text
 from app.db import engine, Base, SessionLocal
-from app.models.control_selection import ControlSelection
+from app.models.control_selection import ControlSelection, CompanyControlSelection
 from app.models.company import Company
 from app.models.framework import Framework
 
@@ -62,7 +62,6 @@ def create_table_sql():
                 id SERIAL PRIMARY KEY,
                 company_id INTEGER NOT NULL,
                 framework_id INTEGER NOT NULL,
-                selected_control_ids JSONB NOT NULL,
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP WITH TIME ZONE,
                 
@@ -90,11 +89,6 @@ def create_table_sql():
                 ON control_selections(company_id, framework_id)
         """))
         
-        db.execute(text("""
-            CREATE INDEX IF NOT EXISTS ix_control_selections_control_ids 
-                ON control_selections USING GIN (selected_control_ids)
-        """))
-        
         db.commit()
         print("✅ Table 'control_selections' created successfully!")
         print("✅ Indexes created successfully!")
@@ -169,6 +163,10 @@ def main():
     print("=" * 60)
     print()
     
+    # Selected controls, one row per control (composite primary key)
+    CompanyControlSelection.__table__.create(bind=engine, checkfirst=True)
+    print("✅ Table 'company_control_selection' is present")
+    
     # Check if table already exists
     if check_table_exists():
         print("✅ Table 'control_selections' already exists")
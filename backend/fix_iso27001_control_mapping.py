@@ -12,6 +12,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 from sqlalchemy import text
 from app.db import SessionLocal
 from app.models import Framework, ControlGroup, Control
+from app.services import framework_catalog
 
 def fix_control_groups():
     """PART 1: Ensure ISO 27001 control groups exist and are correctly linked"""
@@ -68,6 +69,8 @@ def fix_control_groups():
                 db.add(new_group)
                 created_count += 1
         
+        # Cached trees of the framework (running workers included) are reloaded
+        framework_catalog.invalidate_framework(db, framework.id)
         db.commit()
         print(f"\n✅ Control groups: {created_count} created, {updated_count} updated")
         return True
@@ -118,6 +121,7 @@ def fix_control_mappings():
         ).all()
         
         fixed_count = 0
+        other_framework_ids = set()  # Frameworks controls are moved out of
         skipped_count = 0
         error_count = 0
         
@@ -163,6 +167,7 @@ def fix_control_mappings():
                 # Control belongs to wrong framework
                 print(f"🔧 Fixing {control.code} ({control.id}): Wrong framework (group framework_id={current_group.framework_id}) -> {code_prefix} (ID: {correct_group_id})")
                 control.control_group_id = correct_group_id
+                other_framework_ids.add(current_group.framework_id)
                 fixed_count += 1
             elif control.control_group_id != correct_group_id:
                 # Control in wrong group (but same framework)
@@ -173,6 +178,9 @@ def fix_control_mappings():
                 # Control is correctly mapped
                 skipped_count += 1
         
+        # Cached trees of the frameworks involved (running workers included) are reloaded
+        for framework_id in {framework.id} | other_framework_ids:
+            framework_catalog.invalidate_framework(db, framework_id)
         db.commit()
         print(f"\n✅ Control mappings: {fixed_count} fixed, {skipped_count} already correct, {error_count} errors")
         return True
@@ -0,0 +1,46 @@
+"""
+Script to garbage-collect orphaned artifact blobs.
+Removes stored artifact files that no active artifact references any more.
+
+Usage:
+    python gc_artifact_blobs.py [--dry-run] [--grace-hours N]
+"""
+import sys
+import argparse
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.db import SessionLocal
+from app.services.artifact_blob_service import collect_orphan_blobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Garbage-collect orphaned artifact blobs")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    parser.add_argument("--grace-hours", type=int, default=None, help="Minimum age of unreferenced blobs/files before removal")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print("\n" + "="*80)
+        print("ARTIFACT BLOB GARBAGE COLLECTION" + (" (DRY RUN)" if args.dry_run else ""))
+        print("="*80 + "\n")
+
+        result = collect_orphan_blobs(db, grace_hours=args.grace_hours, dry_run=args.dry_run)
+
+        print(f"Reference counts reconciled: {result['reconciled']}")
+        print(f"Blobs removed:               {result['blobs_removed']}")
+        print(f"Blob files removed:          {result['files_removed']}")
+        print(f"Stray files removed:         {result['stray_files_removed']}")
+        print(f"Bytes freed:                 {result['bytes_freed']}")
+        print()
+    except Exception as e:
+        db.rollback()
+        print(f"✗ Garbage collection failed: {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
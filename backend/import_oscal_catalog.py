@@ -0,0 +1,58 @@
+"""
+Script to import a NIST OSCAL catalog or profile (JSON or XML) as a framework.
+Re-running it with a newer revision of the catalog updates the framework in place.
+
+Usage:
+    python import_oscal_catalog.py PATH [--catalog CATALOG] [--name NAME] [--category CATEGORY] [--no-embeddings]
+
+Example:
+    python import_oscal_catalog.py NIST_SP-800-53_rev5_catalog.json
+    python import_oscal_catalog.py NIST_SP-800-53_rev5_MODERATE-baseline_profile.json --catalog NIST_SP-800-53_rev5_catalog.json
+"""
+import sys
+import argparse
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.db import SessionLocal
+from app.services.oscal_importer import import_oscal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import an OSCAL catalog or profile as a framework")
+    parser.add_argument("path", help="OSCAL catalog or profile (JSON or XML)")
+    parser.add_argument("--catalog", default=None, help="Catalog a profile imports (default: resolved from the profile)")
+    parser.add_argument("--name", default=None, help="Framework name (default: the document title)")
+    parser.add_argument("--category", default="Security", help="Framework category")
+    parser.add_argument("--no-embeddings", action="store_true", help="Do not embed the controls into the vector store")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print("\n" + "="*80)
+        print("OSCAL IMPORT")
+        print("="*80 + "\n")
+
+        result = import_oscal(
+            db, args.path, framework_name=args.name, catalog_path=args.catalog,
+            category=args.category, embed=not args.no_embeddings
+        )
+
+        print(f"\nFramework:           {result['framework_name']} (id {result['framework_id']})")
+        print(f"Control groups:      {result['groups']}")
+        print(f"Controls:            {result['controls']} ({result['withdrawn']} withdrawn)")
+        print(f"Deactivated:         {result['deactivated']}")
+        print(f"Embedded:            {result['embedded']}")
+        print(f"Upsert statements:   {result['statements']}")
+        print(f"Import time:         {result['import_seconds']}s (total {result['total_seconds']}s)")
+        print()
+    except Exception as e:
+        db.rollback()
+        print(f"✗ OSCAL import failed: {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Script to rebuild the control group closure table from parent_group_id.
+Needed for databases created without the migration, or after control groups
+were written without the ORM (raw SQL, bulk imports).
+
+Usage:
+    python rebuild_control_group_closure.py [--framework-id N]
+"""
+import sys
+import argparse
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.db import SessionLocal
+from app.services.control_hierarchy import rebuild_closure
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the control group closure table")
+    parser.add_argument("--framework-id", type=int, default=None, help="Only rebuild this framework's groups")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print("\n" + "="*80)
+        print("CONTROL GROUP CLOSURE REBUILD")
+        print("="*80 + "\n")
+
+        rows = rebuild_closure(db, framework_id=args.framework_id)
+        db.commit()
+
+        print(f"Closure rows written: {rows}")
+        print()
+    except Exception as e:
+        db.rollback()
+        print(f"✗ Closure rebuild failed: {str(e)}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ sys.path.insert(0, str(backend_dir))
 from sqlalchemy import text
 from app.db import SessionLocal
 from app.models import Framework, ControlGroup, Control
+from app.services import framework_catalog
 
 def fix_iso27001_control_mappings():
     """
@@ -72,6 +73,7 @@ def fix_iso27001_control_mappings():
         print()
         
         fixed_count = 0
+        other_framework_ids = set()  # Frameworks controls are moved out of
         already_correct = 0
         skipped_count = 0
         
@@ -124,6 +126,7 @@ def fix_iso27001_control_mappings():
                     # Group belongs to different framework
                     needs_fix = True
                     fix_reason = f"Wrong framework (group framework_id={current_group.framework_id}, expected {framework.id})"
+                    other_framework_ids.add(current_group.framework_id)
                 elif control.control_group_id != correct_group_id:
                     # Wrong group (but same framework)
                     needs_fix = True
@@ -140,6 +143,9 @@ def fix_iso27001_control_mappings():
         if fixed_count > 0:
             print()
             print(f"💾 Committing {fixed_count} fixes to database...")
+            # Cached trees of the frameworks involved (running workers included) are reloaded
+            for framework_id in {framework.id} | other_framework_ids:
+                framework_catalog.invalidate_framework(db, framework_id)
             db.commit()
             print(f"✅ Successfully committed changes")
         else:
@@ -10,7 +10,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.db import SessionLocal
 from app.models import Framework, KnowledgeBaseDocument, KnowledgeSourceType
-from app.utils.text_extraction import extract_text_from_file
+from app.utils.text_extraction import extract_text_cached
 from app.services.pinecone_service import get_index, chunk_text
 from app.services.ai_service import get_embedding
 import shutil
@@ -108,7 +108,7 @@ def upload_file_direct(file_path: Path, db) -> dict:
     # Extract text
     try:
         print(f"Extracting text from: {file_path}")
-        raw_text = extract_text_from_file(str(file_path))
+        raw_text = extract_text_cached(str(file_path))
         print(f"✅ Text extracted: {len(raw_text)} characters")
     except Exception as e:
         print(f"❌ Error extracting text: {str(e)}")
@@ -42,7 +42,8 @@ except Exception as e:
 try:
     # Test 3: AI Service
     print("\n3️⃣ Testing AI Service...")
-    from app.services.ai_service import client
+    from app.services.llm_gateway import get_client
+    client = get_client()
     print(f"   ✅ OpenAI client initialized")
     print(f"   ✅ API Key available: {'YES' if hasattr(client, '_client') or True else 'NO'}")
 except Exception as e:
@@ -0,0 +1,101 @@
+"""
+Trace report for exported gap analysis traces (TRACE_EXPORT_FORMAT=jsonl).
+Lists the slowest traced controls and prints each as a span tree with durations
+and attributes, so a slow control can be diagnosed without re-running it.
+
+Usage:
+    python trace_report.py [--file app/storage/traces/spans.jsonl] [--top 5]
+                           [--control-id ID] [--trace-id ID] [--min-ms 1]
+"""
+import sys
+import json
+import argparse
+from collections import defaultdict
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+DEFAULT_FILE = Path(__file__).parent / "app" / "storage" / "traces" / "spans.jsonl"
+
+
+def load_traces(path):
+    """Spans grouped by trace ID (malformed lines are skipped)."""
+    traces = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                span = json.loads(line)
+            except ValueError:
+                continue
+            if "trace_id" in span:
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def root_of(spans):
+    return next((span for span in spans if not span.get("parent_span_id")), None)
+
+
+def format_attributes(attributes):
+    return " ".join(f"{key}={value}" for key, value in attributes.items() if key != "statement" and value is not None)
+
+
+def print_tree(spans, min_ms):
+    """Print a trace as an indented span tree; children shorter than min_ms are summarised."""
+    children = defaultdict(list)
+    for span in spans:
+        children[span.get("parent_span_id")].append(span)
+    for siblings in children.values():
+        siblings.sort(key=lambda span: span["start_unix_nano"])
+
+    def walk(span, depth):
+        status = " ✗ " + span["error"] if span.get("error") else ""
+        print(f"{'  ' * depth}{span['name']:<{max(1, 36 - 2 * depth)}}{span['duration_ms']:>10.1f} ms  "
+              f"{format_attributes(span.get('attributes', {}))}{status}")
+        hidden = [child for child in children[span["span_id"]] if child["duration_ms"] < min_ms]
+        for child in children[span["span_id"]]:
+            if child["duration_ms"] >= min_ms:
+                walk(child, depth + 1)
+        if hidden:
+            print(f"{'  ' * (depth + 1)}... {len(hidden)} span(s) under {min_ms} ms, "
+                  f"{sum(child['duration_ms'] for child in hidden):.1f} ms total")
+
+    root = root_of(spans)
+    if root:
+        walk(root, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the slowest exported gap analysis traces")
+    parser.add_argument("--file", default=str(DEFAULT_FILE), help="Exported spans (jsonl)")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest traces to show")
+    parser.add_argument("--control-id", type=int, default=None, help="Only traces of this control")
+    parser.add_argument("--trace-id", default=None, help="Show one trace")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="Collapse spans shorter than this")
+    args = parser.parse_args()
+
+    if not Path(args.file).exists():
+        print(f"✗ No trace file at {args.file} (set TRACE_SAMPLE_RATE or TRACE_SLOW_MS to record traces)")
+        sys.exit(1)
+
+    traces = load_traces(args.file)
+    selected = []
+    for trace_id, spans in traces.items():
+        root = root_of(spans)
+        if root is None:
+            continue
+        if args.trace_id and trace_id != args.trace_id:
+            continue
+        if args.control_id is not None and root.get("attributes", {}).get("control_id") != args.control_id:
+            continue
+        selected.append((root["duration_ms"], trace_id, spans))
+    selected.sort(key=lambda item: item[0], reverse=True)
+
+    print(f"{len(traces)} trace(s) in {args.file}, showing {min(args.top, len(selected))} of {len(selected)} matching\n")
+    for duration_ms, trace_id, spans in selected[:args.top]:
+        print(f"=== trace {trace_id} ({duration_ms:.1f} ms, {len(spans)} spans) ===")
+        print_tree(spans, args.min_ms)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -36,10 +36,6 @@ def check_indexes():
             'ix_control_selections_company_framework': """
                 CREATE INDEX IF NOT EXISTS ix_control_selections_company_framework 
                 ON control_selections(company_id, framework_id)
-            """,
-            'ix_control_selections_control_ids': """
-                CREATE INDEX IF NOT EXISTS ix_control_selections_control_ids 
-                ON control_selections USING GIN (selected_control_ids)
             """
         }
         
@@ -88,8 +84,10 @@ def check_data():
                     cs.id,
                     c.name AS company_name,
                     f.name AS framework_name,
-                    cs.selected_control_ids,
-                    jsonb_array_length(cs.selected_control_ids::jsonb) AS control_count,
+                    (
+                        SELECT COUNT(*) FROM company_control_selection ccs
+                        WHERE ccs.company_id = cs.company_id AND ccs.framework_id = cs.framework_id
+                    ) AS control_count,
                     cs.created_at
                 FROM control_selections cs
                 LEFT JOIN companies c ON cs.company_id = c.id
@@ -101,7 +99,7 @@ def check_data():
             samples = result.fetchall()
             print("\n📋 Sample records (latest 5):")
             for sample in samples:
-                print(f"   - ID {sample[0]}: {sample[1]} | {sample[2]} | {sample[4]} controls | {sample[5]}")
+                print(f"   - ID {sample[0]}: {sample[1]} | {sample[2]} | {sample[3]} controls | {sample[4]}")
         
     except Exception as e:
         print(f"❌ Error checking data: {str(e)}")